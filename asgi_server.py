@@ -0,0 +1,353 @@
+"""
+ASGI server mode for AutoGen Web Tester.
+
+One asyncio event loop serves Socket.IO, drives Playwright and awaits OpenAI,
+instead of threading-mode Flask-SocketIO with a private loop per run. Runs
+are tasks on the server loop, so there are no per-run threads and emits
+don't cross threads. The Flask HTTP routes are mounted unchanged through an
+ASGI adapter.
+
+Run with:
+    uvicorn asgi_server:app --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import threading
+
+import socketio
+from asgiref.wsgi import WsgiToAsgi
+
+import config
+import web_ui
+from run_control import RunControl
+from run_queue import QueueFullError
+from web_ui import RunRequestError
+
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+
+# Runs in flight; holding a reference keeps their tasks from being collected
+_run_tasks = set()
+
+
+class AsyncEmitter:
+    """
+    Hands web_ui's emits to the async server in order.
+
+    Runs call ``socketio.emit`` synchronously; items are queued and a single
+    consumer task sends them, coalescing 'log' events into 'log_batch' every
+    LOG_BATCH_INTERVAL_MS. Calls from other threads are handed over with
+    ``call_soon_threadsafe``.
+    """
+
+    def __init__(self, server: socketio.AsyncServer, interval: float = 0.1):
+        self.server = server
+        self.interval = interval
+        self._queue = None
+        self._loop = None
+        self._loop_thread = None
+        self._task = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._queue = asyncio.Queue()
+        self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def emit(self, event, data=None, to=None, **kwargs):
+        item = (event, data, to)
+        if threading.get_ident() == self._loop_thread:
+            self._queue.put_nowait(item)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    async def _run(self):
+        pending_logs = []
+        flush_at = None
+        while True:
+            timeout = max(0.0, flush_at - self._loop.time()) if pending_logs else None
+            try:
+                event, data, to = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                await self._flush(pending_logs)
+                pending_logs = []
+                continue
+
+            if event == 'log' and to is None:
+                if not pending_logs:
+                    flush_at = self._loop.time() + self.interval
+                pending_logs.append(data)
+                continue
+
+            # Keep log lines ordered before everything except stream frames
+            if pending_logs and event not in web_ui.InstrumentedSocketIO.UNORDERED_EVENTS:
+                await self._flush(pending_logs)
+                pending_logs = []
+            try:
+                await self.server.emit(event, data, to=to)
+            except Exception as e:
+                print(f"Warning: Could not emit {event}: {e}")
+
+    async def _flush(self, entries: list):
+        if entries:
+            try:
+                await self.server.emit('log_batch', {'entries': entries})
+            except Exception as e:
+                print(f"Warning: Could not emit log batch: {e}")
+
+
+emitter = AsyncEmitter(sio, interval=config.LOG_BATCH_INTERVAL_MS / 1000)
+
+
+def start_run(coro, control: RunControl = None):
+    """Run a coroutine as a task on the server loop, attaching it to the run's control."""
+    task = asyncio.get_running_loop().create_task(coro)
+    _run_tasks.add(task)
+    task.add_done_callback(_run_tasks.discard)
+    if control is not None:
+        control.attach(task)
+    return task
+
+
+def submit_run(kind: str, resources: dict, make_coro, sid: str, label: str = ''):
+    """Queue a run in web_ui's run queue; ``make_coro()`` becomes a task on this loop once admitted.
+
+    Returns:
+        RunControl, or None if the queue was full (the client has been told)
+    """
+    loop = asyncio.get_running_loop()
+
+    def start(control):
+        # Admission can happen on whichever thread released the slot
+        loop.call_soon_threadsafe(lambda: start_run(_run_admitted(control, make_coro), control))
+
+    return web_ui.queue_run(kind, resources, start, sid=sid, label=label)
+
+
+async def _run_admitted(control, make_coro):
+    try:
+        await make_coro()
+    finally:
+        web_ui.finish_run(control)
+
+
+async def log_to(sid: str, log_type: str, message: str):
+    await sio.emit('log', {'type': log_type, 'message': message}, to=sid)
+
+
+@sio.event
+async def connect(sid, environ):
+    """Handle client connection."""
+    await log_to(sid, 'info', 'Connected to AutoGen Web Tester')
+
+
+@sio.on('run_test')
+async def handle_run_test(sid, data):
+    """Handle test execution request."""
+    data = data or {}
+    task = data.get('task', '')
+
+    if not task:
+        await log_to(sid, 'error', 'No test steps provided')
+        return
+
+    try:
+        options = dict(web_ui.parse_run_options(data), **web_ui.parse_network_options(data))
+    except RunRequestError as e:
+        await log_to(sid, 'error', str(e))
+        return
+    if submit_run('ai', web_ui.AI_RUN_SLOTS, lambda: web_ui.run_test_async(task, options), sid, 'AI test'):
+        await log_to(sid, 'info', 'Starting test...')
+
+
+@sio.on('stop_test')
+async def handle_stop_test(sid, data=None):
+    """Handle a stop request for one run (``run_id``) or, by default, all of this client's runs."""
+    if web_ui.stop_runs(run_id=(data or {}).get('run_id'), owner=sid):
+        await log_to(sid, 'info', 'Stop request received, stopping test...')
+    else:
+        await log_to(sid, 'info', 'No running test to stop')
+
+
+@sio.on('run_playwright_code')
+async def handle_run_playwright_code(sid, data):
+    """Handle running Playwright code from the editor."""
+    data = data or {}
+    code = data.get('code', '')
+
+    if not code:
+        await log_to(sid, 'error', 'No code provided')
+        return
+
+    try:
+        options = dict(web_ui.parse_run_options(data), **web_ui.parse_network_options(data))
+    except RunRequestError as e:
+        await log_to(sid, 'error', str(e))
+        return
+    if submit_run('saved', web_ui.BROWSER_RUN_SLOTS,
+                  lambda: web_ui.run_playwright_code_async(code, None, options), sid, 'Editor code'):
+        await log_to(sid, 'info', '▶️ Executing Playwright code from editor...')
+        await log_to(sid, 'info', '🚀 Starting browser session...')
+
+
+@sio.on('run_saved_test')
+async def handle_run_saved_test(sid, data):
+    """Handle running a saved Playwright test (no AI needed)."""
+    data = data or {}
+    filename = data.get('filename')
+
+    try:
+        test_data = web_ui.load_saved_test(filename)
+        network = web_ui.parse_network_options(data)
+    except RunRequestError as e:
+        await log_to(sid, 'error', str(e))
+        return
+    except Exception as e:
+        await log_to(sid, 'error', f'Error running saved test: {str(e)}')
+        return
+
+    name = test_data.get('name')
+    options = dict(web_ui.parse_run_options(data), **network, timeout_s=test_data.get('timeout_s'))
+    if submit_run('saved', web_ui.BROWSER_RUN_SLOTS,
+                  lambda: web_ui.run_playwright_code_async(test_data.get('code'), filename, options),
+                  sid, name or filename):
+        await log_to(sid, 'info', f'Running saved test: {name}')
+        await log_to(sid, 'info', '🚀 Executing Playwright code with live browser preview...')
+        if options['network'] == 'record':
+            await log_to(sid, 'info', '⏺ Re-recording network traffic for replays')
+
+
+@sio.on('run_ai_step')
+async def handle_run_ai_step(sid, data):
+    """Handle running an AI step test from file."""
+    data = data or {}
+    filename = data.get('filename')
+
+    try:
+        step_data = web_ui.load_ai_step(filename)
+        network = web_ui.parse_network_options(data)
+    except RunRequestError as e:
+        await log_to(sid, 'error', str(e))
+        return
+    except Exception as e:
+        await log_to(sid, 'error', f'Error running AI step: {str(e)}')
+        return
+
+    name = step_data.get('name')
+    options = dict(web_ui.parse_run_options(data), **network, timeout_s=step_data.get('timeout_s'))
+    ai_step = {'filename': filename, 'name': name}
+    if submit_run('ai', web_ui.AI_RUN_SLOTS, lambda: web_ui.run_test_async(step_data.get('steps'), options, ai_step),
+                  sid, name or filename):
+        await log_to(sid, 'info', f'🤖 Running AI steps: {name}')
+
+
+@sio.on('run_load_test')
+async def handle_run_load_test(sid, data):
+    """Handle running a saved test as a load test."""
+    data = data or {}
+    filename = data.get('filename')
+    try:
+        test_data = web_ui.load_saved_test(filename)
+        options = web_ui.parse_load_test_options(data, test_data)
+    except RunRequestError as e:
+        await log_to(sid, 'error', str(e))
+        return
+
+    name = test_data.get('name') or filename
+    if submit_run('load', {'browsers': options['browsers']},
+                  lambda: web_ui.run_load_test_async(filename, options), sid, f'Load test: {name}'):
+        await log_to(sid, 'info', f"📈 Load test of {name}: {options['users']} users over "
+                                  f"{options['browsers']} browsers for {options['duration_s']:g}s")
+
+
+@sio.on('run_all_tests')
+async def handle_run_all_tests(sid, data):
+    """Handle running all saved tests concurrently."""
+    data = data or {}
+    try:
+        run_options = dict(web_ui.parse_network_options(data), **web_ui.parse_batch_options(data))
+    except RunRequestError as e:
+        await sio.emit('run_rejected', {'kind': 'batch', 'label': 'Run all tests', 'message': str(e)}, to=sid)
+        await log_to(sid, 'error', str(e))
+        return
+    try:
+        web_ui.run_queue.ensure_capacity()
+    except QueueFullError as e:
+        web_ui.reject_run('batch', sid, 'Run all tests', e)
+        return
+    batch = web_ui.runs.register(RunControl('batch', label='Run all tests', owner=sid))
+    start_run(run_all_tests(data.get('filenames', []), batch=batch, run_options=run_options))
+
+
+async def run_all_tests(filenames, max_workers: int = 5, batch: RunControl = None, report=None,
+                        ai_step_filenames=(), run_options: dict = None):
+    """web_ui.run_batch on the server loop: each attempt is a task, so stop_test can cancel one test alone.
+
+    Returns:
+        dict: The batch summary also emitted as ``batch_run_complete``
+    """
+    run_options = run_options or {}
+
+    async def run_on_loop(kind, test_data, filename, timeout_s, row_results, control):
+        if kind == 'ai':
+            coro = web_ui.run_ai_step_headless_async(test_data, filename, timeout_s, run_options)
+        else:
+            coro = web_ui.run_playwright_code_headless_async(test_data.get('code', ''), filename, timeout_s,
+                                                             run_options, row_results)
+        return await start_run(coro, control)
+
+    return await web_ui.run_batch(filenames, run_on_loop, max_workers, batch, report, ai_step_filenames,
+                                  run_options)
+
+
+@sio.on('chat_message')
+async def handle_chat_message(sid, data):
+    """Handle chat message from AI Chat tab."""
+    data = data or {}
+    message = data.get('message')
+    image = data.get('image')  # Base64 encoded image
+
+    if not message and not image:
+        await sio.emit('chat_error', {'message': 'No message or image provided'}, to=sid)
+        return
+
+    start_run(handle_code_chat(message, data.get('existing_code'), image, data.get('file_type', 'unknown')))
+
+
+async def handle_code_chat(message, existing_code, image=None, file_type='unknown'):
+    """Generate a chat response with the async OpenAI client."""
+    try:
+        async with web_ui.llm_limiter:
+            result = await web_ui.get_code_agent().agenerate_response(message, existing_code, image, file_type)
+        web_ui.emit_chat_result(result)
+    except Exception as e:
+        web_ui.socketio.emit('chat_error', {'message': str(e)})
+
+
+@sio.on('clear_chat')
+async def handle_clear_chat(sid, data=None):
+    """Handle chat history clear request."""
+    if web_ui._code_agent is not None:
+        web_ui._code_agent.clear_history()
+    await log_to(sid, 'info', 'Chat history cleared')
+
+
+async def on_startup():
+    emitter.start()
+    web_ui.socketio.forward_emit = emitter.emit
+    # Every run shares this loop, so a stall is reported but never interrupted
+    web_ui.watchdog.watch(asyncio.get_running_loop(), 'ASGI server loop', threading.get_ident())
+
+
+async def on_shutdown():
+    web_ui.socketio.forward_emit = None
+    await emitter.stop()
+
+
+app = socketio.ASGIApp(sio, other_asgi_app=WsgiToAsgi(web_ui.app),
+                       on_startup=on_startup, on_shutdown=on_shutdown)
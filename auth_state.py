@@ -0,0 +1,129 @@
+"""Reusable authenticated storage state: saved by setup tests, loaded by the tests that depend on them."""
+
+import fnmatch
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, Optional
+
+
+class AuthStateError(Exception):
+    """Raised when a dependency's storage state can't be provided."""
+
+
+def save_state(path: Path, storage_state: dict, ttl_s: float) -> dict:
+    """
+    Store a setup test's storage state (cookies and localStorage) with its expiry.
+
+    Returns:
+        dict: The stored metadata (``saved_at``, ``expires_at``, ``ttl_s``)
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    meta = {
+        'saved_at': datetime.fromtimestamp(now).isoformat(),
+        'expires_at': datetime.fromtimestamp(now + ttl_s).isoformat(),
+        'ttl_s': ttl_s
+    }
+    partial = path.with_name(path.name + '.partial')
+    with open(partial, 'w') as f:
+        json.dump(dict(meta, storage_state=storage_state), f, indent=2)
+    os.replace(partial, path)
+    return meta
+
+
+def state_info(path: Path) -> Optional[dict]:
+    """A stored state's metadata plus ``expired``, without the state itself (None if there is none)."""
+    try:
+        with open(path, 'r') as f:
+            stored = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: Could not read auth state {path}: {e}")
+        return None
+    info = {key: value for key, value in stored.items() if key != 'storage_state'}
+    info['expired'] = datetime.fromisoformat(stored['expires_at']) <= datetime.now()
+    return info
+
+
+def load_state(path: Path) -> Optional[dict]:
+    """The stored storage state, or None if there is none or it has expired."""
+    info = state_info(path)
+    if not info or info['expired']:
+        return None
+    with open(path, 'r') as f:
+        return json.load(f).get('storage_state')
+
+
+def invalidate_state(path: Path) -> bool:
+    """Drop a stored state so the next dependent run refreshes it."""
+    try:
+        Path(path).unlink()
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class StateCapture:
+    """
+    Keeps the storage state of the last context a setup test closes.
+
+    Register ``capture`` as a ContextHooks close callback.
+    """
+
+    def __init__(self):
+        self.state: Optional[dict] = None
+
+    async def capture(self, context):
+        self.state = await context.storage_state()
+
+
+class AuthSession:
+    """
+    Starts a run's contexts with a setup test's storage state and watches for logged-out pages.
+
+    Args:
+        setup: The setup test's filename
+        provide: ``provide(refresh)`` returning the storage state; ``refresh``
+            reruns the setup test even if the stored state is still valid
+        logged_out_urls: Globs for URLs that mean the session was lost
+            (e.g. ``*/login*``), matched against main-frame navigations
+    """
+
+    def __init__(self, setup: str, provide: Callable[[bool], Awaitable[dict]], logged_out_urls: Iterable[str] = ()):
+        self.setup = setup
+        self.state: Optional[dict] = None
+        self.logged_out_url: Optional[str] = None
+        self._provide = provide
+        self._logged_out_urls = tuple(logged_out_urls)
+
+    async def start(self, hooks):
+        """Load the state and register it (and the logged-out watch) with a run's ContextHooks."""
+        self.state = await self._provide(False)
+        hooks.on_options(self._options)
+        if self._logged_out_urls:
+            hooks.on_context(self._watch)
+
+    async def refresh(self):
+        """Rerun the setup test; contexts created from now on get the new state."""
+        self.logged_out_url = None
+        self.state = await self._provide(True)
+
+    def _options(self, options: dict):
+        options.setdefault('storage_state', self.state)
+
+    async def _watch(self, context):
+        context.on('page', self._watch_page)
+        for page in context.pages:
+            self._watch_page(page)
+
+    def _watch_page(self, page):
+        page.on('framenavigated', lambda frame: self._navigated(page, frame))
+
+    def _navigated(self, page, frame):
+        if frame == page.main_frame and any(fnmatch.fnmatch(frame.url, url) for url in self._logged_out_urls):
+            self.logged_out_url = frame.url
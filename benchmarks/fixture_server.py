@@ -0,0 +1,60 @@
+"""Local HTTP server for the bundled benchmark fixture site."""
+
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+FIXTURE_SITE_DIR = Path(__file__).parent / "fixture_site"
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    """Static file handler that doesn't log every request to stderr."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """
+    Serves a directory over HTTP on a background thread.
+
+    Usage:
+        with FixtureServer() as server:
+            print(server.base_url)
+    """
+
+    def __init__(self, directory: Path = FIXTURE_SITE_DIR, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize FixtureServer.
+
+        Args:
+            directory: Directory to serve (defaults to the bundled fixture site)
+            host: Interface to bind
+            port: Port to bind (0 = pick a free port)
+        """
+        handler = partial(_QuietHandler, directory=str(directory))
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
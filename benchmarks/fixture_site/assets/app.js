@@ -0,0 +1,15 @@
+// Fixture site behaviour: client-side validated signup that redirects after a short delay
+const form = document.getElementById('signup-form');
+if (form) {
+    form.addEventListener('submit', (event) => {
+        event.preventDefault();
+        const email = document.getElementById('email').value;
+        const error = document.getElementById('form-error');
+        if (!/^[^@\s]+@[^@\s]+\.[^@\s]+$/.test(email)) {
+            error.hidden = false;
+            return;
+        }
+        error.hidden = true;
+        setTimeout(() => { window.location.href = 'welcome.html'; }, 200);
+    });
+}
@@ -0,0 +1,416 @@
+"""
+Benchmark suite for AutoGen Web Tester's own overhead.
+
+Serves the bundled fixture site and an OpenAI-compatible stub locally, so
+results are reproducible and need neither network access nor an API key.
+
+Usage:
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --only startup,actions --compare previous.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.fixture_server import FixtureServer
+from benchmarks.stub_llm import StubLLMServer, default_script
+
+
+BENCHMARKS = ('import', 'startup', 'actions', 'stream', 'batch', 'load', 'ai')
+
+BATCH_TEST_CODE = """from playwright.async_api import async_playwright
+import asyncio
+
+async def run():
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.goto("{base_url}/index.html")
+        await page.get_by_role("link", name="Sign Up").first.click()
+        await page.fill("input[name='fullName']", "Bench User")
+        await page.fill("input[name='email']", "bench@example.com")
+        await page.click("button[type='submit']")
+        await page.wait_for_url("**/welcome.html")
+        await browser.close()
+
+asyncio.run(run())
+"""
+
+
+def summarize(samples_s: list) -> dict:
+    """Latency statistics in milliseconds."""
+    values = sorted(s * 1000 for s in samples_s)
+    if not values:
+        return {'n': 0}
+    p95_index = max(0, min(len(values) - 1, math.ceil(0.95 * len(values)) - 1))
+    return {
+        'n': len(values),
+        'mean_ms': round(statistics.fmean(values), 2),
+        'median_ms': round(statistics.median(values), 2),
+        'p95_ms': round(values[p95_index], 2),
+        'min_ms': round(values[0], 2),
+        'max_ms': round(values[-1], 2)
+    }
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def bench_import_time(iterations: int, top: int = 10) -> dict:
+    """Cold ``import web_ui`` in fresh interpreters, without an OpenAI key.
+
+    Also reports the heaviest top-level imports (from ``python -X importtime``)
+    so a regression points at the module that caused it.
+    """
+    env = {k: v for k, v in os.environ.items() if k != 'OPENAI_API_KEY'}
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    probe = "import time; t = time.perf_counter(); import web_ui; print(time.perf_counter() - t)"
+
+    samples = []
+    for _ in range(iterations):
+        output = subprocess.check_output([sys.executable, '-c', probe], cwd=REPO_ROOT, env=env,
+                                         stderr=subprocess.DEVNULL, text=True)
+        samples.append(float(output.strip().splitlines()[-1]))
+
+    # Lines look like "import time:  self_us | cumulative_us | <indent>module";
+    # web_ui's direct imports are indented one level below it
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import web_ui'], cwd=REPO_ROOT,
+                            env=env, capture_output=True, text=True)
+    top_level = []
+    for line in result.stderr.splitlines():
+        parts = line.split('|')
+        if len(parts) != 3 or not line.startswith('import time:'):
+            continue
+        name = parts[2]
+        if name.startswith('   ') and not name.startswith('    '):
+            try:
+                top_level.append((int(parts[1]), name.strip()))
+            except ValueError:
+                continue
+    top_level.sort(reverse=True)
+
+    return {
+        'import_web_ui': summarize(samples),
+        'heaviest_imports_ms': {name: round(us / 1000, 1) for us, name in top_level[:top]}
+    }
+
+
+async def bench_browser_startup(iterations: int) -> dict:
+    """Playwright start + Chromium launch + context + page, and teardown."""
+    from playwright.async_api import async_playwright
+
+    launch, context, teardown = [], [], []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        playwright = await async_playwright().start()
+        browser = await playwright.chromium.launch(headless=True)
+        t1 = time.perf_counter()
+        ctx = await browser.new_context()
+        await ctx.new_page()
+        t2 = time.perf_counter()
+        await ctx.close()
+        await browser.close()
+        await playwright.stop()
+        t3 = time.perf_counter()
+        launch.append(t1 - t0)
+        context.append(t2 - t1)
+        teardown.append(t3 - t2)
+    return {'launch': summarize(launch), 'context_and_page': summarize(context), 'teardown': summarize(teardown)}
+
+
+async def bench_action_latency(base_url: str, iterations: int) -> dict:
+    """Raw Playwright actions vs. the agent's BrowserToolWithScreenshots wrappers."""
+    from playwright.async_api import async_playwright
+    from web_ui import BrowserToolWithScreenshots
+    from run_timeline import RunTimeline
+
+    raw = {'goto': [], 'fill': [], 'click': []}
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            await page.goto(f'{base_url}/signup.html', wait_until='domcontentloaded')
+            t1 = time.perf_counter()
+            await page.fill("input[name='fullName']", 'Bench User')
+            t2 = time.perf_counter()
+            await page.click("input[name='email']")
+            t3 = time.perf_counter()
+            raw['goto'].append(t1 - t0)
+            raw['fill'].append(t2 - t1)
+            raw['click'].append(t3 - t2)
+        await browser.close()
+
+    tool = {'navigate': [], 'fill_form': [], 'click': []}
+    timeline = RunTimeline('ai')
+    async with BrowserToolWithScreenshots(headless=True, timeline=timeline) as browser_tool:
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            await browser_tool.navigate(f'{base_url}/signup.html')
+            t1 = time.perf_counter()
+            await browser_tool.fill_form("input[name='fullName']", 'Bench User')
+            t2 = time.perf_counter()
+            await browser_tool.click("input[name='email']")
+            t3 = time.perf_counter()
+            tool['navigate'].append(t1 - t0)
+            tool['fill_form'].append(t2 - t1)
+            tool['click'].append(t3 - t2)
+
+    return {
+        'raw_playwright': {name: summarize(v) for name, v in raw.items()},
+        'browser_tool': {name: summarize(v) for name, v in tool.items()},
+        'browser_tool_breakdown': timeline.breakdown()
+    }
+
+
+async def bench_screenshot_stream(base_url: str, seconds: float) -> dict:
+    """Continuous screenshot streaming throughput and server-side CPU cost."""
+    from web_ui import BrowserToolWithScreenshots
+    from run_timeline import RunTimeline
+
+    timeline = RunTimeline('ai')
+    async with BrowserToolWithScreenshots(headless=True, timeline=timeline) as browser_tool:
+        await browser_tool.page.goto(f'{base_url}/listings.html')
+        cpu0, wall0 = time.process_time(), time.perf_counter()
+        task = asyncio.create_task(browser_tool.start_streaming())
+        await asyncio.sleep(seconds)
+        browser_tool.stop_streaming()
+        await task
+        cpu, wall = time.process_time() - cpu0, time.perf_counter() - wall0
+
+    frames = timeline.stream_frames
+    return {
+        'duration_s': round(wall, 2),
+        'frames': frames,
+        'fps': round(frames / wall, 2) if wall else 0,
+        'capture_mean_ms': round(timeline.stream_capture_s / frames * 1000, 2) if frames else 0,
+        'server_cpu_percent': round(cpu / wall * 100, 1) if wall else 0
+    }
+
+
+def bench_batch_throughput(base_url: str, worker_counts: list, tests: int) -> dict:
+    """run_all_tests_parallel over a temporary suite at several worker counts."""
+    import web_ui
+
+    results = {}
+    original_dirs = web_ui.SAVED_TESTS_DIR, web_ui.ARTIFACTS_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        suite_dir = Path(tmp)
+        filenames = []
+        for i in range(tests):
+            filename = f'Bench_{i}.json'
+            with open(suite_dir / filename, 'w') as f:
+                json.dump({'name': f'Bench {i}', 'code': BATCH_TEST_CODE.format(base_url=base_url)}, f)
+            filenames.append(filename)
+
+        # Runs' artifacts and page metrics trends stay out of the real test_artifacts/
+        web_ui.SAVED_TESTS_DIR, web_ui.ARTIFACTS_DIR = suite_dir, suite_dir / 'test_artifacts'
+        try:
+            for workers in worker_counts:
+                t0 = time.perf_counter()
+                summary = web_ui.run_all_tests_parallel(filenames, max_workers=workers)
+                wall = time.perf_counter() - t0
+                results[f'workers_{workers}'] = {
+                    'tests': tests,
+                    'passed': summary['passed'],
+                    'duration_s': round(wall, 2),
+                    'tests_per_minute': round(tests / wall * 60, 1) if wall else 0
+                }
+        finally:
+            web_ui.SAVED_TESTS_DIR, web_ui.ARTIFACTS_DIR = original_dirs
+    return results
+
+
+def bench_load_test(base_url: str, users: int, seconds: float) -> dict:
+    """run_load_test_async with the batch test as virtual users sharing pooled browsers."""
+    import web_ui
+
+    original_dirs = web_ui.SAVED_TESTS_DIR, web_ui.LOAD_TESTS_DIR, web_ui.ARTIFACTS_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        suite_dir = Path(tmp)
+        with open(suite_dir / 'Bench_load.json', 'w') as f:
+            json.dump({'name': 'Bench load', 'code': BATCH_TEST_CODE.format(base_url=base_url)}, f)
+
+        web_ui.SAVED_TESTS_DIR, web_ui.LOAD_TESTS_DIR, web_ui.ARTIFACTS_DIR = (
+            suite_dir, suite_dir / 'load_tests', suite_dir / 'test_artifacts')
+        try:
+            options = web_ui.parse_load_test_options({'users': users, 'ramp_up_s': 0, 'duration_s': seconds,
+                                                      'think_time_s': 0}, {})
+            result = web_ui.run_load_test('Bench_load.json', options, report=lambda event, payload: None)
+        finally:
+            web_ui.SAVED_TESTS_DIR, web_ui.LOAD_TESTS_DIR, web_ui.ARTIFACTS_DIR = original_dirs
+    return {
+        'users': users,
+        'browsers': options['browsers'],
+        'status': result['status'],
+        'iterations': result['iterations']['total'],
+        'iterations_per_s': result['throughput']['iterations_per_s'],
+        'error_rate': result['error_rate'],
+        'iteration_p50_ms': result['iterations']['p50_ms'],
+        'iteration_p95_ms': result['iterations']['p95_ms'],
+        'actions': {action['action']: {'p50_ms': action['p50_ms'], 'p95_ms': action['p95_ms']}
+                    for action in result['by_action']}
+    }
+
+
+def bench_ai_run(base_url: str, runs: int, llm_latency_ms: int) -> dict:
+    """End-to-end AI run against the stub LLM; overhead excludes LLM wait."""
+    import web_ui
+
+    completions = []
+    original_emit = web_ui.socketio.emit
+
+    def capture_emit(event, *args, **kwargs):
+        if event == 'test_complete' and args:
+            completions.append(args[0])
+        return original_emit(event, *args, **kwargs)
+
+    durations, breakdowns = [], []
+    original_base_url = web_ui.config.OPENAI_BASE_URL
+    with StubLLMServer(default_script(base_url), latency_ms=llm_latency_ms) as llm:
+        web_ui.config.OPENAI_BASE_URL = llm.base_url
+        web_ui.socketio.emit = capture_emit
+        try:
+            for _ in range(runs):
+                completions.clear()
+                t0 = time.perf_counter()
+                web_ui.run_test_sync('Sign up on the fixture site and verify the welcome page.')
+                durations.append(time.perf_counter() - t0)
+                if completions and completions[-1].get('timing'):
+                    breakdowns.append(completions[-1])
+        finally:
+            web_ui.socketio.emit = original_emit
+            web_ui.config.OPENAI_BASE_URL = original_base_url
+        requests = llm.request_count
+
+    passed = sum(1 for c in breakdowns if c.get('status') == 'success')
+    overhead = [b['timing']['total_s'] - b['timing']['llm_s'] for b in breakdowns]
+    return {
+        'runs': runs,
+        'passed': passed,
+        'llm_requests': requests,
+        'llm_latency_ms': llm_latency_ms,
+        'end_to_end': summarize(durations),
+        'overhead_excluding_llm': summarize(overhead),
+        'last_breakdown': breakdowns[-1]['timing'] if breakdowns else None
+    }
+
+
+def _flatten(prefix: str, value, out: dict):
+    if isinstance(value, dict):
+        for k, v in value.items():
+            _flatten(f'{prefix}.{k}' if prefix else k, v, out)
+    elif isinstance(value, (int, float)):
+        out[prefix] = value
+    return out
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Latency metrics (``*_ms`` / ``*_s``) that regressed by more than ``threshold``."""
+    now = _flatten('', current['results'], {})
+    before = _flatten('', baseline.get('results', {}), {})
+    regressions = []
+    for key, value in now.items():
+        if not (key.endswith('_ms') or key.endswith('duration_s')) or key not in before:
+            continue
+        if before[key] > 0 and value > before[key] * (1 + threshold):
+            regressions.append({'metric': key, 'baseline': before[key], 'current': value,
+                                'change_pct': round((value / before[key] - 1) * 100, 1)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark AutoGen Web Tester overhead locally.')
+    parser.add_argument('--output', default='bench_results.json', help='Where to write JSON results')
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help=f'Comma-separated subset of {BENCHMARKS}')
+    parser.add_argument('--iterations', type=int, default=5, help='Iterations for startup/action benchmarks')
+    parser.add_argument('--stream-seconds', type=float, default=5.0, help='Screenshot stream duration')
+    parser.add_argument('--workers', default='1,2,5', help='Worker counts for batch throughput')
+    parser.add_argument('--batch-tests', type=int, default=10, help='Tests per batch run')
+    parser.add_argument('--load-users', type=int, default=5, help='Virtual users for the load test benchmark')
+    parser.add_argument('--load-seconds', type=float, default=10.0, help='Load test benchmark duration')
+    parser.add_argument('--ai-runs', type=int, default=2, help='End-to-end AI runs')
+    parser.add_argument('--llm-latency-ms', type=int, default=0, help='Artificial stub LLM latency')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Regression threshold (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    # The stub stands in for OpenAI; no real key is needed
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark-stub')
+    selected = [b.strip() for b in args.only.split(',') if b.strip()]
+    results = {}
+
+    with FixtureServer() as site:
+        print(f"Fixture site: {site.base_url}")
+        if 'import' in selected:
+            print("Benchmarking web_ui import time...")
+            results['import_time'] = bench_import_time(args.iterations)
+        if 'startup' in selected:
+            print("Benchmarking browser startup...")
+            results['browser_startup'] = asyncio.run(bench_browser_startup(args.iterations))
+        if 'actions' in selected:
+            print("Benchmarking per-action latency...")
+            results['action_latency'] = asyncio.run(bench_action_latency(site.base_url, args.iterations))
+        if 'stream' in selected:
+            print("Benchmarking screenshot stream...")
+            results['screenshot_stream'] = asyncio.run(bench_screenshot_stream(site.base_url, args.stream_seconds))
+        if 'batch' in selected:
+            print("Benchmarking batch throughput...")
+            workers = [int(w) for w in args.workers.split(',') if w.strip()]
+            results['batch_throughput'] = bench_batch_throughput(site.base_url, workers, args.batch_tests)
+        if 'load' in selected:
+            print("Benchmarking load test...")
+            results['load_test'] = bench_load_test(site.base_url, args.load_users, args.load_seconds)
+        if 'ai' in selected:
+            print("Benchmarking end-to-end AI runs...")
+            results['ai_run'] = bench_ai_run(site.base_url, args.ai_runs, args.llm_latency_ms)
+
+    import playwright
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'playwright': getattr(playwright, '__version__', 'unknown'),
+            'cpu_count': os.cpu_count()
+        },
+        'results': results
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(report, baseline, args.threshold)
+        for r in report['regressions']:
+            print(f"REGRESSION {r['metric']}: {r['baseline']} -> {r['current']} (+{r['change_pct']}%)")
+        exit_code = 1 if report['regressions'] else 0
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':
+    main()
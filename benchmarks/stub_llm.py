@@ -0,0 +1,140 @@
+"""OpenAI-compatible stub server that replays scripted tool calls.
+
+The stub is stateless: for each /v1/chat/completions request it counts the
+tool results already present in the conversation and returns the next
+scripted step. That lets the real AutoGen agent drive a real browser
+against the fixture site without network access or API costs.
+"""
+
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+def default_script(base_url: str) -> List[dict]:
+    """Scripted signup flow against the bundled fixture site."""
+    return [
+        {'tool': 'navigate', 'arguments': {'url': f'{base_url}/index.html'}},
+        {'tool': 'click_text', 'arguments': {'text': 'Sign Up'}},
+        {'tool': 'find_inputs', 'arguments': {}},
+        {'tool': 'fill_form', 'arguments': {'selector': "input[name='fullName']", 'value': 'Bench User'}},
+        {'tool': 'fill_form', 'arguments': {'selector': "input[name='email']", 'value': 'bench@example.com'}},
+        {'tool': 'click', 'arguments': {'selector': "button[type='submit']"}},
+        {'tool': 'get_page_content', 'arguments': {}},
+        {'content': 'TEST PASSED: signup flow completed and welcome page shown'},
+    ]
+
+
+class StubLLMServer:
+    """
+    Minimal OpenAI chat completions endpoint on a background thread.
+
+    Usage:
+        with StubLLMServer(default_script(site_url)) as llm:
+            client = OpenAIChatCompletionClient(model="gpt-4o", api_key="stub", base_url=llm.base_url)
+    """
+
+    def __init__(self, script: List[dict], latency_ms: int = 0, host: str = "127.0.0.1", port: int = 0):
+        """
+        Initialize StubLLMServer.
+
+        Args:
+            script: Ordered steps; each is {'tool', 'arguments'} or {'content'}
+            latency_ms: Artificial delay per request to simulate model latency
+            host: Interface to bind
+            port: Port to bind (0 = pick a free port)
+        """
+        self.script = script
+        self.latency_ms = latency_ms
+        self.request_count = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: dict):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.rstrip('/').endswith('/models'):
+                    self._send_json(200, {'object': 'list', 'data': [{'id': 'gpt-4o', 'object': 'model'}]})
+                else:
+                    self._send_json(404, {'error': {'message': 'not found'}})
+
+            def do_POST(self):
+                if not self.path.rstrip('/').endswith('/chat/completions'):
+                    self._send_json(404, {'error': {'message': 'not found'}})
+                    return
+                length = int(self.headers.get('Content-Length', 0))
+                request = json.loads(self.rfile.read(length) or b'{}')
+                self._send_json(200, server.completion(request))
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def completion(self, request: dict) -> dict:
+        """Build the chat completion response for the next scripted step."""
+        with self._lock:
+            self.request_count += 1
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+
+        messages = request.get('messages', [])
+        step_index = sum(1 for m in messages if m.get('role') == 'tool')
+        step = self.script[min(step_index, len(self.script) - 1)]
+        prompt_tokens = sum(len(str(m.get('content') or '')) for m in messages) // 4
+
+        if 'tool' in step:
+            message = {
+                'role': 'assistant',
+                'content': None,
+                'tool_calls': [{
+                    'id': f'call_{uuid.uuid4().hex[:12]}',
+                    'type': 'function',
+                    'function': {'name': step['tool'], 'arguments': json.dumps(step['arguments'])}
+                }]
+            }
+            finish_reason = 'tool_calls'
+        else:
+            message = {'role': 'assistant', 'content': step['content']}
+            finish_reason = 'stop'
+
+        return {
+            'id': f'chatcmpl-{uuid.uuid4().hex[:12]}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-4o'),
+            'choices': [{'index': 0, 'message': message, 'finish_reason': finish_reason, 'logprobs': None}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': 20, 'total_tokens': prompt_tokens + 20}
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,168 @@
+"""ContextHooks: per-run setup applied to every browser context a test creates."""
+
+from typing import Awaitable, Callable, List
+
+
+class ContextHooks:
+    """
+    Setup a run applies to each browser context, whichever way the test's code creates it.
+
+    ``options`` callbacks adjust the keyword arguments of ``new_context`` (or
+    ``new_page``, which creates its own context); ``setup`` callbacks are
+    awaited with each new context before the test gets it, e.g. to install
+    request routes; ``page`` callbacks are awaited with each page ``new_page``
+    creates before the test gets it, e.g. to throttle it; ``close`` callbacks
+    are awaited with a context just before it closes, e.g. to read its
+    storage state.
+    """
+
+    def __init__(self):
+        self._options: List[Callable[[dict], None]] = []
+        self._setups: List[Callable[[object], Awaitable[None]]] = []
+        self._page_setups: List[Callable[[object], Awaitable[None]]] = []
+        self._closers: List[Callable[[object], Awaitable[None]]] = []
+        self._open = []  # Set-up contexts whose close callbacks haven't run
+
+    def __bool__(self) -> bool:
+        return bool(self._options or self._setups or self._page_setups or self._closers)
+
+    def on_options(self, update: Callable[[dict], None]):
+        """Register a callback that edits new-context options in place."""
+        self._options.append(update)
+
+    def on_context(self, setup: Callable[[object], Awaitable[None]]):
+        """Register an async callback run with every new context."""
+        self._setups.append(setup)
+
+    def on_page(self, setup: Callable[[object], Awaitable[None]]):
+        """Register an async callback run with every page new_page creates."""
+        self._page_setups.append(setup)
+
+    def on_close(self, teardown: Callable[[object], Awaitable[None]]):
+        """Register an async callback run with every context just before it closes."""
+        self._closers.append(teardown)
+
+    def context_options(self, options: dict) -> dict:
+        """Context options with every registered adjustment applied."""
+        options = dict(options)
+        for update in self._options:
+            update(options)
+        return options
+
+    async def setup(self, context):
+        for setup in self._setups:
+            await setup(context)
+        if self._closers:
+            self._open.append(context)
+
+    async def setup_page(self, page):
+        for setup in self._page_setups:
+            await setup(page)
+
+    async def teardown(self, context):
+        """Run the close callbacks for a context about to close (once per context)."""
+        if context not in self._open:
+            return
+        self._open.remove(context)
+        for teardown in self._closers:
+            try:
+                await teardown(context)
+            except Exception as e:
+                print(f"Warning: Context close callback failed: {e}")
+
+    async def teardown_all(self):
+        """Run the close callbacks for every context still open, e.g. when the test left them open."""
+        for context in list(self._open):
+            await self.teardown(context)
+
+    def wrap_playwright(self, playwright):
+        """Playwright driver whose browsers apply these hooks (the driver itself if there are none)."""
+        return HookedPlaywright(playwright, self) if self else playwright
+
+
+class HookedPlaywright:
+    def __init__(self, playwright, hooks: ContextHooks):
+        self._playwright = playwright
+        self._hooks = hooks
+
+    @property
+    def chromium(self):
+        return HookedLauncher(self._playwright.chromium, self._hooks)
+
+    @property
+    def firefox(self):
+        return HookedLauncher(self._playwright.firefox, self._hooks)
+
+    @property
+    def webkit(self):
+        return HookedLauncher(self._playwright.webkit, self._hooks)
+
+    def __getattr__(self, name):
+        return getattr(self._playwright, name)
+
+
+class HookedLauncher:
+    def __init__(self, launcher, hooks: ContextHooks):
+        self._launcher = launcher
+        self._hooks = hooks
+
+    async def launch(self, **kwargs):
+        return HookedBrowser(await self._launcher.launch(**kwargs), self._hooks)
+
+    def __getattr__(self, name):
+        return getattr(self._launcher, name)
+
+
+class HookedBrowser:
+    def __init__(self, browser, hooks: ContextHooks):
+        self._browser = browser
+        self._hooks = hooks
+
+    async def new_context(self, **kwargs):
+        context = await self._browser.new_context(**self._hooks.context_options(kwargs))
+        await self._hooks.setup(context)
+        return HookedContext(context, self._hooks)
+
+    async def new_page(self, **kwargs):
+        page = await self._browser.new_page(**self._hooks.context_options(kwargs))
+        await self._hooks.setup(page.context)
+        await self._hooks.setup_page(page)
+        return page
+
+    async def close(self, **kwargs):
+        for context in self._browser.contexts:
+            await self._hooks.teardown(context)
+        await self._browser.close(**kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+class HookedContext:
+    def __init__(self, context, hooks: ContextHooks):
+        self._context = context
+        self._hooks = hooks
+
+    async def new_page(self):
+        page = await self._context.new_page()
+        await self._hooks.setup_page(page)
+        return page
+
+    async def close(self, **kwargs):
+        await self._hooks.teardown(self._context)
+        await self._context.close(**kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
@@ -1,7 +1,14 @@
 """BrowserTool: Playwright wrapper for AutoGen agents."""
 
-from typing import Optional
-from playwright.async_api import async_playwright, Browser, Page, Playwright, BrowserContext
+from __future__ import annotations
+
+from typing import Optional, TYPE_CHECKING
+
+from page_metrics import format_summary
+
+if TYPE_CHECKING:
+    # Playwright is imported on first launch, keeping it out of app startup
+    from playwright.async_api import Browser, Page, Playwright, BrowserContext
 
 
 class BrowserTool:
@@ -13,7 +20,9 @@ class BrowserTool:
     """
 
     def __init__(self, headless: bool = False, timeout: int = 30000,
-                 record_video_dir: str = None, record_har: bool = False):
+                 record_video_dir: str = None, record_har: bool = False,
+                 record_trace_dir: str = None, trace_screenshots: bool = True,
+                 trace_snapshots: bool = True, context_hooks=None, page_metrics=None):
         """
         Initialize BrowserTool.
 
@@ -22,18 +31,38 @@ class BrowserTool:
             timeout: Default timeout for operations in milliseconds
             record_video_dir: Directory to save video recordings (None = no recording)
             record_har: Whether to record HTTP Archive (HAR) file
+            record_trace_dir: Directory to save a Playwright trace (None = no tracing)
+            trace_screenshots: Capture a screenshot filmstrip in the trace
+            trace_snapshots: Capture DOM snapshots for each traced action
+            context_hooks: ContextHooks applied to the browser context
+                (e.g. an execution profile's request blocking)
+            page_metrics: PageMetrics read after each navigation, whose
+                summary is added to navigate's result (its setup should be
+                one of ``context_hooks``)
         """
         self.headless = headless
         self.timeout = timeout
         self.record_video_dir = record_video_dir
         self.record_har = record_har
+        self.record_trace_dir = record_trace_dir
+        self.trace_screenshots = trace_screenshots
+        self.trace_snapshots = trace_snapshots
+        self.context_hooks = context_hooks
+        self.page_metrics = page_metrics
         self.playwright: Optional[Playwright] = None
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
+        # Exact artifact paths, populated once the context has closed
+        self.video_path: Optional[str] = None
+        self.har_path: Optional[str] = None
+        self.trace_path: Optional[str] = None
+        self._har_target: Optional[str] = None
 
     async def __aenter__(self):
         """Initialize Playwright and browser on context entry."""
+        from playwright.async_api import async_playwright
+
         self.playwright = await async_playwright().start()
         self.browser = await self.playwright.chromium.launch(headless=self.headless)
 
@@ -44,12 +73,25 @@ class BrowserTool:
             context_options['record_video_size'] = {"width": 1280, "height": 720}
 
         if self.record_har and self.record_video_dir:
-            context_options['record_har_path'] = f"{self.record_video_dir}/network.har"
+            self._har_target = f"{self.record_video_dir}/network.har"
+            context_options['record_har_path'] = self._har_target
 
-        # Create context with or without recording
-        if context_options:
+        # Create context with or without recording (tracing and hooks need a context)
+        if context_options or self.record_trace_dir or self.context_hooks:
+            if self.context_hooks:
+                context_options = self.context_hooks.context_options(context_options)
             self.context = await self.browser.new_context(**context_options)
+            if self.context_hooks:
+                await self.context_hooks.setup(self.context)
+            if self.record_trace_dir:
+                await self.context.tracing.start(
+                    screenshots=self.trace_screenshots,
+                    snapshots=self.trace_snapshots,
+                    sources=False
+                )
             self.page = await self.context.new_page()
+            if self.context_hooks:
+                await self.context_hooks.setup_page(self.page)
         else:
             self.page = await self.browser.new_page()
 
@@ -58,13 +100,37 @@ class BrowserTool:
 
     async def __aexit__(self, *args):
         """Cleanup resources on context exit."""
-        # Close page first
+        # Grab the video handle before the page goes away
+        video = self.page.video if self.page and self.context else None
+
+        # Close callbacks (e.g. final page metrics) still see the page
+        if self.context and self.context_hooks:
+            await self.context_hooks.teardown(self.context)
+
+        # Close page first; anything still polling it (e.g. a screenshot
+        # stream) sees there is no page left
         if self.page:
-            await self.page.close()
+            page, self.page = self.page, None
+            await page.close()
 
-        # Close context to save video recording
+        # Close context to save video recording; the video and HAR are
+        # guaranteed to be written once this returns
         if self.context:
+            if self.record_trace_dir:
+                try:
+                    trace_target = f"{self.record_trace_dir}/trace.zip"
+                    await self.context.tracing.stop(path=trace_target)
+                    self.trace_path = trace_target
+                except Exception as e:
+                    print(f"Warning: Could not save trace: {e}")
             await self.context.close()
+            if video:
+                try:
+                    self.video_path = str(await video.path())
+                except Exception as e:
+                    print(f"Warning: Could not resolve video path: {e}")
+            if self._har_target:
+                self.har_path = self._har_target
 
         # Close browser and playwright
         if self.browser:
@@ -72,6 +138,10 @@ class BrowserTool:
         if self.playwright:
             await self.playwright.stop()
 
+    async def _settle(self, ms: int):
+        """Fixed wait for dynamic content after an action (overridable for instrumentation)."""
+        await self.page.wait_for_timeout(ms)
+
     async def navigate(self, url: str) -> str:
         """
         Navigate to a URL.
@@ -89,10 +159,14 @@ class BrowserTool:
             # Use 'domcontentloaded' which is more reliable than 'networkidle' for modern SPAs
             await self.page.goto(url, wait_until="domcontentloaded", timeout=60000)
             # Wait a bit for dynamic content to load
-            await self.page.wait_for_timeout(2000)
+            await self._settle(2000)
             final_url = self.page.url
             title = await self.page.title()
-            return f"Navigated to {final_url} - Page title: '{title}'"
+            result = f"Navigated to {final_url} - Page title: '{title}'"
+            navigation = await self.page_metrics.snapshot(self.page) if self.page_metrics else None
+            if navigation:
+                result += f" - Performance: {format_summary(navigation)}"
+            return result
         except Exception as e:
             return f"Error navigating to {url}: {str(e)}"
 
@@ -134,7 +208,7 @@ class BrowserTool:
             await self.page.wait_for_selector(selector, state="visible")
             await self.page.click(selector)
             # Wait a moment for any navigation or dynamic content
-            await self.page.wait_for_timeout(1000)
+            await self._settle(1000)
             return f"Successfully clicked '{selector}'"
         except Exception as e:
             return f"Error clicking element '{selector}': {str(e)}"
@@ -187,9 +261,9 @@ class BrowserTool:
 
             # Wait longer for form submissions (buttons) to process and navigate
             if role == "button":
-                await self.page.wait_for_timeout(6000)  # 6 seconds for form processing & navigation
+                await self._settle(6000)  # 6 seconds for form processing & navigation
             else:
-                await self.page.wait_for_timeout(2000)
+                await self._settle(2000)
 
             return f"Successfully clicked element with text '{text}'"
 
@@ -3,9 +3,12 @@ Code Generation Agent for AutoGen Web Tester
 Provides conversational AI-powered Playwright code generation.
 """
 
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from typing import Optional, List, Dict
 import re
+import time
+
+import metrics
 
 
 class CodeGenerationAgent:
@@ -14,20 +17,22 @@ class CodeGenerationAgent:
     Uses OpenAI API to generate Python Playwright code based on user requests.
     """
 
-    def __init__(self, api_key: str, model: str = "gpt-4o"):
+    def __init__(self, api_key: str, model: str = "gpt-4o", base_url: Optional[str] = None):
         """
         Initialize the Code Generation Agent.
 
         Args:
             api_key: OpenAI API key
             model: OpenAI model name (default: gpt-4o)
+            base_url: Optional OpenAI-compatible API base URL
         """
         self.api_key = api_key
         self.model = model
         self.conversation_history: List[Dict[str, str]] = []
 
-        # Initialize OpenAI client
-        self.client = OpenAI(api_key=self.api_key)
+        # Initialize OpenAI clients (the async one serves ASGI server mode)
+        self.client = OpenAI(api_key=self.api_key, base_url=base_url)
+        self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=base_url)
 
         # System prompt for code generation
         self.system_prompt = """You are a Playwright code generation assistant. Generate and modify Python Playwright automation code.
@@ -117,6 +122,85 @@ RULES:
             # For 'test', 'unknown', or any other type, use the code generation prompt
             return self.system_prompt
 
+    def _prepare_messages(self, user_message: str, existing_code: Optional[str],
+                          image_data: Optional[str], file_type: str) -> List[Dict]:
+        """Add the user's turn to the history and build the chat request messages."""
+        # Build context with existing content if provided
+        context = ""
+        if existing_code:
+            if file_type == 'ai-step':
+                # For AI steps, treat existing content as test steps
+                context = f"Current test steps:\n{existing_code}\n\n"
+            else:
+                # For test files, treat existing content as code
+                context = f"Current code:\n```python\n{existing_code}\n```\n\n"
+
+        full_message = context + user_message
+
+        # Prepare message content (text or text + image)
+        if image_data:
+            # For vision requests, send image along with text
+            user_content = [
+                {"type": "text", "text": full_message},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": image_data
+                    }
+                }
+            ]
+        else:
+            user_content = full_message
+
+        # Add to conversation history
+        self.conversation_history.append({
+            "role": "user",
+            "content": user_content
+        })
+
+        # Get the appropriate system prompt based on file type
+        system_prompt = self._get_system_prompt(file_type)
+        return [{"role": "system", "content": system_prompt}] + self.conversation_history
+
+    def _process_response(self, response, started: float, file_type: str) -> Dict:
+        """Record metrics for a completion, add it to the history and extract code/steps."""
+        usage = getattr(response, 'usage', None)
+        metrics.observe_llm_call(
+            self.model, started,
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+            completion_tokens=getattr(usage, 'completion_tokens', 0) or 0
+        )
+
+        ai_message = response.choices[0].message.content
+
+        # Add to conversation history
+        self.conversation_history.append({
+            "role": "assistant",
+            "content": ai_message
+        })
+
+        # Extract content based on file type
+        code = None
+        content = None
+        explanation = None
+
+        if file_type == 'ai-step':
+            # For AI steps, extract the full response as content (steps)
+            content = self._extract_steps_from_response(ai_message)
+            explanation = self._extract_explanation_from_response(ai_message)
+        else:
+            # For test files, extract code blocks
+            code = self._extract_code_from_response(ai_message)
+            explanation = self._extract_explanation_from_response(ai_message)
+
+        return {
+            "message": ai_message,
+            "code": code,
+            "content": content,
+            "explanation": explanation,
+            "file_type": file_type
+        }
+
     def generate_response(self, user_message: str, existing_code: Optional[str] = None, image_data: Optional[str] = None, file_type: str = 'unknown') -> Dict:
         """
         Generate AI response and code based on user message.
@@ -134,81 +218,56 @@ RULES:
                 - explanation: Brief explanation of what was done
         """
         try:
-            # Build context with existing content if provided
-            context = ""
-            if existing_code:
-                if file_type == 'ai-step':
-                    # For AI steps, treat existing content as test steps
-                    context = f"Current test steps:\n{existing_code}\n\n"
-                else:
-                    # For test files, treat existing content as code
-                    context = f"Current code:\n```python\n{existing_code}\n```\n\n"
-
-            full_message = context + user_message
-
-            # Prepare message content (text or text + image)
-            if image_data:
-                # For vision requests, send image along with text
-                user_content = [
-                    {"type": "text", "text": full_message},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": image_data
-                        }
-                    }
-                ]
-            else:
-                user_content = full_message
+            messages = self._prepare_messages(user_message, existing_code, image_data, file_type)
 
-            # Add to conversation history
-            self.conversation_history.append({
-                "role": "user",
-                "content": user_content
-            })
+            # Call OpenAI API
+            started = time.perf_counter()
+            try:
+                response = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=2000
+                )
+            except Exception:
+                metrics.observe_llm_call(self.model, started, outcome='error')
+                raise
+
+            return self._process_response(response, started, file_type)
 
-            # Get the appropriate system prompt based on file type
-            system_prompt = self._get_system_prompt(file_type)
+        except Exception as e:
+            raise Exception(f"Error generating code: {str(e)}")
 
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt}
-                ] + self.conversation_history,
-                temperature=0.7,
-                max_tokens=2000
-            )
-
-            ai_message = response.choices[0].message.content
-
-            # Add to conversation history
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": ai_message
-            })
-
-            # Extract content based on file type
-            code = None
-            content = None
-            explanation = None
+    async def agenerate_response(self, user_message: str, existing_code: Optional[str] = None, image_data: Optional[str] = None, file_type: str = 'unknown') -> Dict:
+        """
+        Async variant of generate_response that doesn't block the event loop.
 
-            if file_type == 'ai-step':
-                # For AI steps, extract the full response as content (steps)
-                content = self._extract_steps_from_response(ai_message)
-                explanation = self._extract_explanation_from_response(ai_message)
-            else:
-                # For test files, extract code blocks
-                code = self._extract_code_from_response(ai_message)
-                explanation = self._extract_explanation_from_response(ai_message)
-
-            return {
-                "message": ai_message,
-                "code": code,
-                "content": content,
-                "explanation": explanation,
-                "file_type": file_type
-            }
+        Args:
+            user_message: User's request or question
+            existing_code: Optional existing code to modify
+            image_data: Optional base64 encoded image data
+            file_type: Type of file being edited ('test', 'ai-step', or 'unknown')
+
+        Returns:
+            Same dictionary as generate_response
+        """
+        try:
+            messages = self._prepare_messages(user_message, existing_code, image_data, file_type)
+
+            # Call OpenAI API
+            started = time.perf_counter()
+            try:
+                response = await self.async_client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.7,
+                    max_tokens=2000
+                )
+            except Exception:
+                metrics.observe_llm_call(self.model, started, outcome='error')
+                raise
+
+            return self._process_response(response, started, file_type)
 
         except Exception as e:
             raise Exception(f"Error generating code: {str(e)}")
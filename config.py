@@ -6,10 +6,17 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-# API Configuration
+# API Configuration (the key is only required for AI runs and chat)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY must be set in .env file")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # Optional OpenAI-compatible endpoint (e.g. benchmark stub)
+
+
+def require_openai_api_key() -> str:
+    """Return the OpenAI API key, raising if it is not configured."""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY must be set in .env file")
+    return OPENAI_API_KEY
+
 
 # Website Configuration
 WEBSITE_URL = os.getenv("WEBSITE_URL", "https://sunny.com")
@@ -30,4 +37,67 @@ KEEP_LAST_N_VIDEOS = int(os.getenv("KEEP_LAST_N_VIDEOS", "10"))  # Per test
 # Artifact Settings
 ENABLE_HAR_RECORDING = os.getenv("ENABLE_HAR_RECORDING", "true").lower() == "true"
 ENABLE_TRACE_RECORDING = os.getenv("ENABLE_TRACE_RECORDING", "false").lower() == "true"
+TRACE_SCREENSHOTS = os.getenv("TRACE_SCREENSHOTS", "true").lower() == "true"  # Filmstrip in the trace
+TRACE_SNAPSHOTS = os.getenv("TRACE_SNAPSHOTS", "true").lower() == "true"  # DOM snapshots per action
 MAX_ARTIFACT_SIZE_MB = int(os.getenv("MAX_ARTIFACT_SIZE_MB", "500"))  # Fail if exceeds
+COMPRESS_HAR = os.getenv("COMPRESS_HAR", "true").lower() == "true"  # Store HARs as .har.gz
+
+# Live Log Settings
+LOG_BATCH_INTERVAL_MS = int(os.getenv("LOG_BATCH_INTERVAL_MS", "100"))  # Coalesce run logs into log_batch events
+AGENT_MESSAGE_MAX_CHARS = int(os.getenv("AGENT_MESSAGE_MAX_CHARS", "4000"))  # Longer messages are fetched on demand (0 disables)
+
+# Run Queue Settings (shared by every entry point: AI runs, editor/saved runs, batches)
+MAX_CONCURRENT_BROWSERS = int(os.getenv("MAX_CONCURRENT_BROWSERS", "3"))  # Browser runs executing at once
+MAX_CONCURRENT_AI_RUNS = int(os.getenv("MAX_CONCURRENT_AI_RUNS", "2"))  # Of those, AI agent runs
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("MAX_CONCURRENT_LLM_CALLS", "4"))  # OpenAI requests in flight
+MAX_QUEUE_DEPTH = int(os.getenv("MAX_QUEUE_DEPTH", "20"))  # Runs waiting beyond this are rejected
+
+# Run Time Limits (seconds; a saved test or AI step's "timeout_s" overrides the per-run default)
+RUN_TIMEOUT_S = float(os.getenv("RUN_TIMEOUT_S", "300"))  # Saved/editor code and each batch test
+AI_RUN_TIMEOUT_S = float(os.getenv("AI_RUN_TIMEOUT_S", "900"))  # AI agent runs
+BATCH_TIMEOUT_S = float(os.getenv("BATCH_TIMEOUT_S", "3600"))  # Whole "Run all tests" batch
+FORCE_CLOSE_TIMEOUT_S = float(os.getenv("FORCE_CLOSE_TIMEOUT_S", "10"))  # Per browser/driver close after a timeout
+WATCHDOG_STALL_S = float(os.getenv("WATCHDOG_STALL_S", "30"))  # Run loop without progress this long is stalled (0 disables)
+WATCHDOG_INTERRUPT = os.getenv("WATCHDOG_INTERRUPT", "true").lower() == "true"  # Abort stalled runs' threads
+STOP_TIMEOUT_S = float(os.getenv("STOP_TIMEOUT_S", "5"))  # Grace period before a stop is escalated
+
+# HAR Replay Settings
+REPLAY_NOT_FOUND = os.getenv("REPLAY_NOT_FOUND", "abort")  # Requests missing from the HAR: 'abort' (offline) or 'fallback' to the network
+
+# Execution Profiles (request blocking, CPU and network throttling)
+EXECUTION_PROFILE = os.getenv("EXECUTION_PROFILE", "full")  # Default profile: 'full', 'no-trackers', 'lean', 'mid-range-mobile', 'low-end-mobile' or a custom one
+EXECUTION_PROFILES_FILE = os.getenv("EXECUTION_PROFILES_FILE")  # JSON file defining custom profiles
+
+# Auth State Settings
+AUTH_STATE_TTL_S = float(os.getenv("AUTH_STATE_TTL_S", "3600"))  # How long a setup test's storage state is reused
+
+# Incremental Run Settings
+INCREMENTAL_MAX_AGE_S = float(os.getenv("INCREMENTAL_MAX_AGE_S", "86400"))  # Oldest pass an incremental run reuses
+
+# Flaky Test Settings
+BATCH_RETRIES = int(os.getenv("BATCH_RETRIES", "1"))  # Extra attempts for a saved test that fails in a batch
+BATCH_MAX_RETRIES = int(os.getenv("BATCH_MAX_RETRIES", "5"))  # Most retries a batch or a test may ask for
+FLAKY_HISTORY_SIZE = int(os.getenv("FLAKY_HISTORY_SIZE", "20"))  # Batch runs kept per test for its flakiness score
+FLAKY_THRESHOLD = float(os.getenv("FLAKY_THRESHOLD", "0.3"))  # Flakiness score (0-1) that quarantines a test
+FLAKY_MIN_RUNS = int(os.getenv("FLAKY_MIN_RUNS", "5"))  # Runs of history needed before a test can be quarantined
+
+# Data-Driven Test Settings
+DATA_ROW_CONCURRENCY = int(os.getenv("DATA_ROW_CONCURRENCY", "4"))  # Data rows of one test running at once
+
+# Visual Regression Settings
+VISUAL_THRESHOLD = float(os.getenv("VISUAL_THRESHOLD", "0.1"))  # Perceptual color distance (0-1) at which a pixel differs
+VISUAL_MAX_DIFF_RATIO = float(os.getenv("VISUAL_MAX_DIFF_RATIO", "0.001"))  # Share of differing pixels a checkpoint tolerates
+
+# Page Performance Metrics
+PAGE_METRICS_ENABLED = os.getenv("PAGE_METRICS_ENABLED", "true").lower() == "true"  # Measure every navigation of a run
+PERF_BUDGET_LCP_MS = float(os.getenv("PERF_BUDGET_LCP_MS", "0"))  # Default LCP budget per navigation (0 disables)
+PERF_BUDGET_TRANSFER_BYTES = int(os.getenv("PERF_BUDGET_TRANSFER_BYTES", "0"))  # Default bytes per navigation (0 disables)
+PAGE_METRICS_HISTORY_SIZE = int(os.getenv("PAGE_METRICS_HISTORY_SIZE", "200"))  # Samples kept per URL for trends
+
+# Load Test Settings
+LOAD_TEST_MAX_USERS = int(os.getenv("LOAD_TEST_MAX_USERS", "50"))  # Most virtual users one load test may run
+LOAD_TEST_BROWSERS = int(os.getenv("LOAD_TEST_BROWSERS", "2"))  # Default browsers the virtual users share
+LOAD_TEST_DURATION_S = float(os.getenv("LOAD_TEST_DURATION_S", "60"))  # Default load test duration
+LOAD_TEST_THINK_TIME_S = float(os.getenv("LOAD_TEST_THINK_TIME_S", "1"))  # Default pause between a user's iterations
+LOAD_TEST_INTERVAL_S = float(os.getenv("LOAD_TEST_INTERVAL_S", "5"))  # Resolution of the load test timeline
+LOAD_TEST_GRACE_S = float(os.getenv("LOAD_TEST_GRACE_S", "30"))  # How long iterations may overrun the duration
@@ -0,0 +1,315 @@
+"""Data-driven saved tests: parameters, data rows, and a browser shared by the rows of a run."""
+
+import asyncio
+import csv
+import random
+import string
+import time
+import traceback
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+
+# Replaced in parameter values with a random string (one per row and run), e.g. "test+{random}@example.com"
+RANDOM_TOKEN = '{random}'
+# Optional row column naming the row in results (it isn't passed to the test as a parameter)
+LABEL_KEY = '_label'
+
+
+class DataError(ValueError):
+    """Raised when a test's parameters or data rows are malformed."""
+
+
+def read_csv_rows(path: Path) -> List[dict]:
+    """Rows of a CSV data file; the header row holds the parameter names."""
+    try:
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            return [dict(row) for row in csv.DictReader(f)]
+    except FileNotFoundError:
+        raise DataError(f"Data file {Path(path).name} not found")
+    except (OSError, csv.Error, UnicodeDecodeError) as e:
+        raise DataError(f"Could not read data file {Path(path).name}: {e}")
+
+
+def load_rows(settings: dict, data_dir: Path) -> List[dict]:
+    """
+    The data rows a saved test runs with ([] if it isn't data-driven).
+
+    ``"params"`` holds defaults every row starts from. Rows come from an
+    inline ``"data"`` list of objects or a ``"data_file"`` CSV in
+    ``data_dir``. A test with ``params`` but neither runs once with the
+    defaults.
+
+    Raises:
+        DataError: If the parameters or rows are malformed
+    """
+    params = settings.get('params') or {}
+    if not isinstance(params, dict):
+        raise DataError('"params" must be an object of parameter defaults')
+    if settings.get('data') is not None and settings.get('data_file'):
+        raise DataError('Give either "data" or "data_file", not both')
+
+    if settings.get('data_file'):
+        # Files live in data_dir; a path in the setting can't point elsewhere
+        rows = read_csv_rows(Path(data_dir) / Path(settings['data_file']).name)
+    elif settings.get('data') is not None:
+        rows = settings['data']
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise DataError('"data" must be a list of objects')
+    else:
+        return [dict(params)] if params else []
+
+    if not rows:
+        raise DataError('The test\'s data has no rows')
+    return [dict(params, **row) for row in rows]
+
+
+def row_label(row: dict, index: int) -> str:
+    """A row's name in results: its ``_label`` column, else its 1-based position."""
+    return str(row.get(LABEL_KEY) or f'row {index + 1}')
+
+
+def row_params(row: dict) -> dict:
+    """The parameters a row's run gets: ``{random}`` filled in (the same string throughout the row), no label."""
+    token = ''.join(random.choices(string.ascii_lowercase + string.digits, k=10))
+    return {key: value.replace(RANDOM_TOKEN, token) if isinstance(value, str) else value
+            for key, value in row.items() if key != LABEL_KEY}
+
+
+async def run_rows(rows: List[dict], run_row: Callable[[int, dict], Awaitable[None]], concurrency: int,
+                   results: List[dict]):
+    """
+    Run every data row, at most ``concurrency`` at a time.
+
+    ``results`` is filled with one entry per row, in row order: ``index``,
+    ``label``, ``params``, ``status`` ('success' or 'error'), ``error`` and
+    ``duration_s``. A row's failure doesn't stop the others. Rows that hadn't
+    finished when the run was cancelled keep ``status`` None.
+
+    Args:
+        rows: Rows from load_rows
+        run_row: ``run_row(index, params)``, raising if the row fails
+        concurrency: Rows running at once
+        results: List to fill (cleared first)
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results[:] = [{'index': index, 'label': row_label(row, index), 'params': None, 'status': None,
+                   'error': None, 'duration_s': None} for index, row in enumerate(rows)]
+
+    async def run_one(index, row):
+        async with semaphore:
+            result = results[index]
+            result['params'] = row_params(row)
+            started = time.perf_counter()
+            try:
+                await run_row(index, result['params'])
+                result['status'] = 'success'
+            except Exception as e:
+                result['status'] = 'error'
+                result['error'] = f"{str(e)}\n{traceback.format_exc()}"
+            finally:
+                result['duration_s'] = round(time.perf_counter() - started, 3)
+
+    await asyncio.gather(*(run_one(index, row) for index, row in enumerate(rows)))
+
+
+def failed_rows_message(results: List[dict]) -> Optional[str]:
+    """None if every row passed, else which rows failed and the first line of each error."""
+    failed = [result for result in results if result['status'] != 'success']
+    if not failed:
+        return None
+    lines = [f"{len(failed)} of {len(results)} data rows failed:"]
+    for result in failed:
+        error = (result.get('error') or result['status'] or 'not run').strip()
+        lines.append(f"  {result['label']}: {error.splitlines()[0] if error else result['status']}")
+    return '\n'.join(lines)
+
+
+class SharedBrowsers:
+    """
+    One Playwright driver, and a pool of browsers per browser type, shared by the data rows of a run.
+
+    Each row's code gets ``for_row(context_options)`` as its
+    ``async_playwright``. Launching a browser returns a RowBrowser on a
+    shared browser: its contexts start with ``context_options`` (e.g. the
+    row's video directory) and closing it closes only the row's contexts.
+    Videos the row's contexts recorded are listed once they are closed.
+
+    Args:
+        async_playwright: Factory of the real driver, e.g. a PlaywrightTracker
+        pool_size: Browsers per browser type; ``for_row``'s ``slot`` picks one
+    """
+
+    def __init__(self, async_playwright, pool_size: int = 1):
+        self._async_playwright = async_playwright
+        self.pool_size = max(1, pool_size)
+        self._manager = None
+        self._playwright = None
+        self._browsers = {}
+        self._row_browsers = []
+        self._lock = asyncio.Lock()
+
+    def for_row(self, context_options: dict = None, slot: int = 0, wrap_context: Callable = None,
+                video_paths: list = None):
+        """
+        An ``async_playwright`` stand-in for one row's code.
+
+        Args:
+            context_options: Options every context of the row starts with
+            slot: Which of the pooled browsers the row uses (modulo the pool size)
+            wrap_context: Applied to each context before the row's code gets
+                it (e.g. to time its pages' actions)
+            video_paths: Filled with the video files of the row's contexts
+                as they are closed
+        """
+        return lambda: _RowPlaywrightManager(self, context_options or {}, slot % self.pool_size, wrap_context,
+                                             video_paths)
+
+    async def driver(self):
+        async with self._lock:
+            if self._playwright is None:
+                self._manager = self._async_playwright()
+                self._playwright = await self._manager.__aenter__()
+            return self._playwright
+
+    async def launch(self, browser_type: str, launcher, kwargs: dict, slot: int = 0):
+        """The shared browser of a type in a pool slot, launched with the first row's arguments."""
+        async with self._lock:
+            if (browser_type, slot) not in self._browsers:
+                self._browsers[(browser_type, slot)] = await launcher.launch(**kwargs)
+            return self._browsers[(browser_type, slot)]
+
+    async def close(self):
+        """Close the contexts rows left open (finalising their recordings), the shared browsers and the driver."""
+        row_browsers, self._row_browsers = self._row_browsers, []
+        for row_browser in row_browsers:
+            await row_browser.close()
+        browsers, self._browsers = list(self._browsers.values()), {}
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception as e:
+                print(f"  Error closing shared browser: {e}")
+        manager, self._manager, self._playwright = self._manager, None, None
+        if manager:
+            await manager.__aexit__(None, None, None)
+
+
+class _RowPlaywrightManager:
+    def __init__(self, shared: SharedBrowsers, context_options: dict, slot: int = 0, wrap_context: Callable = None,
+                 video_paths: list = None):
+        self._shared = shared
+        self._context_options = context_options
+        self._slot = slot
+        self._wrap_context = wrap_context
+        self._video_paths = video_paths
+        self._browsers = []
+
+    async def start(self):
+        return _RowPlaywright(await self._shared.driver(), self)
+
+    async def stop(self):
+        for browser in self._browsers:
+            await browser.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args):
+        await self.stop()
+
+
+class _RowPlaywright:
+    def __init__(self, playwright, manager: _RowPlaywrightManager):
+        self._playwright = playwright
+        self._manager = manager
+
+    @property
+    def chromium(self):
+        return _RowLauncher('chromium', self._playwright.chromium, self._manager)
+
+    @property
+    def firefox(self):
+        return _RowLauncher('firefox', self._playwright.firefox, self._manager)
+
+    @property
+    def webkit(self):
+        return _RowLauncher('webkit', self._playwright.webkit, self._manager)
+
+    async def stop(self):
+        await self._manager.stop()
+
+    def __getattr__(self, name):
+        return getattr(self._playwright, name)
+
+
+class _RowLauncher:
+    def __init__(self, browser_type: str, launcher, manager: _RowPlaywrightManager):
+        self._browser_type = browser_type
+        self._launcher = launcher
+        self._manager = manager
+
+    async def launch(self, **kwargs):
+        manager = self._manager
+        browser = await manager._shared.launch(self._browser_type, self._launcher, kwargs, manager._slot)
+        row_browser = RowBrowser(browser, manager._context_options, manager._wrap_context, manager._video_paths)
+        manager._browsers.append(row_browser)
+        manager._shared._row_browsers.append(row_browser)
+        return row_browser
+
+    def __getattr__(self, name):
+        return getattr(self._launcher, name)
+
+
+class RowBrowser:
+    """A row's view of a shared browser: every page gets its own context, and close leaves the browser running."""
+
+    def __init__(self, browser, context_options: dict, wrap_context: Callable = None, video_paths: list = None):
+        self._browser = browser
+        self._context_options = context_options
+        self._wrap_context = wrap_context
+        self._video_paths = video_paths
+        self._contexts = []
+        self._pages = []  # Every page of the row's contexts, including ones already closed
+        self._closed = False
+
+    @property
+    def contexts(self):
+        return [self._wrap_context(context) for context in self._contexts] if self._wrap_context else list(self._contexts)
+
+    async def new_context(self, **kwargs):
+        context = await self._browser.new_context(**dict(self._context_options, **kwargs))
+        self._contexts.append(context)
+        if self._video_paths is not None:
+            context.on('page', self._pages.append)
+        return self._wrap_context(context) if self._wrap_context else context
+
+    async def new_page(self, **kwargs):
+        context = await self.new_context(**kwargs)
+        return await context.new_page()
+
+    async def close(self, **kwargs):
+        if self._closed:
+            return
+        self._closed = True
+        videos = [page.video for page in self._pages if page.video]
+        for context in self._contexts:
+            try:
+                await context.close()
+            except Exception as e:
+                print(f"  Error closing row context: {e}")
+        # Once its context is closed Playwright guarantees a video is written
+        for video in videos:
+            try:
+                self._video_paths.append(str(await video.path()))
+            except Exception as e:
+                print(f"  Could not resolve video path: {e}")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
@@ -0,0 +1,323 @@
+"""Execution profiles: requests a run blocks (resource types, tracker domains) and the device it emulates (CPU, network)."""
+
+import asyncio
+import fnmatch
+import json
+import weakref
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+# Analytics, tag-manager and session-recording hosts; a domain also matches its subdomains
+TRACKER_DOMAINS = (
+    'google-analytics.com', 'googletagmanager.com', 'googleadservices.com', 'doubleclick.net',
+    'facebook.net', 'connect.facebook.com', 'hotjar.com', 'segment.com', 'segment.io', 'mixpanel.com',
+    'amplitude.com', 'intercom.io', 'fullstory.com', 'clarity.ms', 'plausible.io', 'newrelic.com',
+    'nr-data.net', 'sentry.io', 'vercel-insights.com'
+)
+
+# Playwright resource types of requests a functional test doesn't need
+HEAVY_RESOURCE_TYPES = ('image', 'font', 'media')
+
+# Network conditions a profile can name (the Chrome DevTools presets); throughputs in kbit/s
+NETWORK_PRESETS = {
+    'slow-3g': {'latency_ms': 2000, 'download_kbps': 400, 'upload_kbps': 400},
+    'slow-4g': {'latency_ms': 563, 'download_kbps': 1440, 'upload_kbps': 675},
+    'fast-4g': {'latency_ms': 165, 'download_kbps': 8100, 'upload_kbps': 1350},
+    'offline': {'offline': True},
+}
+
+BUILTIN_PROFILES = {
+    'full': {},
+    'no-trackers': {'block_domains': list(TRACKER_DOMAINS)},
+    'lean': {'block_resource_types': list(HEAVY_RESOURCE_TYPES), 'block_domains': list(TRACKER_DOMAINS)},
+    # Lighthouse's mobile emulation: a mid-range phone on a slow 4G connection
+    'mid-range-mobile': {'cpu_throttling_rate': 4, 'network': 'slow-4g'},
+    'low-end-mobile': {'cpu_throttling_rate': 6, 'network': 'slow-3g'},
+}
+
+NETWORK_FIELDS = ('latency_ms', 'download_kbps', 'upload_kbps', 'offline')
+
+TOP_DOMAINS_LIMIT = 10
+
+
+class ProfileError(ValueError):
+    """Raised for an unknown or malformed execution profile."""
+
+
+def load_profiles(path: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Built-in profiles plus any defined in a JSON file.
+
+    The file maps profile names to ``{"block_resource_types": [...],
+    "block_domains": [...], "cpu_throttling_rate": 4, "network": ...}``
+    (see validate_profile); a name that matches a built-in replaces it.
+
+    Returns:
+        dict: Profile name -> profile
+    """
+    profiles = {name: dict(profile) for name, profile in BUILTIN_PROFILES.items()}
+    if not path:
+        return profiles
+    try:
+        with open(Path(path), 'r') as f:
+            custom = json.load(f)
+        for name, profile in custom.items():
+            profiles[name] = validate_profile(profile)
+    except Exception as e:
+        print(f"Warning: Could not load execution profiles from {path}: {e}")
+    return profiles
+
+
+def validate_profile(profile) -> dict:
+    """Check an inline or file-defined profile's shape.
+
+    ``cpu_throttling_rate`` is the CPU slowdown factor (1 is none) and
+    ``network`` a NETWORK_PRESETS name or ``{"latency_ms", "download_kbps",
+    "upload_kbps", "offline"}`` (a throughput left out is unlimited).
+
+    Raises:
+        ProfileError: If the block lists aren't string lists or the
+            throttling settings are malformed
+    """
+    if not isinstance(profile, dict):
+        raise ProfileError('An execution profile must be an object')
+    for key in ('block_resource_types', 'block_domains'):
+        values = profile.get(key) or []
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ProfileError(f"Execution profile '{key}' must be a list of strings")
+    rate = profile.get('cpu_throttling_rate')
+    if rate is not None and (isinstance(rate, bool) or not isinstance(rate, (int, float)) or rate < 1):
+        raise ProfileError("Execution profile 'cpu_throttling_rate' must be a number of at least 1")
+    network_conditions(profile.get('network'))
+    return profile
+
+
+def network_conditions(spec) -> Optional[dict]:
+    """
+    The network conditions a profile's ``network`` setting names.
+
+    Returns:
+        dict: ``latency_ms``, ``download_kbps`` and ``upload_kbps`` (None is
+        unlimited) and ``offline``, or None when the network isn't throttled
+
+    Raises:
+        ProfileError: If the preset is unknown or a condition is malformed
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, str):
+        if spec not in NETWORK_PRESETS:
+            raise ProfileError(f"Unknown network preset '{spec}' (expected one of {', '.join(NETWORK_PRESETS)})")
+        spec = NETWORK_PRESETS[spec]
+    if not isinstance(spec, dict):
+        raise ProfileError("Execution profile 'network' must be a preset name or an object")
+    unknown = set(spec) - set(NETWORK_FIELDS)
+    if unknown:
+        raise ProfileError(f"Unknown network condition '{sorted(unknown)[0]}' (expected {', '.join(NETWORK_FIELDS)})")
+    for key in ('latency_ms', 'download_kbps', 'upload_kbps'):
+        value = spec.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+            raise ProfileError(f"Network condition '{key}' must be a non-negative number")
+    if not isinstance(spec.get('offline', False), bool):
+        raise ProfileError("Network condition 'offline' must be true or false")
+    return {
+        'latency_ms': spec.get('latency_ms') or 0,
+        'download_kbps': spec.get('download_kbps'),
+        'upload_kbps': spec.get('upload_kbps'),
+        'offline': spec.get('offline', False)
+    }
+
+
+def resolve_profile(spec, profiles: Dict[str, dict]) -> Tuple[str, dict]:
+    """
+    Look up the profile a run uses.
+
+    Args:
+        spec: A profile name, or an inline profile dict (named 'custom')
+        profiles: Known profiles (see load_profiles)
+
+    Returns:
+        tuple: (name, profile)
+
+    Raises:
+        ProfileError: If the name is unknown or the inline profile is malformed
+    """
+    if isinstance(spec, dict):
+        return 'custom', validate_profile(spec)
+    if spec not in profiles:
+        raise ProfileError(f"Unknown execution profile '{spec}' (expected one of {', '.join(profiles)})")
+    return spec, profiles[spec]
+
+
+def domain_matches(host: str, pattern: str) -> bool:
+    """Whether ``host`` is ``pattern``, one of its subdomains, or matches it as a glob."""
+    host = host.lower()
+    pattern = pattern.lower()
+    return host == pattern or host.endswith('.' + pattern) or fnmatch.fnmatch(host, pattern)
+
+
+class RequestBlocker:
+    """
+    Aborts the requests an execution profile blocks and counts them.
+
+    Register ``setup`` as a ContextHooks context callback so every context
+    the run creates routes its requests through the blocker.
+    """
+
+    def __init__(self, name: str, profile: dict):
+        self.name = name
+        self.resource_types = frozenset(profile.get('block_resource_types') or ())
+        self.domains = tuple(profile.get('block_domains') or ())
+        self.blocked = 0
+        self.by_type: Dict[str, int] = {}
+        self.by_domain: Dict[str, int] = {}
+        self.blocked_urls: Dict[str, int] = {}
+
+    @property
+    def active(self) -> bool:
+        """Whether the profile blocks anything (no route is installed otherwise)."""
+        return bool(self.resource_types or self.domains)
+
+    def blocks(self, resource_type: str, url: str) -> bool:
+        if resource_type in self.resource_types:
+            return True
+        host = urlsplit(url).hostname or ''
+        return bool(host) and any(domain_matches(host, pattern) for pattern in self.domains)
+
+    async def setup(self, context):
+        await context.route('**/*', self._route)
+
+    async def _route(self, route):
+        request = route.request
+        if not self.blocks(request.resource_type, request.url):
+            await route.fallback()
+            return
+        self.blocked += 1
+        self.by_type[request.resource_type] = self.by_type.get(request.resource_type, 0) + 1
+        host = urlsplit(request.url).hostname or ''
+        self.by_domain[host] = self.by_domain.get(host, 0) + 1
+        self.blocked_urls[request.url] = self.blocked_urls.get(request.url, 0) + 1
+        await route.abort('blockedbyclient')
+
+    def summary(self, known_sizes: Optional[Dict[str, int]] = None) -> dict:
+        """
+        What the profile blocked during the run.
+
+        Args:
+            known_sizes: URL -> bytes transferred, from earlier unblocked runs
+
+        Returns:
+            dict: Blocked request count, counts by resource type, the top
+            blocked domains, and ``bytes_saved`` for the blocked requests whose
+            size is known (None when none is; ``sized_requests`` says how many)
+        """
+        bytes_saved = None
+        sized = 0
+        if known_sizes:
+            for url, count in self.blocked_urls.items():
+                if url in known_sizes:
+                    bytes_saved = (bytes_saved or 0) + known_sizes[url] * count
+                    sized += count
+        top_domains = sorted(self.by_domain.items(), key=lambda item: item[1], reverse=True)[:TOP_DOMAINS_LIMIT]
+        return {
+            'blocked_requests': self.blocked,
+            'by_type': dict(self.by_type),
+            'top_domains': dict(top_domains),
+            'bytes_saved': bytes_saved,
+            'sized_requests': sized
+        }
+
+
+def _bytes_per_s(kbps: Optional[float]) -> float:
+    # CDP's throughputs are bytes/s, and -1 disables throttling
+    return -1 if kbps is None else kbps * 1000 / 8
+
+
+class DeviceThrottler:
+    """
+    Emulates an execution profile's CPU and network on every page of a run.
+
+    Register ``setup`` as a ContextHooks context callback and ``throttle``
+    as a page callback, so each page is throttled before the test gets it;
+    pages a context opens by itself (popups) are throttled as they appear.
+    CPU and network throttling use a CDP session per page, so they need
+    Chromium; going offline works in every browser.
+    """
+
+    def __init__(self, name: str, profile: dict):
+        self.name = name
+        self.cpu_rate = profile.get('cpu_throttling_rate') or 1
+        self.network = network_conditions(profile.get('network'))
+        self.throttled_pages = 0
+        self.unsupported: Optional[str] = None  # Why a page couldn't be throttled, if one couldn't
+        self._pages = weakref.WeakKeyDictionary()  # Page -> task applying its throttling
+
+    @property
+    def active(self) -> bool:
+        """Whether the profile throttles anything (no hook is needed otherwise)."""
+        return self.cpu_rate > 1 or self.network is not None
+
+    @property
+    def offline(self) -> bool:
+        return bool(self.network and self.network['offline'])
+
+    def describe(self) -> str:
+        """Short description, e.g. '4x CPU slowdown, 563 ms latency, 1440/675 kbit/s'."""
+        parts = [f"{self.cpu_rate:g}x CPU slowdown"] if self.cpu_rate > 1 else []
+        if self.offline:
+            parts.append('offline')
+        elif self.network:
+            parts.append(f"{self.network['latency_ms']:g} ms latency")
+            if self.network['download_kbps'] is not None or self.network['upload_kbps'] is not None:
+                down, up = (f"{kbps:g}" if kbps is not None else 'unlimited'
+                            for kbps in (self.network['download_kbps'], self.network['upload_kbps']))
+                parts.append(f"{down}/{up} kbit/s")
+        return ', '.join(parts)
+
+    async def setup(self, context):
+        if self.offline:
+            await context.set_offline(True)
+        context.on('page', self.throttle)
+
+    async def throttle(self, page):
+        """Throttle a page (once; a page seen both as created and as a context event shares the one attempt)."""
+        task = self._pages.get(page)
+        if task is None:
+            task = self._pages[page] = asyncio.ensure_future(self._apply(page))
+        await task
+
+    async def _apply(self, page):
+        if self.cpu_rate <= 1 and (self.network is None or self.offline):
+            return None
+        try:
+            # The session must stay attached, or Chromium drops its overrides
+            session = await page.context.new_cdp_session(page)
+            if self.cpu_rate > 1:
+                await session.send('Emulation.setCPUThrottlingRate', {'rate': self.cpu_rate})
+            if self.network is not None and not self.offline:
+                await session.send('Network.enable')
+                await session.send('Network.emulateNetworkConditions', {
+                    'offline': False,
+                    'latency': self.network['latency_ms'],
+                    'downloadThroughput': _bytes_per_s(self.network['download_kbps']),
+                    'uploadThroughput': _bytes_per_s(self.network['upload_kbps'])
+                })
+        except Exception as e:
+            if self.unsupported is None:
+                self.unsupported = (str(e).strip().splitlines() or [type(e).__name__])[0]
+                print(f"Warning: Execution profile '{self.name}' could not throttle a page "
+                      f"(CPU and network throttling need Chromium): {self.unsupported}")
+            return None
+        self.throttled_pages += 1
+        return session
+
+    def summary(self) -> dict:
+        """The emulated device, how many pages it was applied to, and why not if it couldn't be."""
+        return {
+            'cpu_throttling_rate': self.cpu_rate,
+            'network': self.network,
+            'throttled_pages': self.throttled_pages,
+            'unsupported': self.unsupported
+        }
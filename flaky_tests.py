@@ -0,0 +1,55 @@
+"""Flaky-test tracking: per-test run history, flakiness scores and quarantine."""
+
+import time
+from typing import List
+
+
+# Batch statuses a retry may turn into a pass ('stopped' tests are never retried)
+RETRYABLE_STATUSES = ('error', 'timeout')
+
+
+def run_outcome(attempts: List[str]) -> str:
+    """'pass', 'fail', or 'flaky' (failed, then passed on a retry) for one batch run's attempt statuses."""
+    if attempts[-1] != 'success':
+        return 'fail'
+    return 'flaky' if len(attempts) > 1 else 'pass'
+
+
+def flakiness_score(history: List[dict]) -> float:
+    """
+    How flaky a test's recent runs were, from 0 (stable) to 1.
+
+    Counts the runs that passed only on a retry plus every flip between a
+    passing and a failing run, relative to the number of runs. A test that
+    broke once and stayed broken (or was fixed) scores low; one that keeps
+    alternating or needs retries scores high.
+    """
+    if not history:
+        return 0.0
+    outcomes = [entry['outcome'] for entry in history]
+    flaky_runs = outcomes.count('flaky')
+    passed = [outcome != 'fail' for outcome in outcomes]
+    flips = sum(1 for previous, current in zip(passed, passed[1:]) if previous != current)
+    return round(min(1.0, (flaky_runs + flips) / len(outcomes)), 3)
+
+
+def record_run(test_data: dict, attempts: List[str], history_size: int, threshold: float, min_runs: int) -> dict:
+    """
+    Add one batch run to a test's history and update its flakiness and quarantine.
+
+    Args:
+        test_data: The saved test's JSON, updated in place
+        attempts: Status of each attempt, in order
+        history_size: Runs kept in ``run_history``
+        threshold: Score at which the test is quarantined
+        min_runs: Runs needed before a test can be quarantined
+
+    Returns:
+        dict: The new history entry
+    """
+    entry = {'time': time.time(), 'outcome': run_outcome(attempts), 'attempts': len(attempts)}
+    history = (test_data.get('run_history') or []) + [entry]
+    test_data['run_history'] = history[-history_size:]
+    test_data['flakiness'] = flakiness_score(test_data['run_history'])
+    test_data['quarantined'] = len(test_data['run_history']) >= min_runs and test_data['flakiness'] >= threshold
+    return entry
@@ -0,0 +1,126 @@
+"""HAR replay: serve a saved test's network traffic from a recorded HAR."""
+
+import gzip
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Optional
+
+
+# Run network modes: against the live site, from a recorded HAR, or live
+# while re-capturing the HAR that replays use
+NETWORK_MODES = ('live', 'replay', 'record')
+
+# What a replay does with requests the HAR has no entry for
+NOT_FOUND_POLICIES = ('abort', 'fallback')
+
+HAR_FILENAMES = ('network.har.gz', 'network.har')
+
+
+class ReplayUnavailableError(Exception):
+    """Raised when a replay is requested but there is no recording to replay."""
+
+
+def run_har(run_dir: Path) -> Optional[Path]:
+    """The HAR recorded in one run's artifact directory, if any."""
+    for name in HAR_FILENAMES:
+        har_path = Path(run_dir) / name
+        if har_path.exists():
+            return har_path
+    return None
+
+
+def recorded_hars(artifact_base: Path) -> List[Path]:
+    """HARs recorded by a test's runs, newest first."""
+    if not Path(artifact_base).exists():
+        return []
+    run_dirs = sorted((d for d in Path(artifact_base).iterdir() if d.is_dir()), key=lambda d: d.name, reverse=True)
+    return [har for har in (run_har(d) for d in run_dirs) if har]
+
+
+def resolve_replay_har(pinned: Path, artifact_base: Path, timestamp: Optional[str] = None) -> Path:
+    """
+    Pick the HAR a replay serves from.
+
+    Args:
+        pinned: The test's pinned recording (see pin_recording)
+        artifact_base: The test's ``test_artifacts/<test>`` directory
+        timestamp: A specific run's artifact timestamp to replay instead
+
+    Returns:
+        Path: The requested run's HAR, else the pinned one, else the newest recorded
+
+    Raises:
+        ReplayUnavailableError: If there is no such recording
+    """
+    if timestamp:
+        har_path = run_har(Path(artifact_base) / timestamp)
+        if not har_path:
+            raise ReplayUnavailableError(f'No HAR was recorded by the run at {timestamp}')
+        return har_path
+    if Path(pinned).exists():
+        return Path(pinned)
+    hars = recorded_hars(artifact_base)
+    if not hars:
+        raise ReplayUnavailableError('No recorded HAR to replay; refresh the recording first')
+    return hars[0]
+
+
+def pin_recording(har_path: Path, pinned: Path) -> Path:
+    """
+    Store a run's HAR as the test's replay recording, gzipped.
+
+    The copy lives with the test, so it survives artifact cleanup.
+
+    Returns:
+        Path: ``pinned``
+    """
+    pinned = Path(pinned)
+    pinned.parent.mkdir(parents=True, exist_ok=True)
+    partial = pinned.with_name(pinned.name + '.partial')
+    if Path(har_path).suffix == '.gz':
+        shutil.copyfile(har_path, partial)
+    else:
+        with open(har_path, 'rb') as src, gzip.open(partial, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst)
+    os.replace(partial, pinned)
+    return pinned
+
+
+@contextmanager
+def extracted_har(har_path: Path):
+    """Yield a plain .har file for Playwright (gzipped HARs are extracted to a temp file)."""
+    har_path = Path(har_path)
+    if har_path.suffix != '.gz':
+        yield har_path
+        return
+    fd, tmp_name = tempfile.mkstemp(suffix='.har', prefix='replay-')
+    try:
+        with os.fdopen(fd, 'wb') as dst, gzip.open(har_path, 'rb') as src:
+            shutil.copyfileobj(src, dst)
+        yield Path(tmp_name)
+    finally:
+        try:
+            os.remove(tmp_name)
+        except OSError:
+            pass
+
+
+def replay_setup(har_file: Path, not_found: str = 'abort', url: Optional[str] = None):
+    """
+    Context setup that answers requests from ``har_file``.
+
+    Args:
+        har_file: Plain .har file (see extracted_har)
+        not_found: 'abort' unmatched requests (fully offline) or send them
+            to the network ('fallback')
+        url: Only replay requests matching this glob
+
+    Returns:
+        Async callable for ContextHooks.on_context
+    """
+    async def setup(context):
+        await context.route_from_har(str(har_file), not_found=not_found, url=url)
+    return setup
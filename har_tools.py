@@ -0,0 +1,179 @@
+"""HAR helpers: gzip storage at rest and precomputed network summaries."""
+
+import gzip
+import json
+import math
+import shutil
+from pathlib import Path
+from typing import Optional
+
+
+NETWORK_SUMMARY_FILENAME = "network-summary.json"
+SLOWEST_REQUESTS_LIMIT = 10
+FAILED_REQUESTS_LIMIT = 50
+
+
+def load_har(har_path: Path) -> dict:
+    """
+    Load a HAR file, transparently handling gzip-compressed (.har.gz) files.
+
+    Args:
+        har_path: Path to a .har or .har.gz file
+
+    Returns:
+        Parsed HAR document
+    """
+    har_path = Path(har_path)
+    opener = gzip.open if har_path.suffix == '.gz' else open
+    with opener(har_path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compress_har(har_path: Path) -> Path:
+    """
+    Gzip a raw HAR file in place, removing the uncompressed original.
+
+    Args:
+        har_path: Path to the raw .har file
+
+    Returns:
+        Path to the compressed .har.gz file
+    """
+    har_path = Path(har_path)
+    gz_path = har_path.with_name(har_path.name + '.gz')
+    with open(har_path, 'rb') as src, gzip.open(gz_path, 'wb', compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst)
+    har_path.unlink()
+    return gz_path
+
+
+def _percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def _entry_bytes(response: dict) -> int:
+    """Best-effort number of bytes transferred for a HAR response."""
+    for size in (response.get('_transferSize'), response.get('bodySize'),
+                 response.get('content', {}).get('size')):
+        if isinstance(size, (int, float)) and size > 0:
+            return int(size)
+    return 0
+
+
+def response_sizes(har_data: dict) -> dict:
+    """Bytes transferred per request URL in a HAR (requests with no size are left out)."""
+    sizes = {}
+    for entry in har_data.get('log', {}).get('entries', []):
+        url = entry.get('request', {}).get('url')
+        size = _entry_bytes(entry.get('response', {}))
+        if url and size:
+            sizes[url] = max(size, sizes.get(url, 0))
+    return sizes
+
+
+def summarize_har(har_data: dict) -> dict:
+    """
+    Compute a compact network summary from a HAR document.
+
+    Args:
+        har_data: Parsed HAR document
+
+    Returns:
+        Summary with request count, bytes by content type, slowest and
+        failed requests, and request time percentiles (milliseconds)
+    """
+    entries = har_data.get('log', {}).get('entries', [])
+
+    bytes_by_type = {}
+    requests_by_type = {}
+    failed = []
+    timed = []
+    total_bytes = 0
+
+    for entry in entries:
+        request = entry.get('request', {})
+        response = entry.get('response', {})
+        url = request.get('url', '')
+        method = request.get('method', 'GET')
+        status = response.get('status', 0)
+        duration = float(entry.get('time') or 0)
+
+        mime_type = response.get('content', {}).get('mimeType') or 'unknown'
+        content_type = mime_type.split(';')[0].strip().lower() or 'unknown'
+        size = _entry_bytes(response)
+
+        total_bytes += size
+        bytes_by_type[content_type] = bytes_by_type.get(content_type, 0) + size
+        requests_by_type[content_type] = requests_by_type.get(content_type, 0) + 1
+        timed.append((duration, method, url, status, size))
+
+        failure_text = response.get('_failureText')
+        if status == 0 or status >= 400 or failure_text:
+            failed.append({
+                'url': url,
+                'method': method,
+                'status': status,
+                'error': failure_text
+            })
+
+    durations = sorted(t[0] for t in timed)
+    slowest = sorted(timed, key=lambda t: t[0], reverse=True)[:SLOWEST_REQUESTS_LIMIT]
+
+    return {
+        'request_count': len(entries),
+        'total_bytes': total_bytes,
+        'bytes_by_content_type': dict(sorted(bytes_by_type.items(), key=lambda kv: kv[1], reverse=True)),
+        'requests_by_content_type': requests_by_type,
+        'slowest_requests': [
+            {'url': url, 'method': method, 'status': status, 'time_ms': round(duration, 1), 'bytes': size}
+            for duration, method, url, status, size in slowest
+        ],
+        'failed_request_count': len(failed),
+        'failed_requests': failed[:FAILED_REQUESTS_LIMIT],
+        'timing_ms': {
+            'p50': round(_percentile(durations, 50), 1),
+            'p90': round(_percentile(durations, 90), 1),
+            'p95': round(_percentile(durations, 95), 1),
+            'p99': round(_percentile(durations, 99), 1),
+            'max': round(durations[-1], 1) if durations else 0.0
+        }
+    }
+
+
+def finalize_har(artifact_dir: Path, har_path: Optional[Path], compress: bool = True) -> tuple:
+    """
+    Write the network summary next to a finished run's HAR and optionally gzip it.
+
+    Args:
+        artifact_dir: The run's artifact directory
+        har_path: Path to the HAR recorded for the run (None if not recorded)
+        compress: Whether to gzip the HAR at rest
+
+    Returns:
+        tuple: (har_path, summary_path) — the final HAR path (possibly .har.gz)
+        and the summary path; either may be None
+    """
+    if not har_path or not Path(har_path).exists():
+        return None, None
+
+    har_path = Path(har_path)
+    summary_path = Path(artifact_dir) / NETWORK_SUMMARY_FILENAME
+    try:
+        summary = summarize_har(load_har(har_path))
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+    except Exception as e:
+        print(f"Warning: Could not summarize HAR {har_path}: {e}")
+        summary_path = None
+
+    if compress and har_path.suffix == '.har':
+        try:
+            har_path = compress_har(har_path)
+        except Exception as e:
+            print(f"Warning: Could not compress HAR {har_path}: {e}")
+
+    return har_path, summary_path
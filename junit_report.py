@@ -0,0 +1,86 @@
+"""JUnit XML export of batch results, for CI test reporting."""
+
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from typing import List, Optional
+
+
+def build_junit_xml(results: List[dict], summary: dict, suite_name: str = 'saved-tests',
+                    timestamp: Optional[datetime] = None) -> str:
+    """
+    Render batch results as a JUnit XML report.
+
+    'success' passes, 'error' and 'timeout' are failures (typed so a report
+    can tell them apart), and 'stopped' tests are skipped. Cached passes of an
+    incremental run pass, noting the run they were reused from. Failures of
+    quarantined (flaky) tests are skipped rather than failed, and passes that
+    needed a retry note how many attempts they took. Each data row of a
+    data-driven test is a test case of its own.
+
+    Args:
+        results: Per-test results as emitted in ``batch_test_progress``
+        summary: The batch summary emitted as ``batch_run_complete``
+        suite_name: Name of the test suite element
+        timestamp: When the batch started (defaults to now)
+
+    Returns:
+        str: XML document
+    """
+    results = [case for result in results for case in test_cases(result)]
+    failures = sum(1 for r in results if r.get('status') in ('error', 'timeout') and not r.get('quarantined'))
+    skipped = sum(1 for r in results if r.get('status') == 'stopped'
+                  or (r.get('quarantined') and r.get('status') != 'success'))
+
+    testsuites = ET.Element('testsuites', {
+        'name': suite_name,
+        'tests': str(len(results)),
+        'failures': str(failures),
+        'time': f"{summary.get('duration', 0):.3f}"
+    })
+    testsuite = ET.SubElement(testsuites, 'testsuite', {
+        'name': suite_name,
+        'tests': str(len(results)),
+        'failures': str(failures),
+        'errors': '0',
+        'skipped': str(skipped),
+        'time': f"{summary.get('duration', 0):.3f}",
+        'timestamp': (timestamp or datetime.now()).isoformat(timespec='seconds')
+    })
+
+    for result in sorted(results, key=lambda r: r.get('filename', '')):
+        testcase = ET.SubElement(testsuite, 'testcase', {
+            'name': result.get('name') or result.get('filename', ''),
+            'classname': f"{suite_name}.{result.get('filename', '').rsplit('.', 1)[0]}",
+            'time': f"{result.get('duration_s') or 0:.3f}"
+        })
+        status = result.get('status')
+        error = result.get('error') or ''
+        if result.get('quarantined') and status != 'success':
+            ET.SubElement(testcase, 'skipped', {
+                'message': f"quarantined as flaky ({status}): {error.strip().splitlines()[0] if error.strip() else status}"
+            })
+        elif status in ('error', 'timeout'):
+            failure = ET.SubElement(testcase, 'failure', {
+                'type': status,
+                'message': error.strip().splitlines()[0] if error.strip() else status
+            })
+            failure.text = error
+        elif status == 'stopped':
+            ET.SubElement(testcase, 'skipped', {'message': error or 'stopped'})
+        elif result.get('cached'):
+            ET.SubElement(testcase, 'system-out').text = f"Cached pass from {result.get('last_run_time')}"
+        elif result.get('flaky'):
+            ET.SubElement(testcase, 'system-out').text = f"Flaky: passed on attempt {result.get('attempts')}"
+
+    ET.indent(testsuites)
+    return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(testsuites, encoding='unicode') + '\n'
+
+
+def test_cases(result: dict) -> List[dict]:
+    """A batch result as test cases: the result itself, or one per data row of a data-driven test."""
+    if not result.get('rows'):
+        return [result]
+    name = result.get('name') or result.get('filename', '')
+    return [dict(result, name=f"{name} [{row['label']}]", status=row['status'], error=row.get('error'),
+                 duration_s=row.get('duration_s'), rows=None)
+            for row in result['rows']]
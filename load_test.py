@@ -0,0 +1,397 @@
+"""Load tests: a saved test's ``run()`` as concurrent virtual users, with per-action latency, throughput and errors."""
+
+import asyncio
+import functools
+import random
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from page_metrics import percentile, url_key
+
+
+# Page methods timed as actions (waits the scenario makes for pacing, like wait_for_timeout, aren't)
+PAGE_ACTIONS = ('goto', 'reload', 'go_back', 'go_forward', 'click', 'dblclick', 'fill', 'type', 'press', 'check',
+                'uncheck', 'select_option', 'hover', 'set_input_files', 'wait_for_selector', 'wait_for_url',
+                'wait_for_load_state')
+LOCATOR_ACTIONS = ('click', 'dblclick', 'fill', 'type', 'press', 'press_sequentially', 'check', 'uncheck',
+                   'select_option', 'hover', 'set_input_files', 'wait_for', 'text_content', 'inner_text',
+                   'input_value', 'is_visible')
+# Page and locator methods that return a locator
+LOCATOR_FACTORIES = ('locator', 'get_by_role', 'get_by_text', 'get_by_label', 'get_by_placeholder',
+                     'get_by_test_id', 'get_by_alt_text', 'get_by_title')
+
+TOP_ERRORS_LIMIT = 10
+
+
+class LoadTestError(ValueError):
+    """Raised for malformed load-test settings."""
+
+
+def parse_load_options(data: dict, defaults: dict, max_users: int, max_browsers: int) -> dict:
+    """
+    Settings of a load test, from a request and a test's ``"load_test"`` defaults.
+
+    Args:
+        data: ``users``, ``ramp_up_s`` (users start evenly over it),
+            ``duration_s``, ``think_time_s`` (pause between a user's
+            iterations: seconds, or ``[min, max]`` for a random pause),
+            ``browsers`` (pooled browsers the users share) and ``interval_s``
+            (timeline resolution)
+        defaults: Values for settings ``data`` leaves out
+        max_users: Most virtual users a load test may run
+        max_browsers: Most browsers a load test may launch
+
+    Raises:
+        LoadTestError: If a setting is missing, out of range or malformed
+    """
+    merged = dict(defaults, **{key: value for key, value in (data or {}).items() if value is not None})
+
+    def number(key, minimum, integer=False):
+        value = merged.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < minimum:
+            raise LoadTestError(f"Load test '{key}' must be a number of at least {minimum}")
+        if integer and value != int(value):
+            raise LoadTestError(f"Load test '{key}' must be a whole number")
+        return int(value) if integer else float(value)
+
+    users = number('users', 1, integer=True)
+    if users > max_users:
+        raise LoadTestError(f"Load tests run at most {max_users} virtual users (LOAD_TEST_MAX_USERS)")
+    browsers = number('browsers', 1, integer=True)
+    if browsers > max_browsers:
+        raise LoadTestError(f"Load tests use at most {max_browsers} browsers (MAX_CONCURRENT_BROWSERS)")
+    think = merged.get('think_time_s', 0)
+    think = list(think) if isinstance(think, (list, tuple)) else [think, think]
+    if (len(think) != 2 or not all(isinstance(t, (int, float)) and not isinstance(t, bool) and t >= 0 for t in think)
+            or think[0] > think[1]):
+        raise LoadTestError("Load test 'think_time_s' must be seconds or [min, max]")
+    duration = number('duration_s', 1)
+    return {
+        'users': users,
+        'ramp_up_s': number('ramp_up_s', 0),
+        'duration_s': duration,
+        'think_time_s': [float(think[0]), float(think[1])],
+        'browsers': min(browsers, users),
+        'interval_s': min(number('interval_s', 1), duration)
+    }
+
+
+async def skip_visual_checkpoint(page, name: str, **kwargs) -> dict:
+    """Stands in for visual_checkpoint: a load test's screenshots would only add load."""
+    return {'checkpoint': name, 'status': 'skipped', 'reason': 'Load tests skip visual checkpoints'}
+
+
+def action_name(name: str, args: tuple, kwargs: dict) -> str:
+    """What an action's latency is grouped under, e.g. 'goto https://example.com/login' or 'click #submit'."""
+    target = args[0] if args else kwargs.get('url', kwargs.get('selector'))
+    if name == 'goto' and target:
+        return f"goto {url_key(target)}"
+    return f"{name} {target}" if isinstance(target, str) else name
+
+
+def describe_call(name: str, args: tuple, kwargs: dict) -> str:
+    """Readable target for a locator call, e.g. get_by_role('link', name='Sign Up')."""
+    parts = [repr(a) for a in args] + [f"{k}={v!r}" for k, v in kwargs.items()]
+    return f"{name}({', '.join(parts)})"
+
+
+def error_summary(error: BaseException) -> str:
+    """First line of an error, for counting errors of the same kind."""
+    lines = str(error).strip().splitlines()
+    return (lines[0] if lines else type(error).__name__)[:200]
+
+
+class LoadStats:
+    """
+    Latency, throughput and error counts of a load test, overall and per interval.
+
+    Args:
+        interval_s: Width of the timeline's intervals
+    """
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.started = time.monotonic()
+        self.active_users = 0
+        self.cancelled_iterations = 0
+        self._latencies: Dict[str, List[float]] = {}
+        self._action_errors: Counter = Counter()
+        self._iteration_ms: List[float] = []
+        self._failed_iterations = 0
+        self._errors: Counter = Counter()
+        self._intervals: Dict[int, dict] = {}
+
+    def _interval(self) -> dict:
+        index = int((time.monotonic() - self.started) // self.interval_s)
+        interval = self._intervals.get(index)
+        if interval is None:
+            interval = self._intervals[index] = {'users': self.active_users, 'iterations': 0, 'failed_iterations': 0,
+                                                 'actions': 0, 'failed_actions': 0, 'latencies': []}
+        return interval
+
+    def user_started(self):
+        self.active_users += 1
+        interval = self._interval()
+        interval['users'] = max(interval['users'], self.active_users)
+
+    def user_stopped(self):
+        self.active_users -= 1
+        self._interval()
+
+    def record_action(self, action: str, duration_s: float, error: BaseException = None):
+        latency_ms = duration_s * 1000
+        self._latencies.setdefault(action, []).append(latency_ms)
+        interval = self._interval()
+        interval['actions'] += 1
+        interval['latencies'].append(latency_ms)
+        if error is not None:
+            self._action_errors[action] += 1
+            interval['failed_actions'] += 1
+
+    def record_iteration(self, duration_s: float, error: BaseException = None):
+        self._iteration_ms.append(duration_s * 1000)
+        interval = self._interval()
+        interval['iterations'] += 1
+        if error is not None:
+            self._failed_iterations += 1
+            self._errors[error_summary(error)] += 1
+            interval['failed_iterations'] += 1
+
+    def interval_summary(self, index: int) -> dict:
+        """One interval of the timeline: users, throughput, error rate and latency."""
+        interval = self._intervals.get(index) or {'users': self.active_users, 'iterations': 0, 'failed_iterations': 0,
+                                                  'actions': 0, 'failed_actions': 0, 'latencies': []}
+        latencies = interval['latencies']
+        return {
+            't_s': round(index * self.interval_s, 3),
+            'users': interval['users'],
+            'iterations': interval['iterations'],
+            'failed_iterations': interval['failed_iterations'],
+            'actions': interval['actions'],
+            'failed_actions': interval['failed_actions'],
+            'actions_per_s': round(interval['actions'] / self.interval_s, 2),
+            'error_rate': round(interval['failed_iterations'] / interval['iterations'], 4)
+            if interval['iterations'] else 0.0,
+            'p50_ms': _rounded(percentile(latencies, 0.5)),
+            'p95_ms': _rounded(percentile(latencies, 0.95))
+        }
+
+    def timeline(self) -> List[dict]:
+        last = max(self._intervals) if self._intervals else -1
+        return [self.interval_summary(index) for index in range(last + 1)]
+
+    def report(self) -> dict:
+        """The whole run: totals, throughput, error rate, per-action latency percentiles and the timeline."""
+        elapsed = time.monotonic() - self.started
+        iterations = len(self._iteration_ms)
+        actions = sum(len(latencies) for latencies in self._latencies.values())
+        by_action = []
+        for action, latencies in self._latencies.items():
+            errors = self._action_errors[action]
+            by_action.append({
+                'action': action,
+                'count': len(latencies),
+                'errors': errors,
+                'error_rate': round(errors / len(latencies), 4),
+                'mean_ms': _rounded(sum(latencies) / len(latencies)),
+                'p50_ms': _rounded(percentile(latencies, 0.5)),
+                'p90_ms': _rounded(percentile(latencies, 0.9)),
+                'p95_ms': _rounded(percentile(latencies, 0.95)),
+                'p99_ms': _rounded(percentile(latencies, 0.99)),
+                'max_ms': _rounded(max(latencies))
+            })
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'iterations': {
+                'total': iterations,
+                'failed': self._failed_iterations,
+                'cancelled': self.cancelled_iterations,
+                'p50_ms': _rounded(percentile(self._iteration_ms, 0.5)),
+                'p95_ms': _rounded(percentile(self._iteration_ms, 0.95))
+            },
+            'actions': {'total': actions, 'failed': sum(self._action_errors.values())},
+            'throughput': {
+                'iterations_per_s': round(iterations / elapsed, 3) if elapsed else 0.0,
+                'actions_per_s': round(actions / elapsed, 3) if elapsed else 0.0
+            },
+            'error_rate': round(self._failed_iterations / iterations, 4) if iterations else 0.0,
+            'by_action': by_action,
+            'timeline': self.timeline(),
+            'errors': [{'error': error, 'count': count} for error, count in self._errors.most_common(TOP_ERRORS_LIMIT)]
+        }
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+async def _timed(stats: LoadStats, action: str, call: Callable[[], Awaitable]):
+    started = time.perf_counter()
+    try:
+        result = await call()
+    except Exception as e:
+        stats.record_action(action, time.perf_counter() - started, e)
+        raise
+    stats.record_action(action, time.perf_counter() - started)
+    return result
+
+
+class TimedContext:
+    """A virtual user's browser context whose pages time their actions."""
+
+    def __init__(self, context, stats: LoadStats):
+        self._context = context
+        self._stats = stats
+
+    async def new_page(self, **kwargs):
+        return TimedPage(await self._context.new_page(**kwargs), self._stats)
+
+    @property
+    def pages(self):
+        return [TimedPage(page, self._stats) for page in self._context.pages]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self._context.close()
+
+    def __getattr__(self, name):
+        return getattr(self._context, name)
+
+
+class TimedPage:
+    """Wraps a Playwright Page so its actions, and those of its locators, are recorded in LoadStats."""
+
+    def __init__(self, page, stats: LoadStats):
+        self._page = page
+        self._stats = stats
+
+    def __getattr__(self, name):
+        attribute = getattr(self._page, name)
+        if name in PAGE_ACTIONS:
+            async def action(*args, **kwargs):
+                return await _timed(self._stats, action_name(name, args, kwargs), lambda: attribute(*args, **kwargs))
+            return action
+        if name in LOCATOR_FACTORIES:
+            def factory(*args, **kwargs):
+                return timed_locator(attribute(*args, **kwargs), self._stats, describe_call(name, args, kwargs))
+            return factory
+        return attribute
+
+
+def timed_locator(locator, stats: LoadStats, description: str):
+    """A Locator whose actions are recorded in ``stats``; still a real Locator for expect()."""
+    return _timed_locator_type()(locator, stats, description)
+
+
+@functools.lru_cache(maxsize=None)
+def _timed_locator_type():
+    # Playwright is imported on first use, keeping it out of app startup
+    from playwright.async_api import Locator
+
+    class TimedLocator(Locator):
+        def __init__(self, locator, stats, description):
+            super().__init__(locator._impl_obj)
+            self._load_stats = stats
+            self._load_description = description
+
+        def _chain(self, locator, step):
+            return TimedLocator(locator, self._load_stats, f"{self._load_description}.{step}")
+
+        @property
+        def first(self):
+            return self._chain(super().first, 'first')
+
+        @property
+        def last(self):
+            return self._chain(super().last, 'last')
+
+        def nth(self, index):
+            return self._chain(super().nth(index), f'nth({index})')
+
+        def filter(self, **kwargs):
+            return self._chain(super().filter(**kwargs), describe_call('filter', (), kwargs))
+
+    def action(name):
+        async def timed_action(self, *args, **kwargs):
+            method = getattr(Locator, name)
+            return await _timed(self._load_stats, f"{name} {self._load_description}",
+                                lambda: method(self, *args, **kwargs))
+        return timed_action
+
+    def factory(name):
+        def chained(self, *args, **kwargs):
+            return self._chain(getattr(Locator, name)(self, *args, **kwargs), describe_call(name, args, kwargs))
+        return chained
+
+    for name in LOCATOR_ACTIONS:
+        setattr(TimedLocator, name, action(name))
+    for name in LOCATOR_FACTORIES:
+        setattr(TimedLocator, name, factory(name))
+    return TimedLocator
+
+
+async def run_load(run_iteration: Callable[[int, int], Awaitable[None]], options: dict, stats: LoadStats,
+                   on_interval: Callable[[dict], None] = None, grace_s: float = 30):
+    """
+    Run virtual users until the load test's duration is up.
+
+    User ``i`` starts ``i * ramp_up_s / users`` seconds in and runs
+    iterations back to back, pausing for the think time between them, until
+    ``duration_s`` has passed. Iterations still running then get
+    ``grace_s`` to finish before they are cancelled (and counted as
+    cancelled rather than failed).
+
+    Args:
+        run_iteration: ``run_iteration(user, iteration)``, raising if the iteration fails
+        options: Settings from parse_load_options
+        stats: Filled with the run's results
+        on_interval: Called with each finished interval's summary
+        grace_s: How long in-flight iterations may overrun the duration
+    """
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + options['duration_s']
+    users = options['users']
+    think_min, think_max = options['think_time_s']
+
+    async def virtual_user(user):
+        # Users due to start after the duration never do
+        delay = user * options['ramp_up_s'] / users
+        if delay >= options['duration_s']:
+            return
+        await asyncio.sleep(delay)
+        stats.user_started()
+        try:
+            iteration = 0
+            while loop.time() < stop_at:
+                started = time.perf_counter()
+                try:
+                    await run_iteration(user, iteration)
+                    stats.record_iteration(time.perf_counter() - started)
+                except Exception as e:
+                    stats.record_iteration(time.perf_counter() - started, e)
+                iteration += 1
+                pause = min(random.uniform(think_min, think_max), stop_at - loop.time())
+                if pause > 0:
+                    await asyncio.sleep(pause)
+        finally:
+            stats.user_stopped()
+
+    async def report_intervals():
+        index = 0
+        while True:
+            await asyncio.sleep(max(0.0, stats.started + (index + 1) * stats.interval_s - time.monotonic()))
+            on_interval(stats.interval_summary(index))
+            index += 1
+
+    reporter = loop.create_task(report_intervals()) if on_interval else None
+    tasks = [loop.create_task(virtual_user(user)) for user in range(users)]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=max(0.0, stop_at - loop.time()) + grace_s)
+        stats.cancelled_iterations = len(pending)
+    finally:
+        for task in tasks + ([reporter] if reporter else []):
+            task.cancel()
+        await asyncio.gather(*tasks, *([reporter] if reporter else []), return_exceptions=True)
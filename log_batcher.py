@@ -0,0 +1,120 @@
+"""LogBuffer: coalesce a run's 'log' emits into periodic 'log_batch' events."""
+
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+LOG_BATCH_EVENT = "log_batch"
+
+_bound = threading.local()
+
+
+class LogBuffer:
+    """
+    Per-run buffer of log entries, flushed as one event at a fixed cadence.
+
+    Every emit takes the server's lock and writes to each client, so a run
+    that logs every step pays that cost per line. Buffered entries go out
+    together every ``interval`` seconds, or earlier when ``flush()`` is
+    called to keep them ordered before another event.
+    """
+
+    def __init__(self, emit: Callable[[str, dict], None], interval: float = 0.1, max_entries: int = 500):
+        """
+        Initialize LogBuffer.
+
+        Args:
+            emit: Unbuffered emit function, called as emit(event, data)
+            interval: Seconds between flushes
+            max_entries: Flush immediately once this many entries are waiting
+        """
+        self._emit = emit
+        self.interval = interval
+        self.max_entries = max_entries
+        self._entries = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def append(self, entry: dict):
+        with self._lock:
+            self._entries.append(entry)
+            full = len(self._entries) >= self.max_entries
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Emit everything buffered so far as a single batch."""
+        # Held across the emit so concurrent flushes can't reorder batches
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+            if entries:
+                self._emit(LOG_BATCH_EVENT, {'entries': entries})
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='log-batcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Warning: Could not flush log batch: {e}")
+
+
+def current() -> Optional[LogBuffer]:
+    """The buffer bound to the calling thread, if any."""
+    return getattr(_bound, 'buffer', None)
+
+
+@contextmanager
+def bind(buffer: LogBuffer):
+    """Route the calling thread's 'log' emits into ``buffer`` for the duration of the block."""
+    previous = current()
+    _bound.buffer = buffer
+    try:
+        yield buffer
+    finally:
+        _bound.buffer = previous
+
+
+@contextmanager
+def run_log_buffer(emit: Callable[[str, dict], None], interval: float = 0.1):
+    """Start a buffer, bind it to the calling thread, and flush it when the run ends."""
+    buffer = LogBuffer(emit, interval=interval).start()
+    try:
+        with bind(buffer):
+            yield buffer
+    finally:
+        buffer.close()
+
+
+class MessageStore:
+    """Bounded, thread-safe store of full message contents keyed by id (oldest evicted first)."""
+
+    def __init__(self, max_items: int = 500):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, key: str, content: str):
+        with self._lock:
+            self._items[key] = content
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._items.get(key)
@@ -0,0 +1,322 @@
+"""Minimal, dependency-free Prometheus-style metrics for the web tester.
+
+Metrics are kept in process memory and rendered in the Prometheus text
+exposition format (version 0.0.4) by ``/metrics``. All updates are guarded
+by a per-metric lock so they can be called from Socket.IO handlers,
+background threads and per-run asyncio loops alike.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+RUN_DURATION_BUCKETS = (1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 1200)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value the way Prometheus expects."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class _Metric:
+    """Base class: a named metric family with optional labels."""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: dict) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}'
+        ]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    metric_type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time."""
+
+    metric_type = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function: Optional[Callable[[], Dict[Tuple, float]]] = None
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function: Callable[[], Dict[Tuple, float]]):
+        """Compute samples at scrape time; ``function`` returns {label_values: value}."""
+        self._function = function
+
+    def _samples(self):
+        if self._function:
+            items = list(self._function().items())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}' for k, v in items]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds."""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, {'counts': list(v['counts']), 'sum': v['sum'], 'count': v['count']})
+                     for k, v in self._values.items()]
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state["sum"])}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {state["count"]}')
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(m.render() for m in self._metrics) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+              buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# Application metrics
+
+RUNS_TOTAL = counter(
+    'webtester_runs_total', 'Completed runs by type (ai, saved, batch) and final status.',
+    ('type', 'status'))
+RUN_DURATION = histogram(
+    'webtester_run_duration_seconds', 'Wall-clock run duration by type and final status.',
+    ('type', 'status'), buckets=RUN_DURATION_BUCKETS)
+RUNS_IN_PROGRESS = gauge(
+    'webtester_runs_in_progress', 'Runs currently executing, by type.', ('type',))
+QUEUE_DEPTH = gauge(
+    'webtester_queue_depth', 'Runs accepted but waiting for an execution slot.')
+QUEUE_WAIT = histogram(
+    'webtester_queue_wait_seconds', 'Time runs waited in the run queue before starting, by kind.',
+    ('kind',), buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+RUNS_REJECTED = counter(
+    'webtester_runs_rejected_total', 'Runs rejected because the run queue was full, by kind.', ('kind',))
+STALLED_LOOPS = counter(
+    'webtester_stalled_loops_total', 'Run event loops the watchdog found making no progress.')
+BLOCKED_REQUESTS = counter(
+    'webtester_blocked_requests_total', 'Requests aborted by execution profiles, by resource type.', ('resource_type',))
+VISUAL_CHECKPOINTS = counter(
+    'webtester_visual_checkpoints_total', 'Visual checkpoints compared with their baselines, by result.', ('status',))
+VISUAL_DIFF_DURATION = histogram(
+    'webtester_visual_diff_seconds', 'Time to compare a checkpoint screenshot with its baseline.',
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+PAGE_LCP = histogram(
+    'webtester_page_lcp_seconds', 'Largest Contentful Paint of the navigations test runs measured.',
+    buckets=(0.5, 1, 1.5, 2, 2.5, 3, 4, 6, 10))
+PERF_BUDGET_VIOLATIONS = counter(
+    'webtester_perf_budget_violations_total', 'Navigations over a performance budget, by metric.', ('metric',))
+ACTIVE_BROWSERS = gauge(
+    'webtester_active_browsers', 'Browser instances currently open.')
+ACTIVE_CONTEXTS = gauge(
+    'webtester_active_contexts', 'Browser contexts currently open.')
+SCREENSHOT_FRAMES_CAPTURED = counter(
+    'webtester_screenshot_frames_captured_total', 'Screenshot frames captured from the page.', ('kind',))
+SCREENSHOT_FRAMES_EMITTED = counter(
+    'webtester_screenshot_frames_emitted_total', 'Screenshot frames emitted to clients.', ('kind',))
+SCREENSHOT_FRAMES_DROPPED = counter(
+    'webtester_screenshot_frames_dropped_total', 'Screenshot frames that failed to capture or emit.', ('kind',))
+SOCKET_EMITS = counter(
+    'webtester_socket_emits_total', 'Socket.IO events emitted, by event name.', ('event',))
+SOCKET_EMIT_BYTES = counter(
+    'webtester_socket_emit_bytes_total', 'Approximate Socket.IO payload bytes emitted, by event name.', ('event',))
+LLM_REQUEST_DURATION = histogram(
+    'webtester_llm_request_duration_seconds', 'LLM request latency by model and outcome.',
+    ('model', 'outcome'), buckets=(0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120))
+LLM_TOKENS = counter(
+    'webtester_llm_tokens_total', 'LLM tokens consumed by model and kind (prompt, completion).',
+    ('model', 'kind'))
+ARTIFACT_DISK_BYTES = gauge(
+    'webtester_artifact_disk_bytes', 'Bytes used by run artifacts on disk.')
+ARTIFACT_FILES = gauge(
+    'webtester_artifact_files', 'Number of run artifact files on disk.')
+
+
+def payload_size(data) -> int:
+    """Cheap approximation of a Socket.IO payload's size in bytes."""
+    if isinstance(data, (str, bytes)):
+        return len(data)
+    if isinstance(data, dict):
+        return sum(len(str(k)) + payload_size(v) for k, v in data.items())
+    if isinstance(data, (list, tuple)):
+        return sum(payload_size(v) for v in data)
+    return 8
+
+
+def observe_llm_call(model: str, started: float, outcome: str = 'success',
+                     prompt_tokens: int = 0, completion_tokens: int = 0):
+    """Record one LLM request given its start time (``time.perf_counter()``)."""
+    LLM_REQUEST_DURATION.observe(time.perf_counter() - started, model=model, outcome=outcome)
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, model=model, kind='prompt')
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, model=model, kind='completion')
+
+
+class _DiskUsageCache:
+    """Walks the artifact directory at most once per ``ttl`` seconds."""
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._computed_at = 0.0
+        self._result = (0, 0)
+        self.root: Optional[Path] = None
+
+    def _walk(self, path: str) -> Tuple[int, int]:
+        total_bytes = 0
+        total_files = 0
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        b, n = self._walk(entry.path)
+                        total_bytes += b
+                        total_files += n
+                    elif entry.is_file(follow_symlinks=False):
+                        total_bytes += entry.stat(follow_symlinks=False).st_size
+                        total_files += 1
+        except FileNotFoundError:
+            pass
+        return total_bytes, total_files
+
+    def get(self) -> Tuple[int, int]:
+        with self._lock:
+            if self.root and time.monotonic() - self._computed_at > self.ttl:
+                self._result = self._walk(str(self.root))
+                self._computed_at = time.monotonic()
+            return self._result
+
+
+_disk_usage = _DiskUsageCache()
+ARTIFACT_DISK_BYTES.set_function(lambda: {(): _disk_usage.get()[0]})
+ARTIFACT_FILES.set_function(lambda: {(): _disk_usage.get()[1]})
+
+
+def track_artifact_dir(root: Path, ttl: float = 60.0):
+    """Report disk usage of ``root`` in the artifact gauges (cached for ``ttl`` seconds)."""
+    _disk_usage.root = Path(root)
+    _disk_usage.ttl = ttl
+
+
+def render_metrics() -> str:
+    """Render all registered metrics in text exposition format."""
+    return REGISTRY.render()
@@ -0,0 +1,52 @@
+"""Instrumented AutoGen model client.
+
+Kept out of web_ui's import path: importing the AutoGen/OpenAI stack is the
+bulk of app startup, so it is only loaded when the first AI run begins.
+"""
+
+import time
+
+from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+from run_timeline import RunTimeline
+import metrics
+
+
+class InstrumentedChatCompletionClient(OpenAIChatCompletionClient):
+    """OpenAI model client that records request latency and token usage.
+
+    ``limiter`` (an ``async with`` slot limit) caps requests in flight across runs.
+    """
+
+    def __init__(self, *args, timeline: RunTimeline = None, limiter=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_model = kwargs.get('model', 'unknown')
+        self._timeline = timeline
+        self._limiter = limiter
+
+    async def create(self, *args, **kwargs):
+        if self._limiter:
+            async with self._limiter:
+                return await self._create_timed(*args, **kwargs)
+        return await self._create_timed(*args, **kwargs)
+
+    async def _create_timed(self, *args, **kwargs):
+        if self._timeline:
+            async with self._timeline.span('llm_request', self._metrics_model, category='llm'):
+                return await self._create_instrumented(*args, **kwargs)
+        return await self._create_instrumented(*args, **kwargs)
+
+    async def _create_instrumented(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = await super().create(*args, **kwargs)
+        except BaseException:
+            metrics.observe_llm_call(self._metrics_model, started, outcome='error')
+            raise
+        usage = getattr(result, 'usage', None)
+        metrics.observe_llm_call(
+            self._metrics_model, started,
+            prompt_tokens=getattr(usage, 'prompt_tokens', 0),
+            completion_tokens=getattr(usage, 'completion_tokens', 0)
+        )
+        return result
@@ -0,0 +1,317 @@
+"""Page performance metrics: Navigation Timing, paint, LCP, CLS, transfer sizes and long tasks per navigation."""
+
+import json
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import metrics
+
+
+# Installed in every page before its scripts run; observes what the
+# Performance Timeline only reports to observers registered early
+OBSERVER_SCRIPT = """
+(() => {
+  if (window.top !== window || window.__pageMetrics) return;
+  const m = window.__pageMetrics = {lcp: null, cls: 0, longTasks: 0, longTaskMs: 0, tbt: 0};
+  try { performance.setResourceTimingBufferSize(2000); } catch (e) {}
+  const observe = (type, callback) => {
+    try {
+      new PerformanceObserver(list => list.getEntries().forEach(callback)).observe({type, buffered: true});
+    } catch (e) {}
+  };
+  observe('largest-contentful-paint', e => { m.lcp = e.startTime; });
+  observe('layout-shift', e => { if (!e.hadRecentInput) m.cls += e.value; });
+  observe('longtask', e => {
+    m.longTasks += 1;
+    m.longTaskMs += e.duration;
+    m.tbt += Math.max(0, e.duration - 50);
+  });
+})();
+"""
+
+# Reads the current document's metrics; times are ms from the navigation's start
+COLLECT_SCRIPT = """
+() => {
+  const nav = performance.getEntriesByType('navigation')[0];
+  if (!nav) return null;
+  const paint = {};
+  performance.getEntriesByType('paint').forEach(p => { paint[p.name] = p.startTime; });
+  const resources = performance.getEntriesByType('resource');
+  let transfer = nav.transferSize || 0;
+  let decoded = nav.decodedBodySize || 0;
+  resources.forEach(r => { transfer += r.transferSize || 0; decoded += r.decodedBodySize || 0; });
+  const m = window.__pageMetrics;
+  return {
+    url: nav.name,
+    time_origin: performance.timeOrigin,
+    age_ms: performance.now(),
+    navigation_type: nav.type,
+    ttfb_ms: nav.responseStart,
+    dns_ms: nav.domainLookupEnd - nav.domainLookupStart,
+    connect_ms: nav.connectEnd - nav.connectStart,
+    response_ms: nav.responseEnd - nav.responseStart,
+    dom_content_loaded_ms: nav.domContentLoadedEventEnd || null,
+    load_ms: nav.loadEventEnd || null,
+    fp_ms: paint['first-paint'] ?? null,
+    fcp_ms: paint['first-contentful-paint'] ?? null,
+    lcp_ms: m ? m.lcp : null,
+    cls: m ? m.cls : null,
+    long_tasks: m ? m.longTasks : null,
+    long_task_ms: m ? m.longTaskMs : null,
+    total_blocking_time_ms: m ? m.tbt : null,
+    document_bytes: nav.transferSize || 0,
+    transfer_bytes: transfer,
+    decoded_bytes: decoded,
+    resource_count: resources.length
+  };
+}
+"""
+
+# Budgetable metrics; a navigation fails a budget when its value exceeds it
+BUDGET_METRICS = ('lcp_ms', 'transfer_bytes', 'cls')
+
+# Fields kept per navigation in the per-URL trend history
+TREND_FIELDS = ('ttfb_ms', 'fcp_ms', 'lcp_ms', 'load_ms', 'cls', 'total_blocking_time_ms', 'long_tasks',
+                'transfer_bytes', 'resource_count')
+
+
+class PerformanceBudgetError(Exception):
+    """Raised when a run's navigations exceed the test's performance budgets."""
+
+
+def parse_budgets(spec, defaults: Dict[str, float]) -> Dict[str, float]:
+    """
+    The budgets a run checks: ``defaults`` (0 or None is off) overridden by a test's ``"perf_budgets"``.
+
+    Raises:
+        PerformanceBudgetError: If the budgets aren't an object of numbers
+            for known metrics
+    """
+    budgets = {key: value for key, value in (defaults or {}).items() if value}
+    if spec is None:
+        return budgets
+    if not isinstance(spec, dict):
+        raise PerformanceBudgetError('"perf_budgets" must be an object, e.g. {"lcp_ms": 2500}')
+    for key, value in spec.items():
+        if key not in BUDGET_METRICS:
+            raise PerformanceBudgetError(f"Unknown performance budget '{key}' (expected one of "
+                                         f"{', '.join(BUDGET_METRICS)})")
+        if value is None or value == 0:
+            budgets.pop(key, None)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            budgets[key] = value
+        else:
+            raise PerformanceBudgetError(f"Performance budget '{key}' must be a positive number")
+    return budgets
+
+
+def url_key(url: str) -> str:
+    """The URL a navigation counts towards in trends: scheme, host and path (no query or fragment)."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path or '/'}"
+
+
+def format_summary(navigation: dict) -> str:
+    """Short summary of a navigation's metrics, e.g. 'LCP 1.24s, CLS 0.02, 512 KB in 38 requests'."""
+    parts = []
+    if navigation.get('lcp_ms') is not None:
+        parts.append(f"LCP {navigation['lcp_ms'] / 1000:.2f}s")
+    elif navigation.get('load_ms'):
+        parts.append(f"load {navigation['load_ms'] / 1000:.2f}s")
+    if navigation.get('cls') is not None:
+        parts.append(f"CLS {navigation['cls']:.3f}")
+    parts.append(f"{navigation.get('transfer_bytes', 0) / 1024:.0f} KB in {navigation.get('resource_count', 0) + 1} "
+                 f"requests")
+    return ', '.join(parts)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile (None for no values)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+
+def trend_summary(samples: List[dict]) -> Dict[str, dict]:
+    """Median and 75th percentile (the Core Web Vitals convention) of each trend field over ``samples``."""
+    summary = {}
+    for field in TREND_FIELDS:
+        values = [sample[field] for sample in samples if sample.get(field) is not None]
+        if values:
+            summary[field] = {'median': percentile(values, 0.5), 'p75': percentile(values, 0.75)}
+    return summary
+
+
+class PageMetrics:
+    """
+    Collects every page navigation's performance metrics during a run.
+
+    Register ``setup`` as a ContextHooks context callback and ``teardown``
+    as a close callback. Each context gets the observer script, and each
+    document's metrics are read when it loads, when the page starts
+    navigating away, after a wrapped ``goto`` (``snapshot``) and when the
+    context closes. The latest reading of a document wins, so LCP and CLS
+    cover as much of its life as was observed.
+
+    Args:
+        budgets: Metric -> limit (see parse_budgets); navigations over a
+            limit fail the run (see raise_for_budgets)
+    """
+
+    def __init__(self, budgets: Dict[str, float] = None):
+        self.budgets = budgets or {}
+        self.navigations: List[dict] = []
+        self._documents: Dict[tuple, dict] = {}
+
+    async def setup(self, context):
+        await context.add_init_script(OBSERVER_SCRIPT)
+        context.on('page', self._watch)
+        for page in context.pages:
+            self._watch(page)
+
+    async def teardown(self, context):
+        for page in context.pages:
+            await self.snapshot(page)
+
+    def _watch(self, page):
+        async def on_load(_page):
+            await self.snapshot(page)
+
+        async def on_request(request):
+            # The document being left is still there while its successor is requested
+            try:
+                leaving = request.is_navigation_request() and request.frame == page.main_frame
+            except Exception:
+                return
+            if leaving:
+                await self.snapshot(page)
+
+        page.on('load', on_load)
+        page.on('request', on_request)
+
+    async def snapshot(self, page) -> Optional[dict]:
+        """
+        Read the metrics of the page's current document.
+
+        Returns:
+            dict: The document's navigation entry (None if the page has no
+            document worth measuring or is gone)
+        """
+        try:
+            reading = await page.evaluate(COLLECT_SCRIPT)
+        except Exception:
+            return None
+        if not reading or not str(reading.get('url', '')).startswith(('http:', 'https:')):
+            return None
+        reading = {key: round(value, 4 if key == 'cls' else 1) if isinstance(value, float) else value
+                   for key, value in reading.items()}
+        document = (id(page), reading.pop('time_origin'))
+        navigation = self._documents.get(document)
+        if navigation is None:
+            navigation = self._documents[document] = {'step': len(self.navigations) + 1}
+            self.navigations.append(navigation)
+        elif navigation['age_ms'] >= reading['age_ms']:
+            return navigation
+        navigation.update(reading)
+        navigation['over_budget'] = self.over_budget(navigation)
+        return navigation
+
+    def over_budget(self, navigation: dict) -> List[str]:
+        """The budgeted metrics a navigation exceeds."""
+        return [key for key, limit in self.budgets.items()
+                if navigation.get(key) is not None and navigation[key] > limit]
+
+    def violations(self) -> List[dict]:
+        return [{'step': navigation['step'], 'url': navigation['url'], 'metric': key,
+                 'value': navigation[key], 'budget': self.budgets[key]}
+                for navigation in self.navigations for key in navigation['over_budget']]
+
+    def raise_for_budgets(self):
+        """Fail the run if any navigation exceeded a budget."""
+        violations = self.violations()
+        for violation in violations:
+            metrics.PERF_BUDGET_VIOLATIONS.inc(metric=violation['metric'])
+        if not violations:
+            return
+        lines = [f"{len(violations)} performance budget(s) exceeded:"]
+        for violation in violations:
+            lines.append(f"  step {violation['step']} {violation['url']}: {violation['metric']} "
+                         f"{violation['value']:g} > {violation['budget']:g}")
+        raise PerformanceBudgetError('\n'.join(lines))
+
+    def record(self) -> dict:
+        """Run-record fields: each navigation's metrics and the budgets they were checked against."""
+        for navigation in self.navigations:
+            if navigation.get('lcp_ms') is not None:
+                metrics.PAGE_LCP.observe(navigation['lcp_ms'] / 1000)
+        return {'page_metrics': [{key: value for key, value in navigation.items() if key != 'age_ms'}
+                                 for navigation in self.navigations] or None,
+                'perf_budgets': self.budgets or None}
+
+
+class PageMetricsHistory:
+    """
+    Per-URL trend of navigation metrics across runs, kept in one JSON file.
+
+    Args:
+        path: The history file
+        size: Samples kept per URL
+    """
+
+    def __init__(self, path: Path, size: int):
+        self.path = Path(path)
+        self.size = size
+        self._lock = threading.Lock()
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            print(f"Warning: Could not read page metrics history {self.path}: {e}")
+            return {}
+
+    def record(self, navigations: List[dict], test: str, run: str, profile: str = None):
+        """Add a run's navigations, measured under execution ``profile``, to their URLs' trends."""
+        if not navigations:
+            return
+        now = time.time()
+        with self._lock:
+            history = self._load()
+            for navigation in navigations:
+                sample = {'time': now, 'test': test, 'run': run, 'step': navigation['step'], 'profile': profile}
+                sample.update({field: navigation.get(field) for field in TREND_FIELDS})
+                samples = history.setdefault(url_key(navigation['url']), [])
+                samples.append(sample)
+                del samples[:-self.size]
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix('.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump(history, f)
+            temp_path.replace(self.path)
+
+    def urls(self) -> List[dict]:
+        """Every tracked URL with its sample count and latest sample, most recently measured first."""
+        with self._lock:
+            history = self._load()
+        summaries = [{'url': url, 'samples': len(samples), 'latest': samples[-1]}
+                     for url, samples in history.items() if samples]
+        return sorted(summaries, key=lambda summary: summary['latest']['time'], reverse=True)
+
+    def trend(self, url: str, limit: int = None, profile: str = None) -> List[dict]:
+        """A URL's samples, oldest first, optionally only those measured under one execution profile.
+
+        The URL's query and fragment are ignored.
+        """
+        with self._lock:
+            samples = self._load().get(url_key(url), [])
+        if profile:
+            samples = [sample for sample in samples if sample.get('profile') == profile]
+        return samples[-limit:] if limit else samples
@@ -0,0 +1,124 @@
+"""SamplingProfiler: low-overhead, dependency-free CPU sampling of run threads."""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Optional
+
+
+PROFILE_FOLDED_FILENAME = "cpu-profile.folded"
+PROFILE_SUMMARY_FILENAME = "cpu-profile.json"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Periodically samples the Python stacks of selected threads.
+
+    Samples are aggregated as collapsed stacks ("a;b;c count"), the format
+    read by flamegraph.pl and speedscope. Nothing runs until ``start()`` is
+    called, so a run that doesn't ask for profiling pays nothing.
+    """
+
+    def __init__(self, thread_ids: Optional[Iterable[int]] = None, interval: float = 0.005):
+        """
+        Initialize SamplingProfiler.
+
+        Args:
+            thread_ids: Threads to sample (defaults to the calling thread)
+            interval: Seconds between samples (default 5 ms = 200 Hz)
+        """
+        self.thread_ids = set(thread_ids or [threading.get_ident()])
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._started_at = None
+        self._stopped_at = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_thread(self, thread_id: int):
+        """Also sample ``thread_id`` (e.g. a worker the run hands off to)."""
+        self.thread_ids.add(thread_id)
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._stopped_at = time.perf_counter()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread_id in self.thread_ids:
+                if thread_id == own_id:
+                    continue
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def summary(self, top: int = 25) -> dict:
+        """Top functions by self and cumulative samples."""
+        self_counts = Counter()
+        cumulative_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            self_counts[frames[-1]] += count
+            for label in set(frames):
+                cumulative_counts[label] += count
+
+        def share(counter):
+            return [
+                {'function': label, 'samples': count,
+                 'percent': round(count / self.samples * 100, 1) if self.samples else 0}
+                for label, count in counter.most_common(top)
+            ]
+
+        duration = (self._stopped_at or time.perf_counter()) - (self._started_at or time.perf_counter())
+        return {
+            'samples': self.samples,
+            'interval_ms': self.interval * 1000,
+            'duration_s': round(duration, 3),
+            'threads': len(self.thread_ids),
+            'top_self': share(self_counts),
+            'top_cumulative': share(cumulative_counts)
+        }
+
+    def save(self, artifact_dir: Path) -> tuple:
+        """
+        Write the collapsed stacks and summary next to the run's artifacts.
+
+        Returns:
+            tuple: (folded_path, summary_path)
+        """
+        artifact_dir = Path(artifact_dir)
+        folded_path = artifact_dir / PROFILE_FOLDED_FILENAME
+        with open(folded_path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        summary_path = artifact_dir / PROFILE_SUMMARY_FILENAME
+        with open(summary_path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+        return folded_path, summary_path
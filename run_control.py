@@ -0,0 +1,153 @@
+"""RunControl: per-run cancellation handles, shared by every run type."""
+
+import asyncio
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import List, Optional
+
+
+_bound = threading.local()
+
+
+class RunControl:
+    """
+    Handle for stopping one run.
+
+    A run's coroutine is attached as a task; ``stop()`` cancels that task on
+    the loop that runs it, from any thread. Cancellation aborts in-flight
+    Playwright awaits, and the run's own handlers close its browser and
+    report ``stopped``. A run stopped before its task exists is cancelled as
+    soon as it is attached.
+    """
+
+    def __init__(self, kind: str, label: str = '', owner: Optional[str] = None,
+                 parent: Optional['RunControl'] = None):
+        """
+        Initialize RunControl.
+
+        Args:
+            kind: Run type ('ai', 'saved', 'batch')
+            label: Name shown in logs
+            owner: Socket.IO sid of the client that started the run
+            parent: Batch this run belongs to; stopping the batch stops it
+        """
+        self.run_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.label = label
+        self.owner = owner
+        self.parent = parent
+        self.ticket = None  # RunQueue ticket while the run waits for admission
+        self.stop_requested = False
+        self.done = threading.Event()
+        self.owns_thread = False
+        self.thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self) -> bool:
+        return self._task is not None
+
+    @property
+    def stopping(self) -> bool:
+        """Whether this run, or the batch it belongs to, was asked to stop."""
+        return self.stop_requested or bool(self.parent and self.parent.stop_requested)
+
+    def attach(self, task: asyncio.Task, owns_thread: bool = False):
+        """
+        Bind the run's task; called on the loop's thread.
+
+        Args:
+            task: Task running the run's coroutine
+            owns_thread: Whether the loop's thread runs only this run (so it may be interrupted)
+        """
+        with self._lock:
+            self._task = task
+            self._loop = task.get_loop()
+            self.owns_thread = owns_thread
+            self.thread_id = threading.get_ident()
+            stop_now = self.stopping
+        if stop_now:
+            task.cancel()
+
+    def stop(self) -> bool:
+        """
+        Request cancellation; safe to call from any thread.
+
+        Returns:
+            bool: False if the run had already finished
+        """
+        if self.done.is_set():
+            return False
+        with self._lock:
+            self.stop_requested = True
+            task, loop = self._task, self._loop
+        if task is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    def to_dict(self) -> dict:
+        return {'run_id': self.run_id, 'kind': self.kind, 'label': self.label,
+                'stopping': self.stopping, 'started': self.started}
+
+
+class RunRegistry:
+    """Thread-safe index of runs in flight, by id and by owning client."""
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def register(self, control: RunControl) -> RunControl:
+        with self._lock:
+            self._runs[control.run_id] = control
+        return control
+
+    def unregister(self, control: RunControl):
+        """Forget a run and mark it finished."""
+        with self._lock:
+            self._runs.pop(control.run_id, None)
+        control.done.set()
+
+    def get(self, run_id: str) -> Optional[RunControl]:
+        with self._lock:
+            return self._runs.get(run_id)
+
+    def matching(self, run_id: Optional[str] = None, owner: Optional[str] = None) -> List[RunControl]:
+        """Runs to stop: ``run_id`` and its batch members, or everything ``owner`` started."""
+        with self._lock:
+            runs = list(self._runs.values())
+        if run_id:
+            return [c for c in runs if c.run_id == run_id or (c.parent and c.parent.run_id == run_id)]
+        return [c for c in runs if owner and c.owner == owner]
+
+    def snapshot(self) -> List[dict]:
+        with self._lock:
+            return [c.to_dict() for c in self._runs.values()]
+
+
+def current() -> Optional[RunControl]:
+    """The run control bound to the calling thread, if any."""
+    return getattr(_bound, 'control', None)
+
+
+@contextmanager
+def bind(control: Optional[RunControl]):
+    """Make ``control`` the calling thread's current run for the duration of the block."""
+    previous = current()
+    _bound.control = control
+    try:
+        yield control
+    finally:
+        _bound.control = previous
+
+
+def start_task(loop: asyncio.AbstractEventLoop, coro) -> asyncio.Task:
+    """Create a run's task on a private loop, attaching the thread's bound run control."""
+    task = loop.create_task(coro)
+    control = current()
+    if control is not None:
+        control.attach(task, owns_thread=True)
+    return task
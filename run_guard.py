@@ -0,0 +1,253 @@
+"""Run guards: wall-clock budgets, bounded teardown, and a watchdog for stalled event loops."""
+
+import asyncio
+import ctypes
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, List, Optional
+
+
+class RunTimeoutError(Exception):
+    """Raised when a run exceeds its wall-clock budget."""
+
+
+class RunStalledError(RunTimeoutError):
+    """Raised inside a run whose event loop stopped making progress."""
+
+    def __init__(self, message: str = 'Run aborted: its event loop stopped making progress'):
+        super().__init__(message)
+
+
+@asynccontextmanager
+async def run_budget(seconds: Optional[float]):
+    """
+    Cancel the block after ``seconds`` of wall-clock time.
+
+    Cancellation unwinds the block, so ``async with`` browsers and contexts
+    inside it are closed on the way out.
+
+    Raises:
+        RunTimeoutError: If the budget ran out (other TimeoutErrors pass through)
+    """
+    if not seconds:
+        yield
+        return
+    # A timer that cancels the task rather than asyncio.timeout, which needs Python 3.11
+    task = asyncio.current_task()
+    expired = False
+
+    def expire():
+        nonlocal expired
+        expired = True
+        task.cancel()
+
+    timer = asyncio.get_running_loop().call_later(seconds, expire)
+    try:
+        yield
+    except asyncio.CancelledError as e:
+        # A stop that arrived alongside the expiry still wins
+        if not expired or absorb_cancellation():
+            raise
+        raise RunTimeoutError(f'Run exceeded its {seconds:g}s time limit') from e
+    finally:
+        timer.cancel()
+
+
+def absorb_cancellation() -> bool:
+    """
+    Mark the current task's cancellation as handled once it has been caught.
+
+    On Python 3.11+ this keeps ``Task.cancelling()`` balanced for timeouts
+    used later in the task; earlier versions don't count cancellations.
+
+    Returns:
+        bool: Whether other cancellation requests are still pending (always False before 3.11)
+    """
+    task = asyncio.current_task()
+    if task is not None and hasattr(task, 'uncancel'):
+        return task.uncancel() > 0
+    return False
+
+
+async def close_within(closing, seconds: float, what: str = 'browser'):
+    """Await a close() coroutine, giving up after ``seconds`` so teardown can't hang a worker."""
+    try:
+        await asyncio.wait_for(closing, seconds)
+    except Exception as e:
+        print(f"Warning: Could not close {what} within {seconds:g}s: {e!r}")
+
+
+class PlaywrightTracker:
+    """
+    Stand-in for ``async_playwright`` that remembers the drivers it started.
+
+    Injected into user code so a timed-out or cancelled run can stop any
+    driver (and with it every browser it launched) the code left running.
+    With ``hooks`` (a ContextHooks), the code gets a driver whose browsers
+    apply them to every context.
+    """
+
+    def __init__(self, hooks=None):
+        self.drivers = []
+        self.hooks = hooks
+
+    def __call__(self):
+        return _TrackedPlaywrightManager(self)
+
+    async def stop_all(self, seconds: float):
+        """Stop every driver still running, each within ``seconds``."""
+        drivers, self.drivers = self.drivers, []
+        for playwright in drivers:
+            await close_within(playwright.stop(), seconds, 'Playwright driver')
+
+
+class _TrackedPlaywrightManager:
+    def __init__(self, tracker: PlaywrightTracker):
+        from playwright.async_api import async_playwright
+        self._tracker = tracker
+        self._manager = async_playwright()
+        self._playwright = None
+
+    async def start(self):
+        self._playwright = await self._manager.start()
+        self._tracker.drivers.append(self._playwright)
+        if self._tracker.hooks is not None:
+            return self._tracker.hooks.wrap_playwright(self._playwright)
+        return self._playwright
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *args):
+        if self._playwright in self._tracker.drivers:
+            self._tracker.drivers.remove(self._playwright)
+        return await self._manager.__aexit__(*args)
+
+
+def interrupt_thread(thread_id: int, exc_type: type = RunStalledError) -> bool:
+    """
+    Raise ``exc_type`` asynchronously in another thread.
+
+    The exception lands at the thread's next Python bytecode, which breaks a
+    busy loop in user code; a thread blocked inside a C call only sees it
+    once the call returns.
+    """
+    result = ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), ctypes.py_object(exc_type))
+    if result > 1:
+        # Affected more than one thread state: undo it
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(thread_id), None)
+        return False
+    return result == 1
+
+
+class WatchedLoop:
+    """An event loop registered with the watchdog, and its last heartbeat."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, label: str, thread_id: Optional[int], interrupt: bool):
+        self.loop = loop
+        self.label = label
+        self.thread_id = thread_id
+        self.interrupt = interrupt
+        self.last_beat = time.monotonic()
+        self.stalled = False
+        self.active = True
+        self._handle = None
+
+    @property
+    def stalled_for(self) -> float:
+        return time.monotonic() - self.last_beat
+
+
+class LoopWatchdog:
+    """
+    Detects event loops that stop making progress.
+
+    Each watched loop schedules a heartbeat callback every ``interval``
+    seconds. A loop blocked by synchronous work (a busy loop in user code, a
+    blocking call) can't run it, so once the last beat is older than
+    ``stall_after`` the watchdog thread reports the loop to ``on_stall``.
+    """
+
+    def __init__(self, stall_after: float, on_stall: Callable[[WatchedLoop], None], interval: float = 1.0):
+        """
+        Initialize LoopWatchdog.
+
+        Args:
+            stall_after: Seconds without a heartbeat before a loop counts as stalled (0 disables)
+            on_stall: Called from the watchdog thread once per stall
+            interval: Seconds between heartbeats and between checks
+        """
+        self.stall_after = stall_after
+        self.on_stall = on_stall
+        self.interval = interval
+        self._watched: List[WatchedLoop] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, loop: asyncio.AbstractEventLoop, label: str, thread_id: Optional[int] = None,
+              interrupt: bool = False) -> Optional[WatchedLoop]:
+        """
+        Start watching ``loop``.
+
+        Args:
+            loop: Event loop to watch; may be called before it starts running
+            label: Name used when reporting a stall
+            thread_id: Thread that runs the loop (needed to interrupt it)
+            interrupt: Whether ``on_stall`` may interrupt the loop's thread
+
+        Returns:
+            WatchedLoop, or None if the watchdog is disabled
+        """
+        if not self.stall_after:
+            return None
+        watched = WatchedLoop(loop, label, thread_id, interrupt)
+        loop.call_soon_threadsafe(self._beat, watched)
+        with self._lock:
+            self._watched.append(watched)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='loop-watchdog', daemon=True)
+                self._thread.start()
+        return watched
+
+    def unwatch(self, watched: Optional[WatchedLoop]):
+        if watched is None:
+            return
+        watched.active = False
+        if watched._handle:
+            watched._handle.cancel()
+        with self._lock:
+            if watched in self._watched:
+                self._watched.remove(watched)
+
+    @contextmanager
+    def watching(self, loop: asyncio.AbstractEventLoop, label: str, interrupt: bool = False):
+        """Watch a loop run by the calling thread for the duration of the block."""
+        watched = self.watch(loop, label, thread_id=threading.get_ident(), interrupt=interrupt)
+        try:
+            yield watched
+        finally:
+            self.unwatch(watched)
+
+    def _beat(self, watched: WatchedLoop):
+        if not watched.active:
+            return
+        watched.last_beat = time.monotonic()
+        if watched.stalled:
+            watched.stalled = False
+            print(f"Watchdog: {watched.label} is making progress again")
+        watched._handle = watched.loop.call_later(self.interval, self._beat, watched)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                watched_loops = list(self._watched)
+            for watched in watched_loops:
+                if watched.stalled or watched.stalled_for < self.stall_after:
+                    continue
+                watched.stalled = True
+                try:
+                    self.on_stall(watched)
+                except Exception as e:
+                    print(f"Warning: Watchdog stall handler failed: {e}")
@@ -0,0 +1,245 @@
+"""RunQueue: admission control for browser and AI runs across all entry points."""
+
+import asyncio
+import itertools
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+
+# Lower runs first: interactive runs are admitted ahead of batch tests
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class QueueFullError(Exception):
+    """Raised when a run is submitted while the queue is at its depth limit."""
+
+
+class RunTicket:
+    """A run waiting for, or holding, execution slots."""
+
+    def __init__(self, kind: str, priority: int, resources: Dict[str, int], start: Callable[['RunTicket'], None],
+                 label: str = '', sid: Optional[str] = None, run_id: Optional[str] = None):
+        self.id = run_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.priority = priority
+        self.resources = resources
+        self.label = label
+        self.sid = sid
+        self.state = 'queued'  # queued -> running -> done, or queued -> cancelled
+        self.enqueued_at = time.time()
+        self.admitted_at: Optional[float] = None
+        self.position_reported = False  # Client was told it is waiting
+        self._start = start
+
+    @property
+    def wait_s(self) -> float:
+        return round((self.admitted_at or time.time()) - self.enqueued_at, 3)
+
+    def to_dict(self) -> dict:
+        return {
+            'run_id': self.id,
+            'kind': self.kind,
+            'label': self.label,
+            'priority': self.priority,
+            'state': self.state,
+            'wait_s': self.wait_s
+        }
+
+
+class RunQueue:
+    """
+    Single priority queue with per-resource concurrency limits.
+
+    Each run declares the slots it needs (e.g. ``{'browsers': 1, 'ai_runs': 1}``).
+    Queued runs are admitted in (priority, arrival) order; a run that doesn't
+    fit yet reserves its slots so later, lower-priority runs can't starve it.
+    Admission calls the ticket's ``start`` callback, which hands the run to
+    whatever executes it (a background thread, or a task on the ASGI loop);
+    the run must call ``release()`` when it finishes.
+    """
+
+    def __init__(self, limits: Dict[str, int], max_depth: int,
+                 on_change: Optional[Callable[[List[RunTicket], List[RunTicket]], None]] = None):
+        """
+        Initialize RunQueue.
+
+        Args:
+            limits: Maximum concurrent slots per resource name
+            max_depth: Maximum number of queued (not yet admitted) runs
+            on_change: Called with (queued, admitted) tickets after each change,
+                e.g. to send queue position events
+        """
+        self.limits = dict(limits)
+        self.max_depth = max_depth
+        self.on_change = on_change
+        self._in_use = {name: 0 for name in self.limits}
+        self._queued: List[RunTicket] = []
+        self._running: Dict[str, RunTicket] = {}
+        self._order = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, start: Callable[[RunTicket], None], resources: Dict[str, int],
+               priority: int = PRIORITY_INTERACTIVE, label: str = '', sid: Optional[str] = None,
+               enforce_depth: bool = True, run_id: Optional[str] = None) -> RunTicket:
+        """
+        Queue a run; ``start(ticket)`` is called (possibly right away) once it is admitted.
+
+        Raises:
+            QueueFullError: If ``enforce_depth`` and the queue is at its depth limit
+        """
+        ticket = RunTicket(kind, priority, resources, start, label=label, sid=sid, run_id=run_id)
+        with self._lock:
+            if enforce_depth:
+                self._check_depth()
+            self._order[ticket.id] = (priority, next(self._counter))
+            self._queued.append(ticket)
+            self._queued.sort(key=lambda t: self._order[t.id])
+        self._dispatch()
+        return ticket
+
+    def release(self, ticket: RunTicket):
+        """Return a finished run's slots and admit whatever now fits."""
+        with self._lock:
+            if self._running.pop(ticket.id, None) is None:
+                return
+            ticket.state = 'done'
+            for name, amount in ticket.resources.items():
+                self._in_use[name] = max(0, self._in_use.get(name, 0) - amount)
+        self._dispatch()
+
+    def cancel(self, ticket: RunTicket) -> bool:
+        """Drop a run that hasn't been admitted yet. Returns False if it already started."""
+        with self._lock:
+            if ticket not in self._queued:
+                return False
+            self._queued.remove(ticket)
+            ticket.state = 'cancelled'
+        self._notify([])
+        return True
+
+    def acquire(self, kind: str, resources: Dict[str, int], priority: int = PRIORITY_BATCH,
+                label: str = '', enforce_depth: bool = False) -> RunTicket:
+        """Queue a run and block the calling thread until it is admitted."""
+        admitted = threading.Event()
+        ticket = self.submit(kind, lambda _: admitted.set(), resources, priority=priority, label=label,
+                             enforce_depth=enforce_depth)
+        admitted.wait()
+        return ticket
+
+    async def acquire_async(self, kind: str, resources: Dict[str, int], priority: int = PRIORITY_BATCH,
+                            label: str = '', enforce_depth: bool = False) -> RunTicket:
+        """Queue a run and wait on the running event loop until it is admitted."""
+        loop = asyncio.get_running_loop()
+        admitted = asyncio.Event()
+        ticket = self.submit(kind, lambda _: loop.call_soon_threadsafe(admitted.set), resources,
+                             priority=priority, label=label, enforce_depth=enforce_depth)
+        try:
+            await admitted.wait()
+        except asyncio.CancelledError:
+            if not self.cancel(ticket):
+                self.release(ticket)
+            raise
+        return ticket
+
+    def position(self, ticket: RunTicket) -> int:
+        """1-based position of a queued run (0 once admitted)."""
+        with self._lock:
+            return self._queued.index(ticket) + 1 if ticket in self._queued else 0
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._queued)
+
+    def ensure_capacity(self):
+        """Raise QueueFullError if a new run would be rejected right now."""
+        with self._lock:
+            self._check_depth()
+
+    def _check_depth(self):
+        if len(self._queued) >= self.max_depth:
+            raise QueueFullError(f'Run queue is full ({self.max_depth} runs waiting), try again shortly')
+
+    def snapshot(self) -> dict:
+        """Limits, slots in use, and the running and queued runs."""
+        with self._lock:
+            return {
+                'limits': dict(self.limits),
+                'in_use': dict(self._in_use),
+                'max_depth': self.max_depth,
+                'running': [t.to_dict() for t in self._running.values()],
+                'queued': [dict(t.to_dict(), position=i + 1) for i, t in enumerate(self._queued)]
+            }
+
+    def _fits(self, resources: Dict[str, int], available: Dict[str, int]) -> bool:
+        return all(available.get(name, 0) >= amount for name, amount in resources.items() if name in self.limits)
+
+    def _dispatch(self):
+        admitted = []
+        with self._lock:
+            available = {name: self.limits[name] - self._in_use[name] for name in self.limits}
+            for ticket in list(self._queued):
+                fits = self._fits(ticket.resources, available)
+                for name, amount in ticket.resources.items():
+                    if name in available:
+                        available[name] -= amount  # Admitted, or reserved so it isn't starved
+                if not fits:
+                    continue
+                self._queued.remove(ticket)
+                for name, amount in ticket.resources.items():
+                    if name in self._in_use:
+                        self._in_use[name] += amount
+                ticket.state = 'running'
+                ticket.admitted_at = time.time()
+                self._running[ticket.id] = ticket
+                admitted.append(ticket)
+
+        for ticket in admitted:
+            try:
+                ticket._start(ticket)
+            except Exception as e:
+                print(f"Warning: Could not start run {ticket.id}: {e}")
+                self.release(ticket)
+        self._notify(admitted)
+
+    def _notify(self, admitted: List[RunTicket]):
+        if not self.on_change:
+            return
+        with self._lock:
+            queued = list(self._queued)
+        try:
+            self.on_change(queued, admitted)
+        except Exception as e:
+            print(f"Warning: Could not report queue positions: {e}")
+
+
+class SlotLimiter:
+    """
+    Counting limit usable from threads (``with``) and event loops (``async with``).
+
+    The async form polls instead of blocking, so waiting for a slot never
+    stalls an event loop shared with other runs.
+    """
+
+    def __init__(self, limit: int, poll_interval: float = 0.05):
+        self.limit = limit
+        self.poll_interval = poll_interval
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def __enter__(self):
+        self._semaphore.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(self.poll_interval)
+        return self
+
+    async def __aexit__(self, *args):
+        self._semaphore.release()
@@ -0,0 +1,285 @@
+"""
+Headless command-line runner for saved tests and AI steps.
+
+Runs tests through the same batch engine as "Run All Tests" in the web UI
+(run queue, time limits, result and artifact recording), without starting
+the web server.
+
+Usage:
+    python run_tests.py                              # every saved test and AI step
+    python run_tests.py 'Sign_Up*' --kind saved --workers 3
+    python run_tests.py --tag smoke --junit report.xml --json results.json
+    python run_tests.py --kind saved --replay        # serve network traffic from recorded HARs
+    python run_tests.py --execution-profile lean     # block images, fonts, media and trackers
+    python run_tests.py --execution-profile mid-range-mobile  # 4x CPU slowdown on a slow 4G network
+    python run_tests.py --incremental                # only what changed, failed or passed too long ago
+    python run_tests.py --retries 2                  # retry failed tests twice; passes on a retry are flaky
+    python run_tests.py Checkout --users 20 --ramp-up 10 --duration 60 --think-time 1,3
+
+Exits 0 when every test passed, 1 when any failed, timed out or was stopped
+(quarantined flaky tests excepted), and 2 when no test matched. A load test
+(--users) exits 1 when it errored or its error rate exceeded --max-error-rate.
+"""
+
+import argparse
+import fnmatch
+import json
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+
+STATUS_LABELS = {
+    'cached': '♻ CACHED',
+    'success': '✅ PASS',
+    'error': '❌ FAIL',
+    'timeout': '⏱ TIMEOUT',
+    'stopped': '⏹ STOPPED'
+}
+
+
+def select_tests(directory: Path, patterns, tags):
+    """Filenames in ``directory`` matching any glob pattern and, if given, any tag.
+
+    Patterns are matched against the filename, its stem and the test's name;
+    tags against the test's optional ``"tags"`` list.
+    """
+    selected = []
+    for filepath in sorted(directory.glob('*.json')):
+        try:
+            with open(filepath, 'r') as f:
+                test_data = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load {filepath}: {e}")
+            continue
+        candidates = (filepath.name, filepath.stem, test_data.get('name') or '')
+        if not any(fnmatch.fnmatch(c, p) for p in patterns for c in candidates):
+            continue
+        if tags and not set(tags) & set(test_data.get('tags') or []):
+            continue
+        selected.append(filepath.name)
+    return selected
+
+
+def print_result(result: dict):
+    label = STATUS_LABELS['cached'] if result.get('cached') else STATUS_LABELS.get(result['status'], result['status'])
+    kind = ' [ai]' if result.get('kind') == 'ai' else ''
+    notes = ''
+    if result.get('flaky'):
+        notes += f" [flaky: passed on attempt {result['attempts']}]"
+    elif result.get('retried'):
+        notes += f" [{result['attempts']} attempts]"
+    if result.get('quarantined'):
+        notes += ' [quarantined]'
+    print(f"{label} {result['name']}{kind}{notes} ({result.get('duration_s') or 0:.1f}s)", flush=True)
+    if result.get('rows'):
+        # A data-driven test's error lists its failed rows; show every row instead
+        for row in result['rows']:
+            label = STATUS_LABELS.get(row['status'], row['status'])
+            print(f"    {label} {row['label']} ({row.get('duration_s') or 0:.1f}s)", flush=True)
+            error = (row.get('error') or '').strip()
+            if error and row['status'] != 'success':
+                print(f"        {error.splitlines()[0]}", flush=True)
+        return
+    error = (result.get('error') or '').strip()
+    if error and result['status'] != 'success':
+        print(f"    {error.splitlines()[0]}", flush=True)
+
+
+def format_ms(value) -> str:
+    return '-' if value is None else f"{value:.0f}ms"
+
+
+def print_load_interval(interval: dict):
+    print(f"[{interval['t_s']:6.1f}s] {interval['users']} users, {interval['iterations']} iterations "
+          f"({interval['failed_iterations']} failed), {interval['actions_per_s']:.1f} actions/s, "
+          f"p95 {format_ms(interval['p95_ms'])}", flush=True)
+
+
+def print_load_report(result: dict):
+    iterations = result['iterations']
+    if result['by_action']:
+        print(f"\n{'Action':<40} {'count':>7} {'errors':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for action in result['by_action']:
+        print(f"{action['action'][:40]:<40} {action['count']:>7} {action['errors']:>7} "
+              f"{format_ms(action['p50_ms']):>8} {format_ms(action['p95_ms']):>8} "
+              f"{format_ms(action['p99_ms']):>8} {format_ms(action['max_ms']):>8}")
+    for error in result['errors']:
+        print(f"    {error['count']}x {error['error']}")
+    print(f"\n{iterations['total']} iterations ({iterations['failed']} failed, {iterations['cancelled']} cancelled, "
+          f"p50 {format_ms(iterations['p50_ms'])}, p95 {format_ms(iterations['p95_ms'])}) at "
+          f"{result['throughput']['iterations_per_s']:.2f}/s, {result['actions']['total']} actions, "
+          f"error rate {result['error_rate']:.1%} in {result['elapsed_s']:.1f}s")
+
+
+def run_load_mode(args, parser, filename: str):
+    """Run one saved test as a load test (--users) and exit with its outcome."""
+    import web_ui
+
+    request = {'users': args.users, 'ramp_up_s': args.ramp_up, 'duration_s': args.duration,
+               'browsers': args.browsers, 'execution_profile': args.execution_profile}
+    if args.think_time is not None:
+        request['think_time_s'] = [float(value) for value in args.think_time.split(',')] \
+            if ',' in args.think_time else float(args.think_time)
+    try:
+        options = web_ui.parse_load_test_options({key: value for key, value in request.items() if value is not None},
+                                                 web_ui.load_saved_test(filename))
+    except (web_ui.RunRequestError, ValueError) as e:
+        parser.error(str(e))
+
+    print(f"Load testing {filename}: {options['users']} users over {options['browsers']} browser(s), "
+          f"{options['ramp_up_s']:g}s ramp-up, {options['duration_s']:g}s")
+
+    def report(event, payload):
+        if event == 'load_test_progress':
+            print_load_interval(payload)
+
+    try:
+        result = web_ui.run_load_test(filename, options, report)
+    except KeyboardInterrupt:
+        print("Stopped")
+        sys.exit(1)
+    print_load_report(result)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Report written to {args.json}")
+    if result['status'] != 'success':
+        print(f"Load test {result['status']}: {(result.get('error') or '').strip()}")
+        sys.exit(1)
+    if args.max_error_rate is not None and result['error_rate'] > args.max_error_rate:
+        print(f"Error rate {result['error_rate']:.1%} exceeds --max-error-rate {args.max_error_rate:.1%}")
+        sys.exit(1)
+    sys.exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run saved tests and AI steps headless, without the web server.')
+    parser.add_argument('patterns', nargs='*', default=['*'],
+                        help='Glob patterns for test filenames or names (default: all)')
+    parser.add_argument('--tag', action='append', default=[], dest='tags',
+                        help='Only tests tagged with this (repeatable; any tag matches)')
+    parser.add_argument('--kind', choices=('all', 'saved', 'ai'), default='all',
+                        help='Saved Playwright tests, AI steps, or both')
+    parser.add_argument('--workers', type=int, help='Tests running at once (default: MAX_CONCURRENT_BROWSERS)')
+    parser.add_argument('--junit', help='Write a JUnit XML report here')
+    parser.add_argument('--json', help='Write the summary and per-test results here')
+    parser.add_argument('--replay', action='store_true',
+                        help="Replay saved tests' network traffic from their recorded HARs")
+    parser.add_argument('--replay-not-found', choices=('abort', 'fallback'),
+                        help='Requests missing from the HAR: abort them, or fall back to the network')
+    parser.add_argument('--execution-profile',
+                        help="Requests to block and device to emulate: 'full', 'no-trackers', 'lean', "
+                             "'mid-range-mobile', 'low-end-mobile' or a custom profile "
+                             "(default: each test's own, else EXECUTION_PROFILE)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Skip tests whose code and run settings are unchanged since a recent pass")
+    parser.add_argument('--max-age', type=float, dest='max_age_s',
+                        help='Seconds a pass is reused by --incremental (default: INCREMENTAL_MAX_AGE_S)')
+    parser.add_argument('--retries', type=int,
+                        help="Extra attempts for a failed saved test (default: each test's own, else BATCH_RETRIES)")
+    parser.add_argument('--users', type=int,
+                        help='Load test one saved test with this many concurrent virtual users')
+    parser.add_argument('--ramp-up', type=float, help='Load test: seconds over which users start (default: 0)')
+    parser.add_argument('--duration', type=float,
+                        help='Load test: seconds users keep iterating (default: LOAD_TEST_DURATION_S)')
+    parser.add_argument('--think-time',
+                        help="Load test: seconds between a user's iterations, or a MIN,MAX range "
+                             "(default: LOAD_TEST_THINK_TIME_S)")
+    parser.add_argument('--browsers', type=int,
+                        help='Load test: browsers the users share (default: LOAD_TEST_BROWSERS)')
+    parser.add_argument('--max-error-rate', type=float,
+                        help='Load test: fail when more than this fraction of iterations failed, e.g. 0.01')
+    parser.add_argument('--list', action='store_true', help='List the matching tests and exit')
+    args = parser.parse_args()
+
+    # Imported after parsing so --help stays fast
+    import config
+    import web_ui
+    from junit_report import build_junit_xml
+    from run_control import RunControl
+
+    try:
+        run_options = web_ui.parse_network_options({'network': 'replay' if args.replay else 'live',
+                                                    'replay_not_found': args.replay_not_found,
+                                                    'execution_profile': args.execution_profile})
+        run_options.update(web_ui.parse_batch_options({'incremental': args.incremental, 'max_age_s': args.max_age_s,
+                                                               'retries': args.retries}))
+    except web_ui.RunRequestError as e:
+        parser.error(str(e))
+
+    saved = select_tests(web_ui.SAVED_TESTS_DIR, args.patterns, args.tags) if args.kind != 'ai' else []
+    ai_steps = select_tests(web_ui.AI_STEPS_DIR, args.patterns, args.tags) if args.kind != 'saved' else []
+    if not saved and not ai_steps:
+        print("No tests matched")
+        sys.exit(2)
+    if args.list:
+        for filename in saved:
+            print(filename)
+        for filename in ai_steps:
+            print(f"{filename} [ai]")
+        sys.exit(0)
+    if args.users is not None:
+        if len(saved) != 1:
+            parser.error(f"--users load tests exactly one saved test ({len(saved)} matched)")
+        run_load_mode(args, parser, saved[0])
+
+    args.workers = args.workers or config.MAX_CONCURRENT_BROWSERS
+    print(f"Running {len(saved)} saved test(s) and {len(ai_steps)} AI step(s) with {args.workers} worker(s)")
+    if args.workers > config.MAX_CONCURRENT_BROWSERS:
+        print(f"Note: at most MAX_CONCURRENT_BROWSERS={config.MAX_CONCURRENT_BROWSERS} browsers run at once")
+
+    started_at = datetime.now()
+    results = []
+    outcome = {}
+    finished = threading.Event()
+
+    def report(event, payload):
+        if event == 'batch_test_progress':
+            results.append(payload)
+            print_result(payload)
+        elif event == 'batch_run_complete':
+            outcome['summary'] = payload
+            finished.set()
+
+    def wait_for_batch():
+        # Event.wait rather than join: an interrupted join can leave the thread looking finished
+        while runner.is_alive() and not finished.wait(0.5):
+            pass
+
+    batch = web_ui.runs.register(RunControl('batch', label='CLI run'))
+    runner = threading.Thread(target=web_ui.run_all_tests_parallel, args=(saved, args.workers, batch, report),
+                              kwargs={'ai_step_filenames': ai_steps, 'run_options': run_options}, daemon=True)
+    runner.start()
+    try:
+        wait_for_batch()
+    except KeyboardInterrupt:
+        print("Stopping tests...", flush=True)
+        web_ui.stop_runs(run_id=batch.run_id)
+        wait_for_batch()
+
+    summary = outcome.get('summary')
+    if summary is None:
+        print("Batch did not complete")
+        sys.exit(1)
+
+    if args.junit:
+        Path(args.junit).write_text(build_junit_xml(results, summary, timestamp=started_at))
+        print(f"JUnit report written to {args.junit}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'summary': summary, 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    cached = f", {summary['cached']} cached" if summary.get('cached') else ''
+    flaky = f", {summary['flaky']} flaky" if summary.get('flaky') else ''
+    quarantined = (f", {summary['quarantined']} quarantined ({summary['quarantine_failed']} failed, not counted)"
+                   if summary.get('quarantined') else '')
+    print(f"\n{summary['passed']}/{summary['total']} passed{cached}{flaky}, {summary['failed']} failed "
+          f"({summary['timed_out']} timed out, {summary['stopped']} stopped){quarantined} in {summary['duration']:.1f}s")
+    sys.exit(0 if summary['failed'] == 0 else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""RunTimeline: per-action timing for saved-test and AI runs."""
+
+import asyncio
+import contextvars
+import json
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+
+TIMELINE_FILENAME = "timeline.json"
+
+# Categories reported in the time breakdown
+CATEGORIES = ('action', 'sleep', 'screenshot', 'llm')
+
+# Innermost open span of the current asyncio task (each task gets its own copy)
+_current_span = contextvars.ContextVar('run_timeline_span', default=None)
+
+
+class RunTimeline:
+    """
+    Records a per-action timeline for one run.
+
+    Each entry has a name, target, start offset, duration and outcome.
+    Spans may nest (e.g. a fixed sleep inside a click); the breakdown uses
+    exclusive time so nested work is not counted twice.
+    """
+
+    def __init__(self, run_type: str):
+        """
+        Initialize RunTimeline.
+
+        Args:
+            run_type: Kind of run being timed ('ai' or 'saved')
+        """
+        self.run_type = run_type
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.entries = []
+        # Continuous stream frames run beside the critical path; aggregate only
+        self.stream_frames = 0
+        self.stream_capture_s = 0.0
+
+    @asynccontextmanager
+    async def span(self, name: str, target: Optional[str] = None, category: str = 'action'):
+        """Time the enclosed block as one timeline entry."""
+        entry = {
+            'name': name,
+            'target': target,
+            'category': category,
+            'start_s': round(time.perf_counter() - self._t0, 4),
+            'duration_s': 0.0,
+            'outcome': 'ok',
+            '_child_s': 0.0
+        }
+        parent = _current_span.get()
+        token = _current_span.set(entry)
+        started = time.perf_counter()
+        try:
+            yield entry
+        except BaseException as e:
+            entry['outcome'] = 'cancelled' if isinstance(e, asyncio.CancelledError) else 'error'
+            entry['error'] = str(e)[:200]
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            _current_span.reset(token)
+            entry['duration_s'] = round(duration, 4)
+            entry['exclusive_s'] = round(max(0.0, duration - entry.pop('_child_s')), 4)
+            if parent is not None and '_child_s' in parent:
+                parent['_child_s'] += duration
+            self.entries.append(entry)
+
+    def record_stream_frame(self, duration: float):
+        """Account for one background stream frame capture."""
+        self.stream_frames += 1
+        self.stream_capture_s += duration
+
+    def breakdown(self) -> dict:
+        """Summarise where the run's wall-clock time went (seconds)."""
+        total = time.perf_counter() - self._t0
+        by_category = {c: 0.0 for c in CATEGORIES}
+        for entry in self.entries:
+            category = entry['category'] if entry['category'] in by_category else 'action'
+            by_category[category] += entry.get('exclusive_s', entry['duration_s'])
+
+        accounted = sum(by_category.values())
+        summary = {f'{c}_s': round(v, 3) for c, v in by_category.items()}
+        summary.update({
+            'total_s': round(total, 3),
+            'other_s': round(max(0.0, total - accounted), 3),
+            'action_count': sum(1 for e in self.entries if e['category'] == 'action'),
+            'failed_actions': sum(1 for e in self.entries if e['category'] == 'action' and e['outcome'] != 'ok'),
+            'stream_frames': self.stream_frames,
+            'stream_capture_s': round(self.stream_capture_s, 3)
+        })
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            'run_type': self.run_type,
+            'started_at': self.started_at,
+            'breakdown': self.breakdown(),
+            'entries': sorted(self.entries, key=lambda e: e['start_s'])
+        }
+
+    def save(self, artifact_dir: Path) -> Path:
+        """Write the timeline next to the run's other artifacts."""
+        path = Path(artifact_dir) / TIMELINE_FILENAME
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
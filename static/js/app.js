@@ -34,6 +34,19 @@ const removeImageBtn = document.getElementById('remove-image');
 
 let currentImage = null; // Store current image as base64
 
+// On-demand run diagnostics, enabled with ?profile=1 and/or ?trace=1 in the page URL
+const pageParams = new URLSearchParams(window.location.search);
+const runDiagnostics = {
+    profile: pageParams.get('profile') === '1',
+    trace: pageParams.get('trace') === '1'
+};
+// "Run All Tests" replays recorded network traffic with ?replay=1
+const batchNetwork = pageParams.get('replay') === '1' ? 'replay' : 'live';
+// "Run All Tests" only reruns what changed, failed or passed too long ago with ?incremental=1
+const batchIncremental = pageParams.get('incremental') === '1';
+// Runs block requests with an execution profile from ?execution_profile=lean (default: each test's own)
+const executionProfile = pageParams.get('execution_profile') || undefined;
+
 // Browser sidebar elements
 const toggleBrowserBtn = document.getElementById('toggle-browser');
 const closeBrowserSidebarBtn = document.getElementById('close-browser-sidebar');
@@ -124,7 +137,7 @@ socket.on('playwright_code', (data) => {
     renderTabs();
 });
 
-socket.on('log', (data) => {
+function handleLog(data) {
     // Simplify certain log messages for human view
     let humanMsg = data.message;
     if (data.message.includes('Initializing browser')) {
@@ -148,6 +161,13 @@ socket.on('log', (data) => {
         }
     }
     addLogEntry(data.type, data.message, humanMsg);
+}
+
+socket.on('log', handleLog);
+
+// Run logs arrive coalesced into batches (see log_batcher.py)
+socket.on('log_batch', (data) => {
+    (data.entries || []).forEach(handleLog);
 });
 
 socket.on('screenshot', (data) => {
@@ -189,19 +209,20 @@ socket.on('screenshot', (data) => {
 socket.on('agent_message', (data) => {
     // Display agent's reasoning and actions
     const content = data.content;
+    let entry;
 
     // Check for test status messages
     if (content.includes('TEST PASSED:')) {
         const statusMsg = content.match(/TEST PASSED:.*$/)?.[0] || content;
-        addLogEntry('success', `✅ ${content}`, `✅ ${statusMsg}`);
+        entry = addLogEntry('success', `✅ ${content}`, `✅ ${statusMsg}`);
         updateBrowserStatus('passed', 'PASSED');
     } else if (content.includes('TEST FAILED:')) {
         const statusMsg = content.match(/TEST FAILED:.*$/)?.[0] || content;
-        addLogEntry('error', `❌ ${content}`, `❌ ${statusMsg}`);
+        entry = addLogEntry('error', `❌ ${content}`, `❌ ${statusMsg}`);
         updateBrowserStatus('failed', 'FAILED');
     } else if (content.includes('TEST ERROR:')) {
         const statusMsg = content.match(/TEST ERROR:.*$/)?.[0] || content;
-        addLogEntry('error', `⚠️ ${content}`, `⚠️ ${statusMsg}`);
+        entry = addLogEntry('error', `⚠️ ${content}`, `⚠️ ${statusMsg}`);
         updateBrowserStatus('error', 'ERROR');
     } else {
         // Extract meaningful info for human-readable view
@@ -269,7 +290,12 @@ socket.on('agent_message', (data) => {
             }
         }
 
-        addLogEntry('agent_action', content, humanMsg);
+        entry = addLogEntry('agent_action', content, humanMsg);
+    }
+
+    // Oversized messages (e.g. get_html results) are truncated; fetch the rest on demand
+    if (data.truncated && entry) {
+        attachFullMessageLink(entry, data);
     }
 });
 
@@ -282,12 +308,23 @@ socket.on('test_complete', (data) => {
     } else if (data.status === 'stopped') {
         updateBrowserStatus('stopped', 'STOPPED');
         addLogEntry('error', '⏹ Test stopped by user', '⏹ Test stopped');
+    } else if (data.status === 'timeout') {
+        updateBrowserStatus('failed', 'TIMED OUT');
+        addLogEntry('error', `⏱ Test timed out: ${data.message || 'time limit exceeded'}`, '⏱ Test timed out');
     } else {
         updateBrowserStatus('failed', 'FAILED');
         const errorMsg = data.message || 'Unknown error';
         addLogEntry('error', `❌ Test failed: ${errorMsg}`, `❌ Test failed`);
     }
 
+    // Time breakdown from the run's per-action timeline
+    if (data.timing) {
+        const t = data.timing;
+        addLogEntry('info',
+            `⏱ ${t.total_s}s total: actions ${t.action_s}s (${t.action_count}), sleeps ${t.sleep_s}s, screenshots ${t.screenshot_s}s, LLM ${t.llm_s}s, other ${t.other_s}s`,
+            `⏱ Finished in ${t.total_s}s`);
+    }
+
     // Update saved test status if this was a saved test run
     if (currentRunningTestFilename) {
         fetch(`/api/saved-tests/${currentRunningTestFilename}/status`, {
@@ -324,11 +361,88 @@ socket.on('batch_test_progress', (data) => {
     }
 
     // Store result
-    batchRunResults.push({ filename, name, status });
+    batchRunResults.push({ filename, name, status, flaky: data.flaky, quarantined: data.quarantined, rows: data.rows });
 
     // Log progress
+    if (data.cached) {
+        addLogEntry('success', `♻️ ${name}: cached pass from ${data.last_run_time}`);
+        return;
+    }
     const emoji = status === 'success' ? '✅' : '❌';
-    addLogEntry(status === 'success' ? 'success' : 'error', `${emoji} ${name}: ${status}`);
+    let notes = '';
+    if (data.flaky) {
+        notes += ` (flaky: passed on attempt ${data.attempts})`;
+    } else if (data.retried) {
+        notes += ` (after ${data.attempts} attempts)`;
+    }
+    if (data.quarantined) notes += ' [quarantined]';
+    const level = status === 'success' ? 'success' : data.quarantined ? 'info' : 'error';
+    addLogEntry(level, `${emoji} ${name}: ${status}${notes}`);
+    // Data-driven tests report each row
+    (data.rows || []).forEach(row => {
+        const rowEmoji = row.status === 'success' ? '✅' : '❌';
+        const rowError = row.status !== 'success' && row.error ? ` - ${row.error.trim().split('\n')[0]}` : '';
+        addLogEntry(row.status === 'success' ? 'success' : level, `    ${rowEmoji} ${name} [${row.label}]: ${row.status}${rowError}`);
+    });
+});
+
+socket.on('run_diagnostics', (data) => {
+    if (data.cpu_profile) {
+        addLogEntry('info', `🔬 CPU profile (${data.cpu_samples} samples): /api/artifacts/${data.cpu_profile} (summary: /api/artifacts/${data.cpu_profile_summary})`, '🔬 CPU profile saved');
+    }
+    if (data.trace) {
+        addLogEntry('info', `🧵 Playwright trace: /api/artifacts/${data.trace}`, '🧵 Trace saved');
+        if (data.trace_timing) {
+            const tt = data.trace_timing;
+            addLogEntry('info', `🧵 ${tt.action_count} traced actions, ${tt.total_action_ms} ms total, ${tt.network_wait_ms} ms waiting on network`);
+        }
+    }
+});
+
+socket.on('load_test_progress', (data) => {
+    const p95 = data.p95_ms !== null ? `, p95 ${Math.round(data.p95_ms)} ms` : '';
+    addLogEntry('info', `📈 ${data.filename} @ ${data.t_s}s: ${data.users} users, ${data.iterations} iterations (${data.failed_iterations} failed), ${data.actions_per_s} actions/s${p95}`);
+});
+
+socket.on('load_test_complete', (data) => {
+    const it = data.iterations;
+    const level = data.status !== 'success' ? 'error' : (it.failed ? 'info' : 'success');
+    addLogEntry(level, `📈 Load test of ${data.name || data.filename} ${data.status}: ${it.total} iterations (${it.failed} failed, ${it.cancelled} cancelled), ${data.throughput.iterations_per_s}/s, error rate ${(data.error_rate * 100).toFixed(1)}% in ${data.elapsed_s}s`);
+    if (data.error) addLogEntry('error', data.error.split('\n')[0]);
+    (data.by_action || []).forEach(action => {
+        addLogEntry('info', `    ${action.action}: ${action.count}x, ${action.errors} errors, p50 ${action.p50_ms} ms, p95 ${action.p95_ms} ms, max ${action.max_ms} ms`);
+    });
+});
+
+socket.on('queue_position', (data) => {
+    if (data.position > 0) {
+        updateBrowserStatus('queued', `QUEUED #${data.position}`);
+        addLogEntry('info', `⏳ ${data.label || 'Run'} is queued at position ${data.position} of ${data.queued}`, `⏳ Waiting in queue (#${data.position})`);
+    } else {
+        updateBrowserStatus('running', 'RUNNING');
+        addLogEntry('info', `▶️ ${data.label || 'Run'} started after waiting ${data.wait_s}s in the queue`);
+    }
+});
+
+socket.on('run_rejected', (data) => {
+    if (data.kind === 'batch') {
+        isBatchRunning = false;
+        runningTestsSet.clear();
+        document.querySelectorAll('.file-item').forEach(item => {
+            item.classList.remove('batch-running', 'batch-running-active');
+            const spinner = item.querySelector('.test-loading-spinner');
+            if (spinner) spinner.remove();
+        });
+        const runAllBtn = document.getElementById('run-all-tests-btn');
+        if (runAllBtn) {
+            runAllBtn.disabled = false;
+            runAllBtn.style.opacity = '1';
+        }
+    } else {
+        isTestRunning = false;
+        currentRunningTestFilename = null;
+        updateBrowserStatus('stopped', 'BUSY');
+    }
 });
 
 socket.on('batch_run_complete', (data) => {
@@ -351,7 +465,12 @@ socket.on('batch_run_complete', (data) => {
     }
 
     // Log summary
-    addLogEntry('info', `📊 Batch complete: ${passed}/${total} passed in ${duration.toFixed(1)}s`);
+    const timedOut = data.timed_out ? `, ${data.timed_out} timed out` : '';
+    const stopped = data.stopped ? `, ${data.stopped} stopped` : '';
+    const cached = data.cached ? ` (${data.cached} cached)` : '';
+    const flaky = data.flaky ? `, ${data.flaky} flaky` : '';
+    const quarantined = data.quarantined ? `, ${data.quarantined} quarantined (${data.quarantine_failed} failed, not counted)` : '';
+    addLogEntry('info', `📊 Batch complete: ${passed}/${total} passed${cached}${flaky}${timedOut}${stopped}${quarantined} in ${duration.toFixed(1)}s`);
 
     // Reload file explorer
     if (hasFileExplorer) loadFileExplorer();
@@ -600,7 +719,7 @@ function saveCurrentTest() {
 
 // Refresh and load saved tests functions removed - file explorer handles this now
 
-function runSavedTest(filename, name) {
+function runSavedTest(filename, name, network = 'live') {
     if (isBatchRunning) {
         alert('Batch test execution in progress. Please wait for it to finish.');
         return;
@@ -618,7 +737,8 @@ function runSavedTest(filename, name) {
     humanLogContainer.innerHTML = '';
     technicalLogContainer.innerHTML = '';
 
-    addLogEntry('info', `🚀 Running: ${name} (no AI tokens used!)`, `🚀 Running: ${name}`);
+    const modeLabel = network === 'replay' ? ' (replaying recorded network)' : network === 'record' ? ' (refreshing recording)' : '';
+    addLogEntry('info', `🚀 Running: ${name}${modeLabel} (no AI tokens used!)`, `🚀 Running: ${name}${modeLabel}`);
     isTestRunning = true;
 
     // Update browser header with test name and status
@@ -651,7 +771,7 @@ function runSavedTest(filename, name) {
     // Automatically open output panel to show logs
     openOutputPanel();
 
-    socket.emit('run_saved_test', { filename });
+    socket.emit('run_saved_test', { filename, network, execution_profile: executionProfile, ...runDiagnostics });
 }
 
 async function runAllTests() {
@@ -710,7 +830,10 @@ async function runAllTests() {
 
     // Emit batch run event
     socket.emit('run_all_tests', {
-        filenames: tests.map(t => t.filename)
+        filenames: tests.map(t => t.filename),
+        network: batchNetwork,
+        execution_profile: executionProfile,
+        incremental: batchIncremental
     });
 }
 
@@ -1035,7 +1158,7 @@ async function fetchTestStatistics() {
         // Calculate statistics
         const totalTests = tests.length;
         const passedTests = tests.filter(t => t.last_run_status === 'success').length;
-        const failedTests = tests.filter(t => t.last_run_status === 'error' || t.last_run_status === 'stopped').length;
+        const failedTests = tests.filter(t => ['error', 'stopped', 'timeout'].includes(t.last_run_status)).length;
         const aiStepsCount = aiSteps.length;
 
         return {
@@ -1151,7 +1274,7 @@ function loadFileExplorer() {
                 let statusIcon = '';
                 if (test.last_run_status === 'success') {
                     statusIcon = '<span class="test-status test-status-success" title="Last run: Passed">✓</span>';
-                } else if (test.last_run_status === 'error' || test.last_run_status === 'stopped') {
+                } else if (['error', 'stopped', 'timeout'].includes(test.last_run_status)) {
                     statusIcon = '<span class="test-status test-status-error" title="Last run: Failed">✗</span>';
                 }
 
@@ -1161,13 +1284,46 @@ function loadFileExplorer() {
                     viewRecordingBtn = `<button class="file-item-action" data-action="view-recording" title="View Recording (${test.artifacts.length})">📹</button>`;
                 }
 
+                // Replay from the pinned (or latest) HAR once one was recorded
+                let replayBtn = '';
+                if (test.replay_recording || (test.artifacts || []).some(a => a.har_path)) {
+                    replayBtn = `<button class="file-item-action" data-action="replay" title="Replay recorded network traffic">⏪</button>`;
+                }
+
+                // Setup tests save the auth state their dependents start with
+                let authIcon = '';
+                if (test.setup) {
+                    const state = test.auth_state;
+                    const stateTitle = !state ? 'no state saved yet' : state.expired ? 'state expired' : `state valid until ${state.expires_at}`;
+                    authIcon = `<span class="test-status" title="Setup test: ${stateTitle}">🔑</span>`;
+                } else if (test.depends_on) {
+                    authIcon = `<span class="test-status" title="Starts with the auth state of ${escapeHtml(test.depends_on)}">🔗</span>`;
+                }
+
+                // Data-driven tests run once per data row in a batch
+                let dataIcon = '';
+                if (test.data_rows) {
+                    dataIcon = `<span class="test-status" title="Data-driven: ${test.data_rows} data row(s)">📋</span>`;
+                }
+
+                // Quarantined flaky tests run last in a batch and don't fail it
+                let flakyIcon = '';
+                if (test.quarantined) {
+                    flakyIcon = `<span class="test-status" title="Quarantined as flaky (score ${test.flakiness})">🧪</span>`;
+                }
+
                 const testDisplayName = getDisplayName(test.name, 'test');
                 fileItem.innerHTML = `
                     <span class="file-item-icon">${sourceIcon}</span>
                     <span class="file-item-name">${escapeHtml(testDisplayName)}</span>
+                    ${authIcon}
+                    ${dataIcon}
+                    ${flakyIcon}
                     ${statusIcon}
                     <div class="file-item-actions">
                         ${viewRecordingBtn}
+                        ${replayBtn}
+                        <button class="file-item-action" data-action="refresh-recording" title="Refresh recording (run live and re-capture the HAR replays use)">⏺</button>
                         <button class="file-item-action" data-action="run" title="Run Test">▶</button>
                         <button class="file-item-action" data-action="delete" title="Delete">🗑</button>
                     </div>
@@ -1181,6 +1337,12 @@ function loadFileExplorer() {
                     } else if (action === 'run') {
                         e.stopPropagation();
                         runSavedTest(test.filename, test.name);
+                    } else if (action === 'replay') {
+                        e.stopPropagation();
+                        runSavedTest(test.filename, test.name, 'replay');
+                    } else if (action === 'refresh-recording') {
+                        e.stopPropagation();
+                        runSavedTest(test.filename, test.name, 'record');
                     } else if (action === 'view-recording') {
                         e.stopPropagation();
                         showVideoViewerModal(test.filename, test.name);
@@ -1315,6 +1477,18 @@ if (runAllTestsBtn) {
     });
 }
 
+// Stop Buttons: stop every run this client started (queued runs are dropped from the queue)
+['stop-run-btn', 'stop-tests-btn'].forEach(id => {
+    const btn = document.getElementById(id);
+    if (btn) {
+        btn.addEventListener('click', (e) => {
+            e.stopPropagation();
+            if (!isTestRunning && !isBatchRunning) return;
+            socket.emit('stop_test', {});
+        });
+    }
+});
+
 // Dashboard Button
 const dashboardBtn = document.getElementById('dashboard-btn');
 const dashboardView = document.getElementById('dashboard-view');
@@ -1402,7 +1576,7 @@ async function loadDashboardStats() {
         // Calculate statistics
         const totalTests = tests.length;
         const passedTests = tests.filter(t => t.last_run_status === 'success').length;
-        const failedTests = tests.filter(t => t.last_run_status === 'error').length;
+        const failedTests = tests.filter(t => t.last_run_status === 'error' || t.last_run_status === 'timeout').length;
         const totalAiSteps = aiSteps.length;
 
         // Update dashboard stats
@@ -1641,7 +1815,7 @@ function runAiStep(filename, name) {
     openOutputPanel();
 
     // Emit run AI step event
-    socket.emit('run_ai_step', { filename });
+    socket.emit('run_ai_step', { filename, execution_profile: executionProfile, ...runDiagnostics });
 
     addLogEntry('info', `🤖 Running AI steps: ${name}`);
 }
@@ -1691,8 +1865,19 @@ function showTestResultsModal(total, passed, failed, duration) {
         resultItem.className = 'result-item';
 
         const icon = result.status === 'success' ? '✅' : '❌';
-        const statusClass = result.status === 'success' ? 'passed' : 'failed';
-        const statusText = result.status === 'success' ? 'Passed' : 'Failed';
+        let statusClass = result.status === 'success' ? 'passed' : 'failed';
+        let statusText = result.status === 'success' ? 'Passed' : 'Failed';
+        if (result.quarantined) {
+            statusClass = 'flaky';
+            statusText = `Quarantined (${statusText})`;
+        } else if (result.flaky) {
+            statusClass = 'flaky';
+            statusText = 'Flaky (passed on retry)';
+        }
+        if (result.rows) {
+            const rowsPassed = result.rows.filter(row => row.status === 'success').length;
+            statusText += ` (${rowsPassed}/${result.rows.length} rows)`;
+        }
 
         resultItem.innerHTML = `
             <span class="result-icon">${icon}</span>
@@ -1772,6 +1957,52 @@ function showVideoViewerModal(filename, testName) {
                 timestampElem.textContent = `Recorded: ${latestArtifact.timestamp.replace('_', ' at ').replace(/-/g, '/')}`;
                 sizeElem.textContent = `Size: ${latestArtifact.video_size_mb} MB | Status: ${latestArtifact.status}`;
 
+                // Append network summary (precomputed server-side, no HAR download)
+                if (latestArtifact.has_network_summary) {
+                    fetch(`/api/saved-tests/${filename}/artifacts/${latestArtifact.timestamp}/network-summary`)
+                        .then(res => res.json())
+                        .then(summary => {
+                            if (summary.error) return;
+                            const mb = (summary.total_bytes / (1024 * 1024)).toFixed(2);
+                            sizeElem.textContent += ` | Network: ${summary.request_count} requests, ${mb} MB, ${summary.failed_request_count} failed, p95 ${summary.timing_ms.p95} ms`;
+                        })
+                        .catch(err => console.error('Error loading network summary:', err));
+                }
+
+                // Append trace-derived step timings (slowest action and time waiting on network)
+                if (latestArtifact.trace_timing) {
+                    const tt = latestArtifact.trace_timing;
+                    const slowest = tt.slowest_actions && tt.slowest_actions[0];
+                    sizeElem.textContent += ` | Trace: ${tt.action_count} actions, ${tt.total_action_ms} ms (${tt.network_wait_ms} ms on network)`;
+                    if (slowest) {
+                        sizeElem.textContent += `, slowest ${slowest.name} ${slowest.duration_ms} ms`;
+                    }
+                }
+
+                // Append what the run's execution profile blocked
+                if (latestArtifact.blocked && latestArtifact.blocked.blocked_requests) {
+                    const blocked = latestArtifact.blocked;
+                    const saved = blocked.bytes_saved ? `, ~${(blocked.bytes_saved / (1024 * 1024)).toFixed(2)} MB saved` : '';
+                    sizeElem.textContent += ` | Blocked (${latestArtifact.execution_profile}): ${blocked.blocked_requests} requests${saved}`;
+                }
+
+                // Append the run's visual checkpoints (data rows have their own)
+                const visualResults = (latestArtifact.visual || []).concat(...(latestArtifact.rows || []).map(row => row.visual || []));
+                if (visualResults.length) {
+                    const differing = visualResults.filter(r => r.status === 'failed').length;
+                    const created = visualResults.filter(r => r.status === 'new').length;
+                    sizeElem.textContent += ` | Visual: ${visualResults.length} checkpoints, ${differing} differ${created ? `, ${created} new baselines` : ''}`;
+                }
+
+                // Append the slowest LCP of the run's navigations and any budgets they exceeded
+                const navigations = latestArtifact.page_metrics || [];
+                if (navigations.length) {
+                    const lcps = navigations.map(n => n.lcp_ms).filter(lcp => lcp !== null && lcp !== undefined);
+                    const overBudget = navigations.filter(n => (n.over_budget || []).length).length;
+                    const slowest = lcps.length ? `, slowest LCP ${(Math.max(...lcps) / 1000).toFixed(2)}s` : '';
+                    sizeElem.textContent += ` | Performance: ${navigations.length} navigations${slowest}${overBudget ? `, ${overBudget} over budget` : ''}`;
+                }
+
                 // Setup download button
                 downloadBtn.onclick = () => {
                     const a = document.createElement('a');
@@ -2052,6 +2283,30 @@ function addLogEntry(type, message, humanMessage = null) {
     `;
     humanLogContainer.appendChild(humanEntry);
     humanLogContainer.scrollTop = humanLogContainer.scrollHeight;
+
+    return technicalEntry;
+}
+
+function attachFullMessageLink(entry, data) {
+    const link = document.createElement('a');
+    link.href = '#';
+    link.className = 'log-show-full';
+    link.textContent = ` Show full message (${data.full_length} chars)`;
+    link.onclick = (e) => {
+        e.preventDefault();
+        fetch(`/api/agent-messages/${data.message_id}`)
+            .then(res => res.json())
+            .then(result => {
+                if (result.error) {
+                    link.textContent = ` ${result.error}`;
+                    return;
+                }
+                entry.querySelector('.message').textContent = result.content;
+                link.remove();
+            })
+            .catch(err => console.error('Error loading full message:', err));
+    };
+    entry.appendChild(link);
 }
 
 function simplifyMessage(message) {
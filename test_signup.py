@@ -76,7 +76,7 @@ async def main():
         # Create OpenAI model client
         model_client = OpenAIChatCompletionClient(
             model=config.MODEL_NAME,
-            api_key=config.OPENAI_API_KEY
+            api_key=config.require_openai_api_key()
         )
 
         # Create agent with browser tools
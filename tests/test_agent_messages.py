@@ -0,0 +1,27 @@
+"""Tests for agent message truncation and the store of full messages."""
+
+import pytest
+
+import config
+import web_ui
+
+
+def test_long_messages_keep_their_head_and_tail(monkeypatch):
+    monkeypatch.setattr(config, 'AGENT_MESSAGE_MAX_CHARS', 8)
+    content = 'abcdefghijTEST PASSED'
+    payload = web_ui.truncate_agent_message(content)
+    assert payload['content'] == 'abcdef\n… [13 characters truncated] …\nED'
+    assert (payload['truncated'], payload['full_length']) == (True, len(content))
+    assert web_ui.agent_messages.get(payload['message_id']) == content
+    assert web_ui.truncate_agent_message('short') == {'content': 'short'}
+
+
+@pytest.mark.parametrize('limit', [0, -1])
+def test_a_limit_of_zero_disables_truncation(monkeypatch, limit):
+    monkeypatch.setattr(config, 'AGENT_MESSAGE_MAX_CHARS', limit)
+    assert web_ui.truncate_agent_message('x' * 10000) == {'content': 'x' * 10000}
+
+
+def test_a_limit_too_small_for_a_tail_keeps_only_the_head(monkeypatch):
+    monkeypatch.setattr(config, 'AGENT_MESSAGE_MAX_CHARS', 3)
+    assert web_ui.truncate_agent_message('abcdefgh')['content'] == 'ab\n… [6 characters truncated] …\n'
@@ -0,0 +1,120 @@
+"""Tests for the batch engine shared by the threading and ASGI servers (runners are faked, no browser needed)."""
+
+import asyncio
+import json
+
+import pytest
+
+import asgi_server
+import config
+import web_ui
+
+
+@pytest.fixture
+def suite(tmp_path, monkeypatch):
+    saved, ai_steps = tmp_path / 'saved_tests', tmp_path / 'ai_steps'
+    (saved / 'data').mkdir(parents=True)
+    ai_steps.mkdir()
+    monkeypatch.setattr(web_ui, 'SAVED_TESTS_DIR', saved)
+    monkeypatch.setattr(web_ui, 'DATA_DIR', saved / 'data')
+    monkeypatch.setattr(web_ui, 'AI_STEPS_DIR', ai_steps)
+    monkeypatch.setattr(config, 'BATCH_RETRIES', 0)
+    for name, extra in (('pass', {}), ('fail', {}), ('flaky', {'retries': 1}), ('quarantined', {'quarantined': True})):
+        (saved / f'{name}.json').write_text(json.dumps(dict({'name': name, 'code': name}, **extra)), encoding='utf-8')
+    (ai_steps / 'search.json').write_text(json.dumps({'name': 'search', 'steps': ['Search']}), encoding='utf-8')
+    return saved
+
+
+def outcome(code, attempts):
+    """What a fake attempt of a saved test returns."""
+    attempts.append(code)
+    if code == 'fail' or (code == 'flaky' and attempts.count('flaky') == 1) or code == 'quarantined':
+        return 'error', f'{code} failed'
+    return 'success', None
+
+
+def check_batch(suite, summary, reported, attempts, ai_runs):
+    assert [event for event, _ in reported] == ['batch_test_progress'] * 5 + ['batch_run_complete']
+    assert reported[-1][1] == summary
+    # Quarantined tests run after the rest of the batch
+    assert reported[4][1]['filename'] == 'quarantined.json'
+    results = {data['filename']: data for event, data in reported[:-1]}
+    assert results['flaky.json']['status'] == 'success'
+    assert (results['flaky.json']['attempts'], results['flaky.json']['flaky']) == (2, True)
+    assert results['search.json']['kind'] == 'ai'
+    assert ai_runs == ['search.json']
+    assert sorted(attempts) == ['fail', 'flaky', 'flaky', 'pass', 'quarantined']
+    assert {key: summary[key] for key in ('total', 'passed', 'failed', 'flaky', 'quarantined',
+                                          'quarantine_failed')} == {
+        'total': 5, 'passed': 3, 'failed': 1, 'flaky': 1, 'quarantined': 1, 'quarantine_failed': 1
+    }
+    assert json.loads((suite / 'fail.json').read_text())['last_run_status'] == 'error'
+    assert web_ui.runs.snapshot() == []
+
+
+def test_threaded_batches_run_tests_on_worker_threads(suite, monkeypatch):
+    attempts, ai_runs, reported = [], [], []
+    monkeypatch.setattr(web_ui, 'run_playwright_code_headless',
+                        lambda code, filename, timeout_s, run_options, row_results: outcome(code, attempts))
+    monkeypatch.setattr(web_ui, 'run_ai_step_headless',
+                        lambda step_data, filename, *args: ai_runs.append(filename) or ('success', None))
+    summary = web_ui.run_all_tests_parallel(['pass.json', 'fail.json', 'flaky.json', 'quarantined.json'], 2,
+                                            report=lambda *event: reported.append(event),
+                                            ai_step_filenames=['search.json'])
+    check_batch(suite, summary, reported, attempts, ai_runs)
+
+
+def test_asgi_batches_run_tests_as_tasks_on_the_server_loop(suite, monkeypatch):
+    attempts, ai_runs, reported = [], [], []
+
+    async def run_saved(code, filename, timeout_s, run_options, row_results):
+        return outcome(code, attempts)
+
+    async def run_ai_step(step_data, filename, timeout_s, run_options):
+        ai_runs.append(filename)
+        return 'success', None
+
+    monkeypatch.setattr(web_ui, 'run_playwright_code_headless_async', run_saved)
+    monkeypatch.setattr(web_ui, 'run_ai_step_headless_async', run_ai_step)
+    summary = asyncio.run(asgi_server.run_all_tests(['pass.json', 'fail.json', 'flaky.json', 'quarantined.json'], 2,
+                                                    report=lambda *event: reported.append(event),
+                                                    ai_step_filenames=['search.json']))
+    check_batch(suite, summary, reported, attempts, ai_runs)
+
+
+def test_missing_tests_and_incremental_passes_are_reported_without_running(suite, monkeypatch):
+    monkeypatch.setattr(web_ui, 'run_playwright_code_headless', lambda *args: ('success', None))
+    reported = []
+    web_ui.run_all_tests_parallel(['pass.json'], report=lambda *event: None)
+    summary = web_ui.run_all_tests_parallel(['pass.json', 'missing.json'], report=lambda *event: reported.append(event),
+                                            run_options={'incremental': True})
+    results = {data['filename']: data for event, data in reported[:-1]}
+    assert results['pass.json']['cached'] is True
+    assert results['missing.json']['error'] == 'Test file not found'
+    assert (summary['cached'], summary['failed']) == (1, 1)
+
+
+@pytest.mark.parametrize('retries', [-1, 6, 1.5, '2.5', 'two', True, [1], {}])
+def test_malformed_or_excessive_batch_retries_are_rejected(retries, monkeypatch):
+    monkeypatch.setattr(config, 'BATCH_MAX_RETRIES', 5)
+    with pytest.raises(web_ui.RunRequestError, match='retries must be an integer from 0 to 5'):
+        web_ui.parse_batch_options({'retries': retries})
+
+
+def test_retries_come_from_the_batch_then_the_test_then_the_default(monkeypatch):
+    monkeypatch.setattr(config, 'BATCH_RETRIES', 2)
+    assert web_ui.parse_batch_options({'retries': '3'})['retries'] == 3
+    assert web_ui.batch_retries({'retries': 4}, web_ui.parse_batch_options({'retries': 0})) == 0
+    assert web_ui.batch_retries({'retries': 4}, {}) == 4
+    assert web_ui.batch_retries({}, {}) == 2
+
+
+def test_a_test_with_malformed_retries_fails_with_a_clear_error(suite, monkeypatch):
+    monkeypatch.setattr(config, 'BATCH_MAX_RETRIES', 5)
+    (suite / 'pass.json').write_text(json.dumps({'name': 'pass', 'code': 'pass', 'retries': 'many'}))
+    monkeypatch.setattr(web_ui, 'run_playwright_code_headless', lambda *args: ('success', None))
+    reported = []
+    web_ui.run_all_tests_parallel(['pass.json'], report=lambda *event: reported.append(event))
+    result = reported[0][1]
+    assert result['status'] == 'error'
+    assert result['error'] == 'The test\'s "retries" must be an integer from 0 to 5, got \'many\''
@@ -0,0 +1,193 @@
+"""Tests for data_driven: loading data rows and running them concurrently."""
+
+import asyncio
+
+import pytest
+
+from data_driven import DataError, SharedBrowsers, failed_rows_message, load_rows, row_params, run_rows
+
+
+def test_a_test_without_data_is_not_data_driven(tmp_path):
+    assert load_rows({}, tmp_path) == []
+
+
+def test_params_alone_run_once_with_the_defaults(tmp_path):
+    assert load_rows({'params': {'plan': 'free'}}, tmp_path) == [{'plan': 'free'}]
+
+
+def test_inline_rows_override_the_defaults(tmp_path):
+    rows = load_rows({'params': {'plan': 'free', 'country': 'US'},
+                      'data': [{'plan': 'pro'}, {'country': 'DE', '_label': 'germany'}]}, tmp_path)
+    assert rows == [{'plan': 'pro', 'country': 'US'}, {'plan': 'free', 'country': 'DE', '_label': 'germany'}]
+
+
+def test_csv_rows_are_read_from_the_data_directory_only(tmp_path):
+    (tmp_path / 'users.csv').write_text('email,name\na@example.com,A\nb@example.com,B\n', encoding='utf-8')
+    rows = load_rows({'params': {'plan': 'free'}, 'data_file': '../elsewhere/users.csv'}, tmp_path)
+    assert rows == [{'plan': 'free', 'email': 'a@example.com', 'name': 'A'},
+                    {'plan': 'free', 'email': 'b@example.com', 'name': 'B'}]
+
+
+@pytest.mark.parametrize('settings, message', [
+    ({'params': ['a']}, '"params" must be an object'),
+    ({'data': [{'a': 1}], 'data_file': 'x.csv'}, 'not both'),
+    ({'data': {'a': 1}}, '"data" must be a list of objects'),
+    ({'data': ['a']}, '"data" must be a list of objects'),
+    ({'data': []}, 'has no rows'),
+    ({'data_file': 'missing.csv'}, 'missing.csv not found'),
+])
+def test_malformed_data_is_rejected(tmp_path, settings, message):
+    with pytest.raises(DataError, match=message):
+        load_rows(settings, tmp_path)
+
+
+def test_row_params_fill_one_random_string_per_row_and_drop_the_label():
+    params = row_params({'email': 'test+{random}@example.com', 'user': 'u_{random}', 'age': 30, '_label': 'x'})
+    token = params['email'][len('test+'):-len('@example.com')]
+    assert len(token) == 10
+    assert params == {'email': f'test+{token}@example.com', 'user': f'u_{token}', 'age': 30}
+    assert row_params({'email': '{random}'})['email'] != token
+
+
+def test_run_rows_records_every_row_in_order_within_the_concurrency():
+    running = []
+    peak = []
+
+    async def run_row(index, params):
+        running.append(index)
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(index)
+        if params['fail']:
+            raise RuntimeError(f'row {index} failed')
+
+    rows = [{'fail': False}, {'fail': True, '_label': 'broken'}, {'fail': False}, {'fail': False}]
+    results = []
+    asyncio.run(run_rows(rows, run_row, concurrency=2, results=results))
+    assert max(peak) == 2
+    assert [result['status'] for result in results] == ['success', 'error', 'success', 'success']
+    assert [result['label'] for result in results] == ['row 1', 'broken', 'row 3', 'row 4']
+    assert results[1]['error'].startswith('row 1 failed')
+    assert results[1]['params'] == {'fail': True}
+    assert all(result['duration_s'] is not None for result in results)
+    assert failed_rows_message(results) == '1 of 4 data rows failed:\n  broken: row 1 failed'
+
+
+def test_rows_cut_short_keep_no_status():
+    async def run_row(index, params):
+        await asyncio.sleep(10 if index else 0)
+
+    async def main():
+        results = []
+        task = asyncio.ensure_future(run_rows([{}, {}], run_row, concurrency=2, results=results))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return results
+
+    results = asyncio.run(main())
+    assert [result['status'] for result in results] == ['success', None]
+    assert failed_rows_message(results) == '1 of 2 data rows failed:\n  row 2: not run'
+
+
+def test_no_message_when_every_row_passed():
+    assert failed_rows_message([{'label': 'row 1', 'status': 'success', 'error': None}]) is None
+
+
+class FakeVideo:
+    def __init__(self, context):
+        self.context = context
+
+    async def path(self):
+        assert self.context.closed, 'a video is only written once its context is closed'
+        return f"{self.context.options['record_video_dir']}/{id(self.context)}.webm"
+
+
+class FakePage:
+    def __init__(self, context):
+        self.video = FakeVideo(context) if context.options.get('record_video_dir') else None
+
+    async def close(self):
+        pass
+
+
+class FakeContext:
+    def __init__(self, options):
+        self.options = options
+        self.closed = False
+        self.listeners = []
+
+    def on(self, event, listener):
+        self.listeners.append(listener)
+
+    async def new_page(self):
+        page = FakePage(self)
+        for listener in self.listeners:
+            listener(page)
+        return page
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+
+    async def new_context(self, **options):
+        return FakeContext(options)
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeDriver:
+    def __init__(self):
+        self.browsers = []
+
+    @property
+    def chromium(self):
+        return self
+
+    async def launch(self, **kwargs):
+        self.browsers.append(FakeBrowser())
+        return self.browsers[-1]
+
+
+class FakeManager:
+    def __init__(self, driver):
+        self.driver = driver
+
+    async def __aenter__(self):
+        return self.driver
+
+    async def __aexit__(self, *args):
+        pass
+
+
+def test_shared_browsers_list_each_rows_videos_once_its_contexts_close():
+    driver = FakeDriver()
+    shared = SharedBrowsers(lambda: FakeManager(driver))
+    videos = {'a': [], 'b': []}
+
+    async def run_row(row):
+        playwright = await shared.for_row({'record_video_dir': row}, video_paths=videos[row])().start()
+        browser = await playwright.chromium.launch()
+        page = await browser.new_page()
+        await page.close()  # Closed pages still have their video listed
+        if row == 'a':
+            await browser.close()
+        else:
+            context = await browser.new_context()
+            await context.new_page()  # Left open, like the browser: the shared close finalises both
+
+    async def main():
+        await run_row('a')
+        assert len(videos['a']) == 1 and videos['b'] == []
+        await run_row('b')
+        await shared.close()
+
+    asyncio.run(main())
+    assert [path.split('/')[0] for path in videos['a']] == ['a']
+    assert len(set(videos['b'])) == 2 and all(path.startswith('b/') for path in videos['b'])
+    assert len(driver.browsers) == 1 and driver.browsers[0].closed
@@ -0,0 +1,120 @@
+"""Tests for execution_profiles: network conditions, profile validation and device throttling."""
+
+import asyncio
+
+import pytest
+
+from execution_profiles import (BUILTIN_PROFILES, DeviceThrottler, ProfileError, network_conditions, resolve_profile,
+                                validate_profile)
+
+
+def test_presets_expand_to_full_network_conditions():
+    assert network_conditions('slow-4g') == {
+        'latency_ms': 563, 'download_kbps': 1440, 'upload_kbps': 675, 'offline': False
+    }
+    assert network_conditions('offline') == {
+        'latency_ms': 0, 'download_kbps': None, 'upload_kbps': None, 'offline': True
+    }
+    assert network_conditions(None) is None
+
+
+def test_custom_conditions_leave_missing_throughputs_unlimited():
+    assert network_conditions({'latency_ms': 150, 'download_kbps': 0.5}) == {
+        'latency_ms': 150, 'download_kbps': 0.5, 'upload_kbps': None, 'offline': False
+    }
+
+
+@pytest.mark.parametrize('spec, message', [
+    ('3g', "Unknown network preset '3g'"),
+    (['slow-3g'], 'preset name or an object'),
+    ({'latency': 100}, "Unknown network condition 'latency'"),
+    ({'latency_ms': -1}, "'latency_ms' must be a non-negative number"),
+    ({'download_kbps': '400'}, "'download_kbps' must be a non-negative number"),
+    ({'upload_kbps': True}, "'upload_kbps' must be a non-negative number"),
+    ({'offline': 'yes'}, "'offline' must be true or false"),
+])
+def test_malformed_network_conditions_are_rejected(spec, message):
+    with pytest.raises(ProfileError, match=message):
+        network_conditions(spec)
+
+
+@pytest.mark.parametrize('profile, message', [
+    ({'cpu_throttling_rate': 0.5}, "'cpu_throttling_rate' must be a number of at least 1"),
+    ({'cpu_throttling_rate': True}, "'cpu_throttling_rate'"),
+    ({'block_domains': 'ads.example.com'}, "'block_domains' must be a list of strings"),
+    ({'network': 'dial-up'}, "Unknown network preset 'dial-up'"),
+])
+def test_malformed_profiles_are_rejected(profile, message):
+    with pytest.raises(ProfileError, match=message):
+        resolve_profile(profile, BUILTIN_PROFILES)
+
+
+def test_builtin_profiles_are_valid():
+    for profile in BUILTIN_PROFILES.values():
+        assert validate_profile(profile) is profile
+
+
+@pytest.mark.parametrize('profile, description', [
+    ({}, ''),
+    ({'cpu_throttling_rate': 4, 'network': 'slow-4g'}, '4x CPU slowdown, 563 ms latency, 1440/675 kbit/s'),
+    ({'cpu_throttling_rate': 1.5, 'network': 'offline'}, '1.5x CPU slowdown, offline'),
+    ({'network': {'latency_ms': 100}}, '100 ms latency'),
+    ({'network': {'upload_kbps': 256}}, '0 ms latency, unlimited/256 kbit/s'),
+])
+def test_throttlers_describe_the_emulated_device(profile, description):
+    throttler = DeviceThrottler('custom', profile)
+    assert throttler.describe() == description
+    assert throttler.active == bool(profile)
+
+
+class FakeSession:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, method, params=None):
+        self.sent.append((method, params))
+
+
+class FakeContext:
+    def __init__(self, cdp=True):
+        self.cdp = cdp
+        self.sessions = []
+
+    async def new_cdp_session(self, page):
+        if not self.cdp:
+            raise RuntimeError('CDP session is only available in Chromium\nCall log: ...')
+        self.sessions.append(FakeSession())
+        return self.sessions[-1]
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+
+def test_pages_are_throttled_once_over_cdp():
+    throttler = DeviceThrottler('mid-range-mobile', BUILTIN_PROFILES['mid-range-mobile'])
+    context = FakeContext()
+    page = FakePage(context)
+
+    async def main():
+        await asyncio.gather(throttler.throttle(page), throttler.throttle(page))
+
+    asyncio.run(main())
+    [session] = context.sessions
+    assert session.sent == [
+        ('Emulation.setCPUThrottlingRate', {'rate': 4}),
+        ('Network.enable', None),
+        ('Network.emulateNetworkConditions', {
+            'offline': False, 'latency': 563, 'downloadThroughput': 180000.0, 'uploadThroughput': 84375.0
+        }),
+    ]
+    assert throttler.summary()['throttled_pages'] == 1
+
+
+def test_browsers_without_cdp_are_reported_not_failed():
+    throttler = DeviceThrottler('custom', {'cpu_throttling_rate': 2, 'network': {'latency_ms': 50}})
+    asyncio.run(throttler.throttle(FakePage(FakeContext(cdp=False))))
+    summary = throttler.summary()
+    assert (summary['throttled_pages'], summary['unsupported']) == (0, 'CDP session is only available in Chromium')
+    assert summary['network']['download_kbps'] is None
@@ -0,0 +1,71 @@
+"""Tests for flaky_tests: run outcomes, flakiness scores and quarantine."""
+
+import pytest
+
+from flaky_tests import flakiness_score, record_run, run_outcome
+
+
+def history(*outcomes):
+    return [{'outcome': outcome} for outcome in outcomes]
+
+
+@pytest.mark.parametrize('attempts, outcome', [
+    (['success'], 'pass'),
+    (['error'], 'fail'),
+    (['error', 'timeout'], 'fail'),
+    (['error', 'success'], 'flaky'),
+])
+def test_run_outcome(attempts, outcome):
+    assert run_outcome(attempts) == outcome
+
+
+def test_no_history_is_stable():
+    assert flakiness_score([]) == 0.0
+
+
+def test_stable_and_consistently_failing_tests_score_zero():
+    assert flakiness_score(history('pass', 'pass', 'pass')) == 0.0
+    assert flakiness_score(history('fail', 'fail', 'fail')) == 0.0
+
+
+def test_a_single_break_scores_low():
+    # One flip over five runs
+    assert flakiness_score(history('pass', 'pass', 'fail', 'fail', 'fail')) == 0.2
+
+
+def test_alternating_runs_score_high():
+    assert flakiness_score(history('pass', 'fail', 'pass', 'fail')) == 0.75
+
+
+def test_flaky_runs_count_as_passes_for_flips():
+    # Two flaky runs and no pass/fail flips
+    assert flakiness_score(history('pass', 'flaky', 'flaky', 'pass')) == 0.5
+
+
+def test_score_is_capped_at_one():
+    assert flakiness_score(history('flaky', 'fail', 'flaky', 'fail')) == 1.0
+
+
+def test_record_run_appends_and_trims_the_history():
+    test_data = {'run_history': history('pass', 'pass')}
+    entry = record_run(test_data, ['error', 'success'], history_size=2, threshold=0.5, min_runs=5)
+    assert entry['outcome'] == 'flaky' and entry['attempts'] == 2
+    assert [run['outcome'] for run in test_data['run_history']] == ['pass', 'flaky']
+    assert test_data['flakiness'] == 0.5
+    assert test_data['quarantined'] is False  # Too few runs
+
+
+def test_record_run_quarantines_a_flaky_test_after_enough_runs():
+    test_data = {}
+    for attempts in (['success'], ['error'], ['success'], ['error']):
+        record_run(test_data, attempts, history_size=10, threshold=0.5, min_runs=4)
+    assert test_data['flakiness'] == 0.75
+    assert test_data['quarantined'] is True
+
+
+def test_record_run_releases_a_test_that_settles_down():
+    test_data = {'run_history': history('pass', 'fail', 'pass', 'fail'), 'quarantined': True}
+    for _ in range(6):
+        record_run(test_data, ['success'], history_size=6, threshold=0.3, min_runs=4)
+    assert test_data['flakiness'] == 0.0
+    assert test_data['quarantined'] is False
@@ -0,0 +1,100 @@
+"""Tests for har_tools: network summaries and gzip storage of HARs."""
+
+import json
+
+from har_tools import (FAILED_REQUESTS_LIMIT, NETWORK_SUMMARY_FILENAME, compress_har, finalize_har, load_har,
+                       response_sizes, summarize_har)
+
+
+def entry(url, time_ms, status=200, mime='text/html', size=100, failure=None, method='GET'):
+    response = {'status': status, 'content': {'mimeType': mime, 'size': size}}
+    if failure:
+        response['_failureText'] = failure
+    return {'request': {'url': url, 'method': method}, 'response': response, 'time': time_ms}
+
+
+def har(*entries):
+    return {'log': {'entries': list(entries)}}
+
+
+def test_summary_of_empty_har():
+    summary = summarize_har(har())
+    assert summary['request_count'] == 0
+    assert summary['total_bytes'] == 0
+    assert summary['timing_ms'] == {'p50': 0.0, 'p90': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+
+def test_timing_percentiles_are_nearest_rank():
+    summary = summarize_har(har(*(entry(f'https://example.com/{i}', i) for i in range(1, 101))))
+    assert summary['timing_ms'] == {'p50': 50.0, 'p90': 90.0, 'p95': 95.0, 'p99': 99.0, 'max': 100.0}
+    assert [r['time_ms'] for r in summary['slowest_requests']][:3] == [100.0, 99.0, 98.0]
+    assert len(summary['slowest_requests']) == 10
+
+
+def test_bytes_by_content_type_ignore_parameters_and_prefer_transfer_size():
+    image = entry('https://example.com/a.png', 5, mime='image/png', size=1000)
+    image['response']['_transferSize'] = 800
+    summary = summarize_har(har(entry('https://example.com/', 10, mime='text/html; charset=utf-8', size=300), image))
+    assert summary['total_bytes'] == 1100
+    assert summary['bytes_by_content_type'] == {'image/png': 800, 'text/html': 300}
+    assert list(summary['bytes_by_content_type']) == ['image/png', 'text/html']
+    assert summary['requests_by_content_type'] == {'text/html': 1, 'image/png': 1}
+
+
+def test_failed_requests_are_http_errors_aborts_and_failure_texts():
+    summary = summarize_har(har(
+        entry('https://example.com/ok', 1),
+        entry('https://example.com/missing', 1, status=404),
+        entry('https://example.com/aborted', 1, status=0),
+        entry('https://example.com/blocked', 1, status=200, failure='net::ERR_BLOCKED_BY_CLIENT', method='POST')
+    ))
+    assert summary['failed_request_count'] == 3
+    assert summary['failed_requests'] == [
+        {'url': 'https://example.com/missing', 'method': 'GET', 'status': 404, 'error': None},
+        {'url': 'https://example.com/aborted', 'method': 'GET', 'status': 0, 'error': None},
+        {'url': 'https://example.com/blocked', 'method': 'POST', 'status': 200, 'error': 'net::ERR_BLOCKED_BY_CLIENT'}
+    ]
+
+
+def test_failed_requests_are_capped_but_counted():
+    summary = summarize_har(har(*(entry(f'https://example.com/{i}', 1, status=500)
+                                  for i in range(FAILED_REQUESTS_LIMIT + 5))))
+    assert summary['failed_request_count'] == FAILED_REQUESTS_LIMIT + 5
+    assert len(summary['failed_requests']) == FAILED_REQUESTS_LIMIT
+
+
+def test_response_sizes_keep_the_largest_size_per_url():
+    sizes = response_sizes(har(entry('https://example.com/a', 1, size=10), entry('https://example.com/a', 1, size=30),
+                               entry('https://example.com/empty', 1, size=0)))
+    assert sizes == {'https://example.com/a': 30}
+
+
+def test_compress_har_round_trips(tmp_path):
+    document = har(entry('https://example.com/', 12.5))
+    har_path = tmp_path / 'network.har'
+    har_path.write_text(json.dumps(document))
+    gz_path = compress_har(har_path)
+    assert gz_path.name == 'network.har.gz'
+    assert not har_path.exists()
+    assert load_har(gz_path) == document
+
+
+def test_finalize_har_writes_the_summary_and_compresses(tmp_path):
+    har_path = tmp_path / 'network.har'
+    har_path.write_text(json.dumps(har(entry('https://example.com/', 7))))
+    final_path, summary_path = finalize_har(tmp_path, har_path)
+    assert final_path == tmp_path / 'network.har.gz'
+    assert summary_path == tmp_path / NETWORK_SUMMARY_FILENAME
+    assert json.loads(summary_path.read_text())['request_count'] == 1
+
+
+def test_finalize_har_without_a_har(tmp_path):
+    assert finalize_har(tmp_path, None) == (None, None)
+    assert finalize_har(tmp_path, tmp_path / 'missing.har') == (None, None)
+
+
+def test_finalize_har_can_leave_the_har_uncompressed(tmp_path):
+    har_path = tmp_path / 'network.har'
+    har_path.write_text(json.dumps(har()))
+    final_path, _ = finalize_har(tmp_path, har_path, compress=False)
+    assert final_path == har_path and har_path.exists()
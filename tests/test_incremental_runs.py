@@ -0,0 +1,96 @@
+"""Tests for incremental batch runs: test fingerprints and reuse of cached passes."""
+
+import json
+import time
+
+import pytest
+
+import web_ui
+
+CODE = 'async def run(page):\n    await page.goto("https://example.com")\n'
+
+
+@pytest.fixture
+def test_dirs(tmp_path, monkeypatch):
+    saved, ai_steps = tmp_path / 'saved_tests', tmp_path / 'ai_steps'
+    (saved / 'data').mkdir(parents=True)
+    ai_steps.mkdir()
+    monkeypatch.setattr(web_ui, 'SAVED_TESTS_DIR', saved)
+    monkeypatch.setattr(web_ui, 'DATA_DIR', saved / 'data')
+    monkeypatch.setattr(web_ui, 'AI_STEPS_DIR', ai_steps)
+    return saved, ai_steps
+
+
+def save(directory, filename, test_data, run_options=None, kind='saved', **last_run):
+    last_run = {'last_run_status': 'success', 'last_run_time': time.time(), **last_run}
+    test_data = dict(test_data, last_run_hash=web_ui.test_fingerprint(test_data, kind, run_options), **last_run)
+    (directory / filename).write_text(json.dumps(test_data), encoding='utf-8')
+
+
+def test_fingerprint_depends_on_code_and_run_configuration(test_dirs):
+    test = {'name': 'Home', 'code': CODE}
+    fingerprint = web_ui.test_fingerprint(test, 'saved')
+    assert fingerprint == web_ui.test_fingerprint(dict(test, name='Renamed'), 'saved')
+    assert fingerprint == web_ui.test_fingerprint(test, 'saved', {'network': 'live'})
+    assert fingerprint != web_ui.test_fingerprint(dict(test, code=CODE + '\n'), 'saved')
+    assert fingerprint != web_ui.test_fingerprint(test, 'saved', {'network': 'replay'})
+    assert fingerprint != web_ui.test_fingerprint(test, 'saved', {'execution_profile': 'lean'})
+    assert fingerprint != web_ui.test_fingerprint(dict(test, depends_on='login.json'), 'saved')
+
+
+def test_ai_fingerprints_follow_the_steps_and_ignore_the_network_mode(test_dirs):
+    test = {'steps': ['Open example.com'], 'code': CODE}
+    fingerprint = web_ui.test_fingerprint(test, 'ai')
+    assert fingerprint == web_ui.test_fingerprint(dict(test, code=''), 'ai', {'network': 'replay'})
+    assert fingerprint != web_ui.test_fingerprint(dict(test, steps=['Open example.org']), 'ai')
+
+
+def test_editing_a_data_file_changes_the_fingerprint(test_dirs):
+    saved, _ = test_dirs
+    test = {'code': CODE, 'data_file': 'users.csv'}
+    (saved / 'data' / 'users.csv').write_text('email\na@example.com\n', encoding='utf-8')
+    fingerprint = web_ui.test_fingerprint(test, 'saved')
+    (saved / 'data' / 'users.csv').write_text('email\nb@example.com\n', encoding='utf-8')
+    assert fingerprint != web_ui.test_fingerprint(test, 'saved')
+
+
+def test_a_recent_unchanged_pass_is_reused(test_dirs):
+    saved, ai_steps = test_dirs
+    save(saved, 'home.json', {'name': 'Home', 'code': CODE})
+    save(ai_steps, 'search.json', {'name': 'Search', 'steps': ['Search']}, kind='ai', last_run_status='passed')
+
+    cached = web_ui.cached_batch_result('home.json', 'saved', {})
+    assert {key: cached[key] for key in ('filename', 'name', 'kind', 'status', 'cached', 'duration_s')} == {
+        'filename': 'home.json', 'name': 'Home', 'kind': 'saved', 'status': 'success', 'cached': True,
+        'duration_s': 0
+    }
+    assert web_ui.cached_batch_result('search.json', 'ai', {})['kind'] == 'ai'
+
+
+@pytest.mark.parametrize('last_run, run_options', [
+    ({'last_run_status': 'error'}, {}),
+    ({'last_run_time': time.time() - 7200}, {'max_age_s': 3600}),
+    ({'last_run_time': None}, {}),
+    ({}, {'network': 'replay'}),
+])
+def test_failed_stale_or_reconfigured_tests_run_again(test_dirs, last_run, run_options):
+    saved, _ = test_dirs
+    save(saved, 'home.json', {'code': CODE}, **last_run)
+    assert web_ui.cached_batch_result('home.json', 'saved', run_options) is None
+
+
+def test_changed_and_unknown_tests_run_again(test_dirs):
+    saved, _ = test_dirs
+    save(saved, 'home.json', {'code': CODE})
+    test_data = json.loads((saved / 'home.json').read_text(encoding='utf-8'))
+    (saved / 'home.json').write_text(json.dumps(dict(test_data, code=CODE + '\n')), encoding='utf-8')
+    assert web_ui.cached_batch_result('home.json', 'saved', {}) is None
+    assert web_ui.cached_batch_result('missing.json', 'saved', {}) is None
+
+
+def test_ui_runs_store_an_iso_last_run_date(test_dirs):
+    saved, _ = test_dirs
+    save(saved, 'home.json', {'code': CODE}, last_run_time=None, last_run='2020-01-01T00:00:00')
+    assert web_ui.cached_batch_result('home.json', 'saved', {}) is None
+    assert web_ui.cached_batch_result('home.json', 'saved', {'max_age_s': time.time()})['last_run_time'] \
+        == '2020-01-01T00:00:00'
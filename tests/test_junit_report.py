@@ -0,0 +1,77 @@
+"""Tests for junit_report: JUnit XML rendering of batch results."""
+
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+from junit_report import build_junit_xml
+
+
+def render(results, duration=12.5):
+    xml = build_junit_xml(results, {'duration': duration}, timestamp=datetime(2024, 5, 1, 9, 30))
+    assert xml.startswith('<?xml version="1.0" encoding="UTF-8"?>\n')
+    return ET.fromstring(xml.split('\n', 1)[1])
+
+
+def cases(root):
+    return {case.get('name'): case for case in root.iter('testcase')}
+
+
+def test_suite_counts_failures_and_skips():
+    root = render([
+        {'filename': 'b.json', 'name': 'Checkout', 'status': 'success', 'duration_s': 1.25},
+        {'filename': 'a.json', 'name': 'Login', 'status': 'error', 'error': 'AssertionError: no\nTraceback...'},
+        {'filename': 'c.json', 'name': 'Search', 'status': 'timeout', 'error': ''},
+        {'filename': 'd.json', 'name': 'Profile', 'status': 'stopped', 'error': None},
+    ])
+    assert (root.get('name'), root.get('tests'), root.get('failures'), root.get('time')) == (
+        'saved-tests', '4', '2', '12.500')
+    [suite] = root
+    assert (suite.get('tests'), suite.get('failures'), suite.get('errors'), suite.get('skipped'),
+            suite.get('timestamp')) == ('4', '2', '0', '1', '2024-05-01T09:30:00')
+    assert [case.get('name') for case in suite] == ['Login', 'Checkout', 'Search', 'Profile']
+
+    by_name = cases(root)
+    assert (by_name['Checkout'].get('classname'), by_name['Checkout'].get('time')) == ('saved-tests.b', '1.250')
+    assert list(by_name['Checkout']) == []
+    failure = by_name['Login'].find('failure')
+    assert (failure.get('type'), failure.get('message')) == ('error', 'AssertionError: no')
+    assert failure.text == 'AssertionError: no\nTraceback...'
+    assert by_name['Search'].find('failure').attrib == {'type': 'timeout', 'message': 'timeout'}
+    assert by_name['Profile'].find('skipped').get('message') == 'stopped'
+
+
+def test_quarantined_failures_are_skipped_and_flaky_or_cached_passes_noted():
+    root = render([
+        {'filename': 'a.json', 'name': 'Flaky', 'status': 'error', 'error': 'Timeout\nmore', 'quarantined': True},
+        {'filename': 'b.json', 'name': 'Retried', 'status': 'success', 'flaky': True, 'attempts': 2},
+        {'filename': 'c.json', 'name': 'Cached', 'status': 'success', 'cached': True,
+         'last_run_time': '2024-05-01T08:00:00'},
+        {'filename': 'd.json', 'name': 'Quarantined pass', 'status': 'success', 'quarantined': True},
+    ])
+    assert (root.get('failures'), root[0].get('skipped')) == ('0', '1')
+    by_name = cases(root)
+    assert by_name['Flaky'].find('skipped').get('message') == 'quarantined as flaky (error): Timeout'
+    assert by_name['Retried'].find('system-out').text == 'Flaky: passed on attempt 2'
+    assert by_name['Cached'].find('system-out').text == 'Cached pass from 2024-05-01T08:00:00'
+    assert list(by_name['Quarantined pass']) == []
+
+
+def test_each_data_row_is_a_test_case():
+    root = render([{
+        'filename': 'signup.json', 'name': 'Signup', 'status': 'error', 'error': '1 of 2 rows failed',
+        'rows': [
+            {'label': 'free', 'status': 'success', 'error': None, 'duration_s': 2.0},
+            {'label': 'pro', 'status': 'error', 'error': 'Card declined', 'duration_s': 3.0},
+        ]
+    }])
+    assert (root.get('tests'), root.get('failures')) == ('2', '1')
+    by_name = cases(root)
+    assert list(by_name['Signup [free]']) == []
+    assert by_name['Signup [free]'].get('time') == '2.000'
+    assert by_name['Signup [pro]'].find('failure').get('message') == 'Card declined'
+
+
+def test_an_empty_batch_is_a_valid_report():
+    root = render([], duration=0)
+    assert (root.get('tests'), root.get('failures'), root[0].get('skipped')) == ('0', '0', '0')
+    assert list(root[0]) == []
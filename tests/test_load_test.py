@@ -0,0 +1,169 @@
+"""Tests for load_test: option parsing, statistics and the virtual-user scheduler (no browser needed)."""
+
+import asyncio
+
+import pytest
+
+from load_test import LoadStats, LoadTestError, TimedPage, action_name, parse_load_options, run_load
+
+DEFAULTS = {'users': 1, 'ramp_up_s': 0, 'duration_s': 60, 'think_time_s': 1, 'browsers': 2, 'interval_s': 5}
+
+
+def options(**overrides):
+    return parse_load_options(overrides, DEFAULTS, max_users=50, max_browsers=4)
+
+
+def test_defaults_fill_in_missing_settings():
+    assert options(users=10, think_time_s=[1, 3]) == {
+        'users': 10, 'ramp_up_s': 0.0, 'duration_s': 60.0, 'think_time_s': [1.0, 3.0], 'browsers': 2,
+        'interval_s': 5.0
+    }
+
+
+def test_browsers_never_exceed_users_and_intervals_never_exceed_the_duration():
+    parsed = options(users=1, browsers=4, duration_s=2)
+    assert parsed['browsers'] == 1
+    assert parsed['interval_s'] == 2.0
+
+
+def test_none_values_fall_back_to_the_defaults():
+    assert options(users=3, duration_s=None)['duration_s'] == 60.0
+
+
+@pytest.mark.parametrize('overrides, message', [
+    ({'users': 0}, "'users' must be a number of at least 1"),
+    ({'users': 2.5}, 'whole number'),
+    ({'users': True}, "'users' must be a number"),
+    ({'users': 51}, 'at most 50 virtual users'),
+    ({'browsers': 5}, 'at most 4 browsers'),
+    ({'duration_s': 0.5}, "'duration_s' must be a number of at least 1"),
+    ({'ramp_up_s': -1}, "'ramp_up_s'"),
+    ({'think_time_s': [3, 1]}, 'seconds or \\[min, max\\]'),
+    ({'think_time_s': [1, 2, 3]}, 'seconds or \\[min, max\\]'),
+    ({'think_time_s': 'slow'}, 'seconds or \\[min, max\\]'),
+])
+def test_malformed_settings_are_rejected(overrides, message):
+    with pytest.raises(LoadTestError, match=message):
+        options(**overrides)
+
+
+def test_action_names_group_gotos_by_url_without_the_query():
+    assert action_name('goto', ('https://example.com/login?next=/home#top',), {}) == 'goto https://example.com/login'
+    assert action_name('goto', (), {'url': 'https://example.com'}) == 'goto https://example.com/'
+    assert action_name('click', ('#submit',), {}) == 'click #submit'
+    assert action_name('wait_for_load_state', (), {}) == 'wait_for_load_state'
+
+
+def test_stats_report_percentiles_errors_and_the_timeline():
+    stats = LoadStats(interval_s=60)
+    stats.user_started()
+    for latency_ms in range(1, 101):
+        stats.record_action('goto https://example.com/', latency_ms / 1000)
+    stats.record_action('click #submit', 0.2, RuntimeError('Timeout 30000ms exceeded.\nCall log: ...'))
+    stats.record_iteration(1.0)
+    stats.record_iteration(2.0, RuntimeError('Timeout 30000ms exceeded.\nCall log: ...'))
+    stats.record_iteration(3.0, ValueError('other'))
+    stats.user_stopped()
+    report = stats.report()
+
+    assert report['iterations'] == {'total': 3, 'failed': 2, 'cancelled': 0, 'p50_ms': 2000.0, 'p95_ms': 3000.0}
+    assert report['actions'] == {'total': 101, 'failed': 1}
+    assert report['error_rate'] == round(2 / 3, 4)
+    goto, click = report['by_action']
+    assert goto['action'] == 'goto https://example.com/'
+    assert (goto['count'], goto['errors'], goto['p50_ms'], goto['p90_ms'], goto['p95_ms'], goto['p99_ms'],
+            goto['max_ms'], goto['mean_ms']) == (100, 0, 50.0, 90.0, 95.0, 99.0, 100.0, 50.5)
+    assert (click['count'], click['errors'], click['error_rate']) == (1, 1, 1.0)
+    assert report['errors'] == [{'error': 'Timeout 30000ms exceeded.', 'count': 1}, {'error': 'other', 'count': 1}]
+    [interval] = report['timeline']
+    assert (interval['users'], interval['iterations'], interval['failed_iterations'], interval['actions'],
+            interval['failed_actions']) == (1, 3, 2, 101, 1)
+
+
+def test_an_interval_without_activity_reports_the_active_users():
+    stats = LoadStats(interval_s=1)
+    stats.user_started()
+    summary = stats.interval_summary(7)
+    assert summary['t_s'] == 7.0
+    assert (summary['users'], summary['iterations'], summary['error_rate'], summary['p95_ms']) == (1, 0, 0.0, None)
+
+
+def test_timed_page_records_actions_and_passes_other_attributes_through():
+    class FakePage:
+        url = 'https://example.com/'
+
+        async def goto(self, url):
+            return 'response'
+
+        async def click(self, selector):
+            raise RuntimeError('element not found')
+
+    stats = LoadStats(interval_s=60)
+    page = TimedPage(FakePage(), stats)
+
+    async def main():
+        assert await page.goto('https://example.com/a?b=c') == 'response'
+        with pytest.raises(RuntimeError):
+            await page.click('#missing')
+
+    asyncio.run(main())
+    assert page.url == 'https://example.com/'
+    by_action = {action['action']: action for action in stats.report()['by_action']}
+    assert by_action['goto https://example.com/a']['errors'] == 0
+    assert by_action['click #missing']['errors'] == 1
+
+
+def test_run_load_ramps_users_up_and_stops_at_the_duration():
+    started = {}
+
+    async def run_iteration(user, iteration):
+        started.setdefault(user, asyncio.get_running_loop().time())
+        await asyncio.sleep(0.01)
+        if user == 1:
+            raise RuntimeError('user 1 always fails')
+
+    intervals = []
+    stats = LoadStats(interval_s=1)
+
+    async def main():
+        loop_started = asyncio.get_running_loop().time()
+        await run_load(run_iteration, {'users': 3, 'ramp_up_s': 0.3, 'duration_s': 1, 'think_time_s': [0, 0]},
+                       stats, on_interval=intervals.append, grace_s=1)
+        return loop_started
+
+    loop_started = asyncio.run(main())
+    assert sorted(started) == [0, 1, 2]
+    assert started[2] - loop_started >= 0.19  # Users start evenly over the ramp-up
+    report = stats.report()
+    assert report['iterations']['total'] > 3
+    assert report['iterations']['cancelled'] == 0
+    assert 0 < report['error_rate'] < 1
+    assert report['errors'][0]['error'] == 'user 1 always fails'
+    assert stats.active_users == 0
+    assert intervals and intervals[0]['users'] == 3
+
+
+def test_users_due_after_the_duration_never_start():
+    users = set()
+
+    async def run_iteration(user, iteration):
+        users.add(user)
+        await asyncio.sleep(0.01)
+
+    stats = LoadStats(interval_s=1)
+    asyncio.run(run_load(run_iteration, {'users': 4, 'ramp_up_s': 4, 'duration_s': 1, 'think_time_s': [0, 0]},
+                         stats, grace_s=1))
+    assert users == {0}  # User 1 would start 1s in
+
+
+def test_iterations_overrunning_the_grace_period_are_cancelled():
+    async def run_iteration(user, iteration):
+        await asyncio.sleep(10)
+
+    stats = LoadStats(interval_s=1)
+    asyncio.run(run_load(run_iteration, {'users': 2, 'ramp_up_s': 0, 'duration_s': 1, 'think_time_s': [0, 0]},
+                         stats, grace_s=0.1))
+    report = stats.report()
+    assert report['iterations']['total'] == 0
+    assert report['iterations']['cancelled'] == 2
+    assert stats.active_users == 0
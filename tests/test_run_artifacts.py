@@ -0,0 +1,75 @@
+"""Tests for run artifact directories: naming, retention and the configurable artifact root."""
+
+import json
+
+import pytest
+
+import web_ui
+
+
+@pytest.fixture
+def artifacts(tmp_path, monkeypatch):
+    saved = tmp_path / 'saved_tests'
+    saved.mkdir()
+    monkeypatch.setattr(web_ui, 'SAVED_TESTS_DIR', saved)
+    monkeypatch.setattr(web_ui, 'ARTIFACTS_DIR', tmp_path / 'test_artifacts')
+    return tmp_path / 'test_artifacts'
+
+
+def test_runs_starting_in_the_same_second_get_their_own_directories(artifacts):
+    first, second, third = (web_ui.new_artifact_dir('checkout.json') for _ in range(3))
+    assert first.parent == artifacts / 'checkout'
+    assert len({first, second, third}) == 3
+    assert all(path.is_dir() for path in (first, second, third))
+    # A run in the same second as the one before it takes the next free suffix
+    later = web_ui.artifact_dir_path('checkout.json')
+    taken = {path.name for path in (first, second, third)}
+    assert later.name not in taken and not later.exists()
+    # Only directories that exist are taken; a path handed out but never created is offered again
+    assert web_ui.artifact_dir_path('other.json') == web_ui.artifact_dir_path('other.json')
+
+
+def test_cleanup_keeps_recorded_runs_apart_from_runs_without_video(artifacts):
+    base = artifacts / 'checkout'
+    for i in range(8):
+        run = base / f'run_{i}'
+        run.mkdir(parents=True)
+        if i < 2:
+            (run / 'row_1').mkdir()
+            (run / 'row_1' / 'a.webm').write_text('video')
+        elif i < 4:
+            (run / 'a.webm').write_text('video')
+    web_ui.cleanup_old_artifacts('checkout', keep_last_n=3)
+    # ctime can't be set, so only how many of each kind survive is checked
+    remaining = {path.name for path in base.iterdir()}
+    assert len(remaining & {'run_0', 'run_1', 'run_2', 'run_3'}) == 3
+    assert len(remaining & {'run_4', 'run_5', 'run_6', 'run_7'}) == 3
+
+
+def test_runs_without_files_are_recorded_without_a_directory(artifacts):
+    (web_ui.SAVED_TESTS_DIR / 'checkout.json').write_text(json.dumps({'name': 'Checkout', 'code': ''}))
+    run_dir = web_ui.artifact_dir_path('checkout.json')
+    web_ui.record_headless_run('checkout.json', run_dir, 'success', {})
+    [entry] = json.loads((web_ui.SAVED_TESTS_DIR / 'checkout.json').read_text())['artifacts']
+    assert (entry['timestamp'], entry['status'], entry['video_path']) == (run_dir.name, 'success', None)
+    assert not run_dir.exists()
+
+
+def test_artifact_paths_and_trends_follow_the_artifact_root(artifacts):
+    (web_ui.SAVED_TESTS_DIR / 'checkout.json').write_text(json.dumps({'name': 'Checkout', 'code': ''}))
+    run_dir = web_ui.new_artifact_dir('checkout.json')
+    (run_dir / 'row_1').mkdir()
+    video = run_dir / 'row_1' / 'a.webm'
+    video.write_text('video')
+    rows = [{'index': 0, 'label': 'row 1', 'status': 'success', 'video_paths': [str(video)]}]
+    web_ui.record_headless_run('checkout.json', run_dir, 'success', {}, row_results=rows)
+    [entry] = json.loads((web_ui.SAVED_TESTS_DIR / 'checkout.json').read_text())['artifacts']
+    assert entry['video_paths'] == [f'test_artifacts/checkout/{run_dir.name}/row_1/a.webm']
+
+    response = web_ui.app.test_client().get(f"/api/artifacts/{entry['video_paths'][0]}")
+    assert (response.status_code, response.data) == (200, b'video')
+    response.close()
+
+    history = web_ui.page_metrics_history()
+    assert history.path == artifacts / 'page_metrics.json'
+    assert web_ui.page_metrics_history() is history
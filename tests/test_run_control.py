@@ -0,0 +1,161 @@
+"""Tests for run_control: stopping runs and batches, and the registry of runs in flight."""
+
+import asyncio
+import threading
+
+import pytest
+
+import run_control
+import web_ui
+from run_control import RunControl, RunRegistry
+from run_queue import RunQueue
+
+
+async def attached_sleep(control):
+    task = asyncio.ensure_future(asyncio.sleep(10))
+    control.attach(task)
+    await asyncio.sleep(0)
+    return task
+
+
+def test_stop_cancels_the_attached_task():
+    async def main():
+        control = RunControl('saved')
+        task = await attached_sleep(control)
+        assert control.stop()
+        await asyncio.gather(task, return_exceptions=True)
+        return control, task
+
+    control, task = asyncio.run(main())
+    assert task.cancelled() and control.stopping and control.started
+
+
+def test_a_run_stopped_before_it_starts_is_cancelled_once_attached():
+    async def main():
+        control = RunControl('saved')
+        assert control.stop() and not control.started
+        task = await attached_sleep(control)
+        await asyncio.gather(task, return_exceptions=True)
+        return task
+
+    assert asyncio.run(main()).cancelled()
+
+
+def test_stop_can_come_from_another_thread():
+    async def main():
+        control = RunControl('saved')
+        task = await attached_sleep(control)
+        await asyncio.to_thread(control.stop)
+        await asyncio.gather(task, return_exceptions=True)
+        return task
+
+    assert asyncio.run(main()).cancelled()
+
+
+def test_stopping_a_batch_stops_its_members():
+    async def main():
+        batch = RunControl('batch')
+        member = RunControl('saved', parent=batch)
+        task = await attached_sleep(member)
+        batch.stop()
+        assert member.stopping and not member.stop_requested
+        # A member admitted after the batch was stopped never gets to run
+        late = RunControl('saved', parent=batch)
+        late_task = await attached_sleep(late)
+        await asyncio.gather(late_task, return_exceptions=True)
+        # Running members are stopped by stop_runs, which matches them through the batch's run_id
+        assert late_task.cancelled() and not task.done()
+        task.cancel()
+
+    asyncio.run(main())
+
+
+def test_registry_matches_runs_by_id_batch_or_owner():
+    registry = RunRegistry()
+    batch = registry.register(RunControl('batch', owner='a'))
+    member = registry.register(RunControl('saved', owner='a', parent=batch))
+    other = registry.register(RunControl('ai', owner='b'))
+    assert registry.get(other.run_id) is other
+    assert registry.matching(run_id=batch.run_id) == [batch, member]
+    assert registry.matching(run_id=member.run_id) == [member]
+    assert registry.matching(owner='a') == [batch, member]
+    assert registry.matching() == []
+    assert [run['run_id'] for run in registry.snapshot()] == [batch.run_id, member.run_id, other.run_id]
+
+
+def test_unregistering_a_finished_run_forgets_it_and_ignores_later_stops():
+    registry = RunRegistry()
+    control = registry.register(RunControl('saved', owner='a'))
+    registry.unregister(control)
+    assert control.done.is_set()
+    assert registry.get(control.run_id) is None and registry.matching(owner='a') == []
+    assert not control.stop()
+    assert not control.stop_requested
+
+
+def test_bind_sets_the_threads_current_run_for_start_task():
+    control = RunControl('saved')
+    seen = []
+
+    def worker():
+        seen.append(run_control.current())
+
+    with run_control.bind(control):
+        assert run_control.current() is control
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+        loop = asyncio.new_event_loop()
+        try:
+            task = run_control.start_task(loop, asyncio.sleep(0))
+            loop.run_until_complete(task)
+        finally:
+            loop.close()
+    assert run_control.current() is None and seen == [None]
+    assert control.started and control.owns_thread and control.thread_id == threading.get_ident()
+
+
+@pytest.fixture
+def fresh_runs(monkeypatch):
+    monkeypatch.setattr(web_ui, 'run_queue', RunQueue({'browsers': 1}, max_depth=10))
+    monkeypatch.setattr(web_ui, 'runs', RunRegistry())
+    return web_ui.runs
+
+
+def test_stop_all_drops_queued_runs_and_cancels_running_ones(fresh_runs):
+    cancelled = []
+
+    async def main():
+        loop = asyncio.get_running_loop()
+
+        async def run(control):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(control.label)
+                raise
+            finally:
+                web_ui.finish_run(control)
+
+        def start(control):
+            control.attach(loop.create_task(run(control)))
+
+        running = web_ui.queue_run('saved', {'browsers': 1}, start, sid='a', label='running')
+        queued = web_ui.queue_run('saved', {'browsers': 1}, start, sid='a', label='queued')
+        other = web_ui.queue_run('saved', {'browsers': 1}, start, sid='b', label='other client')
+        await asyncio.sleep(0)
+        assert (running.started, queued.started) == (True, False)
+
+        assert web_ui.stop_runs(owner='a') == 2
+        assert queued.done.is_set() and queued.ticket.state == 'cancelled'
+        await asyncio.wait_for(asyncio.to_thread(running.done.wait), 1)
+        await asyncio.sleep(0)
+        # The freed browser goes to the other client's run, which keeps going
+        assert other.started and not other.stopping
+        assert fresh_runs.matching(owner='a') == []
+        assert web_ui.stop_runs(run_id=other.run_id) == 1
+        await asyncio.wait_for(asyncio.to_thread(other.done.wait), 1)
+
+    asyncio.run(main())
+    assert cancelled == ['running', 'other client']
+    assert fresh_runs.snapshot() == [] and web_ui.run_queue.snapshot()['in_use'] == {'browsers': 0}
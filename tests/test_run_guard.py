@@ -0,0 +1,150 @@
+"""Tests for run_guard: run budgets, cancellation bookkeeping and the event loop watchdog."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from run_guard import LoopWatchdog, RunStalledError, RunTimeoutError, absorb_cancellation, interrupt_thread, run_budget
+
+counts_cancellations = pytest.mark.skipif(not hasattr(asyncio.Task, 'cancelling'),
+                                          reason='Tasks count cancellations from Python 3.11')
+
+
+def test_an_expired_budget_cancels_the_block_and_raises():
+    unwound = []
+
+    async def main():
+        with pytest.raises(RunTimeoutError, match='0.05s time limit'):
+            async with run_budget(0.05):
+                try:
+                    await asyncio.sleep(10)
+                finally:
+                    unwound.append(True)
+        # The expiry was absorbed: the task goes on and isn't cancelled later
+        await asyncio.sleep(0.01)
+        return asyncio.current_task()
+
+    task = asyncio.run(main())
+    assert unwound == [True]
+    if hasattr(task, 'cancelling'):
+        assert task.cancelling() == 0
+
+
+def test_a_block_that_finishes_in_time_cancels_the_timer():
+    async def main():
+        async with run_budget(0.05):
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.1)  # Past the budget: a leftover timer would cancel this
+        return 'done'
+
+    assert asyncio.run(main()) == 'done'
+
+
+def test_no_budget_means_no_limit():
+    async def main():
+        async with run_budget(None):
+            await asyncio.sleep(0.01)
+        return 'done'
+
+    assert asyncio.run(main()) == 'done'
+
+
+def test_a_stop_within_the_budget_is_not_reported_as_a_timeout():
+    async def main():
+        task = asyncio.current_task()
+        asyncio.get_running_loop().call_later(0.01, task.cancel)
+        async with run_budget(5):
+            await asyncio.sleep(10)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+
+
+@counts_cancellations
+def test_a_stop_arriving_with_the_expiry_is_not_absorbed():
+    async def main():
+        task = asyncio.current_task()
+        async with run_budget(0.01):
+            time.sleep(0.05)  # The timer is now due and fires in the same loop iteration as the stop
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.sleep(10)
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(main())
+
+
+@counts_cancellations
+def test_absorb_cancellation_only_handles_one_request():
+    async def main():
+        task = asyncio.current_task()
+        task.cancel()
+        task.cancel()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            assert absorb_cancellation()
+        assert not absorb_cancellation()
+        # With its cancellations handled, timeouts later in the task work as usual
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.sleep(10), 0.01)
+        return task.cancelling()
+
+    assert asyncio.run(main()) == 0
+
+
+def busy(seconds: float):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+def test_interrupt_thread_breaks_a_busy_loop_in_another_thread():
+    raised = []
+    running = threading.Event()
+
+    def worker():
+        running.set()
+        try:
+            busy(5)
+        except RunStalledError as e:
+            raised.append(e)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    running.wait()
+    assert interrupt_thread(thread.ident)
+    thread.join(2)
+    assert not thread.is_alive() and len(raised) == 1
+
+
+def test_the_watchdog_reports_a_stalled_loop_once_and_can_interrupt_it():
+    stalls = []
+
+    def on_stall(watched):
+        stalls.append(watched.label)
+        if watched.interrupt:
+            interrupt_thread(watched.thread_id)
+
+    watchdog = LoopWatchdog(stall_after=0.1, on_stall=on_stall, interval=0.02)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        with watchdog.watching(loop, 'test loop', interrupt=True) as watched:
+            await asyncio.sleep(0.15)  # Heartbeats keep running while the loop is free
+            assert stalls == []
+            with pytest.raises(RunStalledError):
+                busy(5)
+            await asyncio.sleep(0.05)
+            assert not watched.stalled
+        return watched
+
+    watched = asyncio.run(main())
+    assert stalls == ['test loop'] and not watched.active
+    loop = asyncio.new_event_loop()
+    try:
+        assert LoopWatchdog(stall_after=0, on_stall=on_stall).watch(loop, 'disabled') is None
+    finally:
+        loop.close()
@@ -0,0 +1,153 @@
+"""Tests for run_queue: admission order, slot reservation and the SlotLimiter."""
+
+import asyncio
+import threading
+
+import pytest
+
+from run_queue import PRIORITY_BATCH, PRIORITY_INTERACTIVE, QueueFullError, RunQueue, SlotLimiter
+
+
+def make_queue(limits=None, max_depth=10):
+    started = []
+    changes = []
+    queue = RunQueue(limits or {'browsers': 2, 'ai_runs': 1}, max_depth,
+                     on_change=lambda queued, admitted: changes.append(([t.label for t in queued],
+                                                                         [t.label for t in admitted])))
+    return queue, started, changes
+
+
+def submit(queue, started, label, resources, priority=PRIORITY_INTERACTIVE, **kwargs):
+    return queue.submit('saved', lambda ticket: started.append(ticket.label), resources, priority=priority,
+                        label=label, **kwargs)
+
+
+def test_runs_are_admitted_by_priority_then_arrival():
+    queue, started, _ = make_queue({'browsers': 1})
+    running = submit(queue, started, 'running', {'browsers': 1})
+    batch = [submit(queue, started, f'batch {i}', {'browsers': 1}, PRIORITY_BATCH) for i in range(2)]
+    interactive = submit(queue, started, 'interactive', {'browsers': 1})
+    assert started == ['running']
+    assert [queue.position(t) for t in (batch[0], batch[1], interactive)] == [2, 3, 1]
+
+    for ticket in (running, interactive, batch[0]):
+        queue.release(ticket)
+    assert started == ['running', 'interactive', 'batch 0', 'batch 1']
+    assert (interactive.state, batch[1].state, queue.position(batch[1])) == ('done', 'running', 0)
+
+
+def test_a_run_that_does_not_fit_reserves_its_slots():
+    queue, started, _ = make_queue({'browsers': 2, 'ai_runs': 1})
+    first = submit(queue, started, 'browser', {'browsers': 1})
+    wide = submit(queue, started, 'two browsers', {'browsers': 2})
+    # Would fit in the one free browser, but that browser is held for the earlier, wider run
+    submit(queue, started, 'later browser', {'browsers': 1}, PRIORITY_BATCH)
+    # Needs nothing the waiting runs reserved, so it still goes ahead
+    submit(queue, started, 'ai', {'ai_runs': 1}, PRIORITY_BATCH)
+    assert started == ['browser', 'ai']
+    assert queue.snapshot()['in_use'] == {'browsers': 1, 'ai_runs': 1}
+
+    queue.release(first)
+    assert started == ['browser', 'ai', 'two browsers']
+    queue.release(wide)
+    assert started[-1] == 'later browser'
+    assert queue.snapshot()['in_use'] == {'browsers': 1, 'ai_runs': 1}
+
+
+def test_released_slots_are_returned_once():
+    queue, started, _ = make_queue({'browsers': 1})
+    ticket = submit(queue, started, 'a', {'browsers': 1})
+    queue.release(ticket)
+    queue.release(ticket)
+    assert queue.snapshot()['in_use'] == {'browsers': 0}
+    submit(queue, started, 'b', {'browsers': 1})
+    submit(queue, started, 'c', {'browsers': 1})
+    assert started == ['a', 'b']
+
+
+def test_cancelling_a_queued_run_drops_it_before_it_starts():
+    queue, started, changes = make_queue({'browsers': 1})
+    running = submit(queue, started, 'running', {'browsers': 1})
+    waiting = submit(queue, started, 'waiting', {'browsers': 1})
+    assert queue.cancel(waiting)
+    assert (waiting.state, queue.depth(), changes[-1]) == ('cancelled', 0, ([], []))
+    assert not queue.cancel(running)  # Already admitted
+
+    queue.release(running)
+    assert started == ['running']
+
+
+def test_a_run_whose_start_fails_gives_its_slots_back():
+    queue, started, _ = make_queue({'browsers': 1})
+
+    def broken(ticket):
+        raise RuntimeError('no thread')
+
+    queue.submit('saved', broken, {'browsers': 1}, label='broken')
+    submit(queue, started, 'next', {'browsers': 1})
+    assert started == ['next']
+
+
+def test_submissions_past_the_depth_limit_are_rejected():
+    queue, started, _ = make_queue({'browsers': 1}, max_depth=1)
+    submit(queue, started, 'running', {'browsers': 1})
+    submit(queue, started, 'waiting', {'browsers': 1})
+    with pytest.raises(QueueFullError, match='1 runs waiting'):
+        submit(queue, started, 'rejected', {'browsers': 1})
+    with pytest.raises(QueueFullError):
+        queue.ensure_capacity()
+    submit(queue, started, 'batch', {'browsers': 1}, enforce_depth=False)
+    assert queue.depth() == 2
+
+
+def test_cancelled_async_waiters_leave_the_queue():
+    queue, _, _ = make_queue({'browsers': 1})
+
+    async def main():
+        holder = await queue.acquire_async('batch', {'browsers': 1})
+        waiter = asyncio.ensure_future(queue.acquire_async('batch', {'browsers': 1}))
+        await asyncio.sleep(0.01)
+        assert queue.depth() == 1
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert queue.depth() == 0
+        queue.release(holder)
+        return await asyncio.wait_for(queue.acquire_async('batch', {'browsers': 1}), 1)
+
+    assert asyncio.run(main()).state == 'running'
+
+
+def test_slot_limiter_bounds_threads_and_tasks_together():
+    limiter = SlotLimiter(2, poll_interval=0.01)
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def hold():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        threading.Event().wait(0.03)
+        with lock:
+            running.pop()
+
+    def in_thread():
+        with limiter:
+            hold()
+
+    async def in_task():
+        async with limiter:
+            await asyncio.to_thread(hold)
+
+    async def main():
+        threads = [threading.Thread(target=in_thread) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        await asyncio.gather(*(in_task() for _ in range(3)))
+        for thread in threads:
+            thread.join()
+
+    asyncio.run(main())
+    assert len(peak) == 6 and max(peak) == 2
+    with limiter, limiter:
+        assert not limiter._semaphore.acquire(blocking=False)
@@ -0,0 +1,176 @@
+"""Playwright trace helpers: per-action durations and network waits from trace.zip."""
+
+import json
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+
+TRACE_FILENAME = "trace.zip"
+TRACE_SUMMARY_FILENAME = "trace-summary.json"
+TRACE_ACTIONS_LIMIT = 200
+SLOWEST_ACTIONS_LIMIT = 5
+
+
+def _read_events(archive: zipfile.ZipFile, suffix: str) -> list:
+    """Read the NDJSON events of every ``*<suffix>`` member of a trace archive."""
+    events = []
+    for name in sorted(archive.namelist()):
+        if not name.endswith(suffix):
+            continue
+        with archive.open(name) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+    return events
+
+
+def _action_target(params: dict) -> Optional[str]:
+    """The selector or URL an action was aimed at, if any."""
+    for key in ('selector', 'url', 'key', 'text'):
+        value = (params or {}).get(key)
+        if value:
+            return str(value)
+    return None
+
+
+def _collect_actions(events: list) -> list:
+    """Pair before/after events (or legacy 'action' events) into timed actions."""
+    actions = {}
+    order = []
+    for event in events:
+        kind = event.get('type')
+        if kind == 'before':
+            call_id = event.get('callId')
+            name = event.get('apiName') or event.get('title') or f"{event.get('class', '')}.{event.get('method', '')}"
+            actions[call_id] = {
+                'name': name,
+                'target': _action_target(event.get('params')),
+                'start': float(event.get('startTime') or 0),
+                'end': None,
+                'error': None
+            }
+            order.append(call_id)
+        elif kind == 'after' and event.get('callId') in actions:
+            action = actions[event['callId']]
+            action['end'] = float(event.get('endTime') or action['start'])
+            error = event.get('error')
+            if error:
+                action['error'] = (error.get('message') or error.get('error', {}).get('message') or str(error))[:200]
+        elif kind == 'action':
+            # Traces written by older Playwright versions
+            metadata = event.get('metadata', {})
+            call_id = metadata.get('id') or f"legacy@{len(order)}"
+            error = metadata.get('error')
+            actions[call_id] = {
+                'name': metadata.get('apiName') or f"{metadata.get('type', '')}.{metadata.get('method', '')}",
+                'target': _action_target(metadata.get('params')),
+                'start': float(metadata.get('startTime') or 0),
+                'end': float(metadata.get('endTime') or metadata.get('startTime') or 0),
+                'error': str((error or {}).get('error', {}).get('message') or error)[:200] if error else None
+            }
+            order.append(call_id)
+
+    return [actions[call_id] for call_id in order
+            if actions[call_id]['end'] is not None and not actions[call_id]['name'].startswith('tracing.')]
+
+
+def _collect_requests(events: list) -> list:
+    """(start, end) monotonic windows of the network requests in the trace."""
+    windows = []
+    for event in events:
+        if event.get('type') != 'resource-snapshot':
+            continue
+        snapshot = event.get('snapshot', {})
+        start = snapshot.get('_monotonicTime')
+        if start is None:
+            continue
+        start = float(start)
+        windows.append((start, start + max(float(snapshot.get('time') or 0), 0)))
+    return sorted(windows)
+
+
+def _overlap_ms(windows: list, start: float, end: float) -> float:
+    """Time within [start, end] during which at least one request was in flight."""
+    total = 0.0
+    cursor = start
+    for req_start, req_end in windows:
+        if req_start >= end:
+            break
+        lo = max(req_start, cursor)
+        hi = min(req_end, end)
+        if hi > lo:
+            total += hi - lo
+            cursor = hi
+    return total
+
+
+def summarize_trace(trace_path: Path) -> dict:
+    """
+    Extract per-action durations and network waits from a Playwright trace.
+
+    Args:
+        trace_path: Path to the trace.zip written by ``context.tracing.stop``
+
+    Returns:
+        Summary with each action's duration, time spent with network
+        requests in flight, requests started during it, and error
+    """
+    with zipfile.ZipFile(trace_path) as archive:
+        actions = _collect_actions(_read_events(archive, '.trace'))
+        requests = _collect_requests(_read_events(archive, '.network'))
+
+    steps = []
+    for action in actions:
+        start, end = action['start'], action['end']
+        steps.append({
+            'name': action['name'],
+            'target': action['target'],
+            'duration_ms': round(end - start, 1),
+            'network_wait_ms': round(_overlap_ms(requests, start, end), 1),
+            'requests': sum(1 for req_start, _ in requests if start <= req_start < end),
+            'error': action['error']
+        })
+
+    slowest = sorted(steps, key=lambda s: s['duration_ms'], reverse=True)[:SLOWEST_ACTIONS_LIMIT]
+    return {
+        'action_count': len(steps),
+        'failed_actions': sum(1 for s in steps if s['error']),
+        'total_action_ms': round(sum(s['duration_ms'] for s in steps), 1),
+        'network_wait_ms': round(sum(s['network_wait_ms'] for s in steps), 1),
+        'request_count': len(requests),
+        'slowest_actions': [{'name': s['name'], 'target': s['target'], 'duration_ms': s['duration_ms']} for s in slowest],
+        'actions': steps[:TRACE_ACTIONS_LIMIT]
+    }
+
+
+def finalize_trace(trace_path: Optional[Path]) -> tuple:
+    """
+    Write (or reuse) the summary next to a finished run's trace.
+
+    Args:
+        trace_path: Path to the run's trace.zip (None if not traced)
+
+    Returns:
+        tuple: (summary_path, summary) — both None if there is no readable trace
+    """
+    if not trace_path or not Path(trace_path).exists():
+        return None, None
+
+    summary_path = Path(trace_path).with_name(TRACE_SUMMARY_FILENAME)
+    try:
+        if summary_path.exists():
+            with open(summary_path, 'r') as f:
+                return summary_path, json.load(f)
+        summary = summarize_trace(trace_path)
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return summary_path, summary
+    except Exception as e:
+        print(f"Warning: Could not summarize trace {trace_path}: {e}")
+        return None, None
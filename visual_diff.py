@@ -0,0 +1,277 @@
+"""Visual regression checkpoints: screenshots compared with per-test baselines by a vectorised image diff."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import re
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional, Tuple
+
+import metrics
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# numpy and Pillow are imported by the functions that use them, keeping them
+# out of app startup for deployments and runs that never use checkpoints
+
+# RGB -> YIQ, and the weights of the Y, I and Q differences in the perceptual
+# color distance (as in pixelmatch); MAX_YIQ_DELTA is black vs white
+YIQ = ((0.29889531, 0.58662247, 0.11448223),
+       (0.59597799, -0.27417610, -0.32180189),
+       (0.21147017, -0.52261711, 0.31114694))
+YIQ_WEIGHTS = (0.5053, 0.299, 0.1957)
+MAX_YIQ_DELTA = 35215.0
+
+DIFF_COLOR = (255, 0, 0)
+IGNORED_COLOR = (180, 200, 255)
+
+
+class VisualRegressionError(Exception):
+    """Raised when a run's visual checkpoints differ from their baselines."""
+
+
+def decode_png(data: bytes) -> np.ndarray:
+    """A PNG as an (height, width, 3) uint8 RGB array."""
+    import numpy as np
+    from PIL import Image
+
+    return np.asarray(Image.open(io.BytesIO(data)).convert('RGB'))
+
+
+def encode_png(pixels: np.ndarray) -> bytes:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG', compress_level=1)  # Fast; diff images are mostly flat
+    return buffer.getvalue()
+
+
+def region_mask(shape: Tuple[int, int], regions: Iterable[dict]) -> Optional[np.ndarray]:
+    """
+    Boolean mask of the pixels inside any region (None if there are none).
+
+    Regions are ``{"x", "y", "width", "height"}`` in screenshot pixels and are
+    clipped to the image.
+    """
+    regions = list(regions or ())
+    if not regions:
+        return None
+    import numpy as np
+
+    mask = np.zeros(shape, dtype=bool)
+    for region in regions:
+        try:
+            x, y = int(region['x']), int(region['y'])
+            width, height = int(region['width']), int(region['height'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Masked regions need numeric x, y, width and height: {region!r}")
+        mask[max(0, y):max(0, y + height), max(0, x):max(0, x + width)] = True
+    return mask
+
+
+def differing_pixels(baseline: np.ndarray, actual: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Boolean mask of the pixels whose perceptual color distance exceeds ``threshold``.
+
+    Only pixels whose bytes changed are converted, so near-identical
+    screenshots cost little more than the byte comparison. ``threshold`` is
+    0-1 (of the black/white distance), squared as in pixelmatch.
+    """
+    import numpy as np
+
+    changed = np.any(baseline != actual, axis=-1)
+    if not changed.any():
+        return changed
+    # YIQ is linear, so the difference of the conversions is the conversion of the difference
+    yiq = np.array(YIQ, dtype=np.float32)
+    delta = (actual[changed].astype(np.float32) - baseline[changed].astype(np.float32)) @ yiq.T
+    distance = (delta * delta) @ np.array(YIQ_WEIGHTS, dtype=np.float32)
+    different = np.zeros_like(changed)
+    different[changed] = distance > MAX_YIQ_DELTA * threshold * threshold
+    return different
+
+
+def render_diff(actual: np.ndarray, different: np.ndarray, ignored: Optional[np.ndarray] = None) -> bytes:
+    """A faded grayscale copy of the screenshot with the differing pixels in red and masked regions tinted."""
+    import numpy as np
+
+    luma = actual.astype(np.float32) @ np.array(YIQ[0], dtype=np.float32)
+    faded = (255 - (255 - luma) * 0.25).astype(np.uint8)
+    image = np.repeat(faded[..., None], 3, axis=-1)
+    if ignored is not None:
+        image[ignored] = IGNORED_COLOR
+    image[different] = DIFF_COLOR
+    return encode_png(image)
+
+
+def compare_images(baseline_png: bytes, actual_png: bytes, threshold: float, max_diff_ratio: float,
+                   regions: Iterable[dict] = ()) -> Tuple[dict, Optional[bytes]]:
+    """
+    Compare a screenshot with its baseline.
+
+    Args:
+        baseline_png: The baseline screenshot
+        actual_png: This run's screenshot
+        threshold: Perceptual color distance (0-1) at which a pixel differs
+        max_diff_ratio: Share of compared pixels allowed to differ
+        regions: Regions left out of the comparison (see region_mask)
+
+    Returns:
+        tuple: (comparison, diff_png) where comparison has ``status``
+        ('passed' or 'failed'), ``diff_pixels``, ``diff_ratio`` and, when the
+        sizes differ, ``reason``; diff_png is None when no pixel differs
+    """
+    if baseline_png == actual_png:
+        return {'status': 'passed', 'diff_pixels': 0, 'diff_ratio': 0.0}, None
+    import numpy as np
+
+    baseline, actual = decode_png(baseline_png), decode_png(actual_png)
+    if baseline.shape != actual.shape:
+        reason = (f"size changed from {baseline.shape[1]}x{baseline.shape[0]} "
+                  f"to {actual.shape[1]}x{actual.shape[0]}")
+        return {'status': 'failed', 'diff_pixels': None, 'diff_ratio': None, 'reason': reason}, None
+
+    ignored = region_mask(actual.shape[:2], regions)
+    different = differing_pixels(baseline, actual, threshold)
+    compared = different.size
+    if ignored is not None:
+        different &= ~ignored
+        compared -= int(np.count_nonzero(ignored))
+    diff_pixels = int(np.count_nonzero(different))
+    diff_ratio = diff_pixels / compared if compared else 0.0
+    comparison = {
+        'status': 'failed' if diff_ratio > max_diff_ratio else 'passed',
+        'diff_pixels': diff_pixels,
+        'diff_ratio': round(diff_ratio, 6)
+    }
+    return comparison, render_diff(actual, different, ignored) if diff_pixels else None
+
+
+def checkpoint_slug(name: str) -> str:
+    """A checkpoint or row name as a file name."""
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(name)).strip('._') or 'checkpoint'
+
+
+class VisualChecks:
+    """
+    A run's visual checkpoints, compared with the test's baseline screenshots.
+
+    Test code calls ``await visual_checkpoint(page, name, ...)`` (``check``).
+    A checkpoint without a baseline stores its screenshot as the baseline
+    and passes. Differing checkpoints write the actual screenshot and a diff
+    image to the run's artifacts; the run fails afterwards (see
+    raise_for_failures), so every checkpoint of a run is reported.
+
+    Args:
+        baseline_dir: The test's baselines (None skips every checkpoint, e.g.
+            for unsaved editor code)
+        artifact_dir: Returns the directory for actual and diff images
+        root: Paths in results are relative to this
+        threshold: Default perceptual color distance at which a pixel differs
+        max_diff_ratio: Default share of pixels a checkpoint may differ in
+        key_prefix: Subdirectory of ``baseline_dir`` for these checkpoints
+            (e.g. a data row's)
+    """
+
+    def __init__(self, baseline_dir: Optional[Path], artifact_dir: Callable[[], Path], root: Path,
+                 threshold: float, max_diff_ratio: float, key_prefix: str = ''):
+        self.results: List[dict] = []
+        self._baseline_dir = Path(baseline_dir) if baseline_dir else None
+        self._artifact_dir = artifact_dir
+        self._root = Path(root).resolve()
+        self._threshold = threshold
+        self._max_diff_ratio = max_diff_ratio
+        self._key_prefix = checkpoint_slug(key_prefix) if key_prefix else ''
+        self._count = 0
+
+    async def check(self, page, name: str, mask: Iterable[str] = (), regions: Iterable[dict] = (),
+                    threshold: float = None, max_diff_ratio: float = None, full_page: bool = False) -> dict:
+        """
+        Screenshot the page and compare it with the checkpoint's baseline.
+
+        Args:
+            page: The page to capture
+            name: Checkpoint name, unique within the test
+            mask: Selectors of elements painted over in both screenshots
+                (clocks, ads, avatars)
+            regions: Screenshot regions left out of the comparison
+            threshold: Overrides the per-pixel color distance threshold
+            max_diff_ratio: Overrides the share of pixels allowed to differ
+            full_page: Capture the full scrollable page
+
+        Returns:
+            dict: The checkpoint's result
+        """
+        if self._baseline_dir is None:
+            result = {'checkpoint': name, 'status': 'skipped', 'reason': 'Only saved tests have baselines'}
+            self.results.append(result)
+            return result
+        screenshot = await page.screenshot(type='png', full_page=full_page, animations='disabled',
+                                           mask=[page.locator(selector) for selector in mask])
+        settings = {
+            'threshold': self._threshold if threshold is None else threshold,
+            'max_diff_ratio': self._max_diff_ratio if max_diff_ratio is None else max_diff_ratio,
+            'regions': list(regions)
+        }
+        self._count += 1
+        # Decoding and diffing run off the event loop, beside the other checkpoints and rows
+        result = await asyncio.to_thread(self._compare, self._count, name, screenshot, settings)
+        self.results.append(result)
+        return result
+
+    def _compare(self, index: int, name: str, screenshot: bytes, settings: dict) -> dict:
+        started = time.perf_counter()
+        key = '/'.join(part for part in (self._key_prefix, checkpoint_slug(name)) if part)
+        baseline_path = self._baseline_dir / f"{key}.png"
+        result = {
+            'checkpoint': name,
+            'key': key,
+            'baseline': self._relative(baseline_path),
+            'threshold': settings['threshold'],
+            'max_diff_ratio': settings['max_diff_ratio']
+        }
+        if not baseline_path.exists():
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_bytes(screenshot)
+            result.update(status='new', diff_pixels=0, diff_ratio=0.0)
+        else:
+            comparison, diff_png = compare_images(baseline_path.read_bytes(), screenshot, settings['threshold'],
+                                                  settings['max_diff_ratio'], settings['regions'])
+            result.update(comparison)
+            if comparison['status'] == 'failed' or diff_png:
+                output_dir = self._artifact_dir() / 'visual'
+                output_dir.mkdir(parents=True, exist_ok=True)
+                stem = f"{index:02d}_{checkpoint_slug(name)}"
+                actual_path = output_dir / f"{stem}.png"
+                actual_path.write_bytes(screenshot)
+                result['actual'] = self._relative(actual_path)
+                if diff_png:
+                    diff_path = output_dir / f"{stem}.diff.png"
+                    diff_path.write_bytes(diff_png)
+                    result['diff'] = self._relative(diff_path)
+        duration = time.perf_counter() - started
+        result['duration_ms'] = round(duration * 1000, 1)
+        metrics.VISUAL_CHECKPOINTS.inc(status=result['status'])
+        metrics.VISUAL_DIFF_DURATION.observe(duration)
+        return result
+
+    def _relative(self, path: Path) -> str:
+        return str(path.resolve().relative_to(self._root))
+
+    def failures(self) -> List[dict]:
+        return [result for result in self.results if result['status'] == 'failed']
+
+    def raise_for_failures(self):
+        """Fail the run if any checkpoint differed from its baseline."""
+        failed = self.failures()
+        if not failed:
+            return
+        lines = [f"{len(failed)} of {len(self.results)} visual checkpoints differ from their baselines:"]
+        for result in failed:
+            detail = result.get('reason') or (f"{result['diff_ratio']:.2%} of pixels differ "
+                                              f"(limit {result['max_diff_ratio']:.2%})")
+            lines.append(f"  {result['checkpoint']}: {detail}")
+        raise VisualRegressionError('\n'.join(lines))
@@ -5,7 +5,7 @@ Provides a browser interface to write and run tests, watch browser automation li
 
 import asyncio
 import base64
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
 from flask_socketio import SocketIO, emit
 from datetime import datetime
 import json
@@ -15,36 +15,318 @@ import subprocess
 import tempfile
 import uuid
 import re
-
-from autogen_agentchat.agents import AssistantAgent
-from autogen_agentchat.teams import RoundRobinGroupChat
-from autogen_agentchat.conditions import MaxMessageTermination
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from autogen_core.tools import FunctionTool
-
+import gzip
+import shutil
+import hashlib
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+# The AutoGen/OpenAI stack (AI runs, model client, code chat) is imported on
+# first use so the app starts fast and saved-test deployments need no API key
 from browser_tool import BrowserTool
-from code_agent import CodeGenerationAgent
+from har_tools import finalize_har, load_har, response_sizes, summarize_har, NETWORK_SUMMARY_FILENAME
+from run_timeline import RunTimeline
+from profiler import SamplingProfiler
+from trace_tools import finalize_trace, TRACE_FILENAME
+from log_batcher import MessageStore
+from junit_report import build_junit_xml
+from execution_profiles import DeviceThrottler, ProfileError, RequestBlocker, load_profiles, resolve_profile
+from flaky_tests import RETRYABLE_STATUSES, record_run
+from visual_diff import VisualChecks, VisualRegressionError
+from page_metrics import (PageMetrics, PageMetricsHistory, PerformanceBudgetError, format_summary, parse_budgets,
+                          trend_summary, url_key)
+from load_test import LoadStats, LoadTestError, TimedContext, parse_load_options, run_load, skip_visual_checkpoint
+from data_driven import DataError, SharedBrowsers, failed_rows_message, load_rows, row_label, row_params, run_rows
+from auth_state import AuthSession, AuthStateError, StateCapture, invalidate_state, load_state, save_state, state_info
+from browser_hooks import ContextHooks
+from har_replay import (NETWORK_MODES, NOT_FOUND_POLICIES, ReplayUnavailableError, extracted_har, pin_recording,
+                        recorded_hars, replay_setup, resolve_replay_har, run_har)
+from run_queue import RunQueue, SlotLimiter, QueueFullError, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from run_control import RunControl, RunRegistry
+import run_control
+from run_guard import (LoopWatchdog, PlaywrightTracker, RunTimeoutError, absorb_cancellation, close_within,
+                       interrupt_thread, run_budget)
+import log_batcher
 import config
+import metrics
+
+
+
+class InstrumentedSocketIO(SocketIO):
+    """SocketIO server that counts emitted events and approximate payload bytes.
+
+    Broadcast 'log' events from a thread with a bound run log buffer are
+    queued and sent as 'log_batch'; any other broadcast from that thread
+    flushes the buffer first so clients still see events in order.
+    """
+
+    # Stream frames carry no ordering relative to log lines
+    UNORDERED_EVENTS = ('screenshot',)
+
+    # Set in ASGI server mode (asgi_server.py): emits are handed to the async
+    # Socket.IO server, which orders and batches them itself
+    forward_emit = None
+
+    def emit(self, event, *args, **kwargs):
+        if self.forward_emit is not None:
+            return self.emit_now(event, *args, **kwargs)
+        buffer = log_batcher.current()
+        if buffer is not None and not any(kwargs.get(k) for k in ('to', 'room', 'skip_sid', 'callback')):
+            if event == 'log' and args:
+                buffer.append(args[0])
+                return
+            if event not in self.UNORDERED_EVENTS:
+                buffer.flush()
+        return self.emit_now(event, *args, **kwargs)
+
+    def emit_now(self, event, *args, **kwargs):
+        """Emit immediately, bypassing any log buffer."""
+        metrics.SOCKET_EMITS.inc(event=event)
+        if args:
+            metrics.SOCKET_EMIT_BYTES.inc(metrics.payload_size(args[0]), event=event)
+        if self.forward_emit is not None:
+            return self.forward_emit(event, *args, **kwargs)
+        return super().emit(event, *args, **kwargs)
+
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'autogen-web-tester-secret'
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+socketio = InstrumentedSocketIO(app, cors_allowed_origins="*", async_mode='threading')
+
+# Full text of truncated agent messages, fetched on demand by the log viewer
+agent_messages = MessageStore(max_items=500)
+
+
+def run_log_buffer():
+    """Per-run buffer that coalesces the calling thread's log emits into log_batch events."""
+    return log_batcher.run_log_buffer(socketio.emit_now, interval=config.LOG_BATCH_INTERVAL_MS / 1000)
+
+
+def truncate_agent_message(content: str) -> dict:
+    """Agent message payload fields, truncating oversized content (e.g. get_html results).
+
+    The head and tail are kept so TEST PASSED/FAILED markers near the end
+    still reach the client; the full text is stored for /api/agent-messages.
+    """
+    limit = config.AGENT_MESSAGE_MAX_CHARS
+    if limit <= 0 or len(content) <= limit:
+        return {'content': content}
+    message_id = uuid.uuid4().hex
+    agent_messages.put(message_id, content)
+    # Sliced from the end's index: content[-0:] would be the whole text when the limit leaves no tail
+    head, tail = content[:limit * 3 // 4], content[len(content) - limit // 4:]
+    omitted = len(content) - len(head) - len(tail)
+    return {
+        'content': f"{head}\n… [{omitted} characters truncated] …\n{tail}",
+        'truncated': True,
+        'full_length': len(content),
+        'message_id': message_id
+    }
+
+
+# Code generation agent, created on the first chat message
+_code_agent = None
+_code_agent_lock = threading.Lock()
+
+
+def get_code_agent():
+    """Return the shared code generation agent, creating it (and its OpenAI client) on first use."""
+    global _code_agent
+    with _code_agent_lock:
+        if _code_agent is None:
+            from code_agent import CodeGenerationAgent
+            _code_agent = CodeGenerationAgent(api_key=config.require_openai_api_key(),
+                                              base_url=config.OPENAI_BASE_URL)
+        return _code_agent
+
+
+# Slots each kind of run holds while it executes
+BROWSER_RUN_SLOTS = {'browsers': 1}
+AI_RUN_SLOTS = {'browsers': 1, 'ai_runs': 1}
+
+
+def report_queue_positions(queued, admitted):
+    """Send queue_position events to the clients whose runs are waiting or were just admitted.
+
+    Batch tests have no client of their own (the batch reports progress) and
+    runs admitted without waiting get no event.
+    """
+    for ticket in admitted:
+        metrics.QUEUE_WAIT.observe(ticket.wait_s, kind=ticket.kind)
+        if ticket.sid and ticket.position_reported:
+            socketio.emit('queue_position', dict(ticket.to_dict(), position=0), to=ticket.sid)
+    for position, ticket in enumerate(queued, 1):
+        if ticket.sid:
+            ticket.position_reported = True
+            socketio.emit('queue_position', dict(ticket.to_dict(), position=position,
+                                                 queued=len(queued)), to=ticket.sid)
+
+
+# Admission control for every run, whichever entry point started it
+run_queue = RunQueue(
+    limits={'browsers': config.MAX_CONCURRENT_BROWSERS, 'ai_runs': config.MAX_CONCURRENT_AI_RUNS},
+    max_depth=config.MAX_QUEUE_DEPTH,
+    on_change=report_queue_positions
+)
+llm_limiter = SlotLimiter(config.MAX_CONCURRENT_LLM_CALLS)
+metrics.QUEUE_DEPTH.set_function(lambda: {(): run_queue.depth()})
+
+
+def report_stalled_run(watched):
+    """Watchdog callback: report a run loop that stopped making progress and, if allowed, abort it."""
+    metrics.STALLED_LOOPS.inc()
+    message = f'⚠️ {watched.label}: event loop made no progress for {watched.stalled_for:.0f}s'
+    print(f"Watchdog: {message}")
+    if watched.interrupt and watched.thread_id and interrupt_thread(watched.thread_id):
+        message += ', aborting the run'
+    socketio.emit('log', {'type': 'error', 'message': message})
+
+
+# Detects run loops blocked by synchronous work, which wall-clock budgets can't interrupt
+watchdog = LoopWatchdog(stall_after=config.WATCHDOG_STALL_S, on_stall=report_stalled_run)
+
+
+def watch_run(loop, label: str):
+    """Watch a run's private event loop from the thread that drives it."""
+    return watchdog.watching(loop, label, interrupt=config.WATCHDOG_INTERRUPT)
+
+
+def reject_run(kind: str, sid: str, label: str, error: Exception):
+    """Tell a client its run was turned away because the queue is full."""
+    metrics.RUNS_REJECTED.inc(kind=kind)
+    socketio.emit('run_rejected', {'kind': kind, 'label': label, 'message': str(error)}, to=sid)
+    socketio.emit('log', {'type': 'error', 'message': f'⛔ {error}'}, to=sid)
+
+
+# Runs in flight (queued or executing), looked up by stop_test
+runs = RunRegistry()
+
+
+def queue_run(kind: str, resources: dict, start, sid: str = None, label: str = '',
+              priority: int = PRIORITY_INTERACTIVE):
+    """Register a run and queue it; ``start(control)`` hands it to its executor once admitted.
+
+    Returns:
+        RunControl, or None if the queue was full (the client has been told)
+    """
+    control = runs.register(RunControl(kind, label=label, owner=sid))
+
+    def admitted(ticket):
+        control.ticket = ticket
+        start(control)
+
+    try:
+        control.ticket = run_queue.submit(kind, admitted, resources, priority=priority, label=label,
+                                          sid=sid, run_id=control.run_id)
+    except QueueFullError as e:
+        runs.unregister(control)
+        reject_run(kind, sid, label, e)
+        return None
+    return control
+
+
+def finish_run(control: RunControl):
+    """Return a finished run's queue slots and forget it."""
+    run_queue.release(control.ticket)
+    runs.unregister(control)
+
+
+def submit_run(kind: str, resources: dict, target, *args, sid: str = None, label: str = '',
+               priority: int = PRIORITY_INTERACTIVE):
+    """Queue a run; ``target(*args)`` runs as a background task once it is admitted.
+
+    Returns:
+        RunControl, or None if the queue was full (the client has been told)
+    """
+    def start(control):
+        socketio.start_background_task(_run_admitted, control, target, *args)
+
+    return queue_run(kind, resources, start, sid=sid, label=label, priority=priority)
+
+
+def _run_admitted(control, target, *args):
+    try:
+        # The runner attaches its task to the bound control (run_control.start_task)
+        with run_control.bind(control):
+            target(*args)
+    finally:
+        finish_run(control)
 
-# Initialize code generation agent
-code_agent = CodeGenerationAgent(api_key=config.OPENAI_API_KEY)
 
-# Store active browser session and task
-active_browser = None
+def stop_runs(run_id: str = None, owner: str = None) -> int:
+    """Stop a run (and, for a batch, its tests) or every run a client started.
+
+    Queued runs are dropped from the queue; running ones have their task
+    cancelled, and a stop they don't honour within STOP_TIMEOUT_S is escalated.
+
+    Returns:
+        int: Number of runs asked to stop
+    """
+    controls = runs.matching(run_id=run_id, owner=owner)
+    for control in controls:
+        if control.ticket is not None and run_queue.cancel(control.ticket):
+            runs.unregister(control)
+            socketio.emit('test_complete', {'status': 'stopped', 'message': 'Stopped before it started'},
+                          to=control.owner)
+        elif control.stop() and control.started:
+            threading.Thread(target=enforce_stop, args=(control,), name='stop-enforcer', daemon=True).start()
+    return len(controls)
+
+
+def enforce_stop(control: RunControl):
+    """Escalate a stop the run hasn't honoured, so capacity comes back and the client hears 'stopped'."""
+    if control.done.wait(config.STOP_TIMEOUT_S):
+        return
+    # Blocked in synchronous code: cancellation can't be delivered until it yields
+    if control.owns_thread and control.thread_id:
+        interrupt_thread(control.thread_id, asyncio.CancelledError)
+        if control.done.wait(config.STOP_TIMEOUT_S):
+            return
+    message = f'⚠️ {control.label or "Run"} did not stop within {config.STOP_TIMEOUT_S * 2:g}s; its browser may still be closing'
+    print(f"Warning: {message}")
+    socketio.emit('log', {'type': 'error', 'message': message}, to=control.owner)
+    if control.kind != 'batch':
+        socketio.emit('test_complete', {'status': 'stopped'}, to=control.owner)
+
+
+# Store active task
 active_task = None
-stop_requested = False
 
-# Track current AI step execution for code generation prompt
-current_ai_step = None  # {'filename': '...', 'name': '...'}
+# Run artifacts (videos, HARs, traces, checkpoint diffs), one directory per test and run, and
+# the page metrics trends. Paths in test JSON are relative to its parent, e.g. 'test_artifacts/...'.
+ARTIFACTS_DIR = Path(__file__).parent / 'test_artifacts'
 
 # Saved tests directory
 SAVED_TESTS_DIR = Path(__file__).parent / 'saved_tests'
 SAVED_TESTS_DIR.mkdir(exist_ok=True)
 
+# Pinned HAR recordings that replays serve from, one per saved test
+RECORDINGS_DIR = SAVED_TESTS_DIR / 'recordings'
+
+# Storage state (cookies, localStorage) saved by setup tests, one per setup test
+AUTH_STATES_DIR = SAVED_TESTS_DIR / 'auth_states'
+auth_state_locks = {}
+auth_state_locks_guard = threading.Lock()
+
+# CSV data files of data-driven tests ("data_file")
+DATA_DIR = SAVED_TESTS_DIR / 'data'
+DATA_SETTING_KEYS = ('params', 'data', 'data_file')
+
+# Baseline screenshots of visual checkpoints, one directory per saved test
+BASELINES_DIR = SAVED_TESTS_DIR / 'baselines'
+
+# Load test reports, one directory per saved test (outside test_artifacts/<test>/, whose cleanup
+# removes everything but a test's latest runs)
+LOAD_TESTS_DIR = Path(__file__).parent / 'load_test_reports'
+
+# Per-URL trends of the navigation metrics runs measured, by history file (see page_metrics_history)
+page_metrics_histories = {}
+
+# Execution profiles (requests a run blocks, device it emulates): built-ins plus EXECUTION_PROFILES_FILE
+execution_profiles = load_profiles(config.EXECUTION_PROFILES_FILE)
+
 # AI Steps directory
 AI_STEPS_DIR = Path(__file__).parent / 'ai_steps'
 AI_STEPS_DIR.mkdir(exist_ok=True)
@@ -54,23 +336,481 @@ active_recordings = {}
 TEMP_RECORDINGS_DIR = Path(__file__).parent / 'temp_recordings'
 TEMP_RECORDINGS_DIR.mkdir(exist_ok=True)
 
+# Artifact disk usage is reported by /metrics (walked at most once a minute)
+metrics.track_artifact_dir(ARTIFACTS_DIR)
+
+
+def page_metrics_history() -> PageMetricsHistory:
+    """The per-URL page metrics trends, kept in ARTIFACTS_DIR."""
+    path = ARTIFACTS_DIR / 'page_metrics.json'
+    return page_metrics_histories.setdefault(path, PageMetricsHistory(path, config.PAGE_METRICS_HISTORY_SIZE))
+
+
+def record_run_metrics(run_type: str, status: str, started: float):
+    """Record a finished run's count and duration (``started`` from time.perf_counter())."""
+    metrics.RUNS_TOTAL.inc(type=run_type, status=status)
+    metrics.RUN_DURATION.observe(time.perf_counter() - started, type=run_type, status=status)
+
+
+def parse_run_options(data: dict) -> dict:
+    """On-demand diagnostics requested in a run's socket payload.
+
+    ``profile`` samples the run thread's Python stacks (the event loop and the
+    emit paths it drives); ``trace`` records a Playwright trace. Both are off
+    by default and nothing is started unless they are requested.
+    """
+    data = data or {}
+    return {'profile': bool(data.get('profile')), 'trace': bool(data.get('trace'))}
+
+
+def parse_network_options(data: dict) -> dict:
+    """Network mode and execution profile requested for a run.
+
+    ``network`` is 'live' (default), 'replay' (serve requests from the test's
+    recorded HAR) or 'record' (run live and pin the new HAR for replays once
+    the run passes). Replays take an optional ``replay_not_found`` policy and
+    ``replay_timestamp`` (replay one run's HAR instead of the pinned one).
+    ``execution_profile`` names the profile whose requests are blocked (or
+    is an inline profile), overriding the test's own.
+
+    Raises:
+        RunRequestError: If the mode, policy or profile is unknown
+    """
+    data = data or {}
+    mode = data.get('network') or 'live'
+    if mode not in NETWORK_MODES:
+        raise RunRequestError(f"Unknown network mode '{mode}' (expected one of {', '.join(NETWORK_MODES)})")
+    options = {'network': mode}
+    not_found = data.get('replay_not_found')
+    if not_found:
+        if not_found not in NOT_FOUND_POLICIES:
+            raise RunRequestError(f"Unknown replay_not_found policy '{not_found}'")
+        options['replay_not_found'] = not_found
+    if data.get('replay_timestamp'):
+        options['replay_timestamp'] = Path(data['replay_timestamp']).name
+    if data.get('execution_profile'):
+        try:
+            resolve_profile(data['execution_profile'], execution_profiles)
+        except ProfileError as e:
+            raise RunRequestError(str(e))
+        options['execution_profile'] = data['execution_profile']
+    return options
+
+
+def read_test_settings(test_file: Path) -> dict:
+    """A saved test's or AI step's JSON, for its per-test run settings ({} if unreadable)."""
+    try:
+        with open(test_file, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Could not read run settings of {Path(test_file).name}: {e}")
+        return {}
+
+
+def run_profile(test_file: Path, run_options: dict) -> tuple:
+    """The request blocker and device throttler for a run's execution profile.
+
+    The run's ``execution_profile`` wins over the test JSON's
+    ``"execution_profile"`` (a profile name or an inline profile), and
+    EXECUTION_PROFILE is the default.
+
+    Returns:
+        tuple: (RequestBlocker, DeviceThrottler)
+
+    Raises:
+        ProfileError: If the profile is unknown or malformed
+    """
+    spec = (run_options or {}).get('execution_profile')
+    if not spec and test_file:
+        spec = read_test_settings(test_file).get('execution_profile')
+    name, profile = resolve_profile(spec or config.EXECUTION_PROFILE, execution_profiles)
+    return RequestBlocker(name, profile), DeviceThrottler(name, profile)
+
+
+def apply_run_profile(context_hooks: ContextHooks, blocker: RequestBlocker, throttler: DeviceThrottler,
+                      log=None):
+    """Register an execution profile's request blocking and throttling with a run's context hooks.
+
+    ``log(message)``, if given, announces what the profile does.
+    """
+    if blocker.active:
+        context_hooks.on_context(blocker.setup)
+        if log:
+            log(f'🚫 Execution profile "{blocker.name}": blocking requests')
+    if throttler.active:
+        context_hooks.on_context(throttler.setup)
+        context_hooks.on_page(throttler.throttle)
+        if log:
+            log(f'🐢 Execution profile "{throttler.name}": {throttler.describe()}')
+
+
+def count_blocked_requests(blocker: RequestBlocker):
+    """Add a finished run's blocked requests to /metrics."""
+    for resource_type, count in blocker.by_type.items():
+        metrics.BLOCKED_REQUESTS.inc(count, resource_type=resource_type)
+
+
+def known_response_sizes(test_name: str, artifact_dir: Path = None, limit: int = 3) -> dict:
+    """Bytes per URL from a test's pinned recording and latest recorded HARs (excluding ``artifact_dir``'s)."""
+    candidates = [RECORDINGS_DIR / f"{test_name}.har.gz"]
+    candidates += [har for har in recorded_hars(ARTIFACTS_DIR / test_name)
+                   if not artifact_dir or har.parent.resolve() != Path(artifact_dir).resolve()]
+    sizes = {}
+    for har_path in [har for har in candidates if har.exists()][:limit]:
+        try:
+            for url, size in response_sizes(load_har(har_path)).items():
+                sizes.setdefault(url, size)
+        except Exception as e:
+            print(f"Warning: Could not read response sizes from {har_path}: {e}")
+    return sizes
+
+
+def blocking_record(blocker: RequestBlocker, test_name: str, artifact_dir: Path = None,
+                    throttler: DeviceThrottler = None) -> dict:
+    """Run-record fields for a run's execution profile: what it blocked and the device it emulated.
+
+    Bytes saved are estimated from the sizes the blocked URLs had in the
+    test's earlier recorded HARs. The run's timings (``timing``,
+    ``page_metrics``) were measured under the emulated device.
+    """
+    if not blocker:
+        return {}
+    known_sizes = known_response_sizes(test_name, artifact_dir) if blocker.blocked else None
+    return {'execution_profile': blocker.name, 'blocked': blocker.summary(known_sizes) if blocker.active else None,
+            'throttling': throttler.summary() if throttler and throttler.active else None}
+
+
+def pinned_recording(filename: str) -> Path:
+    """Where a saved test's replay recording is pinned."""
+    return RECORDINGS_DIR / f"{Path(filename).stem}.har.gz"
+
+
+@contextmanager
+def replay_network(hooks: ContextHooks, filename: str, run_options: dict):
+    """Route a replayed run's contexts from the test's recorded HAR.
+
+    Does nothing unless ``run_options['network']`` is 'replay'. The test's
+    JSON may set ``"replay": {"not_found": ..., "url": ...}``; the run's
+    ``replay_not_found`` overrides it, and REPLAY_NOT_FOUND is the default.
+
+    Yields:
+        Path: The HAR being replayed (None for live runs)
+
+    Raises:
+        ReplayUnavailableError: If the test has no recording to replay
+    """
+    run_options = run_options or {}
+    if run_options.get('network') != 'replay':
+        yield None
+        return
+    if not filename:
+        raise ReplayUnavailableError('Only saved tests with a recording can be replayed')
+
+    settings = read_test_settings(SAVED_TESTS_DIR / filename).get('replay') or {}
+    har_path = resolve_replay_har(pinned_recording(filename),
+                                  ARTIFACTS_DIR / Path(filename).stem,
+                                  run_options.get('replay_timestamp'))
+    not_found = run_options.get('replay_not_found') or settings.get('not_found') or config.REPLAY_NOT_FOUND
+    with extracted_har(har_path) as har_file:
+        hooks.on_context(replay_setup(har_file, not_found, url=settings.get('url')))
+        yield har_path
+
+
+def pin_run_recording(filename: str, artifact_dir: Path) -> Path:
+    """Pin the HAR recorded by one run of a saved test as the recording its replays use.
+
+    Returns:
+        Path: The pinned recording
+
+    Raises:
+        ReplayUnavailableError: If the run recorded no HAR
+    """
+    har_path = run_har(artifact_dir)
+    if not har_path:
+        raise ReplayUnavailableError(f'No HAR was recorded by the run at {artifact_dir.name}')
+    pinned = pin_recording(har_path, pinned_recording(filename))
+
+    test_file = SAVED_TESTS_DIR / filename
+    with open(test_file, 'r') as f:
+        test_data = json.load(f)
+    test_data['replay_recording'] = {'timestamp': artifact_dir.name, 'pinned_at': datetime.now().isoformat()}
+    with open(test_file, 'w') as f:
+        json.dump(test_data, f, indent=2)
+    return pinned
+
+
+def auth_state_path(filename: str) -> Path:
+    """Where a setup test's storage state is saved."""
+    return AUTH_STATES_DIR / f"{Path(filename).stem}.json"
+
+
+def save_setup_state(filename: str, settings: dict, capture: StateCapture):
+    """Store the storage state a passing run of a setup test captured.
+
+    Returns:
+        dict: The state's metadata, or None if the run closed no context
+    """
+    if capture.state is None:
+        print(f"Warning: Setup test {filename} closed no browser context; no auth state saved")
+        return None
+    return save_state(auth_state_path(filename), capture.state, settings.get('state_ttl_s') or config.AUTH_STATE_TTL_S)
+
+
+async def provide_auth_state(setup_filename: str, refresh: bool = False, chain: tuple = ()) -> dict:
+    """Storage state of a setup test, running the test first if there is none, it expired, or ``refresh``.
+
+    Runs that need the same state wait for one setup run instead of each
+    starting their own.
+
+    Args:
+        setup_filename: The setup test
+        refresh: Rerun the setup test even if its state is still valid
+        chain: Tests waiting on this state, to catch circular dependencies
+
+    Raises:
+        AuthStateError: If the setup test is missing, not a setup test, fails
+            or saves no state
+    """
+    path = auth_state_path(setup_filename)
+    requested = datetime.now()
+    state = None if refresh else load_state(path)
+    if state is not None:
+        return state
+
+    with auth_state_locks_guard:
+        lock = auth_state_locks.setdefault(Path(setup_filename).stem, threading.Lock())
+    # Polled so a cancelled run never leaves the lock held
+    while not lock.acquire(blocking=False):
+        await asyncio.sleep(0.1)
+    try:
+        # Another run may have refreshed the state while this one waited
+        info = state_info(path)
+        if info and not info['expired'] and (not refresh or datetime.fromisoformat(info['saved_at']) >= requested):
+            return load_state(path)
+        try:
+            test_data = load_saved_test(setup_filename)
+        except RunRequestError as e:
+            raise AuthStateError(f"Setup test {setup_filename}: {e}")
+        if not test_data.get('setup'):
+            raise AuthStateError(f"{setup_filename} is not a setup test (set \"setup\": true in its JSON)")
+        print(f"🔑 Running setup test {setup_filename} for a fresh auth state")
+        status, error = await run_playwright_code_headless_async(
+            test_data.get('code', ''), setup_filename, test_data.get('timeout_s'), {'auth_chain': chain})
+        if status != 'success':
+            reason = (error or status).strip().splitlines()[0]
+            raise AuthStateError(f"Setup test {setup_filename} did not pass: {reason}")
+        state = load_state(path)
+        if state is None:
+            raise AuthStateError(f"Setup test {setup_filename} saved no auth state; close its context or browser "
+                                 f"before run() returns")
+        return state
+    finally:
+        lock.release()
+
+
+async def start_auth_session(hooks: ContextHooks, filename: str, settings: dict, run_options: dict):
+    """Start a run pre-authenticated when its test declares ``"depends_on"`` a setup test.
+
+    Returns:
+        AuthSession: The run's session, or None if the test has no dependency
+
+    Raises:
+        AuthStateError: If the state can't be provided
+    """
+    setup_filename = settings.get('depends_on')
+    if not setup_filename:
+        return None
+    setup_filename = Path(setup_filename).name
+    chain = tuple((run_options or {}).get('auth_chain') or ()) + ((filename,) if filename else ())
+    if setup_filename in chain:
+        raise AuthStateError(f"Circular setup dependency: {' -> '.join(chain + (setup_filename,))}")
+    setup_settings = read_test_settings(SAVED_TESTS_DIR / setup_filename)
+    session = AuthSession(setup_filename, lambda refresh: provide_auth_state(setup_filename, refresh, chain),
+                          setup_settings.get('logged_out_urls') or ())
+    await session.start(hooks)
+    return session
+
+
+async def run_with_auth(run, auth: AuthSession = None, notify=print):
+    """Await ``run()``; if it fails after landing on a logged-out page, refresh the auth state and retry once.
+
+    A run that lands on a logged-out page drops the stored state either way,
+    so the next dependent run starts from a fresh one.
+    """
+    try:
+        await run()
+    except Exception:
+        if not (auth and auth.logged_out_url):
+            raise
+        notify(f"🔑 Landed on logged-out page {auth.logged_out_url}; refreshing auth state from {auth.setup} and retrying")
+        await auth.refresh()
+        await run()
+    if auth and auth.logged_out_url:
+        invalidate_state(auth_state_path(auth.setup))
+
+
+def diagnostics_artifact_dir(artifact_dir: Path = None) -> Path:
+    """Directory for profile/trace output; runs without a saved test get one under test_artifacts/adhoc."""
+    if artifact_dir:
+        return artifact_dir
+    adhoc_dir = new_artifact_dir('adhoc')
+    cleanup_old_artifacts('adhoc', keep_last_n=10)
+    return adhoc_dir
+
+
+def finish_run_diagnostics(diagnostics_dir: Path, profiler: SamplingProfiler = None,
+                           trace_path: str = None) -> dict:
+    """Save a run's CPU profile and announce its downloadable diagnostics.
+
+    Args:
+        diagnostics_dir: Directory the profile/trace belong to
+        profiler: Running profiler to stop and save (None = not profiled)
+        trace_path: Playwright trace written by the run's context (None = not traced)
+
+    Returns:
+        dict: Artifact paths relative to the app root (served by /api/artifacts/<path>)
+    """
+    base_dir = ARTIFACTS_DIR.parent.resolve()
+    diagnostics = {}
+    try:
+        if profiler:
+            profiler.stop()
+            folded_path, summary_path = profiler.save(diagnostics_dir)
+            diagnostics['cpu_profile'] = str(folded_path.resolve().relative_to(base_dir))
+            diagnostics['cpu_profile_summary'] = str(summary_path.resolve().relative_to(base_dir))
+            diagnostics['cpu_samples'] = profiler.samples
+        if trace_path and Path(trace_path).exists():
+            diagnostics['trace'] = str(Path(trace_path).resolve().relative_to(base_dir))
+            summary_path, summary = finalize_trace(trace_path)
+            if summary:
+                diagnostics['trace_summary'] = str(summary_path.resolve().relative_to(base_dir))
+                diagnostics['trace_timing'] = {k: v for k, v in summary.items() if k != 'actions'}
+    except Exception as e:
+        print(f"Warning: Could not save run diagnostics: {e}")
+
+    if diagnostics:
+        socketio.emit('run_diagnostics', diagnostics)
+    return diagnostics
+
+
+def visual_log_entry(result: dict) -> dict:
+    """Log entry for a visual checkpoint's result."""
+    name = result['checkpoint']
+    if result['status'] == 'new':
+        return {'type': 'info', 'message': f'🖼 Checkpoint "{name}": no baseline yet, saved this screenshot as the baseline'}
+    if result['status'] == 'skipped':
+        return {'type': 'info', 'message': f'🖼 Checkpoint "{name}" skipped: {result["reason"]}'}
+    detail = result.get('reason') or f"{result['diff_ratio']:.2%} of pixels differ"
+    if result['status'] == 'failed':
+        diff = f" (diff: /api/artifacts/{result['diff']})" if result.get('diff') else ''
+        return {'type': 'error', 'message': f'🖼 Checkpoint "{name}" differs from its baseline: {detail}{diff}'}
+    return {'type': 'success', 'message': f'🖼 Checkpoint "{name}" matches its baseline ({detail})'}
+
+
+def visual_checks(filename: str, settings: dict, artifact_dir, key_prefix: str = '') -> VisualChecks:
+    """The visual checkpoints of a run of a saved test (baselines under BASELINES_DIR/<test>/).
+
+    The test's ``"visual_threshold"`` and ``"visual_max_diff_ratio"``
+    override VISUAL_THRESHOLD and VISUAL_MAX_DIFF_RATIO; a checkpoint's own
+    arguments override both. Code that isn't a saved test has no baselines.
+    """
+    threshold = settings.get('visual_threshold')
+    max_diff_ratio = settings.get('visual_max_diff_ratio')
+    return VisualChecks(
+        BASELINES_DIR / Path(filename).stem if filename else None,
+        artifact_dir,
+        Path(__file__).parent,
+        threshold=config.VISUAL_THRESHOLD if threshold is None else threshold,
+        max_diff_ratio=config.VISUAL_MAX_DIFF_RATIO if max_diff_ratio is None else max_diff_ratio,
+        key_prefix=key_prefix
+    )
+
+
+def measure_pages(hooks: ContextHooks, settings: dict) -> PageMetrics:
+    """Measure the performance of every navigation in a run's browser contexts.
+
+    The test's ``"perf_budgets"`` (e.g. ``{"lcp_ms": 2500, "transfer_bytes":
+    2000000}``) override PERF_BUDGET_LCP_MS and PERF_BUDGET_TRANSFER_BYTES.
+
+    Returns:
+        PageMetrics: The run's collector, or None when PAGE_METRICS_ENABLED
+        is off and the test sets no budgets
+
+    Raises:
+        PerformanceBudgetError: If the test's budgets are malformed
+    """
+    if not config.PAGE_METRICS_ENABLED and not settings.get('perf_budgets'):
+        return None
+    defaults = {'lcp_ms': config.PERF_BUDGET_LCP_MS, 'transfer_bytes': config.PERF_BUDGET_TRANSFER_BYTES}
+    collector = PageMetrics(parse_budgets(settings.get('perf_budgets'), defaults))
+    hooks.on_context(collector.setup)
+    hooks.on_close(collector.teardown)
+    return collector
+
+
+def page_metrics_record(collector: PageMetrics, test_name: str, artifact_dir: Path = None,
+                        blocker: RequestBlocker = None) -> dict:
+    """Run-record fields for a run's navigation metrics, which are also added to the per-URL trends.
+
+    Trend samples are tagged with the run's execution profile, so throttled
+    runs can be told apart from full-speed ones.
+    """
+    if not collector or not collector.navigations:
+        return {}
+    try:
+        page_metrics_history().record(collector.navigations, test_name, artifact_dir.name if artifact_dir else None,
+                                    profile=blocker.name if blocker else None)
+    except Exception as e:
+        print(f"Warning: Could not record page metrics trends: {e}")
+    return collector.record()
+
+
+def artifact_dir_path(filename: str) -> Path:
+    """The timestamped artifact directory of a new run of a test (not created).
+
+    A run starting in the same second as an earlier one (e.g. a batch
+    retry) gets a ``_2``, ``_3``, ... suffix.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    base = ARTIFACTS_DIR / Path(filename).stem / timestamp
+    artifact_dir, n = base, 1
+    while artifact_dir.exists():
+        n += 1
+        artifact_dir = base.with_name(f"{base.name}_{n}")
+    return artifact_dir
+
+
+def new_artifact_dir(filename: str) -> Path:
+    """A new timestamped artifact directory for a run of a test, never shared with another run."""
+    while True:
+        artifact_dir = artifact_dir_path(filename)
+        try:
+            artifact_dir.mkdir(parents=True)
+            return artifact_dir
+        except FileExistsError:
+            continue  # Another run claimed it first
+
 
 def cleanup_old_artifacts(test_name: str, keep_last_n: int = 10):
-    """Remove old artifact directories, keeping only the last N."""
+    """Remove old artifact directories, keeping the last N with a video and the last N without."""
     import shutil
-    artifact_base = Path(__file__).parent / "test_artifacts" / test_name
+    artifact_base = ARTIFACTS_DIR / test_name
     if not artifact_base.exists():
         return
 
     # Get all timestamp directories, sorted by creation time (newest first)
     try:
-        dirs = sorted(artifact_base.iterdir(), key=lambda x: x.stat().st_ctime, reverse=True)
+        dirs = sorted((d for d in artifact_base.iterdir() if d.is_dir()), key=lambda x: x.stat().st_ctime,
+                      reverse=True)
+        # Counted apart, so batch runs that only hold checkpoint diffs never push recordings out
+        recorded = [d for d in dirs if next(d.rglob('*.webm'), None) is not None]
     except Exception as e:
         print(f"Warning: Could not list artifact directories: {e}")
         return
 
-    # Remove all but the last N
-    for old_dir in dirs[keep_last_n:]:
+    # Remove all but the last N of each
+    others = [d for d in dirs if d not in recorded]
+    for old_dir in recorded[keep_last_n:] + others[keep_last_n:]:
         try:
             shutil.rmtree(old_dir)
             print(f"Cleaned up old artifact: {old_dir}")
@@ -78,8 +818,27 @@ def cleanup_old_artifacts(test_name: str, keep_last_n: int = 10):
             print(f"Warning: Could not remove old artifacts: {e}")
 
 
-def update_test_artifacts(filename: str, artifact_dir: Path, test_status: str = 'unknown'):
-    """Update test JSON metadata with artifact information."""
+# Held while a run's artifact entry is added to its test's JSON
+test_metadata_lock = threading.Lock()
+
+
+def update_test_artifacts(filename: str, artifact_dir: Path, test_status: str = 'unknown',
+                          video_paths: list = None, har_path: str = None,
+                          timeline: RunTimeline = None, trace_path: str = None,
+                          diagnostics: dict = None, run_record: dict = None):
+    """Update test JSON metadata with artifact information.
+
+    Args:
+        filename: Test JSON filename (saved test or AI step)
+        artifact_dir: The run's artifact directory
+        test_status: Final status of the run
+        video_paths: Exact video files written by the run's closed contexts
+        har_path: Exact HAR file written by the run's recording context
+        timeline: Per-action timeline of the run, saved next to the video/HAR
+        trace_path: Playwright trace written by the run's traced context
+        diagnostics: On-demand CPU profile paths from finish_run_diagnostics
+        run_record: Extra fields for the run's artifact entry (e.g. its network mode)
+    """
     if not filename:
         return
 
@@ -97,38 +856,69 @@ def update_test_artifacts(filename: str, artifact_dir: Path, test_status: str =
         return
 
     try:
-        with open(test_file, 'r') as f:
-            test_data = json.load(f)
-
-        # Find video file (Playwright names it automatically)
-        video_files = list(artifact_dir.glob("*.webm"))
-        video_path = video_files[0].relative_to(Path(__file__).parent) if video_files else None
+        # Videos registered by the runner after their contexts closed
+        base_dir = ARTIFACTS_DIR.parent
+        video_files = [Path(p) for p in (video_paths or []) if p and Path(p).exists()]
+        video_path = video_files[0].resolve().relative_to(base_dir.resolve()) if video_files else None
         video_size_mb = video_files[0].stat().st_size / (1024*1024) if video_files else 0
 
-        # Find HAR file
-        har_files = list(artifact_dir.glob("*.har"))
-        har_path = har_files[0].relative_to(Path(__file__).parent) if har_files else None
+        # Summarize the HAR and compress it at rest
+        har_file, summary_file = finalize_har(
+            artifact_dir,
+            Path(har_path) if har_path else None,
+            compress=config.COMPRESS_HAR
+        )
+        har_rel_path = har_file.resolve().relative_to(base_dir.resolve()) if har_file else None
+        har_size_mb = har_file.stat().st_size / (1024*1024) if har_file else 0
+
+        # Per-action timeline and its time breakdown
+        timeline_rel_path = None
+        if timeline:
+            timeline_rel_path = timeline.save(artifact_dir).resolve().relative_to(base_dir.resolve())
 
-        # Add artifact info
-        if 'artifacts' not in test_data:
-            test_data['artifacts'] = []
+        # Per-action durations and network waits parsed from the trace
+        trace_rel_path = None
+        trace_summary_path, trace_summary = finalize_trace(trace_path)
+        if trace_path and Path(trace_path).exists():
+            trace_rel_path = Path(trace_path).resolve().relative_to(base_dir.resolve())
 
         timestamp = artifact_dir.name  # Directory name is the timestamp
-        test_data['artifacts'].append({
+        artifact = {
             'timestamp': timestamp,
             'video_path': str(video_path) if video_path else None,
+            'video_paths': [str(p.resolve().relative_to(base_dir.resolve())) for p in video_files],
             'video_size_mb': round(video_size_mb, 2),
-            'har_path': str(har_path) if har_path else None,
-            'status': test_status
-        })
+            'har_path': str(har_rel_path) if har_rel_path else None,
+            'har_size_mb': round(har_size_mb, 2),
+            'has_network_summary': summary_file is not None,
+            'timeline_path': str(timeline_rel_path) if timeline_rel_path else None,
+            'timing': timeline.breakdown() if timeline else None,
+            'cpu_profile_path': (diagnostics or {}).get('cpu_profile'),
+            'trace_path': str(trace_rel_path) if trace_rel_path else None,
+            'trace_summary_path': str(trace_summary_path.resolve().relative_to(base_dir.resolve())) if trace_summary_path else None,
+            'trace_steps': trace_summary['actions'] if trace_summary else None,
+            'trace_timing': {k: v for k, v in trace_summary.items() if k != 'actions'} if trace_summary else None,
+            'status': test_status,
+            **(run_record or {})
+        }
 
-        # Update test metadata
-        test_data['last_run'] = datetime.now().isoformat()
-        test_data['last_run_status'] = test_status
+        # Runs finalise on worker threads, so concurrent runs of a test take turns with its JSON
+        with test_metadata_lock:
+            with open(test_file, 'r') as f:
+                test_data = json.load(f)
 
-        # Save updated metadata
-        with open(test_file, 'w') as f:
-            json.dump(test_data, f, indent=2)
+            # Add artifact info
+            if 'artifacts' not in test_data:
+                test_data['artifacts'] = []
+            test_data['artifacts'].append(artifact)
+
+            # Update test metadata
+            test_data['last_run'] = datetime.now().isoformat()
+            test_data['last_run_status'] = test_status
+
+            # Save updated metadata
+            with open(test_file, 'w') as f:
+                json.dump(test_data, f, indent=2)
 
         print(f"Updated test metadata with artifact: {video_path}")
 
@@ -143,11 +933,26 @@ def update_test_artifacts(filename: str, artifact_dir: Path, test_status: str =
 class BrowserToolWithScreenshots(BrowserTool):
     """Extended BrowserTool that captures screenshots after each action and continuously streams."""
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, timeline: RunTimeline = None, **kwargs):
         super().__init__(*args, **kwargs)
         self.streaming = False
         self.stream_task = None
         self.playwright_code = []  # Track Playwright code
+        self.timeline = timeline or RunTimeline('ai')
+
+    async def __aenter__(self):
+        await super().__aenter__()
+        metrics.ACTIVE_BROWSERS.inc()
+        metrics.ACTIVE_CONTEXTS.inc()
+        return self
+
+    async def __aexit__(self, *args):
+        self.stop_streaming()
+        try:
+            await super().__aexit__(*args)
+        finally:
+            metrics.ACTIVE_BROWSERS.dec()
+            metrics.ACTIVE_CONTEXTS.dec()
 
     async def start_streaming(self):
         """Start continuous screenshot streaming for video-like experience."""
@@ -166,8 +971,31 @@ class BrowserToolWithScreenshots(BrowserTool):
         """Stop continuous streaming."""
         self.streaming = False
 
+    async def _timed_action(self, name: str, target, action):
+        """Run a tool action in a timeline span; 'Error...' results count as failures."""
+        async with self.timeline.span(name, target) as entry:
+            result = await action()
+            if isinstance(result, str) and result.startswith('Error'):
+                entry['outcome'] = 'error'
+            return result
+
+    async def _settle(self, ms: int):
+        async with self.timeline.span('wait_for_timeout', f'{ms}ms', category='sleep'):
+            await super()._settle(ms)
+
     async def _send_screenshot(self, action_name: str):
+        """Capture and send screenshot via WebSocket, accounting for it in the timeline."""
+        if action_name == 'stream':
+            started = time.perf_counter()
+            await self._capture_and_emit(action_name)
+            self.timeline.record_stream_frame(time.perf_counter() - started)
+        else:
+            async with self.timeline.span('screenshot', action_name, category='screenshot'):
+                await self._capture_and_emit(action_name)
+
+    async def _capture_and_emit(self, action_name: str):
         """Capture and send screenshot via WebSocket (optimized for speed)."""
+        frame_kind = 'stream' if action_name == 'stream' else 'action'
         try:
             # Use JPEG format with quality=40 for fast streaming at high FPS
             # Only capture viewport (not full page) for faster transmission
@@ -176,18 +1004,21 @@ class BrowserToolWithScreenshots(BrowserTool):
                 quality=40,
                 full_page=False
             )
+            metrics.SCREENSHOT_FRAMES_CAPTURED.inc(kind=frame_kind)
             screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
             socketio.emit('screenshot', {
                 'action': action_name,
                 'image': screenshot_b64,
                 'timestamp': datetime.now().isoformat()
             })
+            metrics.SCREENSHOT_FRAMES_EMITTED.inc(kind=frame_kind)
         except Exception as e:
+            metrics.SCREENSHOT_FRAMES_DROPPED.inc(kind=frame_kind)
             print(f"Screenshot error: {e}")
 
     async def navigate(self, url: str) -> str:
         self.playwright_code.append(f'await page.goto("{url}")')
-        result = await super().navigate(url)
+        result = await self._timed_action('navigate', url, lambda: BrowserTool.navigate(self, url))
         await self._send_screenshot('navigate')
         return result
 
@@ -198,7 +1029,7 @@ class BrowserToolWithScreenshots(BrowserTool):
             self.playwright_code.append(f'await page.get_by_role("button", name="{escaped_text}").click()')
         else:
             self.playwright_code.append(f'await page.get_by_text("{escaped_text}").click()')
-        result = await super().click_text(text, role)
+        result = await self._timed_action('click_text', text, lambda: BrowserTool.click_text(self, text, role))
         await self._send_screenshot('click_text')
         return result
 
@@ -207,7 +1038,7 @@ class BrowserToolWithScreenshots(BrowserTool):
         escaped_selector = selector.replace('"', '\\"')
         escaped_value = value.replace('"', '\\"')
         self.playwright_code.append(f'await page.fill("{escaped_selector}", "{escaped_value}")')
-        result = await super().fill_form(selector, value)
+        result = await self._timed_action('fill_form', selector, lambda: BrowserTool.fill_form(self, selector, value))
         await self._send_screenshot('fill_form')
         return result
 
@@ -215,10 +1046,28 @@ class BrowserToolWithScreenshots(BrowserTool):
         # Escape quotes in selector
         escaped_selector = selector.replace('"', '\\"')
         self.playwright_code.append(f'await page.click("{escaped_selector}")')
-        result = await super().click(selector)
+        result = await self._timed_action('click', selector, lambda: BrowserTool.click(self, selector))
         await self._send_screenshot('click')
         return result
 
+    async def get_text(self, selector: str) -> str:
+        return await self._timed_action('get_text', selector, lambda: BrowserTool.get_text(self, selector))
+
+    async def screenshot(self, path: str) -> str:
+        return await self._timed_action('screenshot', path, lambda: BrowserTool.screenshot(self, path))
+
+    async def get_page_content(self) -> str:
+        return await self._timed_action('get_page_content', None, super().get_page_content)
+
+    async def get_current_url(self) -> str:
+        return await self._timed_action('get_current_url', None, super().get_current_url)
+
+    async def get_html(self) -> str:
+        return await self._timed_action('get_html', None, super().get_html)
+
+    async def find_inputs(self) -> str:
+        return await self._timed_action('find_inputs', None, super().find_inputs)
+
 
 def generate_playwright_code(actions):
     """Generate complete Playwright test code from actions."""
@@ -460,42 +1309,101 @@ def run_codegen_process(recording_id: str, url: str, output_file: str, test_name
             pass
 
 
-async def run_test_async(task: str):
-    """Run the test with live updates."""
-    global active_browser, stop_requested, current_ai_step
+async def run_test_async(task: str, run_options: dict = None, ai_step: dict = None):
+    """Run the test with live updates.
+
+    Args:
+        task: Natural-language test steps
+        run_options: Diagnostics, ``timeout_s`` and ``execution_profile``
+            (see parse_run_options and parse_network_options)
+        ai_step: ``{'filename', 'name'}`` when running a saved AI step; its
+            run is recorded under test_artifacts and offered for code generation
 
-    stop_requested = False  # Reset stop flag
+    Returns:
+        tuple: (status, error_message) where status is 'passed', 'failed', 'error',
+        'timeout', 'stopped' or None (no clear status)
+    """
+    run_started = time.perf_counter()
+    metrics.RUNS_IN_PROGRESS.inc(type='ai')
+    timeline = RunTimeline('ai')
     socketio.emit('log', {'type': 'info', 'message': 'Initializing browser...'})
 
     # Create artifacts directory if this is an AI step test with filename
     artifact_dir = None
     video_dir = None
-    test_filename = None  # Save filename before current_ai_step gets reset
+    test_filename = None  # AI step whose artifacts this run records
     test_status = None  # Track test status for artifact metadata
-    if current_ai_step and current_ai_step.get('filename'):
-        from pathlib import Path
-        test_filename = current_ai_step['filename']  # Save for artifact update later
-        test_name = Path(test_filename).stem
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        artifact_dir = Path(__file__).parent / "test_artifacts" / test_name / timestamp
-        artifact_dir.mkdir(parents=True, exist_ok=True)
+    error_message = None  # Why a run that didn't pass failed
+    recording_browser = None  # Holds exact artifact paths once the context closes
+    stream_task = None  # This run's screenshot stream
+    if ai_step and ai_step.get('filename'):
+        test_filename = ai_step['filename']
+        artifact_dir = new_artifact_dir(test_filename)
         video_dir = str(artifact_dir)
         socketio.emit('log', {'type': 'info', 'message': f'📹 Video recording enabled to: {video_dir}'})
 
+    # On-demand diagnostics: sample this (event loop) thread, record a trace
+    run_options = run_options or {}
+    diagnostics_dir = None
+    profiler = None
+    if run_options.get('profile') or run_options.get('trace'):
+        diagnostics_dir = diagnostics_artifact_dir(artifact_dir)
+    if run_options.get('profile'):
+        profiler = SamplingProfiler([threading.get_ident()]).start()
+        socketio.emit('log', {'type': 'info', 'message': '🔬 CPU profiling enabled for this run'})
+    # Traces are recorded on request, or for every recorded run when enabled in config
+    trace_dir = str(diagnostics_dir) if run_options.get('trace') else (
+        video_dir if config.ENABLE_TRACE_RECORDING else None)
+
+    # Requests the run's execution profile blocks, and the setup test's auth state
+    context_hooks = ContextHooks()
+    blocker = None
+    throttler = None
+    auth = None
+    page_perf = None
+
     try:
-        # Initialize browser with screenshots and optional video recording
-        async with BrowserToolWithScreenshots(
-            headless=True,
-            timeout=config.TIMEOUT,
-            record_video_dir=video_dir,
-            record_har=True if video_dir else False
-        ) as browser:
-            active_browser = browser
+        # Fail before launching a browser if the model can't be reached
+        api_key = config.require_openai_api_key()
+        from autogen_agentchat.agents import AssistantAgent
+        from autogen_agentchat.teams import RoundRobinGroupChat
+        from autogen_agentchat.conditions import MaxMessageTermination
+        from autogen_core.tools import FunctionTool
+        from model_client import InstrumentedChatCompletionClient
+
+        blocker, throttler = run_profile(AI_STEPS_DIR / test_filename if test_filename else None, run_options)
+        apply_run_profile(context_hooks, blocker, throttler,
+                          lambda message: socketio.emit('log', {'type': 'info', 'message': message}))
+        settings = read_test_settings(AI_STEPS_DIR / test_filename) if test_filename else {}
+        # Budgets only flag an agent's navigations; the agent decides whether the run passed
+        page_perf = measure_pages(context_hooks, settings)
+        auth = await start_auth_session(context_hooks, test_filename, settings, run_options)
+        if auth:
+            socketio.emit('log', {'type': 'info', 'message': f'🔑 Starting pre-authenticated with the state from {auth.setup}'})
+
+        # Initialize browser with screenshots and optional video recording; the
+        # wall-clock budget closes it (via __aexit__) if the run overruns
+        async with (
+            run_budget(run_options.get('timeout_s') or config.AI_RUN_TIMEOUT_S),
+            BrowserToolWithScreenshots(
+                headless=True,
+                timeout=config.TIMEOUT,
+                record_video_dir=video_dir,
+                record_har=True if video_dir else False,
+                record_trace_dir=trace_dir,
+                trace_screenshots=config.TRACE_SCREENSHOTS,
+                trace_snapshots=config.TRACE_SNAPSHOTS,
+                context_hooks=context_hooks,
+                page_metrics=page_perf,
+                timeline=timeline
+            ) as browser
+        ):
+            recording_browser = browser
 
             socketio.emit('log', {'type': 'info', 'message': 'Browser initialized'})
 
             # Start continuous video-like streaming
-            asyncio.create_task(browser.start_streaming())
+            stream_task = asyncio.create_task(browser.start_streaming())
 
             # Create tools
             navigate_tool = FunctionTool(
@@ -551,9 +1459,12 @@ async def run_test_async(task: str):
             # Create model client
             socketio.emit('log', {'type': 'info', 'message': 'Initializing AI model...'})
 
-            model_client = OpenAIChatCompletionClient(
+            model_client = InstrumentedChatCompletionClient(
                 model=config.MODEL_NAME,
-                api_key=config.OPENAI_API_KEY
+                api_key=api_key,
+                base_url=config.OPENAI_BASE_URL,
+                timeline=timeline,
+                limiter=llm_limiter
             )
 
             # System message
@@ -701,21 +1612,10 @@ These rules apply to ALL tasks. Users will give you natural language instruction
 
             # Run and stream results
             async for message in team.run_stream(task=task):
-                # Check if stop was requested
-                if stop_requested:
-                    socketio.emit('log', {'type': 'error', 'message': 'Test stopped by user'})
-                    # Only send playwright_code for regular tests (not AI steps)
-                    if not current_ai_step:
-                        playwright_code = generate_playwright_code(browser.playwright_code)
-                        socketio.emit('playwright_code', {'code': playwright_code})
-                    socketio.emit('test_complete', {'status': 'stopped'})
-                    current_ai_step = None  # Reset on stop
-                    return
-
-                # Send each message to frontend
+                # Send each message to frontend (oversized tool results are truncated)
                 msg_data = {
                     'type': type(message).__name__,
-                    'content': str(message),
+                    **truncate_agent_message(str(message)),
                     'timestamp': datetime.now().isoformat()
                 }
 
@@ -737,80 +1637,132 @@ These rules apply to ALL tasks. Users will give you natural language instruction
                     socketio.emit('log', {'type': 'success', 'message': 'Test completed: PASSED'})
 
                     # If this was an AI step, prompt user to save generated code
-                    if current_ai_step:
+                    if ai_step:
                         socketio.emit('ai_step_complete_with_code', {
                             'status': 'success',
                             'code': playwright_code,
-                            'ai_step_name': current_ai_step['name'],
-                            'ai_step_filename': current_ai_step['filename']
+                            'ai_step_name': ai_step['name'],
+                            'ai_step_filename': ai_step['filename'],
+                            'timing': timeline.breakdown()
                         })
-                        current_ai_step = None  # Reset after prompting
                     else:
                         # Regular test - send code and complete event
                         socketio.emit('playwright_code', {'code': playwright_code})
-                        socketio.emit('test_complete', {'status': 'success'})
+                        socketio.emit('test_complete', {'status': 'success', 'timing': timeline.breakdown()})
                     break
                 elif 'TEST FAILED:' in message_content:
                     test_status = 'failed'
+                    error_message = message_content[message_content.index('TEST FAILED:'):][:500]
                     socketio.emit('log', {'type': 'error', 'message': 'Test completed: FAILED'})
                     # Only send playwright_code for regular tests (not AI steps)
-                    if not current_ai_step:
+                    if not ai_step:
                         playwright_code = generate_playwright_code(browser.playwright_code)
                         socketio.emit('playwright_code', {'code': playwright_code})
-                    socketio.emit('test_complete', {'status': 'error'})
-                    current_ai_step = None  # Reset on failure
+                    socketio.emit('test_complete', {'status': 'error', 'timing': timeline.breakdown()})
                     break
                 elif 'TEST ERROR:' in message_content:
                     test_status = 'error'
+                    error_message = message_content[message_content.index('TEST ERROR:'):][:500]
                     socketio.emit('log', {'type': 'error', 'message': 'Test completed: ERROR'})
                     # Only send playwright_code for regular tests (not AI steps)
-                    if not current_ai_step:
+                    if not ai_step:
                         playwright_code = generate_playwright_code(browser.playwright_code)
                         socketio.emit('playwright_code', {'code': playwright_code})
-                    socketio.emit('test_complete', {'status': 'error'})
-                    current_ai_step = None  # Reset on error
+                    socketio.emit('test_complete', {'status': 'error', 'timing': timeline.breakdown()})
                     break
 
             # If loop ended naturally without status (hit max messages)
-            if not stop_requested and test_status is None:
+            if test_status is None:
                 socketio.emit('log', {'type': 'error', 'message': 'Test ended without clear status (may have hit message limit)'})
                 # Only send playwright_code for regular tests (not AI steps)
-                if not current_ai_step:
+                if not ai_step:
                     playwright_code = generate_playwright_code(browser.playwright_code)
                     socketio.emit('playwright_code', {'code': playwright_code})
-                socketio.emit('test_complete', {'status': 'error', 'message': 'Test timed out or hit message limit'})
-                current_ai_step = None  # Reset on timeout
-
+                socketio.emit('test_complete', {'status': 'error', 'message': 'Test timed out or hit message limit', 'timing': timeline.breakdown()})
+
+    except RunTimeoutError as e:
+        test_status = 'timeout'
+        error_message = str(e)
+        socketio.emit('log', {'type': 'error', 'message': f'⏱ {e}'})
+        socketio.emit('test_complete', {'status': 'timeout', 'message': str(e), 'timing': timeline.breakdown()})
+    except asyncio.CancelledError:
+        # stop_test cancelled the run; the browser was closed on the way out
+        absorb_cancellation()
+        test_status = 'stopped'
+        socketio.emit('log', {'type': 'error', 'message': 'Test stopped by user'})
+        # Only send playwright_code for regular tests (not AI steps)
+        if not ai_step and recording_browser:
+            playwright_code = generate_playwright_code(recording_browser.playwright_code)
+            socketio.emit('playwright_code', {'code': playwright_code})
+        socketio.emit('test_complete', {'status': 'stopped', 'timing': timeline.breakdown()})
     except Exception as e:
         error_msg = f"Error during test execution: {str(e)}"
         socketio.emit('log', {'type': 'error', 'message': error_msg})
-        socketio.emit('test_complete', {'status': 'error', 'message': str(e)})
+        socketio.emit('test_complete', {'status': 'error', 'message': str(e), 'timing': timeline.breakdown()})
         test_status = 'error'  # Set for artifact tracking
-        current_ai_step = None  # Reset on exception
+        error_message = error_msg
     finally:
-        # Stop streaming when test completes
-        if active_browser:
-            active_browser.stop_streaming()
-        active_browser = None
-
-        # Update test artifacts if video recording was enabled
-        if artifact_dir and test_filename:
-            # Give the browser time to finalize the video
-            import time
-            time.sleep(1)
-            update_test_artifacts(
-                test_filename,
-                artifact_dir,
-                test_status or 'unknown'
-            )
+        # Stop this run's screenshot stream
+        if stream_task:
+            stream_task.cancel()
+            await asyncio.gather(stream_task, return_exceptions=True)
+
+        # Reclaim the browser if closing it during an aborted run failed part-way
+        if recording_browser and recording_browser.browser and recording_browser.browser.is_connected():
+            await close_within(recording_browser.browser.close(), config.FORCE_CLOSE_TIMEOUT_S)
+
+        metrics.RUNS_IN_PROGRESS.dec(type='ai')
+        record_run_metrics('ai', test_status or 'unknown', run_started)
+        if blocker:
+            count_blocked_requests(blocker)
+        # An agent run isn't retried, but the next one starts from a fresh state
+        if auth and auth.logged_out_url:
+            invalidate_state(auth_state_path(auth.setup))
+            socketio.emit('log', {'type': 'info', 'message': f'🔑 Landed on logged-out page {auth.logged_out_url}; '
+                                                             f'the next run refreshes the auth state from {auth.setup}'})
+
+        def finalize_artifacts():
+            diagnostics = None
+            if diagnostics_dir:
+                diagnostics = finish_run_diagnostics(
+                    diagnostics_dir,
+                    profiler=profiler,
+                    trace_path=recording_browser.trace_path if recording_browser else None
+                )
+
+            # Update test artifacts if video recording was enabled. The browser
+            # context has already been closed by BrowserTool.__aexit__, so the
+            # video and HAR are fully written at this point.
+            if artifact_dir and test_filename:
+                update_test_artifacts(
+                    test_filename,
+                    artifact_dir,
+                    test_status or 'unknown',
+                    video_paths=[recording_browser.video_path] if recording_browser and recording_browser.video_path else [],
+                    har_path=recording_browser.har_path if recording_browser else None,
+                    timeline=timeline,
+                    trace_path=recording_browser.trace_path if recording_browser else None,
+                    diagnostics=diagnostics,
+                    run_record={
+                        **page_metrics_record(page_perf, Path(test_filename).stem, artifact_dir, blocker),
+                        **blocking_record(blocker, Path(test_filename).stem, artifact_dir, throttler)
+                    }
+                )
+
+        # HAR compression, trace parsing and JSON rewrites block; under the
+        # ASGI server this loop is shared by every run and client
+        await asyncio.to_thread(finalize_artifacts)
 
+    return test_status, error_message
 
-def run_test_sync(task: str):
-    """Wrapper to run async test in sync context."""
+
+def run_test_sync(task: str, run_options: dict = None, ai_step: dict = None):
+    """Wrapper to run async test in sync context; returns run_test_async's (status, error_message)."""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
     try:
-        loop.run_until_complete(run_test_async(task))
+        with run_log_buffer(), watch_run(loop, 'AI run'):
+            return loop.run_until_complete(run_control.start_task(loop, run_test_async(task, run_options, ai_step)))
     finally:
         # Properly shutdown the event loop to avoid crashes
         try:
@@ -861,36 +1813,110 @@ def run_playwright_code(code: str):
             loop.close()
 
 
-def run_playwright_code_with_streaming(code: str, filename: str = None):
+def prepare_user_code(code: str) -> str:
+    """Strip ``asyncio.run(run())`` and the Playwright/asyncio imports from saved code.
+
+    The runner awaits ``run()`` itself and supplies its own ``async_playwright``.
+    """
+    modified_code = code.replace('asyncio.run(run())', '')
+
+    # Remove common import patterns
+    import_patterns = [
+        'from playwright.async_api import async_playwright\n',
+        'from playwright.async_api import async_playwright, Playwright\n',
+        'from playwright.async_api import Playwright, async_playwright\n',
+        'import asyncio\n',
+    ]
+    for pattern in import_patterns:
+        modified_code = modified_code.replace(pattern, '')
+    return modified_code
+
+
+def run_playwright_code_with_streaming(code: str, filename: str = None, run_options: dict = None):
     """Execute Playwright code with automatic screenshot streaming to browser sidebar."""
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-
-    # Create artifacts directory for this test run if filename provided
-    artifact_dir = None
-    video_dir = None
-    test_status = None  # Track test status for artifact metadata
-    if filename:
+    try:
+        with run_log_buffer(), watch_run(loop, f'Saved test {filename}' if filename else 'Editor run'):
+            loop.run_until_complete(run_control.start_task(loop, run_playwright_code_async(code, filename, run_options)))
+    finally:
+        try:
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        except Exception:
+            pass
+        finally:
+            loop.close()
+
+
+async def run_playwright_code_async(code: str, filename: str = None, run_options: dict = None):
+    """Execute Playwright code with screenshot streaming on the running event loop."""
+    run_started = time.perf_counter()
+    metrics.RUNS_IN_PROGRESS.inc(type='saved')
+    timeline = RunTimeline('saved')
+
+    # Create artifacts directory for this test run if filename provided
+    artifact_dir = None
+    video_dir = None
+    test_status = None  # Track test status for artifact metadata
+    if filename:
         print(f"🎬 Filename provided: {filename}")
-        from pathlib import Path
-        from datetime import datetime
-        test_name = Path(filename).stem
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        artifact_dir = Path(__file__).parent / "test_artifacts" / test_name / timestamp
-        artifact_dir.mkdir(parents=True, exist_ok=True)
+        artifact_dir = new_artifact_dir(filename)
         video_dir = str(artifact_dir)
         print(f"📹 Video directory created: {video_dir}")
         socketio.emit('log', {'type': 'info', 'message': f'📹 Video recording enabled to: {video_dir}'})
     else:
         print("⚠️  No filename provided - video recording disabled")
 
+    # On-demand diagnostics: sample this (event loop) thread, record a trace
+    run_options = run_options or {}
+    diagnostics_dir = None
+    profiler = None
+    if run_options.get('profile') or run_options.get('trace'):
+        diagnostics_dir = diagnostics_artifact_dir(artifact_dir)
+    if run_options.get('profile'):
+        profiler = SamplingProfiler([threading.get_ident()]).start()
+        socketio.emit('log', {'type': 'info', 'message': '🔬 CPU profiling enabled for this run'})
+    # Traces are recorded on request, or for every recorded run when enabled in config
+    trace_dir = str(diagnostics_dir) if run_options.get('trace') else (
+        video_dir if config.ENABLE_TRACE_RECORDING else None)
+
+    # Exact artifact paths registered as recording contexts close
+    recorded_artifacts = {'video_paths': [], 'har_path': None, 'har_target': None,
+                          'trace_path': None, 'trace_target': None}
+    # Screenshot streams started by this run (the loop may be shared with other runs)
+    stream_tasks = []
+    # Browsers the code launched, force-closed at the end if the code left them open
+    launched_browsers = []
+    # Setup applied to every context the code creates (HAR replay, blocking routes and throttling)
+    context_hooks = ContextHooks()
+    network_mode = run_options.get('network', 'live')
+    replayed_har = None
+    blocker = None
+    throttler = None
+    visual = None  # The run's visual checkpoints
+    page_perf = None  # Performance metrics of the run's navigations
+
     async def execute_with_auto_streaming():
         """Execute code with automatic screenshot streaming after each action."""
-        from playwright.async_api import async_playwright
+        from playwright.async_api import async_playwright, Locator
 
-        # Screenshot helper that will be available in user's code
         async def send_screenshot(page, action_name='action'):
+            """Capture and send screenshot, accounting for it in the run timeline."""
+            if action_name == 'stream':
+                started = time.perf_counter()
+                await capture_and_emit(page, action_name)
+                timeline.record_stream_frame(time.perf_counter() - started)
+            else:
+                async with timeline.span('screenshot', action_name, category='screenshot'):
+                    await capture_and_emit(page, action_name)
+
+        # Screenshot helper that will be available in user's code
+        async def capture_and_emit(page, action_name='action'):
             """Capture and send screenshot to browser sidebar."""
+            frame_kind = 'stream' if action_name == 'stream' else 'action'
             try:
                 print(f"📸 Capturing screenshot for action: {action_name}")
                 screenshot_bytes = await page.screenshot(
@@ -898,6 +1924,7 @@ def run_playwright_code_with_streaming(code: str, filename: str = None):
                     quality=40,
                     full_page=False
                 )
+                metrics.SCREENSHOT_FRAMES_CAPTURED.inc(kind=frame_kind)
                 screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
                 print(f"✅ Screenshot captured ({len(screenshot_b64)} bytes), sending to browser...")
                 socketio.emit('screenshot', {
@@ -905,8 +1932,10 @@ def run_playwright_code_with_streaming(code: str, filename: str = None):
                     'image': screenshot_b64,
                     'timestamp': datetime.now().isoformat()
                 })
+                metrics.SCREENSHOT_FRAMES_EMITTED.inc(kind=frame_kind)
                 print(f"✅ Screenshot sent for action: {action_name}")
             except Exception as e:
+                metrics.SCREENSHOT_FRAMES_DROPPED.inc(kind=frame_kind)
                 print(f"❌ Screenshot error: {e}")
                 import traceback
                 traceback.print_exc()
@@ -941,40 +1970,76 @@ def run_playwright_code_with_streaming(code: str, filename: str = None):
             async def goto(self, url, **kwargs):
                 """Navigate and capture screenshot."""
                 print(f"🌐 PageWrapper.goto() called for URL: {url}")
-                result = await self._page.goto(url, **kwargs)
+                async with timeline.span('goto', url):
+                    result = await self._page.goto(url, **kwargs)
+                navigation = await page_perf.snapshot(self._page) if page_perf else None
+                if navigation:
+                    socketio.emit('log', {'type': 'info', 'message': f"⏱ {navigation['url']}: {format_summary(navigation)}"})
                 await send_screenshot(self._page, 'navigate')
                 # Start streaming after first navigation
                 if not self._stream_task:
                     print("📹 Starting continuous screenshot streaming at 10 FPS...")
                     self._stream_task = asyncio.create_task(self._start_streaming())
+                    stream_tasks.append(self._stream_task)
                 return result
 
             async def click(self, selector, **kwargs):
                 """Click and capture screenshot."""
                 print(f"👆 PageWrapper.click() called for selector: {selector}")
-                result = await self._page.click(selector, **kwargs)
+                async with timeline.span('click', selector):
+                    result = await self._page.click(selector, **kwargs)
                 await send_screenshot(self._page, 'click')
                 return result
 
             async def fill(self, selector, value, **kwargs):
                 """Fill and capture screenshot."""
                 print(f"✍️ PageWrapper.fill() called for selector: {selector}")
-                result = await self._page.fill(selector, value, **kwargs)
+                async with timeline.span('fill', selector):
+                    result = await self._page.fill(selector, value, **kwargs)
                 await send_screenshot(self._page, 'fill')
                 return result
 
             async def type(self, selector, text, **kwargs):
                 """Type and capture screenshot."""
-                result = await self._page.type(selector, text, **kwargs)
+                async with timeline.span('type', selector):
+                    result = await self._page.type(selector, text, **kwargs)
                 await send_screenshot(self._page, 'type')
                 return result
 
             async def press(self, selector, key, **kwargs):
                 """Press key and capture screenshot."""
-                result = await self._page.press(selector, key, **kwargs)
+                async with timeline.span('press', f'{selector} {key}'):
+                    result = await self._page.press(selector, key, **kwargs)
                 await send_screenshot(self._page, 'press')
                 return result
 
+            async def wait_for_timeout(self, timeout):
+                """Fixed sleep, recorded separately from actions in the timeline."""
+                async with timeline.span('wait_for_timeout', f'{timeout}ms', category='sleep'):
+                    return await self._page.wait_for_timeout(timeout)
+
+            def _locator(self, name, *args, **kwargs):
+                locator = getattr(self._page, name)(*args, **kwargs)
+                return TimedLocator(locator, self._page, describe_call(name, args, kwargs))
+
+            def locator(self, *args, **kwargs):
+                return self._locator('locator', *args, **kwargs)
+
+            def get_by_role(self, *args, **kwargs):
+                return self._locator('get_by_role', *args, **kwargs)
+
+            def get_by_text(self, *args, **kwargs):
+                return self._locator('get_by_text', *args, **kwargs)
+
+            def get_by_label(self, *args, **kwargs):
+                return self._locator('get_by_label', *args, **kwargs)
+
+            def get_by_placeholder(self, *args, **kwargs):
+                return self._locator('get_by_placeholder', *args, **kwargs)
+
+            def get_by_test_id(self, *args, **kwargs):
+                return self._locator('get_by_test_id', *args, **kwargs)
+
             async def screenshot(self, **kwargs):
                 """Take screenshot and send to sidebar."""
                 result = await self._page.screenshot(**kwargs)
@@ -990,64 +2055,192 @@ def run_playwright_code_with_streaming(code: str, filename: str = None):
                 """Forward all other attributes to the real page."""
                 return getattr(self._page, name)
 
+        def describe_call(name, args, kwargs):
+            """Readable target for a locator call, e.g. get_by_role('link', name='Sign Up')."""
+            parts = [repr(a) for a in args] + [f"{k}={v!r}" for k, v in kwargs.items()]
+            return f"{name}({', '.join(parts)})"
+
+        class TimedLocator(Locator):
+            """Locator whose actions are timed and screenshotted; still a real Locator for expect()."""
+
+            def __init__(self, locator, page, description):
+                super().__init__(locator._impl_obj)
+                self._timed_page = page
+                self._timed_description = description
+
+            def _chain(self, locator, step):
+                return TimedLocator(locator, self._timed_page, f"{self._timed_description}.{step}")
+
+            async def _timed(self, name, action, *args, **kwargs):
+                async with timeline.span(name, self._timed_description):
+                    result = await action(*args, **kwargs)
+                await send_screenshot(self._timed_page, name)
+                return result
+
+            async def click(self, *args, **kwargs):
+                return await self._timed('click', super().click, *args, **kwargs)
+
+            async def dblclick(self, *args, **kwargs):
+                return await self._timed('dblclick', super().dblclick, *args, **kwargs)
+
+            async def fill(self, *args, **kwargs):
+                return await self._timed('fill', super().fill, *args, **kwargs)
+
+            async def type(self, *args, **kwargs):
+                return await self._timed('type', super().type, *args, **kwargs)
+
+            async def press(self, *args, **kwargs):
+                return await self._timed('press', super().press, *args, **kwargs)
+
+            async def check(self, *args, **kwargs):
+                return await self._timed('check', super().check, *args, **kwargs)
+
+            async def uncheck(self, *args, **kwargs):
+                return await self._timed('uncheck', super().uncheck, *args, **kwargs)
+
+            async def select_option(self, *args, **kwargs):
+                return await self._timed('select_option', super().select_option, *args, **kwargs)
+
+            async def hover(self, *args, **kwargs):
+                return await self._timed('hover', super().hover, *args, **kwargs)
+
+            def locator(self, *args, **kwargs):
+                return self._chain(super().locator(*args, **kwargs), describe_call('locator', args, kwargs))
+
+            def get_by_role(self, *args, **kwargs):
+                return self._chain(super().get_by_role(*args, **kwargs), describe_call('get_by_role', args, kwargs))
+
+            def get_by_text(self, *args, **kwargs):
+                return self._chain(super().get_by_text(*args, **kwargs), describe_call('get_by_text', args, kwargs))
+
+            def filter(self, *args, **kwargs):
+                return self._chain(super().filter(*args, **kwargs), describe_call('filter', args, kwargs))
+
+            def nth(self, index):
+                return self._chain(super().nth(index), f'nth({index})')
+
+            @property
+            def first(self):
+                return self._chain(super().first, 'first')
+
+            @property
+            def last(self):
+                return self._chain(super().last, 'last')
+
+        def recording_options():
+            """Recording options for the next context created by the user's code."""
+            if not video_dir:
+                return {}
+            options = {
+                'record_video_dir': video_dir,
+                'record_video_size': {"width": 1280, "height": 720}
+            }
+            # Only the first context records network activity (replays aren't recorded)
+            if network_mode != 'replay' and not recorded_artifacts['har_target']:
+                recorded_artifacts['har_target'] = f"{video_dir}/network.har"
+                options['record_har_path'] = recorded_artifacts['har_target']
+            return options
+
         # Browser context wrapper
         class ContextWrapper:
-            def __init__(self, context):
+            def __init__(self, context, har_path=None, trace_path=None):
                 self._context = context
+                self._har_path = har_path
+                self._trace_path = trace_path
+                self._pages = []
+                self._closed = False
+                metrics.ACTIVE_CONTEXTS.inc()
 
             async def new_page(self):
                 """Create new page with screenshot wrapper."""
                 page = await self._context.new_page()
+                await context_hooks.setup_page(page)
+                self._pages.append(page)
                 return PageWrapper(page)
 
+            async def close(self):
+                """Close the context and register the exact video/HAR files it wrote."""
+                if self._closed:
+                    return
+                self._closed = True
+                metrics.ACTIVE_CONTEXTS.dec()
+                await context_hooks.teardown(self._context)
+                videos = [p.video for p in self._pages if p.video]
+                if self._trace_path:
+                    try:
+                        await self._context.tracing.stop(path=self._trace_path)
+                        recorded_artifacts['trace_path'] = self._trace_path
+                    except Exception as e:
+                        print(f"  Could not save trace: {e}")
+                await self._context.close()
+                # Once the context is closed Playwright guarantees the files are written
+                for video in videos:
+                    try:
+                        recorded_artifacts['video_paths'].append(str(await video.path()))
+                    except Exception as e:
+                        print(f"  Could not resolve video path: {e}")
+                if self._har_path:
+                    recorded_artifacts['har_path'] = self._har_path
+
             def __getattr__(self, name):
                 return getattr(self._context, name)
 
         # Browser wrapper
         class BrowserWrapper:
-            def __init__(self, browser, default_context=None):
+            def __init__(self, browser):
                 self._browser = browser
-                self._default_context = default_context
+                self._default_context = None
                 self._contexts = []
+                self._closed = False
+                metrics.ACTIVE_BROWSERS.inc()
 
             async def new_page(self):
                 """Create new page with screenshot wrapper."""
-                # If we have a default context (with video recording), use it
-                if self._default_context:
-                    page = await self._default_context.new_page()
-                    return PageWrapper(page)
-                else:
-                    page = await self._browser.new_page()
-                    return PageWrapper(page)
+                # With recording enabled, pages live in a recording context
+                if video_dir or trace_dir:
+                    if not self._default_context:
+                        self._default_context = await self.new_context()
+                    return await self._default_context.new_page()
+                page = await self._browser.new_page(**context_hooks.context_options({}))
+                await context_hooks.setup(page.context)
+                await context_hooks.setup_page(page)
+                return PageWrapper(page)
 
             async def new_context(self, **kwargs):
-                """Create new context with wrapper."""
-                context = await self._browser.new_context(**kwargs)
-                wrapped = ContextWrapper(context)
+                """Create new context with wrapper, adding recording options and the run's context hooks."""
+                options = recording_options()
+                options.update(kwargs)
+                options = context_hooks.context_options(options)
+                context = await self._browser.new_context(**options)
+                await context_hooks.setup(context)
+                # Only the first context is traced
+                trace_path = None
+                if trace_dir and not recorded_artifacts['trace_target']:
+                    trace_path = recorded_artifacts['trace_target'] = f"{trace_dir}/{TRACE_FILENAME}"
+                    await context.tracing.start(
+                        screenshots=config.TRACE_SCREENSHOTS,
+                        snapshots=config.TRACE_SNAPSHOTS,
+                        sources=False
+                    )
+                wrapped = ContextWrapper(context, har_path=options.get('record_har_path'), trace_path=trace_path)
                 self._contexts.append(wrapped)
                 return wrapped
 
             async def close(self):
-                """Close all contexts and browser."""
-                print("🔴 BrowserWrapper.close() called - saving videos...")
-                # Close all contexts first (to save videos)
+                """Close all contexts (finalising their recordings) and the browser."""
+                if self._closed:
+                    return
+                self._closed = True
+                metrics.ACTIVE_BROWSERS.dec()
                 for ctx in self._contexts:
                     try:
-                        print(f"  Closing context: {ctx}")
                         await ctx.close()
                     except Exception as e:
                         print(f"  Error closing context: {e}")
-                if self._default_context:
-                    try:
-                        print(f"  Closing default context for video recording...")
-                        await self._default_context.close()
-                        print(f"  ✅ Default context closed - video should be saved")
-                    except Exception as e:
-                        print(f"  ❌ Error closing default context: {e}")
-                print("  Closing browser...")
-                result = await self._browser.close()
-                print("  ✅ Browser closed")
-                return result
+                # Contexts new_page created for itself
+                for context in self._browser.contexts:
+                    await context_hooks.teardown(context)
+                return await self._browser.close()
 
             def __getattr__(self, name):
                 return getattr(self._browser, name)
@@ -1082,22 +2275,9 @@ def run_playwright_code_with_streaming(code: str, filename: str = None):
                 # Override headless to True for smooth streaming without window
                 kwargs['headless'] = True
                 print(f"🚀 Launching browser in HEADLESS mode (streaming to sidebar only)")
-                browser = await self._launcher.launch(**kwargs)
-
-                # Create context with video recording if video_dir is set
-                default_context = None
-                if video_dir:
-                    print(f"📹 Creating browser context with video recording to: {video_dir}")
-                    context_options = {
-                        'record_video_dir': video_dir,
-                        'record_video_size': {"width": 1280, "height": 720}
-                    }
-                    # Also record HAR file for network activity
-                    context_options['record_har_path'] = f"{video_dir}/network.har"
-                    raw_context = await browser.new_context(**context_options)
-                    default_context = ContextWrapper(raw_context)
-
-                return BrowserWrapper(browser, default_context)
+                browser = BrowserWrapper(await self._launcher.launch(**kwargs))
+                launched_browsers.append(browser)
+                return browser
 
             def __getattr__(self, name):
                 return getattr(self._launcher, name)
@@ -1114,23 +2294,35 @@ def run_playwright_code_with_streaming(code: str, filename: str = None):
 
             async def __aexit__(self, *args):
                 print("🎭 async_playwright_wrapper.__aexit__() called")
+                # Finalise recordings of browsers the user's code left open
+                for browser in launched_browsers:
+                    try:
+                        await browser.close()
+                    except Exception as e:
+                        print(f"  Error closing browser: {e}")
                 return await self._playwright_context.__aexit__(*args)
 
         try:
-            nonlocal test_status
+            nonlocal test_status, replayed_har, blocker, throttler, visual, page_perf
             # Remove the playwright import line and asyncio.run() from user's code
             # so we can provide our wrapped version
-            modified_code = code.replace('asyncio.run(run())', '')
-
-            # Remove common import patterns
-            import_patterns = [
-                'from playwright.async_api import async_playwright\n',
-                'from playwright.async_api import async_playwright, Playwright\n',
-                'from playwright.async_api import Playwright, async_playwright\n',
-                'import asyncio\n',
-            ]
-            for pattern in import_patterns:
-                modified_code = modified_code.replace(pattern, '')
+            modified_code = prepare_user_code(code)
+
+            # Interactive runs of a data-driven test use its first data row; batch runs cover every row
+            settings = read_test_settings(SAVED_TESTS_DIR / filename) if filename else {}
+            rows = load_rows(settings, DATA_DIR)
+            params = row_params(rows[0]) if rows else {}
+            if rows:
+                socketio.emit('log', {'type': 'info', 'message': f'📋 Running with data row "{row_label(rows[0], 0)}" '
+                                                                 f'(1 of {len(rows)}); batch runs cover every row'})
+            visual = visual_checks(filename, settings, lambda: artifact_dir,
+                                   row_label(rows[0], 0) if rows else '')
+
+            async def visual_checkpoint(page, name, **kwargs):
+                """Compare a checkpoint with its baseline and report the result in the log."""
+                result = await visual.check(page, name, **kwargs)
+                socketio.emit('log', visual_log_entry(result))
+                return result
 
             # Log the modified code for debugging
             print("=" * 50)
@@ -1145,103 +2337,598 @@ def run_playwright_code_with_streaming(code: str, filename: str = None):
                 'base64': base64,
                 'datetime': datetime,
                 'socketio': socketio,
+                'params': params,
+                'visual_checkpoint': visual_checkpoint,
             }
             exec(modified_code, exec_globals)
 
             # Get and run the user's run function
             if 'run' not in exec_globals:
                 socketio.emit('log', {'type': 'error', 'message': 'Error: Could not find run() function in code'})
-                socketio.emit('test_complete', {'status': 'error'})
+                socketio.emit('test_complete', {'status': 'error', 'timing': timeline.breakdown()})
                 return
 
             run_func = exec_globals['run']
-            await run_func()
+            with replay_network(context_hooks, filename, run_options) as replayed_har:
+                if replayed_har:
+                    socketio.emit('log', {'type': 'info', 'message': f'⏪ Replaying network traffic from {replayed_har.name}'})
+                # Registered after the replay route so blocked requests never reach it
+                blocker, throttler = run_profile(SAVED_TESTS_DIR / filename if filename else None, run_options)
+                apply_run_profile(context_hooks, blocker, throttler,
+                                  lambda message: socketio.emit('log', {'type': 'info', 'message': message}))
+                page_perf = measure_pages(context_hooks, settings)
+                capture = None
+                if settings.get('setup'):
+                    capture = StateCapture()
+                    context_hooks.on_close(capture.capture)
+                auth = await start_auth_session(context_hooks, filename, settings, run_options)
+                if auth:
+                    socketio.emit('log', {'type': 'info', 'message': f'🔑 Starting pre-authenticated with the state from {auth.setup}'})
+                async with run_budget(run_options.get('timeout_s') or config.RUN_TIMEOUT_S):
+                    await run_with_auth(run_func, auth, lambda message: socketio.emit('log', {'type': 'info', 'message': message}))
+                    # Close callbacks of contexts the code left open (a setup test's final state)
+                    await context_hooks.teardown_all()
+                visual.raise_for_failures()
+                if page_perf:
+                    page_perf.raise_for_budgets()
+                if capture and save_setup_state(filename, settings, capture):
+                    socketio.emit('log', {'type': 'success', 'message': '🔑 Auth state saved for dependent tests'})
 
             test_status = 'success'
             socketio.emit('log', {'type': 'success', 'message': '✅ Code execution completed successfully!'})
-            socketio.emit('test_complete', {'status': 'success'})
+            socketio.emit('test_complete', {'status': 'success', 'timing': timeline.breakdown()})
 
+        except RunTimeoutError as e:
+            test_status = 'timeout'
+            socketio.emit('log', {'type': 'error', 'message': f'⏱ {e}'})
+            socketio.emit('test_complete', {'status': 'timeout', 'message': str(e), 'timing': timeline.breakdown()})
+        except ReplayUnavailableError as e:
+            test_status = 'error'
+            socketio.emit('log', {'type': 'error', 'message': f'⏪ {e}'})
+            socketio.emit('test_complete', {'status': 'error', 'message': str(e), 'timing': timeline.breakdown()})
+        except ProfileError as e:
+            test_status = 'error'
+            socketio.emit('log', {'type': 'error', 'message': f'🚫 {e}'})
+            socketio.emit('test_complete', {'status': 'error', 'message': str(e), 'timing': timeline.breakdown()})
+        except AuthStateError as e:
+            test_status = 'error'
+            socketio.emit('log', {'type': 'error', 'message': f'🔑 {e}'})
+            socketio.emit('test_complete', {'status': 'error', 'message': str(e), 'timing': timeline.breakdown()})
+        except DataError as e:
+            test_status = 'error'
+            socketio.emit('log', {'type': 'error', 'message': f'📋 {e}'})
+            socketio.emit('test_complete', {'status': 'error', 'message': str(e), 'timing': timeline.breakdown()})
+        except VisualRegressionError as e:
+            test_status = 'error'
+            socketio.emit('log', {'type': 'error', 'message': f'🖼 {e}'})
+            socketio.emit('test_complete', {'status': 'error', 'message': str(e), 'timing': timeline.breakdown()})
+        except PerformanceBudgetError as e:
+            test_status = 'error'
+            socketio.emit('log', {'type': 'error', 'message': f'⏱ {e}'})
+            socketio.emit('test_complete', {'status': 'error', 'message': str(e), 'timing': timeline.breakdown()})
+        except asyncio.CancelledError:
+            # stop_test cancelled the run; its browsers are closed below
+            absorb_cancellation()
+            test_status = 'stopped'
+            socketio.emit('log', {'type': 'error', 'message': '⏹ Stopped by user'})
+            socketio.emit('test_complete', {'status': 'stopped', 'timing': timeline.breakdown()})
         except Exception as e:
             import traceback
             error_msg = f'Error executing code: {str(e)}'
             test_status = 'error'
             socketio.emit('log', {'type': 'error', 'message': error_msg})
             socketio.emit('log', {'type': 'error', 'message': f'Traceback: {traceback.format_exc()}'})
-            socketio.emit('test_complete', {'status': 'error', 'message': str(e)})
+            socketio.emit('test_complete', {'status': 'error', 'message': str(e), 'timing': timeline.breakdown()})
 
     try:
-        loop.run_until_complete(execute_with_auto_streaming())
+        await execute_with_auto_streaming()
     except Exception as e:
         import traceback
         test_status = 'error'
         socketio.emit('log', {'type': 'error', 'message': f'Execution error: {str(e)}'})
         socketio.emit('log', {'type': 'error', 'message': f'Traceback: {traceback.format_exc()}'})
-        socketio.emit('test_complete', {'status': 'error'})
+        socketio.emit('test_complete', {'status': 'error', 'timing': timeline.breakdown()})
+    finally:
+        # Stop this run's screenshot streams
+        for task in stream_tasks:
+            task.cancel()
+        await asyncio.gather(*stream_tasks, return_exceptions=True)
+
+        # Reclaim browsers an aborted run (or careless code) left open; this
+        # also finalises their recordings
+        for browser in launched_browsers:
+            await close_within(browser.close(), config.FORCE_CLOSE_TIMEOUT_S)
+
+        metrics.RUNS_IN_PROGRESS.dec(type='saved')
+        record_run_metrics('saved', test_status or 'unknown', run_started)
+        if blocker:
+            count_blocked_requests(blocker)
+
+        def finalize_artifacts():
+            diagnostics = None
+            if diagnostics_dir:
+                diagnostics = finish_run_diagnostics(
+                    diagnostics_dir,
+                    profiler=profiler,
+                    trace_path=recorded_artifacts['trace_path']
+                )
+
+            # Update test artifacts if video recording was enabled. Every
+            # recording context was closed (and awaited) inside the run.
+            if artifact_dir and filename:
+                update_test_artifacts(
+                    filename,
+                    artifact_dir,
+                    test_status or 'unknown',
+                    video_paths=recorded_artifacts['video_paths'],
+                    har_path=recorded_artifacts['har_path'],
+                    timeline=timeline,
+                    trace_path=recorded_artifacts['trace_path'],
+                    diagnostics=diagnostics,
+                    run_record={
+                        'network': network_mode,
+                        'replay_har': str(replayed_har.resolve().relative_to(Path(__file__).parent.resolve()))
+                        if replayed_har else None,
+                        'visual': visual.results if visual and visual.results else None,
+                        **page_metrics_record(page_perf, Path(filename).stem, artifact_dir, blocker),
+                        **blocking_record(blocker, Path(filename).stem, artifact_dir, throttler)
+                    }
+                )
+
+        # Off the loop, as in run_test_async
+        await asyncio.to_thread(finalize_artifacts)
+
+        if artifact_dir and filename:
+            # Refreshing the recording pins this run's HAR, but only from a passing run
+            if network_mode == 'record':
+                if test_status != 'success':
+                    socketio.emit('log', {'type': 'error', 'message': '⏺ Recording not refreshed: the run did not pass'})
+                else:
+                    try:
+                        await asyncio.to_thread(pin_run_recording, filename, artifact_dir)
+                        socketio.emit('log', {'type': 'success', 'message': '⏺ Recording refreshed; replays now use this run\'s network traffic'})
+                    except Exception as e:
+                        socketio.emit('log', {'type': 'error', 'message': f'⏺ Could not refresh recording: {e}'})
+
+
+# Batch status and default message for each status an AI run can end with
+AI_RUN_OUTCOMES = {
+    'passed': ('success', None),
+    'failed': ('error', 'Agent reported TEST FAILED'),
+    'error': ('error', 'AI run ended with an error'),
+    'timeout': ('timeout', 'AI run exceeded its time limit'),
+    'stopped': ('stopped', 'Stopped by user'),
+    None: ('error', 'Test ended without clear status (may have hit message limit)')
+}
+
+
+def run_ai_step_headless(step_data: dict, filename: str, timeout_s: float = None, run_options: dict = None):
+    """Run a saved AI step as a batch test.
+
+    The step runs through run_test_async on a private loop, recording its
+    artifacts and status like a run started from the UI. Only the batch's
+    ``execution_profile`` applies from ``run_options``; network replay is
+    for saved tests.
+
+    Returns:
+        tuple: (status, error_message) with the batch statuses of run_playwright_code_headless
+    """
+    steps = step_data.get('steps')
+    if not steps:
+        return 'error', 'No steps found in AI step test'
+    try:
+        test_status, error_message = run_test_sync(steps, *ai_step_batch_run(step_data, filename, timeout_s,
+                                                                             run_options))
+    except Exception as e:
+        import traceback
+        return 'error', f"{str(e)}\n{traceback.format_exc()}"
+    status, default_message = AI_RUN_OUTCOMES.get(test_status, AI_RUN_OUTCOMES[None])
+    return status, error_message or default_message
+
+
+async def run_ai_step_headless_async(step_data: dict, filename: str, timeout_s: float = None,
+                                     run_options: dict = None):
+    """Run a saved AI step as a batch test on the running event loop (see run_ai_step_headless)."""
+    steps = step_data.get('steps')
+    if not steps:
+        return 'error', 'No steps found in AI step test'
+    try:
+        test_status, error_message = await run_test_async(steps, *ai_step_batch_run(step_data, filename, timeout_s,
+                                                                                   run_options))
+    except Exception as e:
+        import traceback
+        return 'error', f"{str(e)}\n{traceback.format_exc()}"
+    status, default_message = AI_RUN_OUTCOMES.get(test_status, AI_RUN_OUTCOMES[None])
+    return status, error_message or default_message
+
+
+def ai_step_batch_run(step_data: dict, filename: str, timeout_s: float, run_options: dict) -> tuple:
+    """The (run_options, ai_step) arguments of run_test_async for an AI step in a batch."""
+    options = {'timeout_s': timeout_s, 'execution_profile': (run_options or {}).get('execution_profile')}
+    return options, {'filename': filename, 'name': step_data.get('name')}
+
+
+def run_playwright_code_headless(code: str, filename: str, timeout_s: float = None, run_options: dict = None,
+                                 row_results: list = None):
+    """Execute Playwright code in headless mode WITHOUT screenshot streaming.
+
+    The code's ``run()`` is driven on a private event loop within a
+    wall-clock budget, watched for stalls. ``row_results`` is filled with
+    each data row's result for a data-driven test.
+
+    Returns:
+        tuple: (status, error_message) where status is 'success', 'error' or 'timeout'
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with watch_run(loop, f'Batch test {filename}'):
+            return loop.run_until_complete(
+                run_control.start_task(loop, run_playwright_code_headless_async(code, filename, timeout_s, run_options,
+                                                                             row_results)))
+    except Exception as e:
+        import traceback
+        error_msg = f"{str(e)}\n{traceback.format_exc()}"
+        return 'error', error_msg
     finally:
         try:
+            # Clean up the event loop
             pending = asyncio.all_tasks(loop)
             for task in pending:
                 task.cancel()
-            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
         except Exception:
             pass
         finally:
             loop.close()
 
-            # Update test artifacts if video recording was enabled
-            if artifact_dir and filename:
-                # Give the browser time to finalize the video
-                import time
-                time.sleep(1)
-                update_test_artifacts(
-                    filename,
-                    artifact_dir,
-                    test_status or 'unknown'
-                )
 
+async def run_playwright_code_headless_async(code: str, filename: str, timeout_s: float = None,
+                                             run_options: dict = None, row_results: list = None):
+    """Execute Playwright code headless on the running event loop.
 
-def run_playwright_code_headless(code: str, filename: str):
-    """Execute Playwright code in headless mode WITHOUT screenshot streaming.
+    The code's ``run()`` is awaited instead of being driven by its own
+    ``asyncio.run``, with ``async_playwright`` swapped for a tracker so any
+    driver left running after a timeout is stopped. A data-driven test runs
+    once per data row (see run_data_rows).
+
+    Args:
+        code: Saved test code defining ``async def run()``
+        filename: Saved test filename
+        timeout_s: Wall-clock budget (defaults to RUN_TIMEOUT_S), shared by all data rows
+        run_options: Network mode and execution profile (see parse_network_options);
+            ``auth_chain`` when run to provide another test's auth state
+        row_results: Filled with each data row's result (see data_driven.run_rows)
 
     Returns:
-        tuple: (status, error_message) where status is 'success' or 'error'
+        tuple: (status, error_message) where status is 'success', 'error' or 'timeout'
     """
-    loop = None
-    try:
-        # Force headless mode
-        modified_code = code.replace('headless=False', 'headless=True')
+    context_hooks = ContextHooks()
+    playwright = PlaywrightTracker(context_hooks)
+    blocker = None
+    throttler = None
+    rows = []
+    row_results = [] if row_results is None else row_results
+    artifact_dir = None
+    visual = None
+    page_perf = None
 
-        # Create a new event loop for this execution
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    def run_artifact_dir():
+        """The run's artifact directory, created on first use (headless runs record no video)."""
+        nonlocal artifact_dir
+        if artifact_dir is None:
+            artifact_dir = new_artifact_dir(filename)
+        return artifact_dir
 
-        # Create namespace with required imports
+    try:
+        modified_code = prepare_user_code(code).replace('headless=False', 'headless=True')
+        settings = read_test_settings(SAVED_TESTS_DIR / filename) if filename else {}
+        rows = load_rows(settings, DATA_DIR)
+        if rows and settings.get('setup'):
+            raise DataError("Setup tests can't be data-driven: dependents need a single auth state")
+        visual = visual_checks(filename, settings, run_artifact_dir)
         namespace = {
             'asyncio': asyncio,
+            'async_playwright': playwright,
+            'params': {},
+            'visual_checkpoint': visual.check,
             '__name__': '__main__'
         }
-
-        # Execute the code (which includes the async def run() and asyncio.run(run()) calls)
         exec(modified_code, namespace)
-
-        return 'success', None
-
+        if 'run' not in namespace:
+            return 'error', 'Could not find run() function in code'
+        with replay_network(context_hooks, filename, run_options):
+            blocker, throttler = run_profile(SAVED_TESTS_DIR / filename if filename else None, run_options)
+            apply_run_profile(context_hooks, blocker, throttler)
+            page_perf = measure_pages(context_hooks, settings)
+            capture = None
+            if settings.get('setup'):
+                capture = StateCapture()
+                context_hooks.on_close(capture.capture)
+            auth = await start_auth_session(context_hooks, filename, settings, run_options)
+            async with run_budget(timeout_s or config.RUN_TIMEOUT_S):
+                if rows:
+                    await run_data_rows(modified_code, filename, rows, settings, playwright, auth,
+                                        run_artifact_dir(), row_results)
+                else:
+                    await run_with_auth(namespace['run'], auth)
+                await context_hooks.teardown_all()
+            visual.raise_for_failures()
+            if page_perf:
+                page_perf.raise_for_budgets()
+            if capture:
+                save_setup_state(filename, settings, capture)
+        failed_rows = failed_rows_message(row_results)
+        status, error_msg = ('error', failed_rows) if failed_rows else ('success', None)
+
+    except RunTimeoutError as e:
+        status, error_msg = 'timeout', str(e)
+    except (ReplayUnavailableError, ProfileError, AuthStateError, DataError, VisualRegressionError,
+            PerformanceBudgetError) as e:
+        status, error_msg = 'error', str(e)
+    except asyncio.CancelledError:
+        absorb_cancellation()
+        status, error_msg = 'stopped', 'Stopped by user'
     except Exception as e:
         import traceback
-        error_msg = f"{str(e)}\n{traceback.format_exc()}"
-        return 'error', error_msg
+        status, error_msg = 'error', f"{str(e)}\n{traceback.format_exc()}"
+    finally:
+        await playwright.stop_all(config.FORCE_CLOSE_TIMEOUT_S)
+        if blocker:
+            count_blocked_requests(blocker)
+
+    # Throttled runs are always recorded, so their profile is kept with their timings. A run
+    # that wrote no files (only metrics) gets an artifact entry but no directory.
+    if filename and (artifact_dir or (visual and visual.results) or (page_perf and page_perf.navigations)
+                     or (throttler and throttler.active)):
+        # Rows cut short by the budget or a stop end with the run
+        for result in row_results:
+            if result['status'] is None:
+                result['status'], result['error'] = status, error_msg
+        # Off the loop, as in run_test_async
+        await asyncio.to_thread(record_headless_run, filename, artifact_dir or artifact_dir_path(filename), status,
+                                run_options, blocker, row_results, visual.results if visual else None, page_perf,
+                                throttler)
+    return status, error_msg
+
+
+async def run_data_rows(code: str, filename: str, rows: list, settings: dict, playwright, auth: AuthSession,
+                        artifact_dir: Path, row_results: list):
+    """Run a data-driven test's code once per data row, in parallel.
+
+    Every row runs in its own browser contexts inside a browser shared by
+    the rows, with ``params`` set to the row's parameters, and records its
+    video under ``row_<n>/`` of the run's artifact directory. A row's
+    visual checkpoints compare with baselines of its own. The test's
+    ``"max_parallel_rows"`` (default DATA_ROW_CONCURRENCY) limits how many
+    rows run at once.
+
+    Args:
+        code: Prepared test code (see prepare_user_code)
+        filename: Saved test filename
+        rows: Data rows from load_rows
+        settings: The test's JSON
+        playwright: The run's PlaywrightTracker (its hooks apply to every row)
+        auth: The run's AuthSession, if the test depends on a setup test
+        artifact_dir: The run's artifact directory
+        row_results: Filled with each row's result
+    """
+    shared = SharedBrowsers(playwright)
+    row_visuals = {}
+    row_videos = {index: [] for index in range(len(rows))}
+
+    async def run_row(index, params):
+        row_dir = artifact_dir / f"row_{index + 1}"
+        row_dir.mkdir(exist_ok=True)
+        # Each row has its own baselines, under the row's label
+        visual = row_visuals[index] = visual_checks(filename, settings, lambda: row_dir, row_label(rows[index], index))
+        namespace = {
+            'asyncio': asyncio,
+            'async_playwright': shared.for_row({
+                'record_video_dir': str(row_dir),
+                'record_video_size': {"width": 1280, "height": 720}
+            }, video_paths=row_videos[index]),
+            'params': params,
+            'visual_checkpoint': visual.check,
+            '__name__': '__main__'
+        }
+        exec(code, namespace)
+        await run_with_auth(namespace['run'], auth)
+        visual.raise_for_failures()
+
+    try:
+        await run_rows(rows, run_row, settings.get('max_parallel_rows') or config.DATA_ROW_CONCURRENCY, row_results)
+    finally:
+        # Finalises the videos of contexts the rows' code left open
+        await close_within(shared.close(), config.FORCE_CLOSE_TIMEOUT_S)
+        for index, visual in row_visuals.items():
+            row_results[index]['visual'] = visual.results
+        for index, videos in row_videos.items():
+            row_results[index]['video_paths'] = videos
+
+
+def record_headless_run(filename: str, artifact_dir: Path, status: str, run_options: dict,
+                        blocker: RequestBlocker = None, row_results: list = None, visual_results: list = None,
+                        page_perf: PageMetrics = None, throttler: DeviceThrottler = None):
+    """Add a headless run to the test's artifacts.
+
+    Records each data row's result and video, the visual checkpoints and the
+    performance metrics of the run's navigations.
+    """
+    video_paths = []
+    base_dir = ARTIFACTS_DIR.parent.resolve()
+    row_results = row_results or []
+    for result in row_results:
+        # Exact files registered as the row's contexts closed
+        videos = [Path(video) for video in result.get('video_paths') or [] if Path(video).exists()]
+        result['video_paths'] = [str(video.resolve().relative_to(base_dir)) for video in videos]
+        video_paths.extend(str(video) for video in videos)
+    update_test_artifacts(filename, artifact_dir, status, video_paths=video_paths, run_record={
+        'network': (run_options or {}).get('network', 'live'),
+        'rows': row_results or None,
+        'visual': visual_results or None,
+        **page_metrics_record(page_perf, Path(filename).stem, artifact_dir, blocker),
+        **blocking_record(blocker, Path(filename).stem, artifact_dir, throttler)
+    })
+
+
+def parse_load_test_options(data: dict, settings: dict) -> dict:
+    """Load-test settings requested for a saved test, plus its execution profile.
+
+    The request's settings win over the test's ``"load_test"`` object,
+    which wins over the LOAD_TEST_* defaults (see load_test.parse_load_options).
+
+    Raises:
+        RunRequestError: If a setting or the execution profile is malformed
+    """
+    defaults = {
+        'users': 1,
+        'ramp_up_s': 0,
+        'duration_s': config.LOAD_TEST_DURATION_S,
+        'think_time_s': config.LOAD_TEST_THINK_TIME_S,
+        'browsers': config.LOAD_TEST_BROWSERS,
+        'interval_s': config.LOAD_TEST_INTERVAL_S
+    }
+    defaults.update(settings.get('load_test') or {})
+    try:
+        options = parse_load_options(data, defaults, config.LOAD_TEST_MAX_USERS, config.MAX_CONCURRENT_BROWSERS)
+    except LoadTestError as e:
+        raise RunRequestError(str(e))
+    if (data or {}).get('execution_profile'):
+        options['execution_profile'] = parse_network_options(data)['execution_profile']
+    return options
+
+
+def run_load_test(filename: str, options: dict, report=None) -> dict:
+    """Run a saved test as a load test on a private event loop (see run_load_test_async)."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        with watch_run(loop, f'Load test {filename}'):
+            return loop.run_until_complete(run_control.start_task(loop, run_load_test_async(filename, options, report)))
     finally:
         try:
-            # Clean up the event loop
-            if loop and not loop.is_closed():
-                pending = asyncio.all_tasks(loop)
-                for task in pending:
-                    task.cancel()
-                if pending:
-                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                loop.close()
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
         except Exception:
             pass
+        finally:
+            loop.close()
+
+
+async def run_load_test_async(filename: str, options: dict, report=None) -> dict:
+    """Run a saved test's ``run()`` as concurrent virtual users.
+
+    Each user runs the test over and over in contexts of its own, inside
+    ``browsers`` pooled browsers, with the test's actions timed (see
+    load_test.run_load for ramp-up, duration and think time). A data-driven
+    test's users take its rows in turn. The test's execution profile and
+    setup dependency apply; videos, HARs, visual checkpoints and page
+    metrics don't, so they don't add load of their own.
+
+    Args:
+        filename: Saved test filename
+        options: Settings from parse_load_test_options
+        report: Called as report(event, data) with ``load_test_progress``
+            after each interval and ``load_test_complete`` with the report
+            (defaults to broadcasting them over Socket.IO)
+
+    Returns:
+        dict: The load test's report, also saved under LOAD_TESTS_DIR
+    """
+    report = report or socketio.emit
+    run_started = time.perf_counter()
+    started_at = datetime.now()
+    stats = LoadStats(options['interval_s'])
+    context_hooks = ContextHooks()
+    playwright = PlaywrightTracker(context_hooks)
+    blocker = None
+    throttler = None
+    test_data = {}
+    metrics.RUNS_IN_PROGRESS.inc(type='load')
+    try:
+        test_data = load_saved_test(filename)
+        code = compile(prepare_user_code(test_data.get('code', '')).replace('headless=False', 'headless=True'),
+                       filename, 'exec')
+        rows = load_rows(test_data, DATA_DIR)
+        blocker, throttler = run_profile(SAVED_TESTS_DIR / filename, options)
+        apply_run_profile(context_hooks, blocker, throttler)
+        # Users of a test with a setup dependency start pre-authenticated
+        await start_auth_session(context_hooks, filename, test_data, options)
+        shared = SharedBrowsers(playwright, options['browsers'])
+
+        def timed_context(context):
+            return TimedContext(context, stats)
+
+        async def run_iteration(user, iteration):
+            namespace = {
+                'asyncio': asyncio,
+                'async_playwright': shared.for_row(slot=user, wrap_context=timed_context),
+                'params': row_params(rows[(user + iteration) % len(rows)]) if rows else {},
+                'visual_checkpoint': skip_visual_checkpoint,
+                '__name__': '__main__'
+            }
+            exec(code, namespace)
+            if 'run' not in namespace:
+                raise RunRequestError('Could not find run() function in code')
+            await namespace['run']()
+
+        try:
+            await run_load(run_iteration, options, stats,
+                           on_interval=lambda interval: report('load_test_progress', dict(interval, filename=filename)),
+                           grace_s=config.LOAD_TEST_GRACE_S)
+        finally:
+            await close_within(shared.close(), config.FORCE_CLOSE_TIMEOUT_S)
+        status, error_msg = 'success', None
+    except (RunRequestError, ProfileError, AuthStateError, DataError) as e:
+        status, error_msg = 'error', str(e)
+    except asyncio.CancelledError:
+        absorb_cancellation()
+        status, error_msg = 'stopped', 'Stopped by user'
+    except Exception as e:
+        import traceback
+        status, error_msg = 'error', f"{str(e)}\n{traceback.format_exc()}"
+    finally:
+        await playwright.stop_all(config.FORCE_CLOSE_TIMEOUT_S)
+        if blocker:
+            count_blocked_requests(blocker)
+        metrics.RUNS_IN_PROGRESS.dec(type='load')
+    record_run_metrics('load', status, run_started)
+
+    result = {
+        'filename': filename,
+        'name': test_data.get('name'),
+        'timestamp': started_at.strftime("%Y-%m-%d_%H-%M-%S"),
+        'started_at': started_at.isoformat(),
+        'status': status,
+        'error': error_msg,
+        'options': {key: value for key, value in options.items() if key != 'execution_profile'},
+        'execution_profile': blocker.name if blocker else None,
+        'throttling': throttler.summary() if throttler and throttler.active else None,
+        **stats.report()
+    }
+    try:
+        save_load_test_report(filename, result)
+    except Exception as e:
+        print(f"Warning: Could not save load test report: {e}")
+    report('load_test_complete', result)
+    return result
+
+
+def save_load_test_report(filename: str, result: dict, keep_last_n: int = 10) -> Path:
+    """Store a load test's report, keeping the test's last N."""
+    report_dir = LOAD_TESTS_DIR / Path(filename).stem
+    report_dir.mkdir(parents=True, exist_ok=True)
+    report_path = report_dir / f"{result['timestamp']}.json"
+    with open(report_path, 'w') as f:
+        json.dump(result, f, indent=2)
+    for old_report in sorted(report_dir.glob('*.json'), reverse=True)[keep_last_n:]:
+        old_report.unlink(missing_ok=True)
+    return report_path
 
 
 @app.route('/')
@@ -1252,6 +2939,18 @@ def index():
     return render_template('index.html', is_cloud=is_cloud)
 
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Expose service metrics in Prometheus text exposition format."""
+    return Response(metrics.render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/api/run-queue')
+def get_run_queue():
+    """Current run queue: concurrency limits, slots in use, running and waiting runs, and stoppable runs."""
+    return jsonify(dict(run_queue.snapshot(), runs=runs.snapshot()))
+
+
 @app.route('/api/example-tests')
 def example_tests():
     """Return example test templates."""
@@ -1330,6 +3029,11 @@ def start_codegen():
     })
 
 
+def data_settings(data: dict) -> dict:
+    """The data-driven settings (``params``, ``data``, ``data_file``) present in a request or test JSON."""
+    return {key: data[key] for key in DATA_SETTING_KEYS if data.get(key) is not None}
+
+
 @app.route('/api/save-test', methods=['POST'])
 def save_test():
     """Save a Playwright test for later reuse."""
@@ -1351,6 +3055,7 @@ def save_test():
         'source': source,
         'created': datetime.now().isoformat()
     }
+    test_data.update(data_settings(data))
 
     filepath = SAVED_TESTS_DIR / filename
     with open(filepath, 'w') as f:
@@ -1359,6 +3064,14 @@ def save_test():
     return jsonify({'success': True, 'filename': filename})
 
 
+def data_row_count(test_data: dict):
+    """How many data rows a saved test runs with (None if it isn't data-driven or its data is malformed)."""
+    try:
+        return len(load_rows(test_data, DATA_DIR)) or None
+    except DataError:
+        return None
+
+
 @app.route('/api/saved-tests')
 def get_saved_tests():
     """Get list of saved tests."""
@@ -1372,9 +3085,17 @@ def get_saved_tests():
                     'name': test_data.get('name'),
                     'created': test_data.get('created'),
                     'source': test_data.get('source', 'ai'),  # Default to 'ai' for backward compatibility
-                    'last_run_status': test_data.get('last_run_status'),  # 'success', 'error', or 'stopped'
+                    'last_run_status': test_data.get('last_run_status'),  # 'success', 'error', 'stopped' or 'timeout'
                     'artifacts': test_data.get('artifacts', []),  # Include artifacts for video recordings
-                    'last_run_time': test_data.get('last_run_time')
+                    'last_run_time': test_data.get('last_run_time'),
+                    'replay_recording': test_data.get('replay_recording'),  # Pinned HAR replays use, if any
+                    'setup': bool(test_data.get('setup')),
+                    'depends_on': test_data.get('depends_on'),
+                    # Saved storage state of a setup test (expiry, without the cookies)
+                    'auth_state': state_info(auth_state_path(filepath.name)) if test_data.get('setup') else None,
+                    'data_rows': data_row_count(test_data),  # Runs per batch of a data-driven test
+                    'flakiness': test_data.get('flakiness'),  # Score over the recent batch runs (0-1)
+                    'quarantined': bool(test_data.get('quarantined'))
                 })
         except Exception as e:
             print(f"Error loading {filepath}: {e}")
@@ -1416,6 +3137,8 @@ def update_saved_test(filename):
         'created': data.get('created', datetime.now().isoformat()),
         'updated': datetime.now().isoformat()
     }
+    # Editing the code keeps the test's parameters and data unless new ones are sent
+    test_data.update(data_settings(data) or data_settings(read_test_settings(filepath)))
 
     with open(filepath, 'w') as f:
         json.dump(test_data, f, indent=2)
@@ -1429,10 +3152,116 @@ def delete_saved_test(filename):
     filepath = SAVED_TESTS_DIR / filename
     if filepath.exists():
         filepath.unlink()
+        pinned_recording(filename).unlink(missing_ok=True)
+        invalidate_state(auth_state_path(filename))
+        shutil.rmtree(BASELINES_DIR / Path(filename).stem, ignore_errors=True)
         return jsonify({'success': True})
     return jsonify({'error': 'Test not found'}), 404
 
 
+@app.route('/api/saved-tests/<filename>/auth-state', methods=['DELETE'])
+def delete_auth_state(filename):
+    """Drop a setup test's saved storage state; the next dependent run reruns the setup test."""
+    if not (SAVED_TESTS_DIR / filename).exists():
+        return jsonify({'error': 'Test not found'}), 404
+    return jsonify({'success': True, 'removed': invalidate_state(auth_state_path(filename))})
+
+
+@app.route('/api/quarantine')
+def get_quarantine():
+    """List the saved tests quarantined as flaky, with their scores and recent batch runs."""
+    tests = []
+    for filepath in SAVED_TESTS_DIR.glob('*.json'):
+        try:
+            with open(filepath, 'r') as f:
+                test_data = json.load(f)
+        except Exception as e:
+            print(f"Error loading {filepath}: {e}")
+            continue
+        if test_data.get('quarantined'):
+            tests.append({
+                'filename': filepath.name,
+                'name': test_data.get('name'),
+                'flakiness': test_data.get('flakiness'),
+                'run_history': test_data.get('run_history', [])
+            })
+
+    tests.sort(key=lambda x: x.get('flakiness') or 0, reverse=True)
+    return jsonify({'tests': tests, 'threshold': config.FLAKY_THRESHOLD, 'min_runs': config.FLAKY_MIN_RUNS})
+
+
+@app.route('/api/quarantine/<filename>', methods=['DELETE'])
+def release_quarantine(filename):
+    """Take a test out of quarantine (e.g. once it's fixed) and start its run history afresh."""
+    filepath = SAVED_TESTS_DIR / filename
+    if not filepath.exists():
+        return jsonify({'error': 'Test not found'}), 404
+
+    with open(filepath, 'r') as f:
+        test_data = json.load(f)
+    was_quarantined = bool(test_data.get('quarantined'))
+    for key in ('run_history', 'flakiness', 'quarantined'):
+        test_data.pop(key, None)
+    with open(filepath, 'w') as f:
+        json.dump(test_data, f, indent=2)
+
+    return jsonify({'success': True, 'released': was_quarantined})
+
+
+@app.route('/api/saved-tests/<filename>/load-tests')
+def list_load_tests(filename):
+    """List a saved test's load test reports, newest first, without their timelines."""
+    reports = []
+    for report_path in sorted((LOAD_TESTS_DIR / Path(filename).stem).glob('*.json'), reverse=True):
+        try:
+            with open(report_path, 'r') as f:
+                result = json.load(f)
+        except Exception as e:
+            print(f"Error loading {report_path}: {e}")
+            continue
+        reports.append({key: result.get(key) for key in ('timestamp', 'status', 'error', 'options', 'elapsed_s',
+                                                         'iterations', 'throughput', 'error_rate')})
+    return jsonify({'reports': reports})
+
+
+@app.route('/api/saved-tests/<filename>/load-tests/<timestamp>')
+def get_load_test(filename, timestamp):
+    """One load test report in full: per-action latency percentiles and the timeline."""
+    report_path = LOAD_TESTS_DIR / Path(filename).stem / f"{Path(timestamp).name}.json"
+    if not report_path.exists():
+        return jsonify({'error': 'Load test not found'}), 404
+    with open(report_path, 'r') as f:
+        return jsonify(json.load(f))
+
+
+@app.route('/api/page-metrics')
+def get_page_metrics_urls():
+    """List the URLs with navigation metrics, most recently measured first, with each one's latest sample."""
+    return jsonify({'urls': page_metrics_history().urls()})
+
+
+@app.route('/api/page-metrics/trend')
+def get_page_metrics_trend():
+    """A URL's navigation metrics across runs, with their median and p75.
+
+    Takes ``?url=`` and optionally ``&limit=`` and ``&profile=`` (only runs
+    under that execution profile).
+    """
+    url = request.args.get('url')
+    if not url:
+        return jsonify({'error': 'url is required'}), 400
+    try:
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    profile = request.args.get('profile')
+    samples = page_metrics_history().trend(url, limit, profile)
+    if not samples:
+        return jsonify({'error': f'No page metrics recorded for {url_key(url)}'
+                                 + (f' under execution profile "{profile}"' if profile else '')}), 404
+    return jsonify({'url': url_key(url), 'profile': profile, 'samples': samples, 'summary': trend_summary(samples)})
+
+
 @app.route('/api/saved-tests/<filename>/status', methods=['POST'])
 def update_test_status(filename):
     """Update the last run status of a saved test."""
@@ -1441,7 +3270,7 @@ def update_test_status(filename):
         return jsonify({'error': 'Test not found'}), 404
 
     data = request.json
-    status = data.get('status')  # 'success', 'error', or 'stopped'
+    status = data.get('status')  # 'success', 'error', 'stopped' or 'timeout'
 
     try:
         # Read existing test data
@@ -1628,16 +3457,25 @@ def update_ai_step_markdown(filename):
     return jsonify({'success': True})
 
 
+@app.route('/api/agent-messages/<message_id>')
+def get_agent_message(message_id):
+    """Full text of an agent message that was truncated in the live log."""
+    content = agent_messages.get(message_id)
+    if content is None:
+        return jsonify({'error': 'Message not found or expired'}), 404
+    return jsonify({'message_id': message_id, 'content': content})
+
+
 @app.route('/api/artifacts/<path:filepath>')
 def serve_artifact(filepath):
     """Serve test artifact files (videos, HAR, traces)."""
     # filepath already includes "test_artifacts/" prefix, so just use it directly
-    artifact_path = Path(__file__).parent / filepath
+    artifact_path = ARTIFACTS_DIR.parent / filepath
 
     # Security: Ensure path is within test_artifacts directory
     try:
         artifact_path = artifact_path.resolve()
-        base_path = (Path(__file__).parent / "test_artifacts").resolve()
+        base_path = ARTIFACTS_DIR.resolve()
         if not str(artifact_path).startswith(str(base_path)):
             return jsonify({'error': 'Invalid path'}), 403
     except Exception:
@@ -1646,6 +3484,30 @@ def serve_artifact(filepath):
     if not artifact_path.exists():
         return jsonify({'error': 'Artifact not found'}), 404
 
+    # Compressed HARs: pass the gzip bytes through when the client accepts them,
+    # otherwise stream-decompress so plain clients still receive JSON
+    if artifact_path.name.endswith('.har.gz'):
+        download_name = artifact_path.name[:-len('.gz')]
+        if 'gzip' in request.headers.get('Accept-Encoding', '').lower():
+            response = send_file(artifact_path, mimetype='application/json', download_name=download_name)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+
+        def generate():
+            with gzip.open(artifact_path, 'rb') as f:
+                while True:
+                    chunk = f.read(64 * 1024)
+                    if not chunk:
+                        break
+                    yield chunk
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='application/json',
+            headers={'Content-Disposition': f'inline; filename="{download_name}"'}
+        )
+
     return send_file(artifact_path)
 
 
@@ -1669,6 +3531,520 @@ def get_test_artifacts(filename):
         return jsonify({'error': f'Failed to load artifacts: {str(e)}'}), 500
 
 
+@app.route('/api/saved-tests/<filename>/artifacts/<timestamp>/network-summary')
+def get_network_summary(filename, timestamp):
+    """Get the precomputed network summary for one artifact run."""
+    artifact_dir = (ARTIFACTS_DIR / Path(filename).stem / timestamp).resolve()
+    base_path = ARTIFACTS_DIR.resolve()
+    if not str(artifact_dir).startswith(str(base_path)):
+        return jsonify({'error': 'Invalid path'}), 403
+    if not artifact_dir.exists():
+        return jsonify({'error': 'Artifact not found'}), 404
+
+    summary_path = artifact_dir / NETWORK_SUMMARY_FILENAME
+    try:
+        if summary_path.exists():
+            with open(summary_path, 'r') as f:
+                return jsonify(json.load(f))
+
+        # Runs recorded before summaries existed: compute once from the
+        # HAR registered in the run's artifact record and store
+        test_file = SAVED_TESTS_DIR / filename
+        if not test_file.exists():
+            test_file = AI_STEPS_DIR / filename
+        if not test_file.exists():
+            return jsonify({'error': 'Test not found'}), 404
+        with open(test_file, 'r') as f:
+            artifacts = json.load(f).get('artifacts', [])
+        record = next((a for a in artifacts if a.get('timestamp') == timestamp), None)
+        har_file = ARTIFACTS_DIR.parent / record['har_path'] if record and record.get('har_path') else None
+        if not har_file or not har_file.exists():
+            return jsonify({'error': 'No HAR recorded for this run'}), 404
+        summary = summarize_har(load_har(har_file))
+        with open(summary_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+        return jsonify(summary)
+    except Exception as e:
+        return jsonify({'error': f'Failed to load network summary: {str(e)}'}), 500
+
+
+@app.route('/api/saved-tests/<filename>/recording', methods=['POST'])
+def pin_test_recording(filename):
+    """Pin the HAR of one recorded run (JSON ``{"timestamp": ...}``) as the test's replay recording."""
+    if not (SAVED_TESTS_DIR / filename).exists():
+        return jsonify({'error': 'Test not found'}), 404
+    timestamp = Path((request.get_json(silent=True) or {}).get('timestamp') or '').name
+    if not timestamp:
+        return jsonify({'error': 'No run timestamp specified'}), 400
+    try:
+        pin_run_recording(filename, ARTIFACTS_DIR / Path(filename).stem / timestamp)
+    except ReplayUnavailableError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'error': f'Failed to pin recording: {str(e)}'}), 500
+    return jsonify({'success': True, 'timestamp': timestamp})
+
+
+def run_visual_results(artifact: dict) -> list:
+    """Every visual checkpoint result of an artifact entry, including each data row's."""
+    results = list(artifact.get('visual') or [])
+    for row in artifact.get('rows') or []:
+        results.extend(row.get('visual') or [])
+    return results
+
+
+@app.route('/api/saved-tests/<filename>/baselines')
+def get_baselines(filename):
+    """List a test's visual checkpoint baselines."""
+    if not (SAVED_TESTS_DIR / filename).exists():
+        return jsonify({'error': 'Test not found'}), 404
+    baseline_dir = BASELINES_DIR / Path(filename).stem
+    baselines = []
+    for path in sorted(baseline_dir.rglob('*.png')) if baseline_dir.exists() else []:
+        baselines.append({
+            'key': path.relative_to(baseline_dir).with_suffix('').as_posix(),
+            'size_kb': round(path.stat().st_size / 1024, 1),
+            'updated': datetime.fromtimestamp(path.stat().st_mtime).isoformat()
+        })
+    return jsonify(baselines)
+
+
+@app.route('/api/saved-tests/<filename>/baselines/<path:key>')
+def get_baseline_image(filename, key):
+    """Serve one baseline screenshot."""
+    baseline_dir = (BASELINES_DIR / Path(filename).stem).resolve()
+    path = (baseline_dir / f"{key}.png").resolve()
+    if not path.is_relative_to(baseline_dir):
+        return jsonify({'error': 'Invalid path'}), 403
+    if not path.exists():
+        return jsonify({'error': 'Baseline not found'}), 404
+    return send_file(path, mimetype='image/png')
+
+
+@app.route('/api/saved-tests/<filename>/baselines', methods=['POST'])
+def accept_baseline(filename):
+    """Make one run's screenshot of a checkpoint the new baseline (JSON ``{"timestamp": ..., "key": ...}``)."""
+    test_file = SAVED_TESTS_DIR / filename
+    if not test_file.exists():
+        return jsonify({'error': 'Test not found'}), 404
+    data = request.get_json(silent=True) or {}
+    timestamp, key = data.get('timestamp'), data.get('key')
+    if not timestamp or not key:
+        return jsonify({'error': 'timestamp and key required'}), 400
+    artifacts = reversed(read_test_settings(test_file).get('artifacts', []))  # Newest run of that timestamp
+    artifact = next((a for a in artifacts if a.get('timestamp') == timestamp), None)
+    if not artifact:
+        return jsonify({'error': f'No run {timestamp}'}), 404
+    result = next((r for r in run_visual_results(artifact) if r.get('key') == key and r.get('actual')), None)
+    if not result:
+        return jsonify({'error': f'Run {timestamp} kept no screenshot of checkpoint {key}'}), 404
+
+    base_dir = Path(__file__).parent
+    actual = base_dir / result['actual']
+    if not actual.exists():
+        return jsonify({'error': 'The run\'s screenshot has been cleaned up'}), 404
+    baseline = base_dir / result['baseline']
+    baseline.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(actual, baseline)
+    return jsonify({'success': True, 'key': key, 'baseline': result['baseline']})
+
+
+@app.route('/api/saved-tests/<filename>/baselines', methods=['DELETE'])
+def delete_baselines(filename):
+    """Drop a test's baselines (``?key=`` for one checkpoint); the next run saves new ones."""
+    if not (SAVED_TESTS_DIR / filename).exists():
+        return jsonify({'error': 'Test not found'}), 404
+    baseline_dir = BASELINES_DIR / Path(filename).stem
+    key = request.args.get('key')
+    if key:
+        path = (baseline_dir / f"{key}.png").resolve()
+        if not path.is_relative_to(baseline_dir.resolve()):
+            return jsonify({'error': 'Invalid path'}), 403
+        removed = path.exists()
+        path.unlink(missing_ok=True)
+    else:
+        removed = baseline_dir.exists()
+        shutil.rmtree(baseline_dir, ignore_errors=True)
+    return jsonify({'success': True, 'removed': removed})
+
+
+# JUnit XML of recently finished HTTP batches, by batch run id
+batch_reports = MessageStore(max_items=50)
+
+# Seconds between keepalives on a quiet progress stream
+STREAM_HEARTBEAT_S = 15
+
+
+def format_stream_event(event: str, data: dict, sse: bool) -> str:
+    """One progress event as a Server-Sent Event or an NDJSON line."""
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({'event': event, **data}) + '\n'
+
+
+@app.route('/api/runs', methods=['POST'])
+def start_run_stream():
+    """Start a batch (or single saved test) and stream its progress.
+
+    Body: ``{"filenames": [...]}`` or ``{"filename": "..."}``; all saved tests
+    when neither is given. ``"network": "replay"`` replays recorded traffic
+    (see parse_network_options) and ``"incremental": true`` skips tests whose
+    last pass still holds (see parse_batch_options). The response streams NDJSON lines, or Server-Sent
+    Events when requested with ``?format=sse`` or ``Accept: text/event-stream``:
+    ``batch_started``, one ``batch_test_progress`` per test (status, error,
+    duration_s), then ``batch_run_complete`` with the summary and the URL of
+    its JUnit XML report.
+    """
+    data = request.get_json(silent=True) or {}
+    filenames = data.get('filenames') or ([data['filename']] if data.get('filename') else None)
+    if filenames is None:
+        filenames = sorted(p.name for p in SAVED_TESTS_DIR.glob('*.json'))
+    if not filenames:
+        return jsonify({'error': 'No saved tests to run'}), 400
+    try:
+        run_options = dict(parse_network_options(data), **parse_batch_options(data))
+    except RunRequestError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        run_queue.ensure_capacity()
+    except QueueFullError as e:
+        metrics.RUNS_REJECTED.inc(kind='batch')
+        return jsonify({'error': str(e)}), 503
+
+    sse = request.args.get('format') == 'sse' or (
+        request.args.get('format') is None and 'text/event-stream' in request.headers.get('Accept', ''))
+    batch = runs.register(RunControl('batch', label=f'HTTP batch ({len(filenames)} tests)'))
+    events = queue.Queue()
+    results = []
+    started_at = datetime.now()
+
+    def report(event, payload):
+        if event == 'batch_test_progress':
+            results.append(payload)
+        elif event == 'batch_run_complete':
+            batch_reports.put(batch.run_id, build_junit_xml(results, payload, timestamp=started_at))
+            payload = dict(payload, run_id=batch.run_id, junit_url=f'/api/runs/{batch.run_id}/junit.xml')
+        events.put((event, payload))
+
+    socketio.start_background_task(run_all_tests_parallel, filenames, 5, batch, report, (), run_options)
+
+    def generate():
+        yield format_stream_event('batch_started', {
+            'run_id': batch.run_id,
+            'total': len(filenames),
+            'filenames': filenames,
+            'stop_url': f'/api/runs/{batch.run_id}/stop'
+        }, sse)
+        while True:
+            try:
+                event, payload = events.get(timeout=STREAM_HEARTBEAT_S)
+            except queue.Empty:
+                # Keeps proxies from closing a stream while a long test runs
+                yield ': keepalive\n\n' if sse else format_stream_event('heartbeat', {}, sse)
+                continue
+            yield format_stream_event(event, payload, sse)
+            if event == 'batch_run_complete':
+                return
+
+    # The batch keeps running if the client disconnects; its report stays available
+    return Response(stream_with_context(generate()),
+                    mimetype='text/event-stream' if sse else 'application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/runs/<run_id>/stop', methods=['POST'])
+def stop_run(run_id):
+    """Stop a run or batch by id (as returned in ``batch_started``)."""
+    if not stop_runs(run_id=run_id):
+        return jsonify({'error': 'Run not found or already finished'}), 404
+    return jsonify({'success': True, 'run_id': run_id})
+
+
+@app.route('/api/runs/<run_id>/junit.xml')
+def get_run_junit(run_id):
+    """JUnit XML report of a finished HTTP batch."""
+    report = batch_reports.get(run_id)
+    if report is None:
+        return jsonify({'error': 'Report not found (batch unknown, still running, or expired)'}), 404
+    return Response(report, mimetype='application/xml')
+
+
+class RunRequestError(Exception):
+    """A run request that can't be started; the message is shown to the client."""
+
+
+def load_saved_test(filename: str) -> dict:
+    """Load a saved test to run it.
+
+    Raises:
+        RunRequestError: If no test was specified or it doesn't exist
+    """
+    if not filename:
+        raise RunRequestError('No test specified')
+    filepath = SAVED_TESTS_DIR / filename
+    if not filepath.exists():
+        raise RunRequestError('Test not found')
+    with open(filepath, 'r') as f:
+        return json.load(f)
+
+
+def load_ai_step(filename: str) -> dict:
+    """Load an AI step test to run it, stamping its last_run time.
+
+    Raises:
+        RunRequestError: If no step was specified, it doesn't exist, or it has no steps
+    """
+    if not filename:
+        raise RunRequestError('No AI step specified')
+    filepath = AI_STEPS_DIR / filename
+    if not filepath.exists():
+        raise RunRequestError('AI step not found')
+
+    with open(filepath, 'r') as f:
+        step_data = json.load(f)
+    if not step_data.get('steps'):
+        raise RunRequestError('No steps found in AI step test')
+
+    # Update last_run timestamp
+    step_data['last_run'] = datetime.now().isoformat()
+    with open(filepath, 'w') as f:
+        json.dump(step_data, f, indent=2)
+    return step_data
+
+
+BATCH_BUDGET_EXHAUSTED = 'Batch time limit reached before this test started'
+BATCH_STOPPED = 'Batch stopped before this test started'
+
+
+def batch_test_timeout(deadline: float, test_data: dict) -> float:
+    """Time limit for one batch test: its own budget, capped by what is left of the batch's.
+
+    Returns:
+        float: Seconds, 0 or less once the batch budget is used up
+    """
+    return min(test_data.get('timeout_s') or config.RUN_TIMEOUT_S, deadline - time.time())
+
+
+def save_batch_result(filepath: Path, test_data: dict, status: str, error_msg: str = None, fingerprint: str = None,
+                      attempts: list = None):
+    """Record a batch run's outcome in the saved test's JSON.
+
+    ``fingerprint`` (see test_fingerprint) is stored with it so incremental
+    runs can tell whether the result still holds. ``attempts`` (each
+    attempt's status) is added to the test's run history, which updates its
+    flakiness score and quarantine.
+    """
+    test_data['last_run_status'] = status
+    test_data['last_run_time'] = time.time()
+    if error_msg:
+        test_data['last_error'] = error_msg
+    if fingerprint:
+        test_data['last_run_hash'] = fingerprint
+    if attempts:
+        record_run(test_data, attempts, config.FLAKY_HISTORY_SIZE, config.FLAKY_THRESHOLD, config.FLAKY_MIN_RUNS)
+    with test_metadata_lock:
+        # Keep artifacts the run added to the file meanwhile (data-driven runs record theirs)
+        test_data['artifacts'] = read_test_settings(filepath).get('artifacts', test_data.get('artifacts', []))
+
+        with open(filepath, 'w') as f:
+            json.dump(test_data, f, indent=2)
+
+
+def parse_batch_options(data: dict) -> dict:
+    """Incremental-run and retry options requested for a batch.
+
+    ``incremental`` skips tests whose last result still holds (see
+    cached_batch_result); ``max_age_s`` overrides INCREMENTAL_MAX_AGE_S;
+    ``retries`` overrides BATCH_RETRIES.
+
+    Raises:
+        RunRequestError: If ``max_age_s`` isn't a positive number or
+            ``retries`` an integer from 0 to BATCH_MAX_RETRIES
+    """
+    data = data or {}
+    options = {'incremental': bool(data.get('incremental'))}
+    if data.get('retries') is not None:
+        options['retries'] = parse_retries(data['retries'], 'retries')
+    if data.get('max_age_s') is not None:
+        try:
+            options['max_age_s'] = float(data['max_age_s'])
+        except (TypeError, ValueError):
+            options['max_age_s'] = 0
+        if options['max_age_s'] <= 0:
+            raise RunRequestError('max_age_s must be a positive number of seconds')
+    return options
+
+
+def parse_retries(value, source: str) -> int:
+    """A retry count from a batch request or a test's JSON.
+
+    Raises:
+        RunRequestError: If it isn't an integer from 0 to BATCH_MAX_RETRIES
+    """
+    try:
+        # Booleans and fractions aren't counts, even though int() takes them
+        retries = int(str(value)) if not isinstance(value, bool) else -1
+    except ValueError:
+        retries = -1
+    if not 0 <= retries <= config.BATCH_MAX_RETRIES:
+        raise RunRequestError(f'{source} must be an integer from 0 to {config.BATCH_MAX_RETRIES}, got {value!r}')
+    return retries
+
+
+def test_fingerprint(test_data: dict, kind: str, run_options: dict = None) -> str:
+    """Hash of what a test run depends on: its code (or AI steps) and the run's configuration.
+
+    The configuration is the network mode, execution profile and setup
+    dependency, so a pass recorded under one doesn't count for another.
+    A data-driven test's rows (including its CSV's contents) count as code.
+    """
+    run_options = run_options or {}
+    material = {
+        'kind': kind,
+        'content': test_data.get('steps') if kind == 'ai' else test_data.get('code'),
+        'network': run_options.get('network', 'live') if kind == 'saved' else None,
+        'execution_profile': (run_options.get('execution_profile') or test_data.get('execution_profile')
+                              or config.EXECUTION_PROFILE),
+        'depends_on': test_data.get('depends_on')
+    }
+    if kind == 'saved':
+        try:
+            rows = load_rows(test_data, DATA_DIR)
+        except DataError as e:
+            rows = str(e)
+        if rows:
+            material['rows'] = rows
+    return hashlib.sha256(json.dumps(material, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def last_run_timestamp(test_data: dict):
+    """When a test last ran, as a Unix timestamp (batch runs store one, UI runs an ISO date)."""
+    for key in ('last_run_time', 'last_run'):
+        value = test_data.get(key)
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                continue
+    return None
+
+
+def cached_batch_result(filename: str, kind: str, run_options: dict):
+    """The batch result of a test an incremental run can skip.
+
+    A test is skipped when its fingerprint matches the one stored with its
+    last result, that result was a pass, and it is at most ``max_age_s``
+    (INCREMENTAL_MAX_AGE_S) old.
+
+    Returns:
+        dict: A cached pass for ``batch_test_progress``, or None if the test must run
+    """
+    filepath = (AI_STEPS_DIR if kind == 'ai' else SAVED_TESTS_DIR) / filename
+    try:
+        with open(filepath, 'r') as f:
+            test_data = json.load(f)
+    except Exception:
+        return None
+    last_run = last_run_timestamp(test_data)
+    max_age_s = run_options.get('max_age_s') or config.INCREMENTAL_MAX_AGE_S
+    if (test_data.get('last_run_hash') != test_fingerprint(test_data, kind, run_options)
+            or test_data.get('last_run_status') not in ('success', 'passed')
+            or last_run is None or time.time() - last_run > max_age_s):
+        return None
+    return {
+        'filename': filename,
+        'name': test_data.get('name', filename),
+        'kind': kind,
+        'status': 'success',
+        'error': None,
+        'duration_s': 0,
+        'cached': True,
+        'last_run_time': datetime.fromtimestamp(last_run).isoformat(timespec='seconds')
+    }
+
+
+def batch_rows(row_results: list):
+    """Per-row results of a data-driven test for its batch result (None for other tests)."""
+    if not row_results:
+        return None
+    return [{key: result.get(key) for key in ('label', 'status', 'error', 'duration_s', 'video_paths')}
+            for result in row_results]
+
+
+def batch_retries(test_data: dict, run_options: dict) -> int:
+    """Extra attempts a failed saved test gets in a batch: the batch's ``retries``, the test's, else BATCH_RETRIES.
+
+    Raises:
+        RunRequestError: If the test's ``"retries"`` is malformed (see parse_retries)
+    """
+    if run_options.get('retries') is not None:
+        return run_options['retries']  # Checked by parse_batch_options
+    if test_data.get('retries') is not None:
+        return parse_retries(test_data['retries'], 'The test\'s "retries"')
+    return min(config.BATCH_RETRIES, config.BATCH_MAX_RETRIES)
+
+
+def attempt_summary(attempts: list, test_data: dict) -> dict:
+    """Retry fields of a batch result: attempts made, whether it was retried or passed only on a retry."""
+    return {
+        'attempts': len(attempts),
+        'retried': len(attempts) > 1,
+        'flaky': len(attempts) > 1 and attempts[-1] == 'success',
+        'flakiness': test_data.get('flakiness')
+    }
+
+
+def split_quarantined(filenames) -> tuple:
+    """Split saved test filenames into (regular, quarantined) by each test's ``quarantined`` flag."""
+    regular, quarantined = [], []
+    for filename in filenames:
+        try:
+            with open(SAVED_TESTS_DIR / filename, 'r') as f:
+                is_quarantined = bool(json.load(f).get('quarantined'))
+        except Exception:
+            is_quarantined = False  # Reported as not found (or unreadable) when it runs
+        (quarantined if is_quarantined else regular).append(filename)
+    return regular, quarantined
+
+
+def summarize_batch(results: list, duration: float) -> dict:
+    """The ``batch_run_complete`` summary of a batch's results.
+
+    Quarantined tests count towards ``total`` and ``passed`` but never
+    towards ``failed``; their failures are counted in ``quarantine_failed``.
+    """
+    regular = [r for r in results if not r.get('quarantined')]
+    quarantined = [r for r in results if r.get('quarantined')]
+    return {
+        'total': len(results),
+        'passed': sum(1 for r in results if r['status'] == 'success'),
+        'failed': sum(1 for r in regular if r['status'] != 'success'),
+        'timed_out': sum(1 for r in regular if r['status'] == 'timeout'),
+        'stopped': sum(1 for r in regular if r['status'] == 'stopped'),
+        'cached': sum(1 for r in results if r.get('cached')),  # Passes reused by an incremental run
+        'retried': sum(1 for r in results if r.get('retried')),
+        'flaky': sum(1 for r in results if r.get('flaky')),  # Passed only on a retry
+        'quarantined': len(quarantined),
+        'quarantine_failed': sum(1 for r in quarantined if r['status'] != 'success'),
+        'duration': duration
+    }
+
+
+def record_run_fingerprint(filepath: Path, fingerprint: str):
+    """Store the fingerprint of an AI step's batch pass (the run itself recorded the result)."""
+    try:
+        with open(filepath, 'r') as f:
+            test_data = json.load(f)
+        test_data['last_run_hash'] = fingerprint
+        with open(filepath, 'w') as f:
+            json.dump(test_data, f, indent=2)
+    except Exception as e:
+        print(f"Warning: Could not record run fingerprint of {filepath.name}: {e}")
+
+
 @socketio.on('run_test')
 def handle_run_test(data):
     """Handle test execution request."""
@@ -1678,18 +4054,25 @@ def handle_run_test(data):
         emit('log', {'type': 'error', 'message': 'No test steps provided'})
         return
 
-    emit('log', {'type': 'info', 'message': 'Starting test...'})
+    try:
+        options = dict(parse_run_options(data), **parse_network_options(data))
+    except RunRequestError as e:
+        emit('log', {'type': 'error', 'message': str(e)})
+        return
 
-    # Run test in background thread
-    socketio.start_background_task(run_test_sync, task)
+    # Run test in background thread once the run queue admits it
+    if submit_run('ai', AI_RUN_SLOTS, run_test_sync, task, options,
+                  sid=request.sid, label='AI test'):
+        emit('log', {'type': 'info', 'message': 'Starting test...'})
 
 
 @socketio.on('stop_test')
-def handle_stop_test():
-    """Handle test stop request."""
-    global stop_requested
-    stop_requested = True
-    emit('log', {'type': 'info', 'message': 'Stop request received, stopping test...'})
+def handle_stop_test(data=None):
+    """Handle a stop request for one run (``run_id``) or, by default, all of this client's runs."""
+    if stop_runs(run_id=(data or {}).get('run_id'), owner=request.sid):
+        emit('log', {'type': 'info', 'message': 'Stop request received, stopping test...'})
+    else:
+        emit('log', {'type': 'info', 'message': 'No running test to stop'})
 
 
 @socketio.on('run_playwright_code')
@@ -1701,11 +4084,17 @@ def handle_run_playwright_code(data):
         emit('log', {'type': 'error', 'message': 'No code provided'})
         return
 
-    emit('log', {'type': 'info', 'message': '▶️ Executing Playwright code from editor...'})
-    emit('log', {'type': 'info', 'message': '🚀 Starting browser session...'})
+    try:
+        options = dict(parse_run_options(data), **parse_network_options(data))
+    except RunRequestError as e:
+        emit('log', {'type': 'error', 'message': str(e)})
+        return
 
-    # Run the code with screenshot streaming
-    socketio.start_background_task(run_playwright_code_with_streaming, code)
+    # Run the code with screenshot streaming once the run queue admits it
+    if submit_run('saved', BROWSER_RUN_SLOTS, run_playwright_code_with_streaming, code, None,
+                  options, sid=request.sid, label='Editor code'):
+        emit('log', {'type': 'info', 'message': '▶️ Executing Playwright code from editor...'})
+        emit('log', {'type': 'info', 'message': '🚀 Starting browser session...'})
 
 
 @socketio.on('run_saved_test')
@@ -1713,158 +4102,254 @@ def handle_run_saved_test(data):
     """Handle running a saved Playwright test (no AI needed)."""
     filename = data.get('filename')
 
-    if not filename:
-        emit('log', {'type': 'error', 'message': 'No test specified'})
-        return
-
-    filepath = SAVED_TESTS_DIR / filename
-    if not filepath.exists():
-        emit('log', {'type': 'error', 'message': 'Test not found'})
-        return
-
     try:
-        with open(filepath, 'r') as f:
-            test_data = json.load(f)
-            code = test_data.get('code')
+        test_data = load_saved_test(filename)
+        code = test_data.get('code')
+        name = test_data.get('name')
+
+        # Run the saved test with streaming in background thread once admitted
+        options = dict(parse_run_options(data), **parse_network_options(data), timeout_s=test_data.get('timeout_s'))
+        if submit_run('saved', BROWSER_RUN_SLOTS, run_playwright_code_with_streaming, code, filename,
+                      options, sid=request.sid, label=name or filename):
+            emit('log', {'type': 'info', 'message': f'Running saved test: {name}'})
+            if options['network'] == 'record':
+                emit('log', {'type': 'info', 'message': '⏺ Re-recording network traffic for replays'})
+            emit('log', {'type': 'info', 'message': '🚀 Executing Playwright code with live browser preview...'})
+
+    except RunRequestError as e:
+        emit('log', {'type': 'error', 'message': str(e)})
+    except Exception as e:
+        emit('log', {'type': 'error', 'message': f'Error running saved test: {str(e)}'})
 
-        emit('log', {'type': 'info', 'message': f'Running saved test: {test_data.get("name")}'})
-        emit('log', {'type': 'info', 'message': '🚀 Executing Playwright code with live browser preview...'})
 
-        # Run the saved test with streaming in background thread
-        socketio.start_background_task(run_playwright_code_with_streaming, code, filename)
+@socketio.on('run_load_test')
+def handle_run_load_test(data):
+    """Handle running a saved test as a load test (see run_load_test_async)."""
+    filename = (data or {}).get('filename')
+    try:
+        test_data = load_saved_test(filename)
+        options = parse_load_test_options(data, test_data)
+    except RunRequestError as e:
+        emit('log', {'type': 'error', 'message': str(e)})
+        return
 
-    except Exception as e:
-        emit('log', {'type': 'error', 'message': f'Error running saved test: {str(e)}'})
+    # The load test holds a browser slot for each browser its users share
+    name = test_data.get('name') or filename
+    if submit_run('load', {'browsers': options['browsers']}, run_load_test, filename, options,
+                  sid=request.sid, label=f'Load test: {name}'):
+        emit('log', {'type': 'info', 'message': f"📈 Load test of {name}: {options['users']} users over "
+                                                f"{options['browsers']} browsers for {options['duration_s']:g}s"})
 
 
 @socketio.on('run_all_tests')
 def handle_run_all_tests(data):
     """Handle running all saved tests in parallel."""
     filenames = data.get('filenames', [])
-    socketio.start_background_task(run_all_tests_parallel, filenames)
-
 
-def run_all_tests_parallel(filenames):
-    """Execute all tests in parallel and collect results."""
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    import time
+    # Individual tests queue at batch priority; the batch itself is turned away when the queue is full
+    try:
+        run_options = dict(parse_network_options(data), **parse_batch_options(data))
+    except RunRequestError as e:
+        emit('run_rejected', {'kind': 'batch', 'label': 'Run all tests', 'message': str(e)})
+        emit('log', {'type': 'error', 'message': str(e)})
+        return
+    try:
+        run_queue.ensure_capacity()
+    except QueueFullError as e:
+        reject_run('batch', request.sid, 'Run all tests', e)
+        return
+    batch = runs.register(RunControl('batch', label='Run all tests', owner=request.sid))
+    socketio.start_background_task(run_all_tests_parallel, filenames, 5, batch, None, (), run_options)
+
+
+async def run_batch(filenames, run_attempt, max_workers: int = 5, batch: RunControl = None, report=None,
+                    ai_step_filenames=(), run_options: dict = None):
+    """Run a batch of tests and collect results; the engine both server modes share.
+
+    Failed saved tests are retried (see batch_retries), and saved tests
+    quarantined as flaky run after the others without failing the batch.
+
+    Args:
+        filenames: Saved test filenames
+        run_attempt: Coroutine function ``run_attempt(kind, test_data, filename,
+            timeout_s, row_results, control)`` running one attempt of a test
+            under ``control`` and returning (status, error_message)
+        max_workers: Tests running at once (within the run queue's browser limit)
+        batch: Registered control for the batch; stopping it stops its tests
+        report: Called as report(event, data) for progress and the summary
+            (defaults to broadcasting them over Socket.IO)
+        ai_step_filenames: AI step filenames to run in the same batch (each
+            holds an AI run slot; results carry ``kind: 'ai'``)
+        run_options: Network mode and execution profile (see parse_network_options;
+            AI steps use only the profile), and incremental-run and retry
+            options (see parse_batch_options)
 
+    Returns:
+        dict: The batch summary also emitted as ``batch_run_complete``
+    """
     start_time = time.time()
+    deadline = start_time + config.BATCH_TIMEOUT_S
+    workers = asyncio.Semaphore(max_workers)
     results = []
+    report = report or socketio.emit
+    run_options = run_options or {}
 
-    def run_single_test(filename):
+    async def run_single_test(filename, kind='saved', quarantined=False):
         """Execute a single test and return result."""
-        try:
-            # Load test file
-            filepath = SAVED_TESTS_DIR / filename
-            if not filepath.exists():
+        # Incremental runs report tests whose last pass still holds without running them
+        if run_options.get('incremental'):
+            cached = cached_batch_result(filename, kind, run_options)
+            if cached:
+                return dict(cached, quarantined=quarantined)
+
+        async with workers:
+            # At most max_workers tests wait here, so they're exempt from the depth limit
+            resources = AI_RUN_SLOTS if kind == 'ai' else BROWSER_RUN_SLOTS
+            ticket = await run_queue.acquire_async('batch', resources, priority=PRIORITY_BATCH, label=filename)
+            metrics.RUNS_IN_PROGRESS.inc(type='batch')
+            test_started = time.perf_counter()
+            status = 'error'
+            control = runs.register(RunControl('batch', label=filename, owner=batch and batch.owner, parent=batch))
+            try:
+                # Load test file
+                filepath = (AI_STEPS_DIR if kind == 'ai' else SAVED_TESTS_DIR) / filename
+                if not filepath.exists():
+                    return {
+                        'filename': filename,
+                        'name': filename,
+                        'kind': kind,
+                        'status': 'error',
+                        'error': 'Test file not found',
+                        'quarantined': quarantined
+                    }
+
+                with open(filepath, 'r') as f:
+                    test_data = json.load(f)
+
+                name = test_data.get('name', filename)
+                fingerprint = test_fingerprint(test_data, kind, run_options)
+
+                # Execute test in headless mode, within its share of the batch budget. Failed saved
+                # tests are retried, each attempt in a fresh browser and context.
+                retries = batch_retries(test_data, run_options) if kind == 'saved' else 0
+                attempts = []
+                row_results = []  # Each data row's result of the last attempt, for data-driven tests
+                while True:
+                    timeout_s = batch_test_timeout(deadline, test_data)
+                    if control.stopping:
+                        status, error_msg = 'stopped', BATCH_STOPPED
+                        break
+                    if timeout_s <= 0:
+                        status, error_msg = 'timeout', BATCH_BUDGET_EXHAUSTED
+                        break
+                    status, error_msg = await run_attempt(kind, test_data, filename, timeout_s, row_results, control)
+                    attempts.append(status)
+                    if status not in RETRYABLE_STATUSES or len(attempts) > retries:
+                        break
+                    print(f"🔁 Retrying {filename} after attempt {len(attempts)} ended with {status}")
+
+                # Update test file with results (AI steps record theirs with their run's artifacts)
+                if kind == 'saved':
+                    save_batch_result(filepath, test_data, status, error_msg, fingerprint, attempts)
+                elif status == 'success':
+                    record_run_fingerprint(filepath, fingerprint)
+
+                return dict({
+                    'filename': filename,
+                    'name': name,
+                    'kind': kind,
+                    'status': status,
+                    'error': error_msg,
+                    'duration_s': round(time.perf_counter() - test_started, 3),
+                    'quarantined': quarantined,
+                    'rows': batch_rows(row_results)
+                }, **attempt_summary(attempts, test_data))
+
+            except Exception as e:
+                import traceback
+                # A malformed test setting is the test's fault, not a crash worth a traceback
+                error_msg = str(e) if isinstance(e, RunRequestError) else f"{str(e)}\n{traceback.format_exc()}"
                 return {
                     'filename': filename,
                     'name': filename,
+                    'kind': kind,
                     'status': 'error',
-                    'error': 'Test file not found'
+                    'error': error_msg,
+                    'quarantined': quarantined
                 }
+            finally:
+                metrics.RUNS_IN_PROGRESS.dec(type='batch')
+                record_run_metrics('batch', status, test_started)
+                run_queue.release(ticket)
+                runs.unregister(control)
+
+    # Quarantined (flaky) tests run on their own once the rest of the batch is done
+    filenames, quarantined = split_quarantined(filenames)
+    phases = (
+        [run_single_test(fn) for fn in filenames] + [run_single_test(fn, 'ai') for fn in ai_step_filenames],
+        [run_single_test(fn, 'saved', True) for fn in quarantined]
+    )
+    for phase in phases:
+        for next_result in asyncio.as_completed(phase):
+            result = await next_result
+            results.append(result)
 
-            with open(filepath, 'r') as f:
-                test_data = json.load(f)
-
-            name = test_data.get('name', filename)
-            code = test_data.get('code', '')
-
-            # Execute test in headless mode
-            status, error_msg = run_playwright_code_headless(code, filename)
-
-            # Update test file with results
-            test_data['last_run_status'] = status
-            test_data['last_run_time'] = time.time()
-            if error_msg:
-                test_data['last_error'] = error_msg
+            # Emit progress update
+            report('batch_test_progress', result)
 
-            with open(filepath, 'w') as f:
-                json.dump(test_data, f, indent=2)
+    # Emit completion event
+    summary = summarize_batch(results, time.time() - start_time)
+    if batch:
+        runs.unregister(batch)
+    report('batch_run_complete', summary)
+    return summary
 
-            return {
-                'filename': filename,
-                'name': name,
-                'status': status,
-                'error': error_msg
-            }
 
-        except Exception as e:
-            import traceback
-            error_msg = f"{str(e)}\n{traceback.format_exc()}"
-            return {
-                'filename': filename,
-                'name': filename,
-                'status': 'error',
-                'error': error_msg
-            }
+def run_all_tests_parallel(filenames, max_workers: int = 5, batch: RunControl = None, report=None,
+                           ai_step_filenames=(), run_options: dict = None):
+    """Execute all tests in parallel and collect results (see run_batch).
 
-    # Execute tests in parallel with max 5 workers
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_filename = {executor.submit(run_single_test, fn): fn for fn in filenames}
+    The batch is driven from a private event loop on the calling thread;
+    each attempt runs on a worker thread with its own loop, bound to the
+    test's run control so it can be stopped.
 
-        for future in as_completed(future_to_filename):
-            result = future.result()
-            results.append(result)
+    Returns:
+        dict: The batch summary also emitted as ``batch_run_complete``
+    """
+    run_options = run_options or {}
 
-            # Emit progress update
-            socketio.emit('batch_test_progress', result)
+    async def run_in_thread(kind, test_data, filename, timeout_s, row_results, control):
+        def attempt():
+            with run_control.bind(control):
+                if kind == 'ai':
+                    return run_ai_step_headless(test_data, filename, timeout_s, run_options)
+                return run_playwright_code_headless(test_data.get('code', ''), filename, timeout_s, run_options,
+                                                    row_results)
+        return await asyncio.to_thread(attempt)
 
-    # Calculate summary statistics
-    duration = time.time() - start_time
-    total = len(results)
-    passed = sum(1 for r in results if r['status'] == 'success')
-    failed = total - passed
-
-    # Emit completion event
-    socketio.emit('batch_run_complete', {
-        'total': total,
-        'passed': passed,
-        'failed': failed,
-        'duration': duration
-    })
+    return asyncio.run(run_batch(filenames, run_in_thread, max_workers, batch, report, ai_step_filenames,
+                                 run_options))
 
 
 @socketio.on('run_ai_step')
 def handle_run_ai_step(data):
     """Handle running an AI step test from file."""
-    global current_ai_step
-
     filename = data.get('filename')
 
-    if not filename:
-        emit('log', {'type': 'error', 'message': 'No AI step specified'})
-        return
-
-    filepath = AI_STEPS_DIR / filename
-    if not filepath.exists():
-        emit('log', {'type': 'error', 'message': 'AI step not found'})
-        return
-
     try:
-        with open(filepath, 'r') as f:
-            step_data = json.load(f)
-            steps = step_data.get('steps')
-            name = step_data.get('name')
-
-        if not steps:
-            emit('log', {'type': 'error', 'message': 'No steps found in AI step test'})
-            return
-
-        emit('log', {'type': 'info', 'message': f'🤖 Running AI steps: {name}'})
-
-        # Update last_run timestamp
-        step_data['last_run'] = datetime.now().isoformat()
-        with open(filepath, 'w') as f:
-            json.dump(step_data, f, indent=2)
-
-        # Track current AI step for code generation prompt
-        current_ai_step = {'filename': filename, 'name': name}
-
-        # Run test using existing run_test_sync logic
-        socketio.start_background_task(run_test_sync, steps)
-
+        step_data = load_ai_step(filename)
+        steps = step_data.get('steps')
+        name = step_data.get('name')
+
+        # Run test using existing run_test_sync logic once the run queue admits it; the
+        # AI step is passed along for artifacts and the code generation prompt
+        options = dict(parse_run_options(data), **parse_network_options(data), timeout_s=step_data.get('timeout_s'))
+        if submit_run('ai', AI_RUN_SLOTS, run_test_sync, steps, options, {'filename': filename, 'name': name},
+                      sid=request.sid, label=name or filename):
+            emit('log', {'type': 'info', 'message': f'🤖 Running AI steps: {name}'})
+
+    except RunRequestError as e:
+        emit('log', {'type': 'error', 'message': str(e)})
     except Exception as e:
         emit('log', {'type': 'error', 'message': f'Error running AI step: {str(e)}'})
 
@@ -1889,41 +4374,47 @@ def handle_code_chat(message, existing_code, image=None, file_type='unknown'):
     """Background task to handle code generation chat."""
     try:
         # Generate response using code agent (with optional image and file type)
-        result = code_agent.generate_response(message, existing_code, image, file_type)
-
-        # Emit AI response
-        socketio.emit('chat_response', {
-            'role': 'ai',
-            'message': result['message'],
-            'timestamp': datetime.now().isoformat()
-        })
-
-        # Emit generated code or content (steps) if available
-        if result.get('code'):
-            # For test files - send code
-            socketio.emit('code_suggestion', {
-                'code': result['code'],
-                'explanation': result.get('explanation', ''),
-                'action': 'suggest',
-                'content_type': 'code'
-            })
-        elif result.get('content'):
-            # For AI steps files - send steps content
-            socketio.emit('code_suggestion', {
-                'code': result['content'],  # Using 'code' field for compatibility with frontend
-                'explanation': result.get('explanation', ''),
-                'action': 'suggest',
-                'content_type': 'steps'
-            })
+        with llm_limiter:
+            result = get_code_agent().generate_response(message, existing_code, image, file_type)
+        emit_chat_result(result)
 
     except Exception as e:
         socketio.emit('chat_error', {'message': str(e)})
 
 
+def emit_chat_result(result: dict):
+    """Send a code agent response (and any suggested code or steps) to the chat."""
+    # Emit AI response
+    socketio.emit('chat_response', {
+        'role': 'ai',
+        'message': result['message'],
+        'timestamp': datetime.now().isoformat()
+    })
+
+    # Emit generated code or content (steps) if available
+    if result.get('code'):
+        # For test files - send code
+        socketio.emit('code_suggestion', {
+            'code': result['code'],
+            'explanation': result.get('explanation', ''),
+            'action': 'suggest',
+            'content_type': 'code'
+        })
+    elif result.get('content'):
+        # For AI steps files - send steps content
+        socketio.emit('code_suggestion', {
+            'code': result['content'],  # Using 'code' field for compatibility with frontend
+            'explanation': result.get('explanation', ''),
+            'action': 'suggest',
+            'content_type': 'steps'
+        })
+
+
 @socketio.on('clear_chat')
 def handle_clear_chat():
     """Handle chat history clear request."""
-    code_agent.clear_history()
+    if _code_agent is not None:
+        _code_agent.clear_history()
     emit('log', {'type': 'info', 'message': 'Chat history cleared'})
 
 